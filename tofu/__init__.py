@@ -53,6 +53,7 @@ __version__
 
 import os
 import sys
+import importlib
 import warnings
 from .version import __version__
 
@@ -62,14 +63,16 @@ from .version import __version__
 # -------------------------------------
 
 
+# use a local bsplines2d repo (next to tofu's) if any
 _PATH_HERE = os.path.dirname(os.path.dirname(__file__))
 _PATH_BS2 = os.path.join(
     os.path.dirname(_PATH_HERE),
     'bsplines2d',
 )
-sys.path.insert(0, _PATH_BS2)
-import bsplines2d as bs2
-sys.path.pop(0)
+if os.path.isdir(_PATH_BS2):
+    sys.path.insert(0, _PATH_BS2)
+    import bsplines2d as bs2
+    sys.path.pop(0)
 
 
 # -------------------------------------
@@ -77,56 +80,103 @@ sys.path.pop(0)
 # -------------------------------------
 
 
-import tofu.pathfile as pathfile
-import tofu.utils as utils
+# -------------------------------------
+#   Lazy loading of subpackages / modules
+# -------------------------------------
+# Subpackages, modules and shortcuts are only imported on first access
+# (PEP 562), to keep "import tofu" light
+
+
+# attribute => (module, attribute in module or None for the module itself)
+_DLAZY = {
+    'pathfile': ('tofu.pathfile', None),
+    'utils': ('tofu.utils', None),
+    '_plot': ('tofu._plot', None),
+    'geom': ('tofu.geom', None),
+    'data': ('tofu.data', None),
+    'spectro': ('tofu.spectro', None),
+    'tests': ('tofu.tests', None),
+    'benchmarks': ('tofu.benchmarks', None),
+    'bs2': ('bsplines2d', None),
+    # shortcuts
+    'save': ('tofu.utils', 'save'),
+    'load': ('tofu.utils', 'load'),
+    'load_from_imas': ('tofu.utils', 'load_from_imas'),
+    'calc_from_imas': ('tofu.utils', 'calc_from_imas'),
+    'load_config': ('tofu.geom.utils', 'create_config'),
+}
+
+
+# optional subpackages, availability probed on first access
+_LOPTIONAL = [
+    'imas2tofu', 'openadas2tofu', 'nist2tofu', 'mag', 'tomotok2tofu',
+]
 
-from tofu.utils import save, load, load_from_imas, calc_from_imas
-import tofu._plot as _plot
-import tofu.geom as geom
-from tofu.geom.utils import create_config as load_config
-import tofu.data as data
-import tofu.spectro as spectro
-import tofu.tests as tests
-import tofu.benchmarks as benchmarks
 
+def _get_dsub(warn=None):
+    """ Try importing all optional subpackages, return their availability
 
-# -------------------------------------
-#   Try importing optional subpackages
-# -------------------------------------
+    True if available, else the error message
+    """
 
-msg = None
-dsub = dict.fromkeys([
-    'imas2tofu', 'openadas2tofu', 'nist2tofu', 'mag', 'tomotok2tofu',
-])
-for sub in dsub.keys():
-    try:
-        exec('import tofu.{0} as {0}'.format(sub))
-        dsub[sub] = True
-    except Exception as err:
-        dsub[sub] = str(err)
+    dsub = {}
+    for sub in _LOPTIONAL:
+        try:
+            importlib.import_module(f'tofu.{sub}')
+            dsub[sub] = True
+        except Exception as err:
+            dsub[sub] = str(err)
 
-# -------------------------------------
-# If any error, populate warning and store error message
-# -------------------------------------
+    # -------------------------------------
+    # If any error, populate warning and store error message
+
+    lsubout = [sub for sub in dsub.keys() if dsub[sub] is not True]
+    if warn is True and len(lsubout) > 0:
+        lsubout = ['tofu.{0}'.format(ss) for ss in lsubout]
+        msg = (
+            "\nThe following subpackages are not available:\n"
+            + "\n".join(["\t- {}".format(sub) for sub in lsubout])
+            + "\n  => see print(tofu.dsub[<subpackage>]) for details."
+        )
+        warnings.warn(msg)
+
+    return dsub
+
+
+def __getattr__(name):
+
+    if name in _DLAZY:
+        mod, attr = _DLAZY[name]
+        out = importlib.import_module(mod)
+        if attr is not None:
+            out = getattr(out, attr)
+
+    elif name in _LOPTIONAL:
+        try:
+            out = importlib.import_module(f'tofu.{name}')
+        except Exception as err:
+            msg = (
+                f"Optional subpackage tofu.{name} is not available:\n{err}"
+            )
+            raise AttributeError(msg) from err
+
+    elif name == 'dsub':
+        out = _get_dsub(warn=True)
+
+    else:
+        msg = f"module 'tofu' has no attribute '{name}'"
+        raise AttributeError(msg)
+
+    globals()[name] = out
+    return out
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_DLAZY) | {'dsub'})
 
-lsubout = [sub for sub in dsub.keys() if dsub[sub] is not True]
-if len(lsubout) > 0:
-    lsubout = ['tofu.{0}'.format(ss) for ss in lsubout]
-    msg = (
-        "\nThe following subpackages are not available:\n"
-        + "\n".join(["\t- {}".format(sub) for sub in lsubout])
-        + "\n  => see print(tofu.dsub[<subpackage>]) for details."
-    )
-    warnings.warn(msg)
 
 # -------------------------------------
-# Add optional subpackages to __all__
+# Core subpackages in __all__
 # -------------------------------------
 
 __all__ = ['pathfile', 'utils', '_plot', 'geom', 'data', 'spectro']
-for sub in dsub.keys():
-    if dsub[sub] is True:
-        __all__.append(sub)
-
-# clean-up the mess
-del sys, warnings, lsubout, sub, msg
@@ -13,6 +13,7 @@ import bsplines2d as bs2
 
 # tofu
 # from tofu import __version__ as __version__
+from . import _saveload
 
 
 __all__ = ['Config']
@@ -34,3 +35,57 @@ class Config(bs2.BSplines2D):
         'config': [
         ],
     })
+
+    # -------------------
+    # saving
+    # -------------------
+
+    def save(
+        self,
+        path=None,
+        name=None,
+        sep=None,
+        mode=None,
+        verb=True,
+        return_pfe=False,
+    ):
+        """ Save the Collection, as a file or a directory
+
+        mode:
+            - 'npz': single .npz file (default)
+            - 'npy': directory with one .npy file per data array,
+                memory-mapped when loaded with tofu.data.load()
+        sep:
+            separator of flattened keys, only for mode='npz'
+
+        """
+
+        mode = ds._generic_check._check_var(
+            mode, 'mode',
+            default='npz',
+            types=str,
+            allowed=['npz', 'npy'],
+        )
+
+        if mode == 'npz':
+            return super().save(
+                path=path,
+                name=name,
+                sep=sep,
+                verb=verb,
+                return_pfe=return_pfe,
+            )
+
+        else:
+            # arrays are not flattened in a directory
+            if sep is not None:
+                msg = "Arg sep can only be used with mode='npz'!"
+                raise ValueError(msg)
+
+            return _saveload.save(
+                coll=self,
+                path=path,
+                name=name,
+                verb=verb,
+                return_pfe=return_pfe,
+            )
@@ -171,6 +171,7 @@ class Rays(Previous):
         ind_ch=None,
         radius_max=None,
         concatenate=None,
+        ragged=None,
         return_coords=None,
     ):
         """ Return the sampled rays
@@ -198,6 +199,12 @@ class Rays(Previous):
             the provided ;ajor radius
         concatenate:     bool
             flag indicating whether to concatenate the sampled points per ray
+        ragged:     bool
+            flag indicating whether to return flat arrays of the valid
+            sampled points (ray by ray, in C order) instead of nan-padded
+            (npts_max, nx0, nx1, ...) arrays
+            If True, the offsets (nrays + 1,) are appended to the output
+            such that the points of ray ii are [offsets[ii]:offsets[ii+1]]
         """
 
         return _sample.main(
@@ -210,6 +217,7 @@ class Rays(Previous):
             ind_ch=ind_ch,
             radius_max=radius_max,
             concatenate=concatenate,
+            ragged=ragged,
             return_coords=return_coords,
         )
 
@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 
 
-import itertools as itt
-
-
 import numpy as np
 import scipy.interpolate as scpinterp
 import datastock as ds
@@ -25,6 +22,7 @@ def main(
     ind_ch=None,
     radius_max=None,
     concatenate=None,
+    ragged=None,
     return_coords=None,
 ):
 
@@ -32,13 +30,14 @@ def main(
     # check inputs
 
     (
-        res, mode, concatenate,
+        res, mode, concatenate, ragged,
         segment, radius_max,
         return_coords, out_xyz, out_k, out_l,
     ) = _sample_check(
         res=res,
         mode=mode,
         concatenate=concatenate,
+        ragged=ragged,
         segment=segment,
         radius_max=radius_max,
         return_coords=return_coords,
@@ -140,7 +139,9 @@ def main(
     # -----------
 
     if pts_x.size == 0 or not np.any(np.isfinite(pts_x)):
-        return [None]*len(return_coords)
+        return [None]*(len(return_coords) + int(ragged))
+
+    shape_ch = pts_x.shape[1:]
 
     # --------------------
     # compute sampling
@@ -190,118 +191,53 @@ def main(
     # --------------------
     # absolute sampling
     # different nb of pts per segment / pixel
+    # all channels at once, as a flat (channel-major) array + offsets
 
     else:
 
-        # get indices of valid pts
-        iok = np.isfinite(pts_x)
+        (
+            itot, pts_x, pts_y, pts_z, length, lengthtot, offsets,
+        ) = _sample_abs(
+            pts_x=pts_x,
+            pts_y=pts_y,
+            pts_z=pts_z,
+            i0=i0,
+            length_rad=length_rad,
+            length0=length0,
+            length1=length1,
+            res=res,
+            out_xyz=out_xyz,
+            out_l=out_l,
+        )
 
-        # get shape of arrays based on max nb of points ()
-        nn = np.ceil(length_rad / res).astype(int)
-        nmax = np.nansum(nn, axis=0) + 1
-        shape = tuple(np.r_[np.nanmax(nmax), length_rad.shape[1:]])
+        if ragged is False:
+            itot, pts_x, pts_y, pts_z, length, lengthtot = [
+                None if aa is None
+                else _ragged_to_padded(aa, offsets, shape_ch)
+                for aa in (itot, pts_x, pts_y, pts_z, length, lengthtot)
+            ]
 
-        # initialize arrays
-        itot = np.full(shape, np.nan)
+    # ---------------------------------
+    # optional ragged layout for 'rel'
 
-        if out_xyz:
-            lpx = np.full(shape, np.nan)
-            lpy = np.full(shape, np.nan)
-            lpz = np.full(shape, np.nan)
+    if ragged is True and mode == 'rel':
 
+        lpad = [np.broadcast_to(
+            itot.reshape((-1,) + (1,)*len(shape_ch)),
+            (itot.size,) + shape_ch,
+        )]
+        if out_xyz:
+            lpad += [pts_x, pts_y, pts_z]
         if out_l:
-            llen = np.full(shape, np.nan)
-            lentot = np.full(shape, np.nan)
-
-        # loop in pixels
-        for ind in itt.product(*[range(ss) for ss in pts_x.shape[1:]]):
-
-            sli0 = tuple([slice(None)] + list(ind))
-            ioki = iok[sli0]
-            iokin = ioki[:-1] * ioki[1:]
-
-            # trivial case
-            if not np.any(iokin):
-                continue
-
-            # get sli2 and i0i
-            sli2 = tuple([ioki] + list(ind))
-            if radius_max is None:
-                i0i = i0[ioki]
-            else:
-                i0i = i0[sli2]
-            nni = nn[tuple([iokin] + list(ind))]
-
-            # itoti
-            itoti = []
-            anyok = False
-            for jj in range(i0i.size - 1):
-                if np.all(np.isfinite(i0i[jj:jj+2])):
-                    itoti.append(
-                        np.linspace(
-                            i0i[jj],
-                            i0i[jj+1],
-                            nni[jj] + 1,
-                        )[:-1]
-                    )
-                    anyok = True
-
-            if anyok is False:
-                continue
-
-            if np.isfinite(i0i[-1]):
-                itoti.append([i0i[-1]])
-
-            itoti = np.concatenate(tuple(itoti))
-
-            # safety check
-            ni = itoti.size
-            if nmax[ind] != ni:
-                msg = (
-                    "Mismatch between:\n"
-                    f"\t- nmax[{ind}] = {nmax[ind]}\n"
-                    f"\t- itoti.size = {itoti.size}\n"
-                )
-                raise Exception(msg)
-
-            slin = tuple([np.arange(ni)] + list(ind))
-            itot[slin] = itoti
-
-            # interpolate
-            if out_xyz:
-                lpx[slin] = scpinterp.interp1d(
-                    i0i,
-                    pts_x[sli2],
-                    kind='linear',
-                    axis=0,
-                )(itoti)
-
-                lpy[slin] = scpinterp.interp1d(
-                    i0i,
-                    pts_y[sli2],
-                    kind='linear',
-                    axis=0,
-                )(itoti)
-
-                lpz[slin] = scpinterp.interp1d(
-                    i0i,
-                    pts_z[sli2],
-                    kind='linear',
-                    axis=0,
-                )(itoti)
-
-            if out_l:
-                i1 = np.floor(itoti).astype(int)
-                i1[i1 == ioki.sum()] -= 1
-
-                llen[slin] = length1[sli2][i1]
-                lentot[slin] = length0[sli2][i1]
+            lpad += [length, lengthtot]
+
+        lflat, offsets = _padded_to_ragged(lpad)
 
+        itot = lflat[0]
         if out_xyz:
-            pts_x, pts_y, pts_z = lpx, lpy, lpz
+            pts_x, pts_y, pts_z = lflat[1:4]
         if out_l:
-            length = llen
-            lengthtot = lentot
+            length, lengthtot = lflat[-2:]
 
     # -------------------------------------
     # optional concatenation (for plotting)
@@ -340,22 +276,6 @@ def main(
                 np.concatenate((lengthtot, nan), axis=0).T.ravel()
             )
 
-    # -------------
-    # adjust npts
-    # -------------
-
-    iok = np.any(np.isfinite(itot), axis=0)
-    if not np.all(iok):
-        sli= tuple([itot] + [slice(None) for ss in itot.shape[1:]])
-        itot = itot[sli]
-        if out_xyz:
-            pts_x = pts_x[sli]
-            pts_y = pts_y[sli]
-            pts_z = pts_z[sli]
-        if out_l:
-            length = length[sli]
-            lengthtot = lengthtot[sli]
-
     # -------------
     # adjust kk
     # -------------
@@ -364,6 +284,11 @@ def main(
         kk = itot - np.floor(itot)
         kk[itot == np.nanmax(itot)] = 1.
 
+        # 'rel' => itot is common to all rays
+        kkl = kk
+        if out_l and kk.ndim < length.ndim:
+            kkl = kk.reshape((-1,) + (1,)*(length.ndim - 1))
+
     # -------------
     # return
     # -------------
@@ -391,6 +316,13 @@ def main(
             uy = np.diff(pts_y, axis=0)
             ux = np.concatenate((ux[0:1, ...], ux), axis=0)
             uy = np.concatenate((uy[0:1, ...], uy), axis=0)
+            if ragged is True:
+                # 1st pt of each channel: use its own segment
+                nn = np.diff(offsets)
+                ind = offsets[:-1][nn > 1]
+                ux[ind], uy[ind] = ux[ind + 1], uy[ind + 1]
+                ind = offsets[:-1][nn == 1]
+                ux[ind], uy[ind] = np.nan, np.nan
             vn = np.sqrt(ux**2 + uy**2)
             ux = ux / vn
             uy = uy / vn
@@ -403,7 +335,7 @@ def main(
             lout.append(kk)
 
         elif cc == 'l':
-            lout.append(kk*length)
+            lout.append(kkl*length)
 
         elif cc == 'ltot':
             # import matplotlib.pyplot as plt
@@ -418,11 +350,178 @@ def main(
             # plt.plot(kk*length + lengthtot)
             # import pdb; pdb.set_trace()     # DB
 
-            lout.append(kk*length + lengthtot)
+            lout.append(kkl*length + lengthtot)
+
+    if ragged is True:
+        lout.append(offsets)
 
     return lout
 
 
+# ###############################################################
+#                   absolute sampling
+# ###############################################################
+
+
+def _sample_abs(
+    pts_x=None,
+    pts_y=None,
+    pts_z=None,
+    i0=None,
+    length_rad=None,
+    length0=None,
+    length1=None,
+    res=None,
+    out_xyz=None,
+    out_l=None,
+):
+    """ Sample all channels at once, with an absolute resolution
+
+    Return flat (channel-major) arrays and the (nch + 1,) offsets such that
+    the samples of channel ii are [offsets[ii]:offsets[ii+1]]
+    Channels are flattened in C order
+    """
+
+    # -------------------------
+    # reshape as (nch, npts)
+
+    npts = pts_x.shape[0]
+    nch = int(np.prod(pts_x.shape[1:]))
+
+    lpts = [
+        aa.reshape((npts, nch)).T
+        for aa in (pts_x, pts_y, pts_z)
+    ]
+    if i0.ndim == 1:
+        i0 = np.broadcast_to(i0, (nch, npts))
+    else:
+        i0 = i0.reshape((npts, nch)).T
+
+    # valid pts and segments
+    iok = np.isfinite(lpts[0]) & np.isfinite(i0)
+    iokin = iok[:, :-1] & iok[:, 1:]
+
+    # -------------------------
+    # nb of samples per segment
+
+    # valid segments, sorted by channel, then segment
+    ich, iseg = iokin.nonzero()
+    nseg = np.ceil(
+        length_rad.reshape((npts - 1, nch)).T[ich, iseg] / res
+    ).astype(int)
+
+    # channels with at least one valid segment get their last point too
+    ichok = np.zeros((nch,), dtype=bool)
+    ichok[ich] = True
+    nlast = np.cumsum(ichok) - ichok
+
+    ncount = np.bincount(ich, weights=nseg, minlength=nch).astype(int)
+    ncount += ichok
+    offsets = np.r_[0, np.cumsum(ncount)]
+
+    # -------------------------
+    # flat itot
+
+    nsamp = int(nseg.sum())
+    ind = np.repeat(np.arange(ich.size), nseg)
+    mm = np.arange(nsamp) - np.repeat(np.cumsum(nseg) - nseg, nseg)
+
+    # same arithmetic as np.linspace(start, end, nseg + 1)[:-1]
+    start = i0[ich, iseg]
+    step = np.zeros(start.shape, dtype=float)
+    iseg_ok = nseg > 0
+    step[iseg_ok] = (
+        (i0[ich, iseg + 1] - start)[iseg_ok] / nseg[iseg_ok]
+    )
+
+    # last pt of each valid channel = end of its last segment
+    ilast = np.r_[ich[1:] != ich[:-1], True] if ich.size > 0 else ich
+
+    # position in flat array, for samples and last pts
+    ipos = np.arange(nsamp) + nlast[ich[ind]]
+    ipos_last = offsets[1:][ichok] - 1
+
+    itot = np.full((offsets[-1],), np.nan)
+    itot[ipos] = mm * step[ind] + start[ind]
+    itot[ipos_last] = i0[ich[ilast], iseg[ilast] + 1]
+
+    # -------------------------
+    # linear interpolation
+    # same as np.interp(): samples falling on a pt get its exact value
+
+    if out_xyz:
+
+        im = mm > 0
+        ii = (ich[ind], iseg[ind])
+        iim = (ii[0][im], ii[1][im])
+        iip = (ii[0][im], ii[1][im] + 1)
+        iilast = (ich[ilast], iseg[ilast] + 1)
+
+        dx = itot[ipos[im]] - i0[iim]
+        dx_seg = i0[iip] - i0[iim]
+
+        lout = []
+        for aa in lpts:
+            out = np.full(itot.shape, np.nan)
+            out[ipos] = aa[ii]
+            out[ipos[im]] = (aa[iip] - aa[iim]) / dx_seg * dx + aa[iim]
+            out[ipos_last] = aa[iilast]
+            lout.append(out)
+        pts_x, pts_y, pts_z = lout
+
+    else:
+        pts_x, pts_y, pts_z = None, None, None
+
+    # -------------------------
+    # lengths
+
+    if out_l:
+
+        # floor(itot) is an index among the valid pts of each channel
+        nok = iok.sum(axis=1)
+        offsets_ok = np.r_[0, np.cumsum(nok)]
+
+        ich_flat = np.repeat(np.arange(nch), ncount)
+        i1 = np.floor(itot).astype(int)
+        i1[i1 == nok[ich_flat]] -= 1
+        i1 = offsets_ok[ich_flat] + np.clip(i1, 0, nok[ich_flat] - 1)
+
+        length = length1.reshape((npts, nch)).T[iok][i1]
+        lengthtot = length0.reshape((npts, nch)).T[iok][i1]
+
+    else:
+        length, lengthtot = None, None
+
+    return itot, pts_x, pts_y, pts_z, length, lengthtot, offsets
+
+
+def _ragged_to_padded(arr, offsets, shape):
+    """ Return a (nmax, *shape) nan-padded array from a flat ragged one """
+
+    nn = np.diff(offsets)
+    nmax = np.max(nn) if nn.size > 0 else 0
+    ich = np.repeat(np.arange(nn.size), nn)
+
+    out = np.full((nmax, nn.size), np.nan)
+    out[np.arange(arr.size) - offsets[ich], ich] = arr
+    return out.reshape((nmax,) + tuple(shape))
+
+
+def _padded_to_ragged(lpad):
+    """ Return flat ragged arrays + offsets from (npts, *shape) padded ones
+
+    Only the pts finite in all arrays are kept
+    """
+
+    npts = lpad[0].shape[0]
+    lpad = [aa.reshape((npts, -1)).T for aa in lpad]
+
+    iok = np.all([np.isfinite(aa) for aa in lpad], axis=0)
+    offsets = np.r_[0, np.cumsum(iok.sum(axis=1))]
+
+    return [aa[iok] for aa in lpad], offsets
+
+
 # ###############################################################
 #                   check inputs
 # ###############################################################
@@ -434,6 +533,7 @@ def _sample_check(
     segment=None,
     radius_max=None,
     concatenate=None,
+    ragged=None,
     return_coords=None,
 ):
 
@@ -470,6 +570,19 @@ def _sample_check(
         default=False,
     )
 
+    # ------------
+    # ragged
+
+    ragged = ds._generic_check._check_var(
+        ragged, 'ragged',
+        types=bool,
+        default=False,
+    )
+
+    if ragged is True and concatenate is True:
+        msg = "Args ragged and concatenate cannot be both True!"
+        raise Exception(msg)
+
     # ----------------
     # segment indices
     # ----------------
@@ -513,7 +626,7 @@ def _sample_check(
     out_l = any(['l' in return_coords, 'ltot' in return_coords])
 
     return (
-        res, mode, concatenate,
+        res, mode, concatenate, ragged,
         segment, radius_max,
         return_coords, out_xyz, out_k, out_l
     )
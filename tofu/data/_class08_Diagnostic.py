@@ -222,6 +222,12 @@ class Diagnostic(Previous):
         check=None,
         margin_par=None,
         margin_perp=None,
+        # quasi Monte-Carlo numerical etendue
+        numerical_method=None,
+        rtol=None,
+        npts_max=None,
+        nrep=None,
+        seed=None,
         # spectro-only
         ind_ap_lim_spectral=None,
         rocking_curve_fw=None,
@@ -248,6 +254,13 @@ class Diagnostic(Previous):
         If plot, plot the comparison between all computations
         If store = 'analytical' or 'numerical', overwrites the diag etendue
 
+        numerical_method sets the numerical estimator:
+            - 'grid': solid angles on grids of resolutions res (default)
+            - 'qmc': quasi Monte-Carlo sampling of detector x aperture
+                points, using nrep scrambled Sobol sequences, until the
+                standard error is <= rtol * etendue for each detector
+                (or npts_max points per sequence are reached)
+
         """
 
         # prepare computation
@@ -261,6 +274,11 @@ class Diagnostic(Previous):
             check=check,
             margin_par=margin_par,
             margin_perp=margin_perp,
+            numerical_method=numerical_method,
+            rtol=rtol,
+            npts_max=npts_max,
+            nrep=nrep,
+            seed=seed,
             # spectro-only
             ind_ap_lim_spectral=ind_ap_lim_spectral,
             rocking_curve_fw=rocking_curve_fw,
@@ -440,6 +458,9 @@ class Diagnostic(Previous):
         check=None,
         verb=None,
         debug=None,
+        n_workers=None,
+        path_shards=None,
+        resume=None,
         store=None,
         overwrite=None,
         replace_poly=None,
@@ -448,6 +469,13 @@ class Diagnostic(Previous):
         """ Compute the vos of the diagnostic (per pixel)
 
         - poly_margin (0.3) fraction by which the los-estimated vos is widened
+        - n_workers (1): nb of processes over which pixels (broadband) or
+            plasma points (spectro) are sharded
+        - path_shards: existing dir where each finished pixel (broadband)
+            or radius of plasma points (spectro) is saved, can be assembled
+            by store_diagnostic_vos()
+        - resume: if True, pixels / radii already saved in path_shards are
+            skipped
         -store:
             - if replace_poly, will replace the vos polygon approximation
             - will store the toroidally-integrated solid angles
@@ -486,6 +514,9 @@ class Diagnostic(Previous):
             check=check,
             verb=verb,
             debug=debug,
+            n_workers=n_workers,
+            path_shards=path_shards,
+            resume=resume,
             store=store,
             overwrite=overwrite,
             replace_poly=replace_poly,
@@ -528,8 +559,25 @@ class Diagnostic(Previous):
         spectro=None,
         overwrite=None,
         replace_poly=None,
+        # from shards
+        key_cam=None,
+        path_shards=None,
     ):
-        """ Store a pre-computed dvos """
+        """ Store a pre-computed dvos
+
+        If path_shards is provided, dvos and dref are assembled from the
+        shards saved by compute_diagnostic_vos(path_shards=...)
+
+        """
+        if path_shards is not None:
+            dvos, dref = _vos._assemble_from_shards(
+                coll=self,
+                key_diag=key_diag,
+                key_cam=key_cam,
+                path_shards=path_shards,
+            )
+            spectro = self.dobj['diagnostic'][key_diag]['spectro']
+
         _vos._store(
             coll=self,
             key_diag=key_diag,
@@ -918,6 +966,7 @@ class Diagnostic(Previous):
         groupby=None,
         val_init=None,
         ref_com=None,
+        sparse=None,
         # signal
         brightness=None,
         spectral_binning=None,
@@ -934,6 +983,15 @@ class Diagnostic(Previous):
     ):
         """ Compute synthetic signal for a diagnostic and an emissivity field
 
+        sparse: bool
+            Only for method='los' and non-spectro diagnostics
+            If True, all los are sampled once and turned into a sparse
+            (npix, nbs) integration operator, applied to all time steps
+            (and other dimensions) of the integrand in a single product
+            Much faster for long time series, same trapezoidal integration
+            as the default (sparse=False), but los seeing only zero
+            emissivity get 0 instead of val_init
+
         """
 
         return _compute_signal.compute_signal(
@@ -952,6 +1010,7 @@ class Diagnostic(Previous):
             groupby=groupby,
             val_init=val_init,
             ref_com=ref_com,
+            sparse=sparse,
             # signal
             brightness=brightness,
             spectral_binning=spectral_binning,
@@ -993,6 +1052,8 @@ class Diagnostic(Previous):
         rocking_curve=None,
         res_rock_curve=None,
         # options
+        max_mem=None,
+        sparse=None,
         append=None,
         plot=None,
         dax=None,
@@ -1004,7 +1065,14 @@ class Diagnostic(Previous):
         elements=None,
         colorbar=None,
     ):
-        """ Get rays from plasma points to camera for a spectrometer diag """
+        """ Get rays from plasma points to camera for a spectrometer diag
+
+        Unless append=True, points are processed by blocks, sized to fit
+        the memory budget max_mem (bytes, default 2e8)
+        If sparse=True, sang0 and sang are returned as sparse matrices
+        of shape (npix, npts), storing only the (pixel, point) pairs hit
+
+        """
 
         return _reverse_rt._from_pts(
             coll=self,
@@ -1028,6 +1096,8 @@ class Diagnostic(Previous):
             rocking_curve=rocking_curve,
             res_rock_curve=res_rock_curve,
             # options
+            max_mem=max_mem,
+            sparse=sparse,
             append=append,
             plot=plot,
             dax=dax,
@@ -10,10 +10,14 @@ Created on Thu Jan 25 19:03:27 2024
 
 # Common
 import numpy as np
-import scipy.integrate as scpinteg
+import scipy.sparse as scpsp
 import astropy.units as asunits
 
 
+# max nb. of elements of the bsplines details array per chunk
+_CHUNK_SIZE = int(1e7)
+
+
 # #############################################################################
 # #############################################################################
 #                           LOS
@@ -63,50 +67,85 @@ def _compute_los(
         key_mat = f'{key}_{k0}'
 
         sh = tuple([npix if ss is None else ss for ss in shape_mat])
-        mat = np.zeros(sh, dtype=float)
+
+        # (nchan, nbs) matrices are sparse
+        sparse = len(sh) == 2
 
         # -----------------------
-        # loop on group of pixels (to limit memory footprint)
+        # sample all los at once
+
+        out_sample = coll.sample_rays(
+            key=key_los,
+            res=res,
+            mode=mode,
+            segment=None,
+            ind_ch=None,
+            radius_max=radius_max,
+            concatenate=False,
+            ragged=True,
+            return_coords=['R', 'z', 'ltot'],
+        )
+
+        # valid points, sorted by pixel (flat pixel index in C order)
+        if out_sample is None or out_sample[0] is None:
+            R = np.zeros((0,), dtype=float)
+            Z, length = R, R
+            ipix = np.zeros((0,), dtype=int)
+        else:
+            R, Z, length, offsets = out_sample
+            ipix = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+
+            iok = np.isfinite(R) & np.isfinite(Z) & np.isfinite(length)
+            if not np.all(iok):
+                R, Z, length, ipix = R[iok], Z[iok], length[iok], ipix[iok]
+
+        # integration weights
+        weights = _get_simpson_weights(xx=length, ilos=ipix)
+
+        # ----------------------------------------------------
+        # loop on chunks of pixels (to limit memory footprint)
+
+        nother = int(np.prod(
+            [ss for aa, ss in enumerate(sh) if aa != axis_pix]
+        ))
+        lchunks = _get_chunks(
+            ipix=ipix,
+            npix=npix,
+            npts_max=max(1, _CHUNK_SIZE // nother),
+        )
+
+        if sparse:
+            lmat = []
+        else:
+            mat = np.zeros(sh, dtype=float)
 
         anyok = False
-        for ii in range(npix):
+        nnz = 0
+        for (ip0, ip1, i0, i1) in lchunks:
 
             # verb
             if verb is True:
                 msg = (
-                    f"\t- '{key_mat}' for cam '{k0}': pixel {ii + 1} / {npix}"
-                    f"\t{(mat > 0).sum()} / {mat.size}\t\t"
+                    f"\t- '{key_mat}' for cam '{k0}': pixel {ip1} / {npix}"
+                    f"\t{nnz} / {npix * nother}\t\t"
                 )
-                end = '\n' if ii == npix - 1 else '\r'
+                end = '\n' if ip1 == npix else '\r'
                 print(msg, flush=True, end=end)
 
-            # sample los
-            out_sample = coll.sample_rays(
-                key=key_los,
-                res=res,
-                mode=mode,
-                segment=None,
-                ind_ch=ii,
-                radius_max=radius_max,
-                concatenate=False,
-                return_coords=['R', 'z', 'ltot'],
-            )
-
-            if out_sample is None or out_sample[0] is None:
+            if i1 == i0:
+                if sparse:
+                    lmat.append(scpsp.csr_matrix((ip1 - ip0, sh[1])))
                 continue
 
-            R, Z, length = out_sample
-
             # -------------
             # interpolate
 
-            # datai, units, refi = coll.interpolate(
             douti = coll.interpolate(
                 keys=None,
                 ref_key=key_bs,
                 # interpolation pts
-                x0=R[:, 0],
-                x1=Z[:, 0],
+                x0=R[i0:i1],
+                x1=Z[i0:i1],
                 submesh=True,
                 grid=False,
                 # common ref
@@ -126,27 +165,35 @@ def _compute_los(
             datai, refi = douti['data'], douti['ref']
             axis = refi.index(None)
             iok = np.isfinite(datai)
-
-            if not np.any(iok):
-                continue
-
+            anyok = anyok or bool(np.any(iok))
             datai[~iok] = 0.
 
             # ------------
             # integrate
 
-            # check and update slice
             assert datai.ndim in [2, 3], datai.shape
-            sli_mat[axis_pix] = ii
 
-            # integrate
-            mat[tuple(sli_mat)] = scpinteg.simpson(
-                datai,
-                x=length[:, 0],
-                axis=axis,
+            # segment sums, as (nlos, npts) sparse weights @ datai
+            wmat = scpsp.csr_matrix(
+                (weights[i0:i1], (ipix[i0:i1] - ip0, np.arange(i1 - i0))),
+                shape=(ip1 - ip0, i1 - i0),
+            )
+            datai = np.moveaxis(datai, axis, 0)
+            shi = datai.shape
+            mati = (wmat @ datai.reshape((shi[0], -1))).reshape(
+                (ip1 - ip0,) + shi[1:]
             )
 
-            anyok = True
+            if sparse:
+                lmat.append(scpsp.csr_matrix(mati))
+                nnz += lmat[-1].nnz
+            else:
+                sli_mat[axis_pix] = slice(ip0, ip1)
+                mat[tuple(sli_mat)] = np.moveaxis(mati, 0, axis_pix)
+                nnz += np.count_nonzero(mati)
+
+        if sparse:
+            mat = scpsp.vstack(lmat, format='csr')
 
         # --------------
         # post-treatment
@@ -157,8 +204,13 @@ def _compute_los(
                 ketend = doptics[k0]['etendue']
                 units_coefs = coll.ddata[ketend]['units']
                 etend = coll.ddata[ketend]['data']
-                sh_etend = [-1 if aa == axis else 1 for aa in range(len(refi))]
-                mat *= etend.reshape(sh_etend)
+                if sparse:
+                    mat = scpsp.diags(etend.ravel()) @ mat
+                else:
+                    sh_etend = [
+                        -1 if aa == axis else 1 for aa in range(len(refi))
+                    ]
+                    mat *= etend.reshape(sh_etend)
 
             # set ref
             refi = list(refi)
@@ -179,6 +231,102 @@ def _compute_los(
     return dout, axis
 
 
+def _get_simpson_weights(xx=None, ilos=None):
+    """ Return the composite simpson weights of concatenated los
+
+    xx are the (increasing) abscissa of all points, ilos the los index
+    Each pair of intervals uses the (uneven) simpson rule, a degenerate
+    pair the trapezoidal rule
+    A trailing odd interval gets Cartwright's correction, as the default of
+    scipy.integrate.simpson(), or the trapezoidal rule if alone
+
+    """
+
+    npts = xx.size
+    ww = np.zeros((npts,), dtype=float)
+    if npts == 0:
+        return ww
+
+    # index of each point in its los, and of its los last point
+    istart = np.r_[0, (np.diff(ilos) != 0).nonzero()[0] + 1]
+    nn = np.diff(np.r_[istart, npts])
+    kk = np.arange(npts) - np.repeat(istart, nn)
+    klast = np.repeat(nn, nn) - 1
+
+    # --------------------
+    # pairs of intervals
+
+    ip = ((kk % 2 == 0) & (kk + 2 <= klast)).nonzero()[0]
+    h0 = xx[ip + 1] - xx[ip]
+    h1 = xx[ip + 2] - xx[ip + 1]
+    hs = h0 + h1
+
+    # trapezoid by default (degenerate)
+    w0, w1, w2 = 0.5 * h0, 0.5 * hs, 0.5 * h1
+
+    iok = (h0 > 0.) & (h1 > 0.)
+    h0, h1, hs = h0[iok], h1[iok], hs[iok]
+    w0[iok] = hs / 6. * (2. - h1 / h0)
+    w1[iok] = hs**3 / (6. * h0 * h1)
+    w2[iok] = hs / 6. * (2. - h0 / h1)
+
+    ww[ip] += w0
+    ww[ip + 1] += w1
+    ww[ip + 2] += w2
+
+    # --------------------
+    # trailing odd interval
+
+    it = ((kk == klast - 1) & (klast % 2 == 1)).nonzero()[0]
+
+    # single interval: trapezoid
+    i1 = it[kk[it] == 0]
+    hh = 0.5 * (xx[i1 + 1] - xx[i1])
+    ww[i1] += hh
+    ww[i1 + 1] += hh
+
+    # Cartwright's correction, using the last 3 points
+    it = it[kk[it] > 0]
+    h0 = xx[it] - xx[it - 1]
+    h1 = xx[it + 1] - xx[it]
+    hs = h0 + h1
+
+    alpha, beta, eta = np.zeros((3, it.size), dtype=float)
+    iok = hs > 0.
+    alpha[iok] = (2. * h1[iok]**2 + 3. * h0[iok] * h1[iok]) / (6. * hs[iok])
+    iok = h0 > 0.
+    beta[iok] = (h1[iok]**2 + 3. * h0[iok] * h1[iok]) / (6. * h0[iok])
+    eta[iok] = h1[iok]**3 / (6. * h0[iok] * hs[iok])
+
+    ww[it + 1] += alpha
+    ww[it] += beta
+    ww[it - 1] -= eta
+
+    return ww
+
+
+def _get_chunks(ipix=None, npix=None, npts_max=None):
+    """ Return a list of (ip0, ip1, i0, i1) covering all pixels
+
+    Pixels [ip0, ip1) have their points in [i0, i1) and each chunk holds
+    at most npts_max points (unless a single los has more)
+
+    """
+
+    # first point index of each pixel
+    ind = np.r_[0, np.cumsum(np.bincount(ipix, minlength=npix))]
+
+    lchunks = []
+    ip0 = 0
+    while ip0 < npix:
+        ip1 = np.searchsorted(ind, ind[ip0] + npts_max, side='right') - 1
+        ip1 = int(min(max(ip1, ip0 + 1), npix))
+        lchunks.append((ip0, ip1, int(ind[ip0]), int(ind[ip1])))
+        ip0 = ip1
+
+    return lchunks
+
+
 # #############################################################################
 # #############################################################################
 #                           VOS
@@ -287,7 +435,13 @@ def _compute_vos(
 
         # shape, key
         sh = tuple([npix if ss is None else ss for ss in shape_mat])
-        mat = np.zeros(sh, dtype=float)
+
+        # (nchan, nbs) matrices are sparse
+        sparse = len(sh) == 2
+        if sparse:
+            lrows = [None for ii in range(npix)]
+        else:
+            mat = np.zeros(sh, dtype=float)
 
         # ---------------------------------------------------
         # loop on group of pixels (to limit memory footprint)
@@ -299,7 +453,6 @@ def _compute_vos(
             if verb is True:
                 msg = (
                     f"\t- '{key_mat}' for cam '{k0}': pixel {ii + 1} / {npix}"
-                    f"\t{(mat > 0).sum()} / {mat.size}\t\t"
                 )
                 end = '\n' if ii == npix - 1 else '\r'
                 print(msg, flush=True, end=end)
@@ -355,13 +508,27 @@ def _compute_vos(
             sli_mat[axis_pix] = ii
 
             # integrate
-            mat[tuple(sli_mat)] = np.sum(
+            mati = np.sum(
                 datai * dvos[k0]['sang_cross']['data'][sli(ii)][indok][:, None],
                 axis=axis,
             )
 
+            if sparse:
+                lrows[ii] = scpsp.csr_matrix(mati)
+            else:
+                mat[tuple(sli_mat)] = mati
+
             anyok = True
 
+        if sparse:
+            mat = scpsp.vstack(
+                [
+                    scpsp.csr_matrix((1, sh[1])) if rr is None else rr
+                    for rr in lrows
+                ],
+                format='csr',
+            )
+
         # --------------
         # post-treatment
 
@@ -371,8 +538,13 @@ def _compute_vos(
                 ketend = doptics[k0]['etendue']
                 units_coefs = coll.ddata[ketend]['units']
                 etend = coll.ddata[ketend]['data']
-                sh_etend = [-1 if aa == axis else 1 for aa in range(len(refi))]
-                mat /= etend.reshape(sh_etend)
+                if sparse:
+                    mat = scpsp.diags(1. / etend.ravel()) @ mat
+                else:
+                    sh_etend = [
+                        -1 if aa == axis else 1 for aa in range(len(refi))
+                    ]
+                    mat /= etend.reshape(sh_etend)
 
             # set ref
             refi = list(refi)
@@ -59,6 +59,8 @@ class Inversion(Previous):
         solver=None,
         conv_crit=None,
         chain=None,
+        n_workers=None,
+        batch=None,
         verb=None,
         store=None,
         # algo and solver-specific options
@@ -73,6 +75,14 @@ class Inversion(Previous):
     ):
         """ Compute tomographic inversion
 
+        n_workers: int
+            nb. of worker processes solving independent time steps
+            (only with chain=False), default 1
+        batch: bool
+            solve time steps sharing the same channel mask and sigma with a
+            common regularization parameter, as one matrix right-hand side
+            (linear augmented-Tikhonov algos only), default False
+
         """
 
         return _compute.compute_inversions(
@@ -99,6 +109,8 @@ class Inversion(Previous):
             # misc
             conv_crit=conv_crit,
             chain=chain,
+            n_workers=n_workers,
+            batch=batch,
             verb=verb,
             store=store,
             # algo and solver-specific options
@@ -41,6 +41,11 @@ except Exception as err:
     tomotok2tofu = False
 
 
+# accuracy thresholds for the diagonalized augTikho solve
+_EIGH_RTOL = 1e-6       # max relative round-off error on eigenvalues
+_EIGH_CONDMAX = 1e10    # max condition number of (TTn + mu*R)
+
+
 _DALGO0 = {
     'algo0': {
         'source': 'tofu',
@@ -303,17 +308,24 @@ def inv_linear_augTikho_dense(
     verb=None,
     verb2head=None,
     maxiter_outer=None,
+    dfact=None,
     **kwdargs,
 ):
     """
     Linear algorithm for Phillips-Tikhonov regularisation
     Called "Augmented Tikhonov", dense matrix version
+
+    dfact: optional dict caching the diagonalization of (TTn, R)
     """
 
     conv = 0.           # convergence variable
     niter = 0           # number of iterations
     mu1 = 0.            # regularisation param
 
+    # (TTn, R) diagonalization => O(nbs**2) solve for any mu
+    deig = _augTikho_eigh(TTn=TTn, R=R, dfact=dfact)
+    Tyv = None if deig is None else deig['vect'].T.dot(Tyn)
+
     # verb
     if verb >= 2:
         chi2n = np.sum((Tn.dot(sol0) - yn)**2) / nchan
@@ -329,14 +341,16 @@ def inv_linear_augTikho_dense(
     while niter <= 2 or (conv > conv_crit and niter < maxiter_outer):
 
         # call solver
-        sol = scplin.solve(
-            TTn + mu0*R, Tyn,
-            assume_a='pos',      # 'pos' faster than 'sym'
-            overwrite_a=True,    # no significant gain
-            overwrite_b=False,   # True is faster, but a copy of Tyn is needed
-            check_finite=False,  # small speed gain compared to True
-            transposed=False,
-        )  # 3
+        sol = _augTikho_eigh_solve(deig=deig, Tyv=Tyv, mu=mu0)
+        if sol is None:
+            sol = scplin.solve(
+                TTn + mu0*R, Tyn,
+                assume_a='pos',      # 'pos' faster than 'sym'
+                overwrite_a=True,    # no significant gain
+                overwrite_b=False,   # True faster, but a copy of Tyn needed
+                check_finite=False,  # small speed gain compared to True
+                transposed=False,
+            )  # 3
 
         # call augmented Tikhonov update of mu
         mu1, conv, res2, reg, tau, lamb = _augTikho_update(
@@ -470,15 +484,24 @@ def inv_linear_augTikho_chol_dense(
     verb=None,
     verb2head=None,
     maxiter_outer=None,
+    dfact=None,
     **kwdargs,
 ):
     """
+    Linear algorithm for Phillips-Tikhonov regularisation
+    Called "Augmented Tikhonov", dense matrix version, cholesky fallback
+
+    dfact: optional dict caching the diagonalization of (TTn, R)
     """
 
     conv = 0.           # convergence variable
     niter = 0           # number of iterations
     mu1 = 0.            # regularisation param
 
+    # (TTn, R) diagonalization => O(nbs**2) solve for any mu
+    deig = _augTikho_eigh(TTn=TTn, R=R, dfact=dfact)
+    Tyv = None if deig is None else deig['vect'].T.dot(Tyn)
+
     # verb
     if verb >= 2:
         chi2n = np.sum((Tn.dot(sol0) - yn)**2) / nchan
@@ -492,31 +515,33 @@ def inv_linear_augTikho_chol_dense(
     # loop
     # Continue until convergence criterion, and at least 2 iterations
     while niter <= 2 or (conv > conv_crit and niter < maxiter_outer):
-        try:
-            # choleski decomposition requires det(TT + mu0*LL) != 0
-            # (chol(A).T * chol(A) = A
-            chol = scplin.cholesky(
-                TTn + mu0*R,
-                lower=False,
-                check_finite=False,
-                overwrite_a=False,
-            )
-            # Use np.linalg.lstsq for double-solving the equation
-            sol = scplin.cho_solve(
-                (chol, False), Tyn,
-                overwrite_b=None,
-                check_finite=True,
-            )
-        except Exception as err:
-            # call solver
-            sol = scplin.solve(
-                TTn + mu0*R, Tyn,
-                assume_a='sym',         # chol failed => not 'pos'
-                overwrite_a=True,       # no significant gain
-                overwrite_b=False,      # True faster, but a copy of Tyn needed
-                check_finite=False,     # small speed gain compared to True
-                transposed=False,
-            )  # 3
+        sol = _augTikho_eigh_solve(deig=deig, Tyv=Tyv, mu=mu0)
+        if sol is None:
+            try:
+                # choleski decomposition requires det(TT + mu0*LL) != 0
+                # (chol(A).T * chol(A) = A
+                chol = scplin.cholesky(
+                    TTn + mu0*R,
+                    lower=False,
+                    check_finite=False,
+                    overwrite_a=False,
+                )
+                # Use np.linalg.lstsq for double-solving the equation
+                sol = scplin.cho_solve(
+                    (chol, False), Tyn,
+                    overwrite_b=None,
+                    check_finite=True,
+                )
+            except Exception as err:
+                # call solver
+                sol = scplin.solve(
+                    TTn + mu0*R, Tyn,
+                    assume_a='sym',         # chol failed => not 'pos'
+                    overwrite_a=True,       # no significant gain
+                    overwrite_b=False,      # True faster, but copy Tyn needed
+                    check_finite=False,     # small speed gain compared to True
+                    transposed=False,
+                )  # 3
 
         # call augmented Tikhonov update of mu
         mu1, conv, res2, reg, tau, lamb = _augTikho_update(
@@ -705,6 +730,153 @@ def inv_linear_augTikho_pos_dense(
     return sol, mu1, res2/nchan, reg, niter, [tau, lamb]
 
 
+def _augTikho_eigh(TTn=None, R=None, dfact=None):
+    """ Return deig, a simultaneous diagonalization of (TTn, R)
+
+        vect.T.dot(TTn).dot(vect) = diag(d0)
+        vect.T.dot(R).dot(vect) = diag(d1)
+    so that, for any mu:
+        inv(TTn + mu*R) = vect.dot(diag(1 / (d0 + mu*d1))).dot(vect.T)
+
+    Uses the generalized eigen-decomposition of (TTn, R) if R is positive
+    definite (d1 = 1), else of (TTn, TTn + R) (d1 = 1 - d0)
+    'noise' is the estimated absolute error on d0
+
+    Only computed from the second call with the same dfact (i.e.: when the
+    same (TTn, R) is actually re-used), stored in dfact and re-used until
+    dfact is cleared
+    Return None (i.e.: use a direct solver) if dfact is None, on the first
+    call, or if neither pencil is positive definite
+
+    """
+
+    if dfact is None:
+        return None
+    elif 'deig' in dfact:
+        return dfact['deig']
+
+    # first call: a direct solve is cheaper than the eigen-decomposition
+    dfact['ncall'] = dfact.get('ncall', 0) + 1
+    if dfact['ncall'] < 2:
+        return None
+
+    if scpsp.issparse(R):
+        R = R.toarray()
+
+    eps = np.finfo(float).eps
+    try:
+        d0, vect = scplin.eigh(TTn, R, check_finite=False)
+        deig = {
+            'd0': d0,
+            'd1': np.ones(d0.shape),
+            'vect': vect,
+            # d0 >= 0 in theory
+            'noise': max(-d0[0], 0.) + d0.size * eps * np.abs(d0).max(),
+            'slope': 0.,
+        }
+    except scplin.LinAlgError:
+        try:
+            d0, vect = scplin.eigh(TTn, TTn + R, check_finite=False)
+            deig = {
+                'd0': d0,
+                'd1': 1. - d0,
+                'vect': vect,
+                # 0 <= d0 <= 1 in theory
+                'noise': max(-d0[0], d0[-1] - 1., 0.) + d0.size * eps,
+                'slope': 1.,
+            }
+        except scplin.LinAlgError:
+            deig = None
+
+    dfact['deig'] = deig
+
+    return deig
+
+
+def _augTikho_eigh_solve(deig=None, Tyv=None, mu=None):
+    """ Return inv(TTn + mu*R).dot(Tyn) from _augTikho_eigh() output
+
+    Tyv = deig['vect'].T.dot(Tyn)
+
+    Return None (i.e.: use a direct solver instead) if not available or if
+    the diagonalized form is not accurate enough for this mu
+    (round-off errors on d0 or ill-conditioned TTn + mu*R)
+
+    """
+
+    if deig is None:
+        return None
+
+    dd = deig['d0'] + mu*deig['d1']
+    ddmin = dd.min()
+    err = deig['noise'] * (1. + mu*deig['slope'])
+    c0 = (
+        ddmin > 0.
+        and err < _EIGH_RTOL * ddmin
+        and dd.max() < _EIGH_CONDMAX * ddmin
+    )
+    if not c0:
+        return None
+
+    return deig['vect'].dot(Tyv / dd)
+
+
+def inv_linear_augTikho_batch(
+    Tn=None,
+    TTn=None,
+    Tyn=None,
+    R=None,
+    yn=None,
+    mu0=None,
+    nchan=None,
+    sparse=None,
+    a0bis=None,
+    b0=None,
+    a1bis=None,
+    b1=None,
+    d=None,
+    **kwdargs,
+):
+    """ Solve (TTn + mu0*R).sol = Tyn for a fixed mu0, matrix Tyn
+
+    Tyn and yn are (nbs, nn) and (nchan, nn) arrays of nn time steps
+    sharing the same (Tn, TTn, R)
+    Single factorization of (TTn + mu0*R), single solve for all columns
+
+    Then evaluates the augmented Tikhonov update of mu column-wise
+    (same as _augTikho_update()), so that conv tells for which columns
+    mu0 is (close to) the augmented Tikhonov fixed point
+
+    """
+
+    # single factorization, matrix right-hand side
+    if sparse:
+        AA = scpsp.csc_matrix(TTn + mu0*R)
+        sol = scpsp.linalg.splu(AA).solve(Tyn)
+    else:
+        AA = TTn + mu0*R
+        try:
+            cho = scplin.cho_factor(AA, lower=False, check_finite=False)
+            sol = scplin.cho_solve(cho, Tyn, check_finite=False)
+        except scplin.LinAlgError:
+            sol = scplin.solve(
+                AA, Tyn,
+                assume_a='sym',         # chol failed => not 'pos'
+                check_finite=False,
+            )
+
+    # column-wise augmented Tikhonov update of mu
+    res2 = np.sum((Tn.dot(sol) - yn)**2, axis=0)
+    reg = np.sum(sol * R.dot(sol), axis=0)
+
+    lamb = a0bis/(0.5*reg + b0)
+    tau = a1bis/(0.5*res2 + b1)
+    mu1 = (lamb/tau) * (2*a1bis/res2)**d
+    conv = np.abs(mu1 - mu0) / mu1
+
+    return sol, mu1, res2/nchan, reg, conv, tau, lamb
+
+
 def _augTikho_update(
     Tn, sol, yn, R,
     a0bis, b0, a1bis, b1,
@@ -50,6 +50,8 @@ def _compute_check(
     # misc
     conv_crit=None,
     chain=None,
+    n_workers=None,
+    batch=None,
     verb=None,
     store=None,
     # algo and solver-specific options
@@ -93,7 +95,12 @@ def _compute_check(
     m3d = matrix.ndim == 3
     crop = coll.dobj['geom matrix'][key_matrix]['crop']
 
-    if np.any(~np.isfinite(matrix)):
+    if scpsp.issparse(matrix):
+        matfinite = np.isfinite(matrix.data)
+    else:
+        matfinite = np.isfinite(matrix)
+
+    if np.any(~matfinite):
         msg = "Geometry matrix should not contain NaNs or infs!"
         raise Exception(msg)
 
@@ -259,6 +266,8 @@ def _compute_check(
     # add matrix = 0 to indok
     if m3d is True:
         indok &= (np.sum(matrix, axis=-1) > 0)
+    elif scpsp.issparse(matrix):
+        indok &= (np.asarray(matrix.sum(axis=1)).ravel() > 0)[None, ...]
     else:
         indok &= (np.sum(matrix, axis=-1) > 0)[None, ...]
 
@@ -414,6 +423,59 @@ def _compute_check(
         types=bool,
     )
 
+    # n_workers
+    n_workers = ds._generic_check._check_var(
+        n_workers, 'n_workers',
+        default=1,
+        types=int,
+        sign='> 0',
+    )
+
+    if n_workers > 1:
+        if chain is True:
+            msg = (
+                "Arg n_workers > 1 requires chain = False!\n"
+                "(chained time steps can only be solved sequentially)\n"
+                f"\t- n_workers: {n_workers}\n"
+            )
+            raise Exception(msg)
+
+        if dalgo['source'] != 'tofu':
+            msg = "Arg n_workers > 1 only implemented for tofu algorithms!"
+            raise NotImplementedError(msg)
+
+    # batch
+    batch = ds._generic_check._check_var(
+        batch, 'batch',
+        default=False,
+        types=bool,
+    )
+
+    if batch is True:
+        c0 = (
+            dalgo['source'] == 'tofu'
+            and dalgo['reg_param'] == 'augTikho'
+            and dalgo['positive'] is False
+        )
+        if not c0:
+            msg = (
+                "Arg batch = True only implemented for tofu linear "
+                "augmented-Tikhonov algorithms!\n"
+                f"\t- algo: {dalgo['name']}\n"
+            )
+            raise NotImplementedError(msg)
+
+        if dcon is not None:
+            msg = "Arg batch = True not implemented with constraints!"
+            raise NotImplementedError(msg)
+
+        if n_workers > 1:
+            msg = (
+                "Args batch = True and n_workers > 1 are mutually exclusive!\n"
+                f"\t- n_workers: {n_workers}\n"
+            )
+            raise Exception(msg)
+
     # verb
     verb = ds._generic_check._check_var(
         verb, 'verb',
@@ -469,7 +531,7 @@ def _compute_check(
         dopmat, operator, geometry,
         dalgo, dconstraints, dcon,
         conv_crit, maxiter_outer,
-        crop, chain, kwdargs, method, options,
+        crop, chain, n_workers, batch, kwdargs, method, options,
         solver, verb, store,
         key, refinv, regul,
     )
@@ -661,6 +723,14 @@ def _check_time_steps(
                 ))
                 for it in range(nt)
             ])
+        elif scpsp.issparse(matrix):
+            litout = np.array([
+                np.any(
+                    abs(matrix[indok[it, :], :][:, ifree[it, :]]).sum(axis=0)
+                    == 0
+                )
+                for it in range(nt)
+            ])
         else:
             litout = np.array([
                 np.any(np.all(
@@ -3,6 +3,7 @@
 
 # Built-in
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 
 # Common
@@ -50,6 +51,8 @@ def compute_inversions(
     solver=None,
     conv_crit=None,
     chain=None,
+    n_workers=None,
+    batch=None,
     verb=None,
     store=None,
     # algo and solver-specific options
@@ -75,7 +78,7 @@ def compute_inversions(
         dopmat, operator, geometry,
         dalgo, dconstraints, dcon,
         conv_crit, maxiter_outer,
-        crop, chain, kwdargs, method, options,
+        crop, chain, n_workers, batch, kwdargs, method, options,
         solver, verb, store,
         keyinv, refinv, regul,
     ) = _checks._compute_check(**locals())
@@ -127,12 +130,20 @@ def compute_inversions(
     )
 
     # normalize geometry matrix to avoid having 1e-15 * 1e16
-    mmm = matrix
-    if hasattr(matrix, 'toarray'):
-        mmm = matrix.toarray()
-
-    mmm = np.mean(mmm, axis=-1, where=mmm>0)
-    matnorm = np.mean(mmm, axis=-1, where=mmm>0)
+    if scpsp.issparse(matrix):
+        # mean of the rows means of positive values, without densifying
+        mcoo = matrix.tocoo()
+        iok = mcoo.data > 0
+        nn = np.bincount(mcoo.row[iok], minlength=nchan)
+        mmm = np.bincount(
+            mcoo.row[iok],
+            weights=mcoo.data[iok],
+            minlength=nchan,
+        )
+        matnorm = np.mean(mmm[nn > 0] / nn[nn > 0])
+    else:
+        mmm = np.mean(matrix, axis=-1, where=matrix>0)
+        matnorm = np.mean(mmm, axis=-1, where=mmm>0)
     matrix_norm = matrix / matnorm[:, None, None] if m3d else matrix / matnorm
 
     # --------------------------------
@@ -172,14 +183,13 @@ def compute_inversions(
     # -------------
     # initial guess
 
+    msum = np.asarray(mat0.sum(axis=1)).ravel()
     if indok is None:
-        sol0 = np.full((nbs,), np.mean(data[0, :] / np.sum(mat0, axis=1)))
+        sol0 = np.full((nbs,), np.mean(data[0, :] / msum))
     else:
         sol0 = np.full(
             (nbs,),
-            np.mean(
-                data[0, indok[0, :]] / np.sum(mat0[indok[0, :], :], axis=1),
-            ),
+            np.mean(data[0, indok[0, :]] / msum[indok[0, :]]),
         )
 
     # Safety check
@@ -230,6 +240,8 @@ def compute_inversions(
             sparse=dalgo['sparse'],
             positive=dalgo['positive'],
             chain=chain,
+            n_workers=n_workers,
+            batch=batch,
             verb=verb,
             kwdargs=kwdargs,
             method=method,
@@ -668,6 +680,8 @@ def _compute_inv_loop(
     sparse=None,
     positive=None,
     chain=None,
+    n_workers=None,
+    batch=None,
     verb=None,
     kwdargs=None,
     method=None,
@@ -684,6 +698,20 @@ def _compute_inv_loop(
     spec=None,
 ):
 
+    # -------------------------------------
+    # independent time steps - process pool
+
+    if n_workers is not None and n_workers > 1:
+        dinv = {k0: v0 for k0, v0 in locals().items() if k0 != 'n_workers'}
+        return _compute_inv_loop_parallel(n_workers=n_workers, dinv=dinv)
+
+    # -------------------------------------
+    # matrix right-hand sides - by groups
+
+    if batch is True:
+        dinv = {k0: v0 for k0, v0 in locals().items() if k0 != 'batch'}
+        return _compute_inv_loop_batch(dinv=dinv)
+
     # -----------------------------------
     # Getting initial solution - step 1/2
 
@@ -732,6 +760,7 @@ def _compute_inv_loop(
     bi = bounds
     Ri = R
     indbsi = np.ones((nbsi,), dtype=bool)
+    dfact = {'key': None}
     for ii in range(0, nt):
 
         if verb >= 1:
@@ -771,6 +800,16 @@ def _compute_inv_loop(
                 regul=regul,
             )
 
+        # factorization cache of (TTni, Ri), reset only if they may change
+        keyfact = (
+            ii if m3d else sigma[min(ii, sigma.shape[0] - 1), :].tobytes(),
+            None if indok is None else indok[ii, :].tobytes(),
+            None if dcon is None else ic,
+        )
+        if keyfact != dfact['key']:
+            dfact.clear()
+            dfact['key'] = keyfact
+
         # solving
         (
             sol[ii, indbsi], mu[ii], chi2n[ii], regularity[ii],
@@ -800,6 +839,7 @@ def _compute_inv_loop(
             bounds=bi,
             method=method,
             options=options,
+            dfact=dfact,
             **kwdargs,
         )
 
@@ -865,6 +905,251 @@ def _compute_inv_loop(
             print(msg, end='\n', flush=True)
 
 
+# ##################################################################
+# ##################################################################
+#                   _compute time loop - parallel
+# ##################################################################
+
+
+# time-independent context of each worker process, set once per worker
+_DINV = None
+
+
+def _init_worker(dinv=None):
+    global _DINV
+    _DINV = dinv
+
+
+def _slice_dinv(dinv=None, ind=None):
+    """ Return a copy of dinv restricted to time steps ind
+
+    Time-dependent inputs are sliced, outputs are freshly allocated
+    """
+
+    # slice time-dependent inputs
+    dinv = dict(dinv)
+    dinv['data_n'] = dinv['data_n'][ind, :]
+    if dinv['sigma'].shape[0] > 1:
+        dinv['sigma'] = dinv['sigma'][ind, :]
+    if dinv['indok'] is not None:
+        dinv['indok'] = dinv['indok'][ind, :]
+    if dinv['m3d']:
+        dinv['matrix'] = dinv['matrix'][ind, ...]
+
+    dcon = dinv['dcon']
+    if dcon is not None and dcon['hastime']:
+        dinv['dcon'] = dict(dcon)
+        dinv['dcon'].update({
+            'indbs_free': dcon['indbs_free'][ind, :],
+            'indbs': [dcon['indbs'][ii] for ii in ind],
+            'offset': dcon['offset'][ind, :],
+            'coefs': [dcon['coefs'][ii] for ii in ind],
+        })
+
+    # outputs
+    nt, nbs = ind.size, dinv['sol'].shape[1]
+    dinv.update({
+        'sol0': np.copy(dinv['sol0']),
+        'sol': np.full((nt, nbs), np.nan),
+        'mu': np.full((nt,), np.nan),
+        'chi2n': np.full((nt,), np.nan),
+        'regularity': np.full((nt,), np.nan),
+        'niter': np.zeros((nt,), dtype=int),
+        'spec': [None for ii in range(nt)],
+        'verb': 0,
+    })
+
+    return dinv
+
+
+def _compute_inv_loop_chunk(ind=None):
+
+    dinv = _slice_dinv(dinv=_DINV, ind=ind)
+    _compute_inv_loop(**dinv)
+
+    return (
+        dinv['sol'], dinv['mu'], dinv['chi2n'], dinv['regularity'],
+        dinv['niter'], dinv['spec'],
+    )
+
+
+def _compute_inv_loop_parallel(n_workers=None, dinv=None):
+    """ Solve independent time steps (chain=False) over a process pool
+
+    Time steps are split in n_workers contiguous chunks, each solved by
+    _compute_inv_loop() in a worker process.
+    The time-independent context (Tn, TTn, R, data...) is handed to each
+    worker once through the pool initializer.
+    Chunks are gathered in submission order into sol, mu, chi2n,
+    regularity, niter and spec.
+    Each time step starts from sol0. mu is only warm-started within a
+    chunk: the first time step of each chunk starts from mu0, so results
+    may differ from the sequential loop within the convergence criterion.
+
+    """
+
+    nt = dinv['data_n'].shape[0]
+    lchunks = np.array_split(np.arange(nt), min(nt, n_workers))
+    verb = dinv['verb']
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(dinv,),
+    ) as executor:
+
+        lfut = [
+            executor.submit(_compute_inv_loop_chunk, ind=ind)
+            for ind in lchunks
+        ]
+
+        for fut, ind in zip(lfut, lchunks):
+            (
+                dinv['sol'][ind, :], dinv['mu'][ind], dinv['chi2n'][ind],
+                dinv['regularity'][ind], dinv['niter'][ind], speci,
+            ) = fut.result()
+
+            for jj, ii in enumerate(ind):
+                dinv['spec'][ii] = speci[jj]
+
+            if verb >= 1:
+                msg = (
+                    f"\ttime step {ind[-1]+1} / {nt}"
+                    f"\t({n_workers} workers)"
+                )
+                print(msg, end='\n', flush=True)
+
+
+# ##################################################################
+# ##################################################################
+#                   _compute time loop - batched
+# ##################################################################
+
+
+def _compute_inv_loop_sub(dinv=None, ind=None, mu0=None):
+    """ Solve time steps ind with the usual loop, store in dinv outputs """
+
+    dsub = _slice_dinv(dinv=dinv, ind=ind)
+    dsub['mu0'] = mu0
+    _compute_inv_loop(**dsub)
+
+    for k0 in ['sol', 'mu', 'chi2n', 'regularity', 'niter']:
+        dinv[k0][ind, ...] = dsub[k0]
+    for jj, ii in enumerate(ind):
+        dinv['spec'][ii] = dsub['spec'][jj]
+
+
+def _compute_inv_loop_batch(dinv=None):
+    """ Solve groups of time steps with matrix right-hand sides
+
+    Time steps sharing the same normalized geometry matrix (same channel
+    mask and same sigma, no time-dependent matrix) are grouped.
+    For each group:
+        - the first time step is solved by the usual loop, giving mu
+        - all others are solved at once with this mu, from a single
+          factorization of (TTn + mu*R)
+        - those for which mu is not an augmented Tikhonov fixed point
+          (within conv_crit) are solved again by the usual loop, from mu
+
+    As in the sequential loop, mu is passed from one group to the next
+    whatever chain, and sol0 only if chain is True
+
+    """
+
+    data_n = dinv['data_n']
+    sigma = dinv['sigma']
+    indok = dinv['indok']
+    verb = dinv['verb']
+    nt = data_n.shape[0]
+
+    # ---------------------------
+    # group time steps by matrix
+
+    dgroup = {}
+    for ii in range(nt):
+        key = (
+            ii if dinv['m3d'] else sigma[min(ii, sigma.shape[0]-1)].tobytes(),
+            None if indok is None else indok[ii, :].tobytes(),
+        )
+        dgroup.setdefault(key, []).append(ii)
+
+    # ----------
+    # loop
+
+    mu0 = dinv['mu0']
+    for ig, ind in enumerate(dgroup.values()):
+
+        ind = np.array(ind)
+
+        # first time step => mu
+        _compute_inv_loop_sub(dinv=dinv, ind=ind[:1], mu0=mu0)
+        mu0 = dinv['mu'][ind[0]]
+        if dinv['chain']:
+            dinv['sol0'][:] = dinv['sol'][ind[0], :]
+
+        nok = 0
+        if ind.size > 1:
+            indb = ind[1:]
+
+            # common matrices
+            Tni, TTni, _, _, nchani = _update_TTyn(
+                sparse=dinv['sparse'],
+                data_n=data_n,
+                sigma=sigma,
+                matrix=dinv['matrix'],
+                Tn=dinv['Tn'],
+                TTn=dinv['TTn'],
+                Tyn=dinv['Tyn'],
+                indok=indok,
+                ii=ind[0],
+                m3d=dinv['m3d'],
+                regul=dinv['regul'],
+            )
+
+            # matrix right-hand side
+            if indok is None:
+                yn = data_n[indb, :].T
+            else:
+                yn = data_n[indb, :][:, indok[ind[0], :]].T
+
+            (
+                sol, mu1, chi2n, reg, conv, tau, lamb,
+            ) = _algos.inv_linear_augTikho_batch(
+                Tn=Tni,
+                TTn=TTni,
+                Tyn=Tni.T.dot(yn),
+                R=dinv['R'],
+                yn=yn,
+                mu0=mu0,
+                nchan=nchani,
+                sparse=dinv['sparse'],
+                **dinv['kwdargs'],
+            )
+
+            # store time steps consistent with mu
+            iok = conv <= dinv['conv_crit']
+            nok = iok.sum()
+            iokt = indb[iok]
+            dinv['sol'][iokt, :] = sol[:, iok].T
+            dinv['mu'][iokt] = mu1[iok]
+            dinv['chi2n'][iokt] = chi2n[iok]
+            dinv['regularity'][iokt] = reg[iok]
+            dinv['niter'][iokt] = 1
+            for jj in iok.nonzero()[0]:
+                dinv['spec'][indb[jj]] = [tau[jj], lamb[jj]]
+
+            # others => usual loop, from mu
+            if nok < indb.size:
+                _compute_inv_loop_sub(dinv=dinv, ind=indb[~iok], mu0=mu0)
+
+        if verb >= 1:
+            msg = (
+                f"\tgroup {ig+1} / {len(dgroup)}: "
+                f"{ind.size} time steps, {nok} batched"
+            )
+            print(msg, end='\n', flush=True)
+
+
 # ##################################################################
 # ##################################################################
 #                   _compute time loop - TOMOTOK
@@ -497,34 +497,31 @@ def _compute_rays(
     c0 = RA**2 * CAv**2 - R0**2 * RA**2 * eRAv**2
 
     # --------------------------------
-    # loop on rays
+    # solve for all rays at once
 
-    linds = [range(ss) for ss in ptsx.shape]
+    shape = ptsx.shape
+    coefs = np.array([c0, c1, c2, c3, c4]).reshape((5, -1))
+    iok = np.all(np.isfinite(coefs), axis=0)
 
-    dwarn = {}
-    roots0 = np.full(ptsx.shape, np.nan)
-    for ind in itt.product(*linds):
+    roots = np.full((iok.size, 4), np.nan)
+    roots[iok, :] = _get_quartic_roots(coefs[:, iok])
 
-        coefs = np.r_[c0[ind], c1[ind], c2[ind], c3[ind], c4[ind]]
-        if not np.all(np.isfinite(coefs)):
-            continue
+    # positive only
+    roots[roots < 0.] = np.nan
+    nsol = np.sum(np.isfinite(roots), axis=1)
 
-        # define polynomial
-        poly = np.polynomial.polynomial.Polynomial(coefs)
+    # extract solution
+    roots0 = np.full((iok.size,), np.nan)
+    isol = nsol > 0
+    roots0[isol] = np.nanmin(roots[isol, :], axis=1)
+    roots0 = roots0.reshape(shape)
 
-        # roots
-        roots = poly.roots()
-        roots = np.real(roots[np.isreal(roots)])
-
-        # positive only
-        roots = roots[roots>=0.]
-
-        # extract solution
-        nsol = roots.size
-        if nsol > 0:
-            if nsol > 1:
-                dwarn[ind] = roots
-            roots0[ind] = roots[np.argmin(np.abs(roots))]
+    dwarn = {
+        np.unravel_index(ii, shape): np.sort(
+            roots[ii, np.isfinite(roots[ii, :])]
+        )
+        for ii in (nsol > 1).nonzero()[0]
+    }
 
     # ----------
     # warnings
@@ -610,6 +607,187 @@ def _compute_rays(
     return dout
 
 
+# ###############################################################
+# ###############################################################
+#            Quartic roots (batched)
+# ###############################################################
+
+
+def _get_quartic_roots(coefs=None, rtol=1e-8):
+    """ Return the real roots of n quartics, as a (n, 4) array (nan = none)
+
+    coefs is a (5, n) array of polynomial coefs, in increasing degree order
+
+    Closed-form (Ferrari) solution for all quartics at once, each real root
+    being polished by Newton iterations.
+    Ill-conditioned cases (degenerate leading coef, near-double roots,
+    non-converged roots) fall back to the eigenvalues of the companion
+    matrices, as np.polynomial.polynomial.polyroots(), batched
+    """
+
+    nn = coefs.shape[1]
+    roots = np.full((nn, 4), np.nan)
+    if nn == 0:
+        return roots
+
+    # -------------------
+    # monic, depressed quartic y^4 + p y^2 + q y + r (x = y - a/4)
+
+    c4 = coefs[4, :]
+    ideg = c4 != 0.
+    c4 = np.where(ideg, c4, 1.)
+    aa, bb, cc, dd = [coefs[ii, :] / c4 for ii in [3, 2, 1, 0]]
+
+    pp = bb - 3.*aa**2/8.
+    qq = cc - aa*bb/2. + aa**3/8.
+    rr = dd - aa*cc/4. + aa**2*bb/16. - 3.*aa**4/256.
+
+    # -------------------
+    # largest real root of resolvent cubic
+    # m^3 - p/2 m^2 - r m + (p r / 2 - q^2 / 8) = 0
+
+    mm = _get_cubic_largest_root(
+        -pp/2.,
+        -rr,
+        pp*rr/2. - qq**2/8.,
+    )
+
+    # -------------------
+    # two quadratics y^2 -/+ s y + m +/- q / (2s), with s^2 = 2m - p
+
+    s2 = 2.*mm - pp
+    ss = np.sqrt(np.maximum(s2, 0.))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qs = qq / (2.*ss)
+
+        # rounding errors on s^2, q / (2s) (cancellation if s is small)
+        eps = np.finfo(float).eps
+        err_s2 = eps * (2.*np.abs(mm) + np.abs(pp))
+        err_qs = np.abs(qs) * (eps + err_s2 / (2.*s2))
+        iamb = ~(np.isfinite(qs) & np.isfinite(err_qs) & (s2 > err_s2))
+
+    for ii, sign in enumerate([1., -1.]):
+        bq = -sign * ss
+        cq = mm + sign * qs
+        disc = bq**2 - 4.*cq
+
+        # near-double roots: sign of disc not reliable
+        err_disc = err_s2 + 4.*(eps*(np.abs(mm) + np.abs(qs)) + err_qs)
+        iamb |= np.abs(disc) <= 100. * err_disc
+
+        # stable quadratic formula
+        with np.errstate(invalid='ignore', divide='ignore'):
+            qu = -0.5*(bq + np.copysign(np.sqrt(disc), bq))
+            roots[:, 2*ii] = qu
+            roots[:, 2*ii + 1] = cq / qu
+
+    roots -= aa[:, None] / 4.
+
+    # -------------------
+    # Newton polishing, then check last Newton step is negligible
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for _ in range(3):
+            ff, df = _get_poly_val(coefs, roots)
+            dx = ff / df
+            ipol = np.isfinite(dx)
+            roots[ipol] -= dx[ipol]
+
+        ires = ~(np.abs(dx) <= rtol * np.maximum(np.abs(roots), 1.))
+        ires &= np.isfinite(roots)
+
+    iamb |= np.any(ires, axis=1)
+
+    # -------------------
+    # fallback: eigenvalues of companion matrices
+
+    iamb |= ~ideg
+    if np.any(iamb):
+        roots[iamb, :] = _get_quartic_roots_eig(coefs[:, iamb])
+
+    return roots
+
+
+def _get_cubic_largest_root(aa, bb, cc):
+    """ Largest real root of m^3 + a m^2 + b m + c = 0 """
+
+    # depressed cubic t^3 + P t + Q = 0 (m = t - a/3)
+    pp = bb - aa**2/3.
+    qq = 2.*aa**3/27. - aa*bb/3. + cc
+    disc = (qq/2.)**2 + (pp/3.)**3
+
+    tt = np.full(aa.shape, np.nan)
+
+    # one real root (Cardano)
+    i1 = disc > 0.
+    sq = np.sqrt(disc[i1])
+    tt[i1] = np.cbrt(-qq[i1]/2. + sq) + np.cbrt(-qq[i1]/2. - sq)
+
+    # three real roots (trigonometric)
+    i3 = ~i1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rad = np.sqrt(-pp[i3]/3.)
+        arg = np.clip(-qq[i3] / (2. * rad**3), -1., 1.)
+        tt[i3] = 2. * rad * np.cos(np.arccos(arg) / 3.)
+    tt[i3 & (pp == 0.)] = 0.
+
+    mm = tt - aa/3.
+
+    # Newton polishing
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for _ in range(2):
+            ff = ((mm + aa)*mm + bb)*mm + cc
+            df = (3.*mm + 2.*aa)*mm + bb
+            dm = ff / df
+            iok = np.isfinite(dm)
+            mm[iok] -= dm[iok]
+
+    return mm
+
+
+def _get_poly_val(coefs, xx):
+    """ Values and derivatives of quartics at (n, nroots) xx (Horner) """
+
+    ff = coefs[4, :, None] * np.ones(xx.shape)
+    df = np.zeros(xx.shape)
+    for ii in [3, 2, 1, 0]:
+        df = df * xx + ff
+        ff = ff * xx + coefs[ii, :, None]
+    return ff, df
+
+
+def _get_quartic_roots_eig(coefs=None):
+    """ Real roots of quartics, from batched companion matrices
+
+    Same as np.polynomial.polynomial.polyroots(), except for degenerate
+    polynomials (leading coef = 0) which are solved one by one
+    """
+
+    nn = coefs.shape[1]
+    roots = np.full((nn, 4), np.nan)
+
+    ideg = coefs[4, :] != 0.
+    if np.any(ideg):
+        # companion matrices, as polycompanion()[::-1, ::-1]
+        cc = coefs[:, ideg]
+        mat = np.zeros((cc.shape[1], 4, 4), dtype=float)
+        mat[:, 1:, :-1][:, np.arange(3), np.arange(3)] = 1.
+        mat[:, :, -1] -= (cc[:-1, :] / cc[-1:, :]).T
+        eig = np.linalg.eigvals(mat[:, ::-1, ::-1])
+
+        rr = np.real(eig)
+        rr[~np.isreal(eig)] = np.nan
+        roots[ideg, :] = rr
+
+    # degenerate
+    for ii in (~ideg).nonzero()[0]:
+        rr = np.polynomial.polynomial.Polynomial(coefs[:, ii]).roots()
+        rr = np.real(rr[np.isreal(rr)])
+        roots[ii, :rr.size] = rr
+
+    return roots
+
+
 # ###############################################################
 # ###############################################################
 #            Multiple solutions
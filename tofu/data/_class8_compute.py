@@ -533,6 +533,9 @@ def _harmonize_polygon_sizes(
 ):
     """ From a list of polygons return an array
 
+    Polygons with less than nmax points are completed by points evenly
+    spread on their segments (vectorized on all polygons)
+
     """
 
     # -----------
@@ -542,7 +545,7 @@ def _harmonize_polygon_sizes(
     npoly = len(lp0)
     assert npoly == np.prod(shape), (npoly, shape)
 
-    ln = [p0.size if p0 is not None else 0 for p0 in lp0]
+    ln = np.array([p0.size if p0 is not None else 0 for p0 in lp0])
     nmax = max(np.max(ln), nmin)
 
     # --------------
@@ -550,72 +553,58 @@ def _harmonize_polygon_sizes(
     # --------------
 
     sh = tuple(np.r_[shape, nmax])
-    x0 = np.full(sh, np.nan)
-    x1 = np.full(sh, np.nan)
+    x0 = np.full((npoly, nmax), np.nan)
+    x1 = np.full((npoly, nmax), np.nan)
+
+    iok = (ln > 0).nonzero()[0]
+    if iok.size == 0:
+        return x0.reshape(sh), x1.reshape(sh)
+
+    # --------------------------
+    # stack closed polygons
+    # --------------------------
+
+    nn = ln[iok]
+    irow = np.repeat(np.arange(iok.size), nn)
+    icol = np.arange(irow.size) - np.repeat(np.cumsum(nn) - nn, nn)
+
+    p0 = np.full((iok.size, nmax + 1), np.nan)
+    p1 = np.full((iok.size, nmax + 1), np.nan)
+    p0[irow, icol] = np.concatenate([lp0[ii] for ii in iok])
+    p1[irow, icol] = np.concatenate([lp1[ii] for ii in iok])
+    p0[np.arange(iok.size), nn] = p0[:, 0]
+    p1[np.arange(iok.size), nn] = p1[:, 0]
+
+    # -------------------------------------------------
+    # fractional index of each point
+    # the nmax - ln extra points go to the first segments
+    # -------------------------------------------------
+
+    nn = nn[:, None]
+    qq, rr = (nmax - nn) // nn, (nmax - nn) % nn
+    jj = np.arange(nmax)[None, :]
+
+    # the rr first segments hold qq + 2 points, the others qq + 1
+    nlong = rr * (qq + 2)
+    ilong = jj < nlong
+    jr = jj - nlong
+    iseg = np.where(ilong, jj // (qq + 2), rr + jr // (qq + 1))
+    frac = np.where(
+        ilong,
+        (jj % (qq + 2)) / (qq + 2),
+        (jr % (qq + 1)) / (qq + 1),
+    )
 
     # -----------
-    # loop
+    # interpolate
     # -----------
 
-    lind = [range(ss) for ss in shape]
-    for ii, ind in enumerate(itt.product(*lind)):
-
-        sli = tuple(list(ind) + [slice(None)])
-
-        # -------
-        # trivial
-
-        if lp0[ii] is None:
-            continue
-
-        # -------------
-        # less than max
-
-        elif ln[ii] < nmax:
-
-            ndif = nmax - ln[ii]
-            ind0 = np.arange(0, ln[ii] + 1)
-
-            # create imax
-            iseg = np.arange(0, ndif) % ln[ii]
-            npts = np.unique(iseg, return_counts=True)[1]
-
-            if npts.size < ln[ii]:
-                npts = np.r_[
-                    npts, np.zeros((ln[ii] - npts.size,))
-                ].astype(int)
-
-            imax = np.concatenate(tuple([
-                np.linspace(
-                    ind0[ii],
-                    ind0[ii+1],
-                    2 + npts[ii],
-                    endpoint=True,
-                )[:-1]
-                for ii in range(ln[ii])
-            ]))
-
-            # interpolate
-            x0[sli] = scpinterp.interp1d(
-                ind0,
-                np.r_[lp0[ii], lp0[ii][0]],
-                kind='linear',
-            )(imax)
-
-            x1[sli] = scpinterp.interp1d(
-                ind0,
-                np.r_[lp1[ii], lp1[ii][0]],
-                kind='linear',
-            )(imax)
-
-        # -------------
-        # more than max
-
-        else:
-            x0[sli] = lp0[ii]
-            x1[sli] = lp1[ii]
+    for pp, xx in [(p0, x0), (p1, x1)]:
+        pa = np.take_along_axis(pp, iseg, axis=1)
+        pb = np.take_along_axis(pp, iseg + 1, axis=1)
+        xx[iok, :] = pa + frac * (pb - pa)
 
-    return x0, x1
+    return x0.reshape(sh), x1.reshape(sh)
 
 
 # ###############################################################
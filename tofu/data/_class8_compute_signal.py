@@ -6,12 +6,17 @@ import itertools as itt
 
 import numpy as np
 import scipy.integrate as scpinteg
+import scipy.sparse as scpsp
+import matplotlib.path as mpath
 import astropy.units as asunits
 
 
 import datastock as ds
 
 
+from . import _class09_compute_broadband as _compute_broadband
+
+
 # ################################################################
 # ################################################################
 #               Main routine
@@ -34,6 +39,7 @@ def compute_signal(
     groupby=None,
     val_init=None,
     ref_com=None,
+    sparse=None,
     # vos
     dvos=None,
     # signal
@@ -55,7 +61,7 @@ def compute_signal(
 
     (
         key_diag, key_cam, spectro, PHA, is2d,
-        method, mode, groupby, val_init,
+        method, mode, groupby, val_init, sparse,
         brightness, spectral_binning,
         key_integrand, key_mesh0, key_bs,
         key_ref_spectro, key_bs_spectro,
@@ -72,6 +78,8 @@ def compute_signal(
         mode=mode,
         groupby=groupby,
         val_init=val_init,
+        ref_com=ref_com,
+        sparse=sparse,
         # vos
         dvos=dvos,
         # signal
@@ -124,7 +132,9 @@ def compute_signal(
     # --------------
 
     # pick routine
-    if method == 'los':
+    if method == 'los' and sparse is True:
+        func = _compute_los_sparse
+    elif method == 'los':
         func = _compute_los
     else:
         if spectro is True:
@@ -276,6 +286,8 @@ def _compute_signal_check(
     mode=None,
     groupby=None,
     val_init=None,
+    ref_com=None,
+    sparse=None,
     # vos
     dvos=None,
     # signal
@@ -390,6 +402,28 @@ def _compute_signal_check(
         allowed=[np.nan, 0.]
     )
 
+    # sparse
+    sparse = ds._generic_check._check_var(
+        sparse, 'sparse',
+        types=bool,
+        default=False,
+    )
+
+    if sparse is True and (
+        method != 'los' or spectro is True or ref_com is not None
+    ):
+        msg = (
+            "Arg sparse = True is only available for:\n"
+            "\t- method = 'los'\n"
+            "\t- non-spectro diagnostics\n"
+            "\t- ref_com = None\n"
+            "Provided:\n"
+            f"\t- method = '{method}'\n"
+            f"\t- spectro = {spectro}\n"
+            f"\t- ref_com = {ref_com}\n"
+        )
+        raise Exception(msg)
+
     # dvos
     if method == 'vos':
         # single camera + get dvos
@@ -442,7 +476,7 @@ def _compute_signal_check(
 
     return (
         key_diag, key_cam, spectro, PHA, is2d,
-        method, mode, groupby, val_init,
+        method, mode, groupby, val_init, sparse,
         brightness, spectral_binning,
         key_integrand, key_mesh0, key_bs,
         key_ref_spectro, key_bs_spectro,
@@ -940,6 +974,314 @@ def _compute_los(
     return dout, dt
 
 
+# ##################################################################
+# ##################################################################
+#               LOS - sparse operator
+# ##################################################################
+
+
+def _compute_los_sparse(
+    coll=None,
+    is2d=None,
+    key=None,
+    key_diag=None,
+    key_cam=None,
+    key_bs=None,
+    res=None,
+    mode=None,
+    key_integrand=None,
+    radius_max=None,
+    val_init=None,
+    brightness=None,
+    # verb
+    verb=None,
+    # timing
+    timing=None,
+    # unused
+    **kwdargs,
+):
+    """ Same as _compute_los(), through a sparse (npix, nbs) operator
+
+    All los are sampled once, the bsplines are evaluated once at all points
+    and reduced per los with trapezoidal weights into a sparse operator.
+    The signal for all other dimensions (e.g.: time) is then a single
+    sparse matrix product with the bsplines coefficients.
+
+    """
+
+    # --------------
+    # prepare timing
+
+    dt = None
+    if timing is True:
+        lk = [
+            '\tpreparation',
+            '\tsample rays',
+            '\tlos operator',
+            '\tproduct',
+            '\tformat output',
+        ]
+        dt = dict.fromkeys(lk, 0)
+        t0 = dtm.datetime.now()     # Timing
+
+    # -----------------
+    # prepare coefs
+
+    wbs = coll._which_bsplines
+    wm = coll._which_mesh
+    keym = coll.dobj[wbs][key_bs][wm]
+    mtype = coll.dobj[wm][keym]['type']
+
+    # submesh (e.g.: rho-based bsplines on a 2d map of rho)
+    submesh = coll.dobj[wm][keym]['subkey'] is not None
+    if submesh is True:
+        subkey = coll.dobj[wm][keym]['subkey']
+        subbs = coll.dobj[wm][keym]['subbs']
+        crop_path = None
+    elif mtype == 'rect':
+        # same out-of-mesh criterion as interpolate()
+        doutline = coll.get_mesh_outline(keym)
+        crop_path = mpath.Path(
+            np.array([doutline['x0']['data'], doutline['x1']['data']]).T
+        )
+    else:
+        crop_path = None
+
+    # bsplines indices, as used by the details
+    if mtype == 'rect':
+        indbs = coll.select_ind(key=key_bs, returnas='tuple-flat', crop=True)
+    else:
+        indbs = coll.select_ind(key=key_bs, returnas=int)
+
+    # coefs as (nother, nbs), bsplines axes last
+    ref_coefs = coll.ddata[key_integrand]['ref']
+    ref_bs = coll.dobj[wbs][key_bs]['ref']
+    axis = ref_coefs.index(ref_bs[0])
+    nd_bs = len(ref_bs)
+
+    coefs = np.moveaxis(
+        coll.ddata[key_integrand]['data'],
+        list(range(axis, axis + nd_bs)),
+        list(range(-nd_bs, 0)),
+    )
+    if nd_bs == 2:
+        coefs = coefs[..., indbs[0], indbs[1]]
+    else:
+        coefs = coefs[..., indbs]
+    sh_other = coefs.shape[:-1]
+    coefs = coefs.reshape((-1, coefs.shape[-1]))
+
+    # nan coefs do not contribute
+    coefs = np.where(np.isfinite(coefs), coefs, 0.)
+
+    ref_other = ref_coefs[:axis] + ref_coefs[axis + nd_bs:]
+
+    # units
+    units0, units_bs = _units_integration(
+        coll=coll,
+        key_integrand=key_integrand,
+        key_bs=key_bs,
+    )
+    units = units0 * units_bs
+
+    # timing
+    if timing is True:
+        t1 = dtm.datetime.now()
+        dt['\tpreparation'] = (t1 - t0).total_seconds()
+
+    # ----------------
+    # loop on cameras
+
+    dout = {}
+    doptics = coll.dobj['diagnostic'][key_diag]['doptics']
+    for k0 in key_cam:
+
+        # timing
+        if timing is True:
+            t01 = dtm.datetime.now()
+
+        npix = coll.dobj['camera'][k0]['dgeom']['pix_nb']
+        key_los = doptics[k0]['los']
+
+        # -----------------------
+        # sample all los at once
+
+        out_sample = coll.sample_rays(
+            key=key_los,
+            res=res,
+            mode=mode,
+            segment=None,
+            ind_ch=None,
+            radius_max=radius_max,
+            concatenate=False,
+            ragged=True,
+            return_coords=['R', 'z', 'ltot'],
+        )
+
+        # valid points, sorted by pixel (flat pixel index in C order)
+        if out_sample is None or out_sample[0] is None:
+            R = np.zeros((0,), dtype=float)
+            Z, length = R, R
+            ipix = np.zeros((0,), dtype=int)
+        else:
+            R, Z, length, offsets = out_sample
+            ipix = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+
+            iok = np.isfinite(R) & np.isfinite(Z) & np.isfinite(length)
+            if not np.all(iok):
+                R, Z, length, ipix = R[iok], Z[iok], length[iok], ipix[iok]
+
+        # trapezoidal weights
+        weights = np.zeros(length.shape, dtype=float)
+        dl = 0.5 * np.diff(length) * (np.diff(ipix) == 0)
+        weights[:-1] += dl
+        weights[1:] += dl
+
+        # timing
+        if timing is True:
+            t02 = dtm.datetime.now()
+            dt['\tsample rays'] += (t02 - t01).total_seconds()
+
+        # ------------------------------------
+        # operator, by chunks of whole los
+
+        lchunks = _compute_broadband._get_chunks(
+            ipix=ipix,
+            npix=npix,
+            npts_max=_compute_broadband._CHUNK_SIZE // max(1, coefs.shape[1]),
+        )
+
+        lop = []
+        pixok = np.zeros((npix,), dtype=bool)
+        for (ip0, ip1, i0, i1) in lchunks:
+
+            if i1 == i0:
+                lop.append(scpsp.csr_matrix((ip1 - ip0, coefs.shape[1])))
+                continue
+
+            datai = coll.interpolate(
+                keys=None,
+                ref_key=key_bs,
+                x0=R[i0:i1],
+                x1=Z[i0:i1],
+                submesh=True,
+                grid=False,
+                indbs_tf=indbs,
+                details=True,
+                crop=None,
+                nan0=True,
+                val_out=np.nan,
+                return_params=False,
+                store=False,
+            )[f'{key_bs}_details']['data']
+
+            if datai.ndim != 2:
+                msg = (
+                    "Arg sparse = True requires a time-independent mesh!\n"
+                    f"\t- key_bs: {key_bs}\n"
+                    f"\t- details shape: {datai.shape}\n"
+                    "=> use sparse = False"
+                )
+                raise Exception(msg)
+
+            # points inside the mesh
+            if submesh is True:
+                dsub = coll.interpolate(
+                    keys=list(subkey),
+                    ref_key=subbs,
+                    x0=R[i0:i1],
+                    x1=Z[i0:i1],
+                    grid=False,
+                    details=False,
+                    crop=None,
+                    val_out=np.nan,
+                    return_params=False,
+                    store=False,
+                )
+                iokpts = np.all(
+                    [np.isfinite(dsub[k1]['data']) for k1 in subkey],
+                    axis=0,
+                )
+            elif crop_path is not None:
+                iokpts = crop_path.contains_points(
+                    np.array([R[i0:i1], Z[i0:i1]]).T
+                )
+            else:
+                iokpts = np.any(np.isfinite(datai), axis=1)
+
+            # los with at least one point inside the mesh
+            pixok[np.unique(ipix[i0:i1][iokpts])] = True
+            datai[~iokpts, :] = 0.
+            datai[~np.isfinite(datai)] = 0.
+
+            # segment sums, as (nlos, npts) sparse weights @ datai
+            wmat = scpsp.csr_matrix(
+                (weights[i0:i1], (ipix[i0:i1] - ip0, np.arange(i1 - i0))),
+                shape=(ip1 - ip0, i1 - i0),
+            )
+            lop.append(scpsp.csr_matrix(wmat @ datai))
+
+        op = scpsp.vstack(lop, format='csr')
+
+        # timing
+        if timing is True:
+            t03 = dtm.datetime.now()
+            dt['\tlos operator'] += (t03 - t02).total_seconds()
+
+        # --------------------------
+        # all other dims at once
+
+        data = np.asarray(op @ coefs.T)
+        data[~pixok, :] = val_init
+
+        # timing
+        if timing is True:
+            t04 = dtm.datetime.now()
+            dt['\tproduct'] += (t04 - t03).total_seconds()
+
+        # --------------
+        # post-treatment
+
+        # brightness
+        if brightness is False:
+            ketend = doptics[k0]['etendue']
+            etend = coll.ddata[ketend]['data']
+            data *= etend.reshape((-1, 1))
+            unitsi = units * coll.ddata[ketend]['units']
+        else:
+            unitsi = units
+
+        # (npix, nother) => pixels at axis
+        if is2d:
+            sh_pix = tuple(coll.dobj['camera'][k0]['dgeom']['shape'])
+        else:
+            sh_pix = (npix,)
+        data = np.moveaxis(
+            data.reshape(sh_pix + sh_other),
+            list(range(len(sh_pix))),
+            list(range(axis, axis + len(sh_pix))),
+        )
+
+        # set ref
+        ref_cam = coll.dobj['camera'][k0]['dgeom']['ref']
+        ref = tuple(ref_other[:axis]) + tuple(ref_cam) + tuple(ref_other[axis:])
+
+        # timing
+        if timing is True:
+            t05 = dtm.datetime.now()
+            dt['\tformat output'] += (t05 - t04).total_seconds()
+
+        # fill dout
+        dout[k0] = {
+            'key': f'{key}_{k0}',
+            'data': data,
+            'ref': ref,
+            'units': unitsi,
+        }
+
+    return dout, dt
+
+
 def _units_integration(
     coll=None,
     key_integrand=None,
@@ -195,7 +195,40 @@ def equivalent_apertures(
     npix = pixel[0].size
     shape0 = cx.shape
     iok = np.ones(shape0, dtype=bool)
-    for ii, ij in enumerate(zip(*pixel)):
+
+    # all pixels at once if possible (pinhole, non-spectro, planar ref)
+    batch = pinhole is True and spectro is False
+    if batch is True:
+        dgeom = coll.dobj[optics_cls[iref]][optics[iref]]['dgeom']
+        batch = dgeom['type'] == 'planar'
+
+    if batch is True:
+
+        if verb is True:
+            msg = f"\t- camera '{key_cam}': {npix} pixels (batch)"
+            print(msg)
+
+        p_a = coll.get_optics_outline(key=optics[iref], add_points=addp0)
+        x0, x1 = _get_equivalent_aperture_batch(
+            p_a=plg.Polygon(np.array([p_a[0], p_a[1]]).T),
+            pts_x=cx[pixel],
+            pts_y=cy[pixel],
+            pts_z=cz[pixel],
+            lpoly_pre=lpoly_pre,
+            ptsvect=ptsvect,
+            plane={kk: dgeom[kk] for kk in ['cent', 'nin', 'e0', 'e1']},
+        )
+        for p0, ij in zip(x0, zip(*pixel)):
+            if p0 is None or p0.size == 0:
+                iok[ij] = False
+
+        # no per-pixel loop
+        lpix = []
+
+    else:
+        lpix = zip(*pixel)
+
+    for ii, ij in enumerate(lpix):
 
         # ----- DEBUG -------
         # if ij not in [1148]:
@@ -926,6 +959,382 @@ def _get_equivalent_aperture(
     return np.array(p_a.contour(0)).T
 
 
+# ##############################################################
+# ##############################################################
+#           Equivalent aperture non-spectro - batch
+# ##############################################################
+
+
+def _get_equivalent_aperture_batch(
+    p_a=None,
+    p0=None,
+    p1=None,
+    pts_x=None,
+    pts_y=None,
+    pts_z=None,
+    lpoly_pre=None,
+    ptsvect=None,
+    plane=None,
+):
+    """ Equivalent aperture of all pixels at once (pinhole, planar ref)
+
+    Polygons are stored in fixed-size vertex buffers (npix, nmax)
+    For each optics, the reference polygon is clipped by the projected
+    optics (Sutherland-Hodgman, vectorized on pixels), using whichever of
+    the two polygons is convex as clipper.
+    Pixels for which none is convex fall back to _get_equivalent_aperture()
+    If p_a is None, the reference polygons are provided per pixel as p0, p1
+    of shape (npix, npts)
+
+    Return lists of x0, x1 (None for invalid pixels), in pixel order
+    """
+
+    # ------------
+    # initialize
+
+    npix = pts_x.size
+    if p_a is None:
+        px, py = np.array(p0, dtype=float), np.array(p1, dtype=float)
+    else:
+        p0, p1 = np.array(p_a.contour(0)).T
+        px = np.repeat(p0[None, :], npix, axis=0)
+        py = np.repeat(p1[None, :], npix, axis=0)
+    npts = np.full((npix,), px.shape[1])
+
+    iok = np.ones((npix,), dtype=bool)
+    ifb = np.full((npix,), -1, dtype=int)
+
+    # ---------------
+    # loop on optics
+
+    for jj, poly in enumerate(lpoly_pre):
+
+        ind = (iok & (ifb < 0)).nonzero()[0]
+        if ind.size == 0:
+            break
+
+        # project on reference plane
+        q0, q1, iokj = _get_x01_on_plane_batch(
+            pts_x=pts_x[ind],
+            pts_y=pts_y[ind],
+            pts_z=pts_z[ind],
+            poly=poly,
+            **plane,
+        )
+        iok[ind[~iokj]] = False
+        ind, q0, q1 = ind[iokj], q0[iokj], q1[iokj]
+        nq = np.full((ind.size,), q0.shape[1])
+
+        # convexity (collinear vertices are useless to clip)
+        ikeep = _get_ind_not_collinear(poly)
+        qk0, qk1 = q0[:, ikeep], q1[:, ikeep]
+        nk = np.full((ind.size,), ikeep.size)
+        sq, convq = _get_orientation_convexity(qk0, qk1, nk)
+        sa, conva = _get_orientation_convexity(px[ind], py[ind], npts[ind])
+
+        # all projected points inside => projected polygon
+        # (only corners need to be checked if the polygon is convex)
+        iin = np.zeros((ind.size,), dtype=bool)
+        for (ic, ik) in [(conva, ikeep), (~conva, slice(None))]:
+            if np.any(ic):
+                iin[ic] = np.all(
+                    _inside_poly_batch(
+                        q0[ic][:, ik], q1[ic][:, ik],
+                        px[ind[ic]], py[ind[ic]], npts[ind[ic]],
+                    ),
+                    axis=1,
+                )
+
+        # clip by whichever is convex
+        ic0 = ~iin & convq
+        ic1 = ~iin & ~convq & conva
+        ifb[ind[~iin & ~convq & ~conva]] = jj
+
+        lout = [(ind[iin], q0[iin], q1[iin], nq[iin])]
+        if np.any(ic0):
+            lout.append((ind[ic0],) + _clip_poly_batch(
+                px[ind[ic0]], py[ind[ic0]], npts[ind[ic0]],
+                qk0[ic0], qk1[ic0], nk[ic0], sq[ic0],
+            ))
+        if np.any(ic1):
+            lout.append((ind[ic1],) + _clip_poly_batch(
+                qk0[ic1], qk1[ic1], nk[ic1],
+                px[ind[ic1]], py[ind[ic1]], npts[ind[ic1]], sa[ic1],
+            ))
+
+        # store in buffers
+        nmax = max([px.shape[1]] + [oo[1].shape[1] for oo in lout])
+        if nmax > px.shape[1]:
+            nan = np.full((npix, nmax - px.shape[1]), np.nan)
+            px = np.concatenate((px, nan), axis=1)
+            py = np.concatenate((py, nan), axis=1)
+
+        for (indi, pxi, pyi, ni) in lout:
+            px[indi, :] = np.nan
+            py[indi, :] = np.nan
+            px[indi, :pxi.shape[1]] = pxi
+            py[indi, :pyi.shape[1]] = pyi
+            npts[indi] = ni
+
+        # degenerate (zero area) polygons are empty, as with Polygon
+        iok[ind[npts[ind] < 3]] = False
+        iok[ind[_is_degenerate_batch(px[ind], py[ind], npts[ind])]] = False
+
+    # ----------------------
+    # fall back (non-convex)
+
+    x0 = [None for ii in range(npix)]
+    x1 = [None for ii in range(npix)]
+    for ii in iok.nonzero()[0]:
+        if ifb[ii] >= 0:
+            x0[ii], x1[ii] = _get_equivalent_aperture(
+                p_a=plg.Polygon(
+                    np.array([px[ii, :npts[ii]], py[ii, :npts[ii]]]).T
+                ),
+                pt=np.r_[pts_x[ii], pts_y[ii], pts_z[ii]],
+                lpoly_pre=lpoly_pre[ifb[ii]:],
+                ptsvect=ptsvect,
+            )
+        else:
+            x0[ii], x1[ii] = px[ii, :npts[ii]], py[ii, :npts[ii]]
+
+    return x0, x1
+
+
+def _get_x01_on_plane_batch(
+    pts_x=None,
+    pts_y=None,
+    pts_z=None,
+    poly=None,
+    cent=None,
+    nin=None,
+    e0=None,
+    e1=None,
+):
+    """ Project poly (3, npts) on plane from each point (npix,)
+
+    Return x0, x1 of shape (npix, npts) and iok (npix,)
+    iok is False if poly is (even partly) behind the plane
+    """
+
+    vx = poly[0][None, :] - pts_x[:, None]
+    vy = poly[1][None, :] - pts_y[:, None]
+    vz = poly[2][None, :] - pts_z[:, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kk = (
+            (
+                (cent[0] - pts_x)*nin[0]
+                + (cent[1] - pts_y)*nin[1]
+                + (cent[2] - pts_z)*nin[2]
+            )[:, None]
+            / (vx*nin[0] + vy*nin[1] + vz*nin[2])
+        )
+    iok = np.all(np.isfinite(kk) & (kk >= 0), axis=1)
+
+    dx = pts_x[:, None] + kk * vx - cent[0]
+    dy = pts_y[:, None] + kk * vy - cent[1]
+    dz = pts_z[:, None] + kk * vz - cent[2]
+    return (
+        dx*e0[0] + dy*e0[1] + dz*e0[2],
+        dx*e1[0] + dy*e1[1] + dz*e1[2],
+        iok,
+    )
+
+
+# ##############################################################
+# ##############################################################
+#           Batched polygon tools
+# ##############################################################
+
+
+def _get_ind_prev_next(npts, nmax):
+    """ Cyclic previous / next vertex indices for (npoly, nmax) buffers """
+    ii = np.arange(nmax)[None, :]
+    nn = np.maximum(npts[:, None], 1)
+    iprev = np.where(ii == 0, nn - 1, ii - 1)
+    inext = np.where(ii >= nn - 1, 0, ii + 1)
+    return ii < npts[:, None], iprev, inext
+
+
+def _get_ind_not_collinear(poly):
+    """ Return indices of vertices of a 3d polygon that are not collinear
+
+    Collinearity is preserved by projection from a point on a plane
+    """
+    vprev = poly - np.roll(poly, 1, axis=1)
+    vnext = np.roll(poly, -1, axis=1) - poly
+    cross = np.linalg.norm(np.cross(vprev, vnext, axis=0), axis=0)
+    eps = 1e-10 * np.linalg.norm(vprev, axis=0) * np.linalg.norm(vnext, axis=0)
+    ind = (cross > eps).nonzero()[0]
+    return ind if ind.size >= 3 else np.arange(poly.shape[1])
+
+
+def _get_orientation_convexity(px, py, npts):
+    """ Return orientation (+1 / -1) and convexity flag of each polygon
+
+    Collinear consecutive edges are tolerated
+    """
+    valid, iprev, inext = _get_ind_prev_next(npts, px.shape[1])
+    pxn = np.take_along_axis(px, inext, axis=1)
+    pyn = np.take_along_axis(py, inext, axis=1)
+
+    # orientation from signed area
+    area2 = np.sum(np.where(valid, px*pyn - pxn*py, 0.), axis=1)
+    sign = np.where(area2 < 0., -1., 1.)
+
+    # convexity from cross products of consecutive edges
+    ux, uy = pxn - px, pyn - py
+    uxn = np.take_along_axis(ux, inext, axis=1)
+    uyn = np.take_along_axis(uy, inext, axis=1)
+    cross = (ux*uyn - uy*uxn) * sign[:, None]
+    eps = 1e-10 * np.hypot(ux, uy) * np.hypot(uxn, uyn)
+    convex = np.all((cross >= -eps) | ~valid, axis=1)
+    return sign, convex
+
+
+def _is_degenerate_batch(px, py, npts):
+    """ Return True for polygons with a zero area (within rounding) """
+    valid, iprev, inext = _get_ind_prev_next(npts, px.shape[1])
+    pxn = np.take_along_axis(px, inext, axis=1)
+    pyn = np.take_along_axis(py, inext, axis=1)
+    area2 = np.abs(np.sum(np.where(valid, px*pyn - pxn*py, 0.), axis=1))
+    dx = np.max(np.where(valid, px, -np.inf), axis=1) - np.min(
+        np.where(valid, px, np.inf), axis=1,
+    )
+    dy = np.max(np.where(valid, py, -np.inf), axis=1) - np.min(
+        np.where(valid, py, np.inf), axis=1,
+    )
+    return ~(area2 > 1e-12 * np.hypot(dx, dy)**2)
+
+
+def _inside_poly_batch(x, y, px, py, npts):
+    """ Return (npoly, npts_x) bool, True if x, y inside polygon
+
+    Crossing number, vectorized on polygons and points
+    """
+    valid, iprev, inext = _get_ind_prev_next(npts, px.shape[1])
+    xi, yi = px[:, None, :], py[:, None, :]
+    xj = np.take_along_axis(px, iprev, axis=1)[:, None, :]
+    yj = np.take_along_axis(py, iprev, axis=1)[:, None, :]
+    xx, yy = x[:, :, None], y[:, :, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cross = (
+            ((yi > yy) != (yj > yy))
+            & (xx < (xj - xi) * (yy - yi) / (yj - yi) + xi)
+            & valid[:, None, :]
+        )
+    return np.sum(cross, axis=-1) % 2 == 1
+
+
+def _inside_poly_flat(x, y, ipoly, px, py, npts):
+    """ Return (npts_x,) bool, True if x, y inside polygon ipoly
+
+    Crossing number, each point tested against its own polygon
+    Loops on vertices, to keep memory linear in the number of points
+    """
+    inside = np.zeros(x.shape, dtype=bool)
+    ilast = npts[ipoly] - 1
+    for kk in range(px.shape[1]):
+        ok = kk <= ilast
+        jj = np.where(kk == 0, ilast, kk - 1)
+        xi, yi = px[ipoly, kk], py[ipoly, kk]
+        xj, yj = px[ipoly, jj], py[ipoly, jj]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside ^= (
+                ok
+                & ((yi > y) != (yj > y))
+                & (x < (xj - xi) * (y - yi) / (yj - yi) + xi)
+            )
+    return inside
+
+
+def _clip_poly_batch(px, py, npts, qx, qy, nq, sq):
+    """ Clip polygons (px, py) by convex polygons (qx, qy)
+
+    Sutherland-Hodgman, one clipping edge at a time for all polygons
+    sq is the orientation of the clippers (+1 / -1)
+    Return clipped px, py, npts
+    """
+
+    irow = np.arange(qx.shape[0])
+    ilast = np.maximum(nq - 1, 0)
+    for kk in range(qx.shape[1]):
+
+        # edge kk => kk+1 (degenerate for padded vertices kk >= nq)
+        ka = np.minimum(kk, ilast)
+        kb = np.where(kk == ilast, 0, np.minimum(kk + 1, ilast))
+
+        px, py, npts = _clip_halfplane_batch(
+            px, py, npts,
+            qx[irow, ka], qy[irow, ka], qx[irow, kb], qy[irow, kb],
+            sq,
+        )
+        if np.all(npts == 0):
+            break
+
+    # remove consecutive duplicates
+    valid, iprev, inext = _get_ind_prev_next(npts, px.shape[1])
+    dx = px - np.take_along_axis(px, iprev, axis=1)
+    dy = py - np.take_along_axis(py, iprev, axis=1)
+    scale = np.nanmax(np.abs(np.r_[qx.ravel(), qy.ravel()]))
+    keep = valid & (np.hypot(dx, dy) > 1e-12 * scale)
+    return _compact_batch(px, py, keep)
+
+
+def _clip_halfplane_batch(px, py, npts, ax, ay, bx, by, sign):
+    """ Keep the part of each polygon left of (a, b) (right if sign < 0)
+    """
+
+    valid, iprev, inext = _get_ind_prev_next(npts, px.shape[1])
+
+    # algebraic distance to line (>= 0 inside)
+    ux, uy = (bx - ax)[:, None], (by - ay)[:, None]
+    dist = (ux * (py - ay[:, None]) - uy * (px - ax[:, None])) * sign[:, None]
+    dprev = np.take_along_axis(dist, iprev, axis=1)
+    inside = dist >= 0
+    inprev = dprev >= 0
+
+    # intersection of [prev, current] with line
+    cut = (inside != inprev) & valid
+    sx = np.take_along_axis(px, iprev, axis=1)
+    sy = np.take_along_axis(py, iprev, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tt = dprev / (dprev - dist)
+    ix = sx + tt * (px - sx)
+    iy = sy + tt * (py - sy)
+
+    # output: intersection (if any) then current (if inside)
+    inside &= valid
+    ncut = cut.astype(int)
+    nout = ncut + inside
+    start = np.cumsum(nout, axis=1) - nout
+    npts = np.sum(nout, axis=1)
+
+    sh = (px.shape[0], max(np.max(npts), 1))
+    pxo, pyo = np.full(sh, np.nan), np.full(sh, np.nan)
+    irow = np.broadcast_to(np.arange(px.shape[0])[:, None], px.shape)
+    pxo[irow[cut], start[cut]] = ix[cut]
+    pyo[irow[cut], start[cut]] = iy[cut]
+    ind = (start + ncut)[inside]
+    pxo[irow[inside], ind] = px[inside]
+    pyo[irow[inside], ind] = py[inside]
+    return pxo, pyo, npts
+
+
+def _compact_batch(px, py, keep):
+    """ Keep only flagged vertices, packed at the start of each row """
+    npts = np.sum(keep, axis=1)
+    sh = (px.shape[0], max(np.max(npts), 1))
+    pxo, pyo = np.full(sh, np.nan), np.full(sh, np.nan)
+    irow = np.broadcast_to(np.arange(px.shape[0])[:, None], px.shape)
+    ind = (np.cumsum(keep, axis=1) - 1)[keep]
+    pxo[irow[keep], ind] = px[keep]
+    pyo[irow[keep], ind] = py[keep]
+    return pxo, pyo, npts
+
+
 # ##############################################################
 # ##############################################################
 #           Equivalent aperture spectro
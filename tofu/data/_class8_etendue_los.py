@@ -6,8 +6,10 @@ import itertools as itt
 
 
 import numpy as np
+import scipy.stats.qmc as scpqmc
 import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
+import matplotlib.path as mpath
 
 
 import Polygon as plg
@@ -35,6 +37,12 @@ def compute_etendue_los(
     res=None,
     margin_par=None,
     margin_perp=None,
+    # quasi Monte-Carlo numerical etendue
+    numerical_method=None,
+    rtol=None,
+    npts_max=None,
+    nrep=None,
+    seed=None,
     # options
     add_points=None,
     # spectro-only
@@ -65,6 +73,11 @@ def compute_etendue_los(
         res,
         margin_par,
         margin_perp,
+        numerical_method,
+        rtol,
+        npts_max,
+        nrep,
+        seed,
         check,
         verb,
         plot,
@@ -77,6 +90,11 @@ def compute_etendue_los(
         res=res,
         margin_par=margin_par,
         margin_perp=margin_perp,
+        numerical_method=numerical_method,
+        rtol=rtol,
+        npts_max=npts_max,
+        nrep=nrep,
+        seed=seed,
         check=check,
         verb=verb,
         plot=plot,
@@ -210,6 +228,7 @@ def compute_etendue_los(
         # compute numerically
 
         etend1 = None
+        etend1_err, etend1_npts = None, None
         if numerical is True:
 
             if spectro is True:
@@ -226,6 +245,25 @@ def compute_etendue_los(
                 #     margin_par=margin_par,
                 #     margin_perp=margin_perp,
                 # )
+            elif numerical_method == 'qmc':
+                (
+                    etend1, etend1_err, etend1_npts,
+                ) = _compute_etendue_numerical_qmc(
+                    coll=coll,
+                    key_diag=key,
+                    key_cam=key_cam,
+                    ldeti=v0['ldet'],
+                    los_x=los_x,
+                    rtol=rtol,
+                    npts_max=npts_max,
+                    nrep=nrep,
+                    seed=seed,
+                    verb=verb,
+                )
+                etend1 = etend1.reshape(tuple(np.r_[1, shape0]))
+                etend1_err = etend1_err.reshape(shape0)
+                etend1_npts = etend1_npts.reshape(shape0)
+
             else:
                 etend1 = _compute_etendue_numerical(
                     coll=coll,
@@ -249,7 +287,7 @@ def compute_etendue_los(
             _ = _plot_etendues(
                 etend0=etend0,
                 etend1=etend1,
-                res=res,
+                res=res if numerical_method == 'grid' else ['qmc'],
             )
 
         # --------
@@ -263,6 +301,8 @@ def compute_etendue_los(
         dcompute[key_cam].update({
             'analytical': etend0,
             'numerical': etend1,
+            'numerical_err': etend1_err,
+            'numerical_npts': etend1_npts,
             'res': res,
             'iref': iref,
             'optics': optics,
@@ -297,6 +337,8 @@ def compute_etendue_los(
 
             if store == 'analytical':
                 etend_type = store
+            elif numerical_method == 'qmc':
+                etend_type = 'qmc'
             else:
                 etend_type = v0['res'][-1]
 
@@ -356,6 +398,11 @@ def _check(
     res=None,
     margin_par=None,
     margin_perp=None,
+    numerical_method=None,
+    rtol=None,
+    npts_max=None,
+    nrep=None,
+    seed=None,
     check=None,
     verb=None,
     plot=None,
@@ -482,6 +529,51 @@ def _check(
         default=0.05,
     )
 
+    # -----------------
+    # numerical_method
+    # -----------------
+
+    numerical_method = ds._generic_check._check_var(
+        numerical_method, 'numerical_method',
+        types=str,
+        default='grid',
+        allowed=['grid', 'qmc'],
+    )
+
+    # -----------------
+    # qmc parameters
+    # -----------------
+
+    rtol = float(ds._generic_check._check_var(
+        rtol, 'rtol',
+        types=(int, float),
+        default=1e-2,
+        sign='> 0',
+    ))
+
+    npts_max = int(ds._generic_check._check_var(
+        npts_max, 'npts_max',
+        types=int,
+        default=2**16,
+        sign='> 0',
+    ))
+    # power of 2 (Sobol sequences balance)
+    npts_max = int(2**np.ceil(np.log2(npts_max)))
+
+    nrep = int(ds._generic_check._check_var(
+        nrep, 'nrep',
+        types=int,
+        default=8,
+        sign='>= 2',
+    ))
+
+    if seed is not None:
+        seed = int(ds._generic_check._check_var(
+            seed, 'seed',
+            types=(int, np.integer),
+            sign='>= 0',
+        ))
+
     # -----------
     # check
     # -----------
@@ -539,6 +631,11 @@ def _check(
         res,
         margin_par,
         margin_perp,
+        numerical_method,
+        rtol,
+        npts_max,
+        nrep,
+        seed,
         check,
         verb,
         plot,
@@ -590,73 +687,66 @@ def _loop_on_pix(
     los_z = np.full(shape0, np.nan)
     solid_angles = np.zeros(shape0, dtype=float)
     solid_angles_rc = np.zeros(shape0, dtype=float)
-    cos_los_det = np.full(shape0, np.nan)
     distances = np.full(shape0, np.nan)
     mindiff = np.full(shape0, np.nan)
 
-    # ------------------------------
-    # compute area, solid angle, los
-    # ------------------------------
+    # ----------------------------------
+    # stack pixels (same order as ldet)
+    # ----------------------------------
 
-    lind = [range(ss) for ss in shape0]
-    for ii, ind in enumerate(itt.product(*lind)):
+    dpix = {
+        k0: v0.reshape(shape0)
+        for k0, v0 in _get_stacked_ldet(ldet).items()
+    }
 
-        if not iok[ind]:
-            continue
+    # --------------------------------------
+    # solid angles (all valid pixels at once)
+    # --------------------------------------
 
-        # ------------
-        # solid angles
-
-        solid_angles[ind] = _comp_solidangles.calc_solidangle_apertures(
-            # observation points
-            pts_x=centsx[ind],
-            pts_y=centsy[ind],
-            pts_z=centsz[ind],
-            # polygons
-            apertures=None,
-            detectors=ldet[ii],
-            # possible obstacles
-            config=None,
-            # parameters
-            visibility=False,
-            return_vector=False,
-            # timing
-            timing=False,
-        )[0, 0]
+    if np.any(iok):
+
+        ddet = {k0: v0[iok] for k0, v0 in dpix.items()}
+        ddet['outline_x0'] = ldet[0]['outline_x0']
+        ddet['outline_x1'] = ldet[0]['outline_x1']
+
+        solid_angles[iok] = _comp_solidangles.calc_solidangle_detectors_paired(
+            pts_x=centsx[iok],
+            pts_y=centsy[iok],
+            pts_z=centsz[iok],
+            detectors=ddet,
+        )
 
         # -------------
         # rocking curve
 
         if spectro:
 
-            out0 = ldet[ii]['outline_x0']
+            out0 = ldet[0]['outline_x0']
             width0 = np.max(np.abs(np.diff(out0)))
             dist = np.sqrt(
-                (centsx[ind] - ldet[ii]['cents_x'])**2
-                + (centsy[ind] - ldet[ii]['cents_y'])**2
-                + (centsz[ind] - ldet[ii]['cents_z'])**2
+                (centsx[iok] - ddet['cents_x'])**2
+                + (centsy[iok] - ddet['cents_y'])**2
+                + (centsz[iok] - ddet['cents_z'])**2
             )
 
             withrc = dist * rocking_curve_fw * (dist + dist_cryst2ap / dist)
             out0_norm = out0 / width0
-            ldet[ii]['outline_x0'] = out0_norm * min(width0, withrc)
-
-            solid_angles_rc[ind] = _comp_solidangles.calc_solidangle_apertures(
-                # observation points
-                pts_x=centsx[ind],
-                pts_y=centsy[ind],
-                pts_z=centsz[ind],
-                # polygons
-                apertures=None,
-                detectors=ldet[ii],
-                # possible obstacles
-                config=None,
-                # parameters
-                visibility=False,
-                return_vector=False,
-                # timing
-                timing=False,
-            )[0, 0]
+            ddet['outline_x0'] = (
+                out0_norm[None, :] * np.minimum(width0, withrc)[:, None]
+            )
+
+            # keep ldet consistent (det_area below)
+            for jj, ii in enumerate(iok.ravel().nonzero()[0]):
+                ldet[ii]['outline_x0'] = ddet['outline_x0'][jj, :]
+
+            solid_angles_rc[iok] = (
+                _comp_solidangles.calc_solidangle_detectors_paired(
+                    pts_x=centsx[iok],
+                    pts_y=centsy[iok],
+                    pts_z=centsz[iok],
+                    detectors=ddet,
+                )
+            )
 
     # -------------
     # rocking curve
@@ -685,12 +775,11 @@ def _loop_on_pix(
     # angles
     # ------
 
-    for ii, ind in enumerate(itt.product(*lind)):
-        cos_los_det[ind] = (
-            los_x[ind] * ldet[ii]['nin_x']
-            + los_y[ind] * ldet[ii]['nin_y']
-            + los_z[ind] * ldet[ii]['nin_z']
-        )
+    cos_los_det = (
+        los_x * dpix['nin_x']
+        + los_y * dpix['nin_y']
+        + los_z * dpix['nin_z']
+    )
 
     # abs() because for spectro nin is the other way around
     cos_los_ap = np.abs(
@@ -743,6 +832,19 @@ def _loop_on_pix(
     )
 
 
+def _get_stacked_ldet(ldet=None):
+    """ Return a dict of flat (nd,) arrays of pixel positions and vectors """
+    lk = [
+        f'{k0}_{k1}'
+        for k0 in ['cents', 'nin', 'e0', 'e1']
+        for k1 in ['x', 'y', 'z']
+    ]
+    return {
+        k0: np.array([dd[k0] for dd in ldet], dtype=float).ravel()
+        for k0 in lk
+    }
+
+
 # ##################################################################
 # ##################################################################
 #                   op_post interpolation
@@ -1073,6 +1175,310 @@ def _compute_etendue_numerical(
 
     return etendue
 
+
+# ##################################################################
+# ##################################################################
+#           Numerical etendue - quasi Monte-Carlo
+# ##################################################################
+
+
+_QMC_NPTS0 = 2**10
+_QMC_CHUNK = 2**20
+
+
+def _compute_etendue_numerical_qmc(
+    coll=None,
+    key_diag=None,
+    key_cam=None,
+    ldeti=None,
+    los_x=None,
+    rtol=None,
+    npts_max=None,
+    nrep=None,
+    seed=None,
+    verb=None,
+):
+    """ Quasi Monte-Carlo etendue, with standard error, for all detectors
+
+    The etendue is the integral, over points D of the detector and A of a
+    reference aperture (smallest solid angle), of cos(D).cos(A) / |DA|^2,
+    restricted to lines (DA) going through all other optics
+
+    (D, A) pairs are drawn from nrep independently scrambled Sobol sequences
+    The estimate is the mean of the nrep replicas
+    The standard error is their standard deviation / sqrt(nrep)
+
+    The number of points per replica is doubled until, for each detector,
+    std_err <= rtol * etendue, or npts_max is reached
+    Converged detectors are not evaluated anymore
+
+    Return etendue, std_err and npts (per replica), as (nd,) arrays
+
+    """
+
+    # ------------
+    # optics
+
+    doptics = coll.dobj['diagnostic'][key_diag]['doptics'][key_cam]
+    lop = []
+    for cc, oo in zip(doptics['cls'], doptics['optics']):
+        dgeom = coll.dobj[cc][oo]['dgeom']
+        if dgeom['type'] != 'planar':
+            msg = (
+                "Quasi Monte-Carlo etendue only handles planar optics!\n"
+                f"\t- diag: '{key_diag}'\n"
+                f"\t- optics '{oo}' is {dgeom['type']}"
+            )
+            raise Exception(msg)
+
+        p0, p1 = [coll.ddata[kk]['data'] for kk in dgeom['outline']]
+        lop.append({
+            'cent': dgeom['cent'],
+            'nin': dgeom['nin'],
+            'e0': dgeom['e0'],
+            'e1': dgeom['e1'],
+            'outline': (p0, p1),
+            'path': mpath.Path(np.array([p0, p1]).T),
+            'area': plg.Polygon(np.array([p0, p1]).T).area(),
+        })
+
+    # ------------
+    # detectors
+
+    nd = len(ldeti)
+    dpix = _get_stacked_ldet(ldeti)
+    out0, out1 = ldeti[0]['outline_x0'], ldeti[0]['outline_x1']
+
+    # optics seen by each detector (collimators)
+    paths = doptics.get('paths')
+    if doptics['pinhole'] is True or paths is None:
+        paths = np.ones((nd, len(lop)), dtype=bool)
+    else:
+        paths = paths.reshape((nd, len(lop)))
+
+    # ------------
+    # initialize
+
+    rng = np.random.default_rng(seed)
+    etendue = np.full((nd,), np.nan)
+    std_err = np.full((nd,), np.nan)
+    npts = np.zeros((nd,), dtype=int)
+
+    iok = np.isfinite(los_x).ravel()
+
+    # ------------------------------
+    # loop on groups of same optics
+
+    upaths, inv = np.unique(paths, axis=0, return_inverse=True)
+    for ii, pp in enumerate(upaths):
+
+        ind = (iok & (inv.ravel() == ii)).nonzero()[0]
+        if ind.size == 0 or not np.any(pp):
+            continue
+
+        # reference = smallest solid angle (more efficient sampling)
+        lopi = [oo for oo, pi in zip(lop, pp) if pi]
+        cent = np.r_[
+            np.mean(dpix['cents_x'][ind]),
+            np.mean(dpix['cents_y'][ind]),
+            np.mean(dpix['cents_z'][ind]),
+        ]
+        lsang = []
+        for oo in lopi:
+            vect = oo['cent'] - cent
+            dist = np.linalg.norm(vect)
+            lsang.append(oo['area'] * np.abs(vect.dot(oo['nin'])) / dist**3)
+        iref = np.argmin(lsang)
+
+        (
+            etendue[ind], std_err[ind], npts[ind],
+        ) = _get_etendue_qmc_group(
+            dpix={k0: v0[ind] for k0, v0 in dpix.items()},
+            det_outline=(out0, out1),
+            dref=lopi[iref],
+            lop=[oo for jj, oo in enumerate(lopi) if jj != iref],
+            rtol=rtol,
+            npts_max=npts_max,
+            nrep=nrep,
+            rng=rng,
+            verb=verb,
+        )
+
+    return etendue, std_err, npts
+
+
+def _get_etendue_qmc_group(
+    dpix=None,
+    det_outline=None,
+    dref=None,
+    lop=None,
+    rtol=None,
+    npts_max=None,
+    nrep=None,
+    rng=None,
+    verb=None,
+):
+    """ QMC etendue loop for detectors sharing the same optics """
+
+    # sampling boxes and areas
+    det_path = mpath.Path(np.array(det_outline).T)
+    dbox = [(np.min(pp), np.max(pp)) for pp in det_outline]
+    abox = [(np.min(pp), np.max(pp)) for pp in dref['outline']]
+    box_area = np.prod([bb[1] - bb[0] for bb in dbox + abox])
+
+    # ------------
+    # initialize
+
+    nd = dpix['cents_x'].size
+    lsobol = [
+        scpqmc.Sobol(d=4, scramble=True, seed=rng)
+        for ii in range(nrep)
+    ]
+
+    sums = np.zeros((nd, nrep), dtype=float)
+    etendue = np.full((nd,), np.nan)
+    std_err = np.full((nd,), np.nan)
+    npts = np.zeros((nd,), dtype=int)
+
+    iact = np.ones((nd,), dtype=bool)
+    nnew = min(_QMC_NPTS0, npts_max)
+    ntot = 0
+
+    # ------------
+    # loop
+
+    while np.any(iact):
+
+        # new points (nrep, nnew)
+        uu = np.array([ss.random(nnew) for ss in lsobol])
+        d0 = dbox[0][0] + uu[..., 0] * (dbox[0][1] - dbox[0][0])
+        d1 = dbox[1][0] + uu[..., 1] * (dbox[1][1] - dbox[1][0])
+        a0 = abox[0][0] + uu[..., 2] * (abox[0][1] - abox[0][0])
+        a1 = abox[1][0] + uu[..., 3] * (abox[1][1] - abox[1][0])
+
+        # points inside detector and reference aperture
+        iin = (
+            det_path.contains_points(
+                np.array([d0.ravel(), d1.ravel()]).T
+            )
+            & dref['path'].contains_points(
+                np.array([a0.ravel(), a1.ravel()]).T
+            )
+        ).reshape(d0.shape)
+
+        # aperture points
+        lA = [
+            dref['cent'][ii] + a0 * dref['e0'][ii] + a1 * dref['e1'][ii]
+            for ii in range(3)
+        ]
+
+        # loop on chunks of active detectors
+        ind = iact.nonzero()[0]
+        nchunk = max(1, _QMC_CHUNK // (nrep * nnew))
+        for ic in range(0, ind.size, nchunk):
+            indc = ind[ic:ic + nchunk]
+            sums[indc, :] += _get_etendue_qmc_sums(
+                dpix={k0: v0[indc] for k0, v0 in dpix.items()},
+                d0=d0,
+                d1=d1,
+                lA=lA,
+                iin=iin,
+                nin_ref=dref['nin'],
+                lop=lop,
+            )
+
+        ntot += nnew
+        npts[ind] = ntot
+
+        # estimates
+        est = sums[ind, :] * box_area / ntot
+        etendue[ind] = np.mean(est, axis=1)
+        std_err[ind] = np.std(est, axis=1, ddof=1) / np.sqrt(nrep)
+
+        # convergence
+        conv = (etendue[ind] > 0.) & (std_err[ind] <= rtol * etendue[ind])
+        iact[ind[conv]] = False
+
+        if verb is True:
+            msg = (
+                f"\tQMC etendue: {ntot} pts x {nrep} rep."
+                f"  => {ind.size - conv.sum()} / {nd} det. not converged"
+            )
+            print(msg)
+
+        if ntot >= npts_max:
+            break
+
+        # doubling (keeps Sobol balance properties)
+        nnew = min(ntot, npts_max - ntot)
+
+    return etendue, std_err, npts
+
+
+def _get_etendue_qmc_sums(
+    dpix=None,
+    d0=None,
+    d1=None,
+    lA=None,
+    iin=None,
+    nin_ref=None,
+    lop=None,
+):
+    """ Return (nd, nrep) sums of the etendue integrand over points """
+
+    # detector points (nd, nrep, npts)
+    lD = [
+        dpix[f'cents_{kk}'][:, None, None]
+        + d0[None, ...] * dpix[f'e0_{kk}'][:, None, None]
+        + d1[None, ...] * dpix[f'e1_{kk}'][:, None, None]
+        for kk in ['x', 'y', 'z']
+    ]
+
+    # D => A vectors
+    lv = [aa[None, ...] - dd for aa, dd in zip(lA, lD)]
+    dist2 = lv[0]**2 + lv[1]**2 + lv[2]**2
+
+    # cosines (x dist)
+    cosd = (
+        lv[0] * dpix['nin_x'][:, None, None]
+        + lv[1] * dpix['nin_y'][:, None, None]
+        + lv[2] * dpix['nin_z'][:, None, None]
+    )
+    cosa = np.abs(lv[0] * nin_ref[0] + lv[1] * nin_ref[1] + lv[2] * nin_ref[2])
+
+    iok = iin[None, ...] & (cosd > 0.)
+
+    # lines through other optics
+    for oo in lop:
+
+        if not np.any(iok):
+            break
+
+        cent, nin = oo['cent'], oo['nin']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kk = (
+                (cent[0] - lD[0]) * nin[0]
+                + (cent[1] - lD[1]) * nin[1]
+                + (cent[2] - lD[2]) * nin[2]
+            ) / (lv[0] * nin[0] + lv[1] * nin[1] + lv[2] * nin[2])
+
+        iok &= np.isfinite(kk) & (kk > 0.)
+        if not np.any(iok):
+            break
+
+        dx, dy, dz = [
+            (dd + kk * vv)[iok] - cc
+            for dd, vv, cc in zip(lD, lv, cent)
+        ]
+        x0 = dx * oo['e0'][0] + dy * oo['e0'][1] + dz * oo['e0'][2]
+        x1 = dx * oo['e1'][0] + dy * oo['e1'][1] + dz * oo['e1'][2]
+        iok[iok] = oo['path'].contains_points(np.array([x0, x1]).T)
+
+    integ = np.zeros(dist2.shape, dtype=float)
+    integ[iok] = cosd[iok] * cosa[iok] / dist2[iok]**2
+    return np.sum(integ, axis=-1)
+
+
 # ##################################################################
 # ##################################################################
 #           Numerical etendue estimation routine
@@ -1212,7 +1618,7 @@ def _plot_etendues(
             f'order {ii}' for ii in range(nmax)
         ]
     if etend1 is not None:
-        x1 = [f'{res[ii]}' for ii in range(nmax)]
+        x1 = [f'{res[ii]}' if ii < len(res) else '' for ii in range(nmax)]
         if x0 is None:
             x0 = x1
         else:
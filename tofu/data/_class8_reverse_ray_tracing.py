@@ -2,6 +2,7 @@
 
 import numpy as np
 import scipy.interpolate as scpinterp
+import scipy.sparse as scpsp
 import scipy.stats as scpstats
 import Polygon as plg
 from matplotlib.path import Path
@@ -17,6 +18,14 @@ from . import _generic_check
 from . import _class8_vos_utilities as _utilities
 
 
+# default memory budget (bytes) of the batched reverse ray-tracing
+_MAX_MEM = int(2e8)
+
+# approx. memory footprint (bytes) of a ray sample / polygon vertex
+_NBYTES_SAMPLE = 512
+_NBYTES_VERTEX = 256
+
+
 # ################################################
 # ################################################
 #               main
@@ -46,6 +55,8 @@ def _from_pts(
     rocking_curve=None,
     res_rock_curve=None,
     # options
+    max_mem=None,
+    sparse=None,
     append=None,
     plot=None,
     plot_pixels=None,
@@ -72,6 +83,7 @@ def _from_pts(
         shape, iok,
         ptsx, ptsy, ptsz, phi,
         lamb0, rocking_curve,
+        max_mem, sparse,
         append, plot, plot_pixels, colorbar,
     ) = _check(
         coll=coll,
@@ -90,6 +102,8 @@ def _from_pts(
         lamb0=lamb0,
         rocking_curve=rocking_curve,
         # options
+        max_mem=max_mem,
+        sparse=sparse,
         append=append,
         plot=plot,
         plot_pixels=plot_pixels,
@@ -165,10 +179,12 @@ def _from_pts(
     # --------------
     # prepare output
 
-    if key_mesh is None:
+    if key_mesh is not None:
+        func = _loop1
+    elif append is True:
         func = _loop0
     else:
-        func = _loop1
+        func = _loop0_batch
 
     # -------------
     # compute
@@ -176,10 +192,17 @@ def _from_pts(
     dout = func(**locals())
     dout['rocking_curve'] = rocking_curve
 
+    if sparse is True and key_mesh is None:
+        for k0 in ['sang0', 'sang']:
+            if not scpsp.issparse(dout[k0]['data']):
+                dout[k0]['data'] = scpsp.csr_matrix(
+                    dout[k0]['data'].reshape((-1, ptsx.size))
+                )
+
     # -------
     # reshape
 
-    if len(shape) > 1:
+    if len(shape) > 1 and not sparse:
         shape_new = tuple(np.r_[shape_cam, shape])
         for k0 in ['sang']:
             dout[k0]['data'] = dout[k0]['data'].reshape(shape_new)
@@ -237,6 +260,9 @@ def _check(
     # optional lamb
     lamb0=None,
     rocking_curve=None,
+    # options
+    max_mem=None,
+    sparse=None,
     # bool
     append=None,
     plot=None,
@@ -406,6 +432,21 @@ def _check(
     # ---------
     # options
 
+    # max_mem
+    max_mem = int(ds._generic_check._check_var(
+        max_mem, 'max_mem',
+        types=(int, float),
+        default=_MAX_MEM,
+        sign='> 0',
+    ))
+
+    # sparse
+    sparse = ds._generic_check._check_var(
+        sparse, 'sparse',
+        types=bool,
+        default=False,
+    )
+
     # plot
     plot = ds._generic_check._check_var(
         plot, 'plot',
@@ -440,6 +481,7 @@ def _check(
         shape, iok,
         ptsx, ptsy, ptsz, phi,
         lamb0, rocking_curve,
+        max_mem, sparse,
         append, plot, plot_pixels, colorbar,
     )
 
@@ -976,6 +1018,540 @@ def _loop0(
     }
 
 
+def _loop0_batch(
+    iok=None,
+    ptsx=None,
+    ptsy=None,
+    ptsz=None,
+    lpoly_post=None,
+    # ref
+    cent=None,
+    nin=None,
+    e0=None,
+    e1=None,
+    # p0
+    p0x=None,
+    p0y=None,
+    p0z=None,
+    # dang
+    pix_size=None,
+    dist_to_cam=None,
+    dang=None,
+    shape_cam=None,
+    # lamb
+    lamb=None,
+    dlamb=None,
+    bragg_per_pix=None,
+    ang_rel=None,
+    pow_interp=None,
+    bragg=None,
+    # optional
+    n0=None,
+    n1=None,
+    # functions
+    ptsvect_plane=None,
+    coords_x01toxyz_plane=None,
+    ptsvect_spectro=None,
+    ptsvect_cam=None,
+    # others
+    cbin0=None,
+    cbin1=None,
+    max_mem=None,
+    sparse=None,
+    verb=True,
+    **kwdargs,
+):
+    """ Same as _loop0(), but processing blocks of points at once
+
+    For each block of points:
+        - the equivalent apertures are computed on the crystal plane
+        - the apertures are sampled and all samples are ray-traced at once
+        - solid angles are accumulated per (pixel, point) pair
+
+    The block sizes are set by the memory budget max_mem (bytes)
+    Only the non-zero (pixel, point) pairs are stored
+    """
+
+    # ----------
+    # prepare
+
+    npix = int(np.prod(shape_cam))
+    npts = ptsx.size
+    plane = {'cent': cent, 'nin': nin, 'e0': e0, 'e1': e1}
+
+    # max nb. of polygons / samples per block
+    nvert = p0x.size + np.sum([pp[0].size for pp in lpoly_post], dtype=int)
+    npoly_max = max(1, max_mem // (_NBYTES_VERTEX * nvert))
+    nsamp_max = max(1, max_mem // _NBYTES_SAMPLE)
+
+    ncounts = np.zeros((npix,), dtype=float)
+    sang_lamb = np.zeros((npix,), dtype=float)
+    lpix, lpts, lsang0, lsang = [], [], [], []
+
+    # ----------
+    # loop on blocks of points
+
+    ind_pts = iok.nonzero()[0]
+    npts0 = ind_pts.size
+    for ib in range(0, npts0, npoly_max):
+
+        indb = ind_pts[ib:ib + npoly_max]
+
+        # ------------------------------
+        # apertures on the crystal plane
+
+        px, py, npoly, iokb = _get_apertures_batch(
+            ptsx=ptsx[indb],
+            ptsy=ptsy[indb],
+            ptsz=ptsz[indb],
+            p0x=p0x,
+            p0y=p0y,
+            p0z=p0z,
+            lpoly_post=lpoly_post,
+            ptsvect_plane=ptsvect_plane,
+            plane=plane,
+        )
+        if not np.any(iokb):
+            continue
+        indb = indb[iokb]
+        px, py, npoly = px[iokb], py[iokb], npoly[iokb]
+
+        # ----------------------------
+        # sampling resolution per point
+
+        x0min, x0max = np.nanmin(px, axis=1), np.nanmax(px, axis=1)
+        x1min, x1max = np.nanmin(py, axis=1), np.nanmax(py, axis=1)
+
+        n0b, n1b = _get_n01_batch(
+            ptsx=ptsx[indb],
+            ptsy=ptsy[indb],
+            ptsz=ptsz[indb],
+            Dx0=x0max - x0min,
+            Dx1=x1max - x1min,
+            cent=cent,
+            e0=e0,
+            e1=e1,
+            pix_size=pix_size,
+            dist_to_cam=dist_to_cam,
+            dang=dang,
+            n0=n0,
+            n1=n1,
+        )
+
+        # ---------------------------------------
+        # sub-blocks of samples (bounded nb. samples)
+
+        nb = indb.size
+        cumsamp = np.r_[0, np.cumsum(n0b * n1b)]
+        for is0 in range(0, cumsamp[-1], nsamp_max):
+
+            is1 = min(is0 + nsamp_max, cumsamp[-1])
+
+            # ray-trace all samples
+            ipt, ipix, dsang, angles = _get_pixels_from_samples(
+                isamp=np.arange(is0, is1),
+                cumsamp=cumsamp,
+                ptsx=ptsx[indb],
+                ptsy=ptsy[indb],
+                ptsz=ptsz[indb],
+                px=px,
+                py=py,
+                npoly=npoly,
+                x0min=x0min,
+                x0max=x0max,
+                x1min=x1min,
+                x1max=x1max,
+                n0=n0b,
+                n1=n1b,
+                nin=nin,
+                # functions
+                coords_x01toxyz_plane=coords_x01toxyz_plane,
+                ptsvect_spectro=ptsvect_spectro,
+                ptsvect_cam=ptsvect_cam,
+                # camera
+                cbin0=cbin0,
+                cbin1=cbin1,
+            )
+
+            if verb is True:
+                ndone = np.searchsorted(cumsamp, is1, side='right') - 1
+                msg = f"\t\t{ib + ndone} / {npts0} pts"
+                print(msg, end='\r')
+
+            if ipt.size == 0:
+                continue
+
+            # ---------------------------
+            # accumulate per (pixel, point)
+
+            ncounts += np.bincount(ipix, minlength=npix)
+
+            if lamb is None:
+                wsang = dsang
+            else:
+                arel = angles - bragg_per_pix.ravel()[ipix]
+                wsang = pow_interp(arel) * dsang
+
+            pairs, inv = np.unique(ipix * nb + ipt, return_inverse=True)
+            lpix.append(pairs // nb)
+            lpts.append(indb[pairs % nb])
+            lsang0.append(np.bincount(inv, weights=dsang))
+            lsang.append(np.bincount(inv, weights=wsang))
+
+            # ----------
+            # sang_lamb
+
+            if lamb is None:
+                sang_lamb += np.bincount(ipix, weights=dsang, minlength=npix)
+            else:
+                sang_lamb += _get_sang_lamb_batch(
+                    ipix=ipix,
+                    dsang=dsang,
+                    angles=angles,
+                    bragg=bragg,
+                    ang_rel=ang_rel,
+                    pow_interp=pow_interp,
+                    npix=npix,
+                )
+
+    # --------------
+    # format output
+
+    if len(lpix) > 0:
+        rows, cols = np.concatenate(lpix), np.concatenate(lpts)
+        vsang0, vsang = np.concatenate(lsang0), np.concatenate(lsang)
+    else:
+        rows, cols = np.zeros((0,), dtype=int), np.zeros((0,), dtype=int)
+        vsang0, vsang = np.zeros((0,)), np.zeros((0,))
+
+    # pairs split over several blocks of samples are summed
+    sang0 = scpsp.csr_matrix((vsang0, (rows, cols)), shape=(npix, npts))
+    sang = scpsp.csr_matrix((vsang, (rows, cols)), shape=(npix, npts))
+    if sparse is False:
+        sang0 = sang0.toarray().reshape(tuple(np.r_[shape_cam, npts]))
+        sang = sang.toarray().reshape(tuple(np.r_[shape_cam, npts]))
+
+    return {
+        'ncounts': {'data': ncounts.reshape(shape_cam), 'units': ''},
+        'sang0': {'data': sang0, 'units': 'sr'},
+        'sang': {'data': sang, 'units': 'sr'},
+        'sang_lamb': {'data': sang_lamb.reshape(shape_cam), 'units': 'sr'},
+        'lamb': {'data': lamb, 'units': 'm'},
+        'dlamb': {'data': dlamb, 'units': 'm'},
+        'lp0': {'data': None, 'units': 'm'},
+        'lp1': {'data': None, 'units': 'm'},
+        'lpx': {'data': None, 'units': 'm'},
+        'lpy': {'data': None, 'units': 'm'},
+        'lpz': {'data': None, 'units': 'm'},
+        'dpow': {'data': None, 'units': ''},
+        'lsang': {'data': None, 'units': 'sr'},
+    }
+
+
+def _get_apertures_batch(
+    ptsx=None,
+    ptsy=None,
+    ptsz=None,
+    p0x=None,
+    p0y=None,
+    p0z=None,
+    lpoly_post=None,
+    ptsvect_plane=None,
+    plane=None,
+):
+    """ Equivalent apertures of a block of points, on the crystal plane
+
+    Return vertex buffers px, py (npts, nmax), nb. of vertices and iok
+    """
+
+    # crystal on its own plane, seen from each point
+    p0, p1, iok = _equivalent_apertures._get_x01_on_plane_batch(
+        pts_x=ptsx,
+        pts_y=ptsy,
+        pts_z=ptsz,
+        poly=np.array([p0x, p0y, p0z]),
+        **plane,
+    )
+    npoly = np.full((ptsx.size,), p0.shape[1])
+
+    if len(lpoly_post) == 0 or not np.any(iok):
+        return p0, p1, npoly, iok
+
+    # equivalent aperture
+    lx0, lx1 = _equivalent_apertures._get_equivalent_aperture_batch(
+        p0=p0[iok],
+        p1=p1[iok],
+        pts_x=ptsx[iok],
+        pts_y=ptsy[iok],
+        pts_z=ptsz[iok],
+        lpoly_pre=lpoly_post,
+        ptsvect=ptsvect_plane,
+        plane=plane,
+    )
+
+    # back to buffers
+    ind = iok.nonzero()[0]
+    for ii, x0 in enumerate(lx0):
+        if x0 is None or x0.size < 3:
+            iok[ind[ii]] = False
+
+    nmax = max([1] + [x0.size for x0 in lx0 if x0 is not None])
+    px = np.full((ptsx.size, nmax), np.nan)
+    py = np.full((ptsx.size, nmax), np.nan)
+    for ii, (x0, x1) in enumerate(zip(lx0, lx1)):
+        if iok[ind[ii]]:
+            px[ind[ii], :x0.size] = x0
+            py[ind[ii], :x0.size] = x1
+            npoly[ind[ii]] = x0.size
+
+    return px, py, npoly, iok
+
+
+def _get_n01_batch(
+    ptsx=None,
+    ptsy=None,
+    ptsz=None,
+    Dx0=None,
+    Dx1=None,
+    cent=None,
+    e0=None,
+    e1=None,
+    pix_size=None,
+    dist_to_cam=None,
+    dang=None,
+    n0=None,
+    n1=None,
+):
+    """ Vectorized version of the n0, n1 of _get_points_on_camera_from_pts()
+    """
+
+    vx, vy, vz = cent[0] - ptsx, cent[1] - ptsy, cent[2] - ptsz
+    dist = np.sqrt(vx**2 + vy**2 + vz**2)
+    vx, vy, vz = vx / dist, vy / dist, vz / dist
+    dang_min = np.minimum(dang, 0.25 * pix_size / (dist_to_cam + dist))
+
+    lout = []
+    for nn, ee, DD in [(n0, e0, Dx0), (n1, e1, Dx1)]:
+        if nn is None:
+            cos = np.sqrt(
+                (ee[1]*vz - ee[2]*vy)**2
+                + (ee[2]*vx - ee[0]*vz)**2
+                + (ee[0]*vy - ee[1]*vx)**2
+            )
+            nn = np.ceil(cos * DD / dist / dang_min).astype(int) + 2
+        else:
+            nn = np.full((ptsx.size,), nn, dtype=int)
+        lout.append(nn)
+
+    return lout
+
+
+def _get_pixels_from_samples(
+    isamp=None,
+    cumsamp=None,
+    ptsx=None,
+    ptsy=None,
+    ptsz=None,
+    px=None,
+    py=None,
+    npoly=None,
+    x0min=None,
+    x0max=None,
+    x1min=None,
+    x1max=None,
+    n0=None,
+    n1=None,
+    nin=None,
+    # functions
+    coords_x01toxyz_plane=None,
+    ptsvect_spectro=None,
+    ptsvect_cam=None,
+    # camera
+    cbin0=None,
+    cbin1=None,
+):
+    """ Sample the apertures of a block of points and ray-trace to camera
+
+    Samples of all points are flattened in a single set of arrays
+    Only samples isamp are computed (cumsamp: cumulated nb. of samples)
+    Return, for samples hitting the camera:
+        - ipt: index of the point (in the block)
+        - ipix: flat index of the pixel
+        - dsang: elementary solid angle
+        - angles: incidence angle on the crystal
+    """
+
+    # ------------------------------
+    # regular grid of each aperture
+
+    ipt = np.searchsorted(cumsamp, isamp, side='right') - 1
+    jj = isamp - cumsamp[ipt]
+
+    margin0 = 1e-6 * (x0max - x0min)
+    margin1 = 1e-6 * (x1max - x1min)
+    dx0 = (x0max - x0min - 2*margin0) / (n0 - 1)
+    dx1 = (x1max - x1min - 2*margin1) / (n1 - 1)
+
+    x0 = (x0min + margin0)[ipt] + (jj // n1[ipt]) * dx0[ipt]
+    x1 = (x1min + margin1)[ipt] + (jj % n1[ipt]) * dx1[ipt]
+
+    # keep only samples inside the aperture
+    ind = _equivalent_apertures._inside_poly_flat(x0, x1, ipt, px, py, npoly)
+    ipt, x0, x1 = ipt[ind], x0[ind], x1[ind]
+    dx01 = (dx0 * dx1)[ipt]
+
+    # ------------------------------
+    # back to 3d and solid angles
+
+    xx, yy, zz = coords_x01toxyz_plane(x0=x0, x1=x1)
+
+    ax = xx - ptsx[ipt]
+    ay = yy - ptsy[ipt]
+    az = zz - ptsz[ipt]
+    di = np.sqrt(ax**2 + ay**2 + az**2)
+    cos = np.abs((nin[0] * ax + nin[1] * ay + nin[2] * az) / di)
+    dsang = dx01 * cos / di**2
+
+    # ------------------------------
+    # reflexion and camera
+
+    angles, x0c, x1c = _get_x01_cam_samples(
+        ptsx=ptsx[ipt],
+        ptsy=ptsy[ipt],
+        ptsz=ptsz[ipt],
+        vx=ax / di,
+        vy=ay / di,
+        vz=az / di,
+        ipt=ipt,
+        ptsvect_spectro=ptsvect_spectro,
+        ptsvect_cam=ptsvect_cam,
+    )
+
+    # ------------------------------
+    # binning (same as binned_statistic_2d)
+
+    iok = (
+        (x0c >= cbin0[0])
+        & (x0c <= cbin0[-1])
+        & (x1c >= cbin1[0])
+        & (x1c <= cbin1[-1])
+    )
+
+    nb0, nb1 = cbin0.size - 1, cbin1.size - 1
+    i0 = np.searchsorted(cbin0, x0c[iok], side='right') - 1
+    i1 = np.searchsorted(cbin1, x1c[iok], side='right') - 1
+    i0 = np.minimum(i0, nb0 - 1)
+    i1 = np.minimum(i1, nb1 - 1)
+
+    return ipt[iok], i0 * nb1 + i1, dsang[iok], angles[iok]
+
+
+def _get_x01_cam_samples(
+    ptsx=None,
+    ptsy=None,
+    ptsz=None,
+    vx=None,
+    vy=None,
+    vz=None,
+    ipt=None,
+    ptsvect_spectro=None,
+    ptsvect_cam=None,
+):
+    """ Reflect samples on the crystal and project them on the camera
+
+    Planar surfaces return None if any sample is on the wrong side
+    In this case, points are handled one by one and the failing ones are
+    discarded (nan)
+    """
+
+    # reflexion
+    (
+        ptsx1, ptsy1, ptsz1,
+        vrx, vry, vrz,
+        angles,
+    ) = ptsvect_spectro(
+        pts_x=ptsx,
+        pts_y=ptsy,
+        pts_z=ptsz,
+        vect_x=vx,
+        vect_y=vy,
+        vect_z=vz,
+        strict=False,
+        return_x01=False,
+    )[:7]
+
+    # x0, x1 on camera
+    if ptsx1 is not None:
+        x0c, x1c = ptsvect_cam(
+            pts_x=ptsx1,
+            pts_y=ptsy1,
+            pts_z=ptsz1,
+            vect_x=vrx,
+            vect_y=vry,
+            vect_z=vrz,
+        )[:2]
+
+        if x0c is not None:
+            return angles, x0c, x1c
+
+    # ---------------------
+    # point by point
+
+    angles = np.full(ipt.shape, np.nan)
+    x0c = np.full(ipt.shape, np.nan)
+    x1c = np.full(ipt.shape, np.nan)
+    if np.unique(ipt).size == 1:
+        return angles, x0c, x1c
+
+    for ii in np.unique(ipt):
+        ind = ipt == ii
+        angles[ind], x0c[ind], x1c[ind] = _get_x01_cam_samples(
+            ptsx=ptsx[ind],
+            ptsy=ptsy[ind],
+            ptsz=ptsz[ind],
+            vx=vx[ind],
+            vy=vy[ind],
+            vz=vz[ind],
+            ipt=ipt[ind],
+            ptsvect_spectro=ptsvect_spectro,
+            ptsvect_cam=ptsvect_cam,
+        )
+
+    return angles, x0c, x1c
+
+
+def _get_sang_lamb_batch(
+    ipix=None,
+    dsang=None,
+    angles=None,
+    bragg=None,
+    ang_rel=None,
+    pow_interp=None,
+    npix=None,
+):
+    """ Solid angle integrated over the wavelength bins, per pixel """
+
+    sang_lamb = np.zeros((npix,), dtype=float)
+
+    # only wavelengths reached by at least one sample
+    ilamb = (
+        (bragg >= np.min(angles) - ang_rel[-1])
+        & (bragg <= np.max(angles) - ang_rel[0])
+    ).nonzero()[0]
+
+    for kk in ilamb:
+        arel = angles - bragg[kk]
+        ind = (arel >= ang_rel[0]) & (arel < ang_rel[-1])
+        if np.any(ind):
+            sang_lamb += np.bincount(
+                ipix[ind],
+                weights=pow_interp(arel[ind]) * dsang[ind],
+                minlength=npix,
+            )
+
+    return sang_lamb
+
+
 def _loop1(
     # specific
     coll=None,
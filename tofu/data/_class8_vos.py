@@ -2,6 +2,7 @@
 
 
 import copy
+import multiprocessing as mp
 
 
 import numpy as np
@@ -13,6 +14,7 @@ import datetime as dtm      # DB
 
 from . import _class8_vos_broadband as _vos_broadband
 from . import _class8_vos_spectro as _vos_spectro
+from . import _class8_vos_shards as _shards
 from . import _class8_los_angles
 
 
@@ -56,6 +58,11 @@ def compute_vos(
     check=None,
     verb=None,
     debug=None,
+    # parallel
+    n_workers=None,
+    # checkpoint
+    path_shards=None,
+    resume=None,
     # storing
     store=None,
     overwrite=None,
@@ -85,6 +92,9 @@ def compute_vos(
         visibility,
         verb,
         debug,
+        n_workers,
+        path_shards,
+        resume,
         store,
         overwrite,
         timing,
@@ -106,6 +116,9 @@ def compute_vos(
         visibility=visibility,
         verb=verb,
         debug=debug,
+        n_workers=n_workers,
+        path_shards=path_shards,
+        resume=resume,
         store=store,
         overwrite=overwrite,
         timing=timing,
@@ -209,6 +222,7 @@ def compute_vos(
                 doptics=doptics,
                 key_diag=key_diag,
                 key_cam=k0,
+                key_mesh=key_mesh,
                 dsamp=dsamp,
                 # inputs sample points
                 x0u=x0u,
@@ -240,6 +254,10 @@ def compute_vos(
                 config=config,
                 visibility=visibility,
                 verb=verb,
+                n_workers=n_workers,
+                # checkpoint
+                path_shards=path_shards,
+                resume=resume,
                 # debug
                 debug=debug,
                 # timing
@@ -320,6 +338,9 @@ def _check(
     check=None,
     verb=None,
     debug=None,
+    n_workers=None,
+    path_shards=None,
+    resume=None,
     store=None,
     overwrite=None,
     timing=None,
@@ -498,6 +519,49 @@ def _check(
         default=False,
     )
 
+    # -----------
+    # n_workers - pixels (broadband) or plasma points (spectro) sharded
+    # over a process pool
+
+    n_workers = ds._generic_check._check_var(
+        n_workers, 'n_workers',
+        types=int,
+        default=1,
+        sign='> 0',
+    )
+
+    c0 = (
+        spectro is True
+        and n_workers > 1
+        and 'fork' not in mp.get_all_start_methods()
+    )
+    if c0:
+        msg = (
+            "Arg n_workers > 1 requires the 'fork' start method for spectro"
+            f" diag '{key_diag}'\n"
+            "(the projection functions of the optics are closures, which"
+            " can only reach worker processes by forking)\n"
+            f"\t- available: {mp.get_all_start_methods()}\n"
+        )
+        raise ValueError(msg)
+
+    if debug is True and n_workers > 1:
+        msg = "Arg debug = True requires n_workers = 1"
+        raise Exception(msg)
+
+    # -----------
+    # path_shards, resume - checkpoint on disk per pixel (broadband) or
+    # per radius of the plasma points (spectro)
+
+    path_shards, resume = _shards._check(
+        path_shards=path_shards,
+        resume=resume,
+    )
+
+    if spectro is True and debug is True and path_shards is not None:
+        msg = "Arg debug = True requires path_shards = None for spectro"
+        raise Exception(msg)
+
     # -----------
     # store
 
@@ -541,6 +605,9 @@ def _check(
         visibility,
         verb,
         debug,
+        n_workers,
+        path_shards,
+        resume,
         store,
         overwrite,
         timing,
@@ -653,6 +720,114 @@ def _get_user_limits(
     return user_limits
 
 
+# ###########################################################
+# ###########################################################
+#               assemble from shards
+# ###########################################################
+
+
+def _assemble_from_shards(
+    coll=None,
+    key_diag=None,
+    key_cam=None,
+    path_shards=None,
+):
+    """ Assemble dvos, dref from complete per-pixel (broadband) or
+    per-radius (spectro) shards
+    """
+
+    # ------------
+    # check inputs
+
+    path_shards = _shards._check(path_shards=path_shards)[0]
+    if path_shards is None:
+        msg = "Arg path_shards must be provided!"
+        raise Exception(msg)
+
+    lok = list(coll.dobj.get('diagnostic', {}).keys())
+    key_diag = ds._generic_check._check_var(
+        key_diag, 'key_diag',
+        types=str,
+        allowed=lok,
+    )
+
+    spectro = coll.dobj['diagnostic'][key_diag]['spectro']
+
+    lok = coll.dobj['diagnostic'][key_diag]['camera']
+    if isinstance(key_cam, str):
+        key_cam = [key_cam]
+    key_cam = ds._generic_check._check_var_iter(
+        key_cam, 'key_cam',
+        types=list,
+        types_iter=str,
+        default=lok,
+        allowed=lok,
+    )
+
+    # ----------------
+    # loop on cameras
+
+    dvos, dref = {}, {}
+    for k0 in key_cam:
+
+        path, dmeta = _shards.get_meta(
+            path_shards=path_shards,
+            key_diag=key_diag,
+            key_cam=k0,
+        )
+        if path is None:
+            continue
+
+        if spectro is True:
+            ldpts = [
+                _shards.load_points(path=path, ii=ii)
+                for ii in range(dmeta['nrad'])
+            ]
+
+            dvos[k0], dref[k0] = _vos_spectro._format_output(
+                coll=coll,
+                key_diag=key_diag,
+                key_cam=k0,
+                dpts=_vos_spectro._gather(ldpts),
+                lamb=np.array(dmeta['lamb']),
+            )
+
+        else:
+            npix = int(np.prod(dmeta['shape_cam']))
+            ldpix = [
+                _shards.load_pixel(
+                    path=path,
+                    ii=ii,
+                    dpix=_vos_broadband._get_empty_pixel(),
+                )
+                for ii in range(npix)
+            ]
+
+            dvos[k0], dref[k0] = _vos_broadband._format_output(
+                coll=coll,
+                key_cam=k0,
+                ldpix=ldpix,
+                keep3d=dmeta['keep3d'],
+                return_vector=dmeta['return_vector'],
+            )
+
+        dvos[k0]['keym'] = dmeta['key_mesh']
+        dvos[k0]['res_RZ'] = dmeta['res_RZ']
+        dvos[k0]['res_phi'] = dmeta['res_phi']
+        if spectro is True:
+            dvos[k0]['res_lamb'] = dmeta['res_lamb']
+            dvos[k0]['res_rock_curve'] = dmeta['res_rock_curve']
+
+    if len(dvos) == 0:
+        msg = (
+            f"No vos shards found for diag '{key_diag}' in:\n"
+            f"\t{path_shards}"
+        )
+        raise Exception(msg)
+
+    return dvos, dref
+
+
 # ###########################################################
 # ###########################################################
 #               store
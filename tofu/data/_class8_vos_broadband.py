@@ -2,6 +2,7 @@
 
 
 import itertools as itt
+from concurrent.futures import ProcessPoolExecutor
 
 
 import datetime as dtm      # DB
@@ -14,6 +15,7 @@ from matplotlib.path import Path
 
 from ..geom import _comp_solidangles
 from . import _class8_vos_utilities as _utilities
+from . import _class8_vos_shards as _shards
 
 
 # ###########################################################
@@ -26,7 +28,9 @@ def _vos(
     # ressources
     coll=None,
     doptics=None,
+    key_diag=None,
     key_cam=None,
+    key_mesh=None,
     dsamp=None,
     # inputs
     x0u=None,
@@ -51,6 +55,10 @@ def _vos(
     config=None,
     visibility=None,
     verb=None,
+    n_workers=None,
+    # checkpoint
+    path_shards=None,
+    resume=None,
     # debug
     debug=False,
     # timing
@@ -80,7 +88,7 @@ def _vos(
     # ----------------
 
     if user_limits is not None:
-        xx, yy, zz, dind, ir, iz, iphi, dV = _vos_points(
+        pts = _vos_points(
             # polygons
             pcross0=user_limits['pcross_user'][0, :],
             pcross1=user_limits['pcross_user'][1, :],
@@ -100,15 +108,13 @@ def _vos(
             # shape
             sh=sh,
         )
-
-        shape = coll.dobj['camera'][key_cam]['dgeom']['shape']
-        shape = np.r_[0, shape]
+        pcross0, pcross1, phor0, phor1, dphi = None, None, None, None, None
 
     else:
 
         # get temporary vos
+        pts = None
         kpc0, kpc1 = doptics[key_cam]['dvos']['pcross']
-        shape = coll.ddata[kpc0]['data'].shape
         pcross0 = coll.ddata[kpc0]['data']
         pcross1 = coll.ddata[kpc1]['data']
         kph0, kph1 = doptics[key_cam]['dvos']['phor']
@@ -125,7 +131,6 @@ def _vos(
 
     dgeom = coll.dobj['camera'][key_cam]['dgeom']
     par = dgeom['parallel']
-    is2d = dgeom['nd'] == '2d'
     cx, cy, cz = coll.get_camera_cents_xyz(key=key_cam)
     dvect = coll.get_camera_unit_vectors(key=key_cam)
     outline = dgeom['outline']
@@ -141,28 +146,59 @@ def _vos(
     if pinhole is False:
         paths = doptics[key_cam]['paths']
     else:
-        dap = dap0
+        paths = None
+
+    # ------------------------------------
+    # pixel-independent context (no coll)
+    # ------------------------------------
+
+    dctx = {
+        # sample points
+        'pts': pts,
+        'dsamp': dsamp,
+        'x0u': x0u,
+        'x1u': x1u,
+        'x0f': x0f,
+        'x1f': x1f,
+        'x0l': x0l,
+        'x1l': x1l,
+        'dx0': dx0,
+        'dx1': dx1,
+        'sh': sh,
+        'res_RZ': res_RZ,
+        'res_phi': res_phi,
+        # temporary vos
+        'pcross0': pcross0,
+        'pcross1': pcross1,
+        'phor0': phor0,
+        'phor1': phor1,
+        'dphi': dphi,
+        'margin_poly': margin_poly,
+        # detector
+        'cx': cx,
+        'cy': cy,
+        'cz': cz,
+        'dvect': dvect,
+        'par': par,
+        'out0': out0,
+        'out1': out1,
+        # apertures
+        'pinhole': pinhole,
+        'optics': optics,
+        'paths': paths,
+        'dap0': dap0,
+        # parameters
+        'config': config,
+        'visibility': visibility,
+        'keep3d': keep3d,
+        'return_vector': return_vector,
+        'debug': debug,
+    }
 
     if timing:
         t11 = dtm.datetime.now()     # DB
         dt11 += (t11-t00).total_seconds()
 
-    # -----------------
-    # initialize lists
-    # -----------------
-
-    (
-        # common
-        lpcross, lphor, lsang_cross, lindr_cross, lindz_cross,
-        # keep3d
-        lindr_3d, lindz_3d, lphi_3d, lsang_3d,
-        # return_vector
-        lang_tor_cross, lang_pol_cross, lvectx, lvecty, lvectz
-    ) = _initialize_lists(
-        return_vector=return_vector,
-        keep3d=keep3d,
-    )
-
     # ----------------
     # loop on pixels
     # ----------------
@@ -170,281 +206,158 @@ def _vos(
     shape_cam = coll.dobj['camera'][key_cam]['dgeom']['shape']
     npix = int(np.prod(shape_cam))
     linds = [range(ss) for ss in shape_cam]
-    for ii, ind in enumerate(itt.product(*linds)):
+    lind = list(itt.product(*linds))
+
+    # on-disk per-pixel shards (checkpoint)
+    if path_shards is None:
+        dshards = None
+    else:
+        dshards = _shards.get_dshards(
+            path_shards=path_shards,
+            resume=resume,
+            # keys
+            key_diag=key_diag,
+            key_cam=key_cam,
+            key_mesh=key_mesh,
+            # parameters
+            res_RZ=res_RZ,
+            res_phi=res_phi,
+            keep3d=keep3d,
+            return_vector=return_vector,
+            shape_cam=shape_cam,
+            # pixel-independent context
+            dctx=dctx,
+        )
 
-        # -----------------
-        # slices
-
-        sli_poly = tuple([slice(None)] + list(ind))
-        sli_poly0 = tuple([0] + list(ind))
-
-        # -----------------
-        # get volume limits
-
-        if timing:
-            t000 = dtm.datetime.now()     # DB
-
-        # get points
-        if user_limits is None:
-
-            if np.isnan(pcross0[sli_poly0]):
-                pts_cross = np.zeros((0,), dtype=float)
-                lpcross.append((None, None))
-                lphor.append((None, None))
-                lsang_cross.append(pts_cross)
-                lindr_cross.append(pts_cross)
-                lindz_cross.append(pts_cross)
-                if return_vector is True:
-                    lang_pol_cross.append(pts_cross)
-                    lang_tor_cross.append(pts_cross)
-                continue
-
-            xx, yy, zz, dind, ir, iz, iphi, dV = _vos_points(
-                # polygons
-                pcross0=pcross0[sli_poly],
-                pcross1=pcross1[sli_poly],
-                phor0=phor0[sli_poly],
-                phor1=phor1[sli_poly],
-                margin_poly=margin_poly,
-                dphi=dphi[sli_poly],
-                # sampling
-                dsamp=dsamp,
-                x0f=x0f,
-                x1f=x1f,
-                x0u=x0u,
-                x1u=x1u,
-                res=res_phi,
-                dx0=dx0,
-                dx1=dx1,
-                # shape
-                sh=sh,
+    if n_workers == 1:
+        ldpix = [
+            _get_pixel(
+                ind=ind,
+                dctx=dctx,
+                bool_cross=bool_cross,
+                timing=timing,
+                dshards=dshards,
+                # verb
+                key_cam=key_cam if verb is True else None,
+                ii=ii,
+                npix=npix,
             )
+            for ii, ind in enumerate(lind)
+        ]
 
-        if xx is None:
-            pts_cross = np.zeros((0,), dtype=float)
-            lpcross.append((None, None))
-            lphor.append((None, None))
-            lsang_cross.append(pts_cross)
-            lindr_cross.append(pts_cross)
-            lindz_cross.append(pts_cross)
-            if return_vector is True:
-                lang_pol_cross.append(pts_cross)
-                lang_tor_cross.append(pts_cross)
-            continue
+    else:
+        ldpix = _vos_pixels_parallel(
+            lind=lind,
+            dctx=dctx,
+            shape_bool=bool_cross.shape,
+            timing=timing,
+            dshards=dshards,
+            n_workers=n_workers,
+            key_cam=key_cam if verb is True else None,
+        )
 
-        # --------------
-        # re-initialize
+    if timing:
+        dt = np.sum([dpix['dt'] for dpix in ldpix], axis=0)
+        dt111 += dt[0]
+        dt222 += dt[1]
+        dt333 += dt[2]
+        dt1111 += dt[3]
+        dt2222 += dt[4]
+        dt3333 += dt[5]
+        dt4444 += dt[6]
 
-        bool_cross[...] = False
-        npts_tot = xx.size
-        npts_cross = np.sum([v0['iz'].size for v0 in dind.values()])
+    # -------------
+    # format output
+    # -------------
 
-        dsang_hor = {}
-        sang_cross = np.zeros((npts_cross,), dtype=float)
-        indr_cross = np.zeros((npts_cross,), dtype=int)
-        indz_cross = np.zeros((npts_cross,), dtype=int)
-        if return_vector is True:
-            ang_pol_cross = np.zeros((npts_cross,), dtype=float)
-            ang_tor_cross = np.zeros((npts_cross,), dtype=float)
-
-        if verb is True:
-            msg = (
-                f"\tcam '{key_cam}' pixel {ii+1} / {npix}"
-                f"\tnpts in cross_section = {npts_cross}"
-                f"\t({npts_tot} total)"
-            )
-            end = '\n 'if ii == npix - 1 else '\r'
-            print(msg, end=end, flush=True)
-
-        # --------------------------------
-        # get formatted detector geometry
-
-        # get detector / aperture
-        deti = _get_deti(
-            coll=coll,
-            cxi=cx[ind],
-            cyi=cy[ind],
-            czi=cz[ind],
-            dvect=dvect,
-            par=par,
-            out0=out0,
-            out1=out1,
-            ind=ind,
-        )
+    if timing:
+        t22 = dtm.datetime.now()     # DB
 
-        if timing:
-            t111 = dtm.datetime.now()     # DB
-            dt111 += (t111-t000).total_seconds()
+    dout, dref = _format_output(
+        coll=coll,
+        key_cam=key_cam,
+        ldpix=ldpix,
+        keep3d=keep3d,
+        return_vector=return_vector,
+    )
 
-        # --------------------------------
-        # get pixel-specific apertures if not pinhole
+    if timing:
+        t33 = dtm.datetime.now()
+        dt22 += (t33 - t22).total_seconds()
 
-        if pinhole is False:
-            sli_path = tuple(list(ind) + [slice(None)])
-            iop = np.nonzero(paths[sli_path])[0]
-            dap = {optics[ii]: dap0[optics[ii]] for ii in iop}
+    return (
+        dout, dref,
+        dt11, dt22,
+        dt111, dt222, dt333,
+        dt1111, dt2222, dt3333, dt4444,
+    )
 
-        # -------------------
-        # compute solid angle
 
-        # compute
-        out = _comp_solidangles.calc_solidangle_apertures(
-            # observation points
-            pts_x=xx,
-            pts_y=yy,
-            pts_z=zz,
-            # polygons
-            apertures=dap,
-            detectors=deti,
-            # possible obstacles
-            config=config,
-            # parameters
-            summed=False,
-            visibility=visibility,
-            return_vector=return_vector,
-            return_flat_pts=None,
-            return_flat_det=None,
-            timing=timing,
-        )
+# ###########################################################
+# ###########################################################
+#               Format output
+# ###########################################################
 
-        if isinstance(out, tuple):
-            out, vectx, vecty, vectz = out
-        else:
-            vectx, vecty, vectz = None, None, None
-
-        # ------------
-        # get indices
-
-        if timing:
-            t0 = dtm.datetime.now()     # DB
-            out, dt1, dt2, dt3 = out
-
-        # update cross-section
-        ipt = 0
-        for i0, v0 in dind.items():
-            for i1 in v0['iz']:
-                ind1 = dind[i0]['indrz'] & (iz == i1)
-                totii = np.sum(out[0, ind1]) * v0['dV']
-                sang_cross[ipt] = totii
-                indr_cross[ipt] = i0
-                indz_cross[ipt] = i1
-                bool_cross[i0 + 1, i1 + 1] = sang_cross[ipt] > 0.
-                if vectx is not None:
-                    tor = np.arctan2(yy[ind1], xx[ind1])
-                    ang_pol = np.arctan2(
-                        vectz[0, ind1],
-                        vectx[0, ind1]*np.cos(tor) + vecty[0, ind1]*np.sin(tor),
-                    )
-                    ang_tor = np.arccos(
-                        vectx[0, ind1] * (-np.sin(tor))
-                        + vecty[0, ind1] * np.cos(tor)
-                    )
-                    ang_pol_cross[ipt] = np.sum(out[0, ind1] * ang_pol) / totii
-                    ang_tor_cross[ipt] = np.sum(out[0, ind1] * ang_tor) / totii
-                ipt += 1
-
-        # update horizontal
-        for i0, v0 in dind.items():
-            dsang_hor[i0] = np.zeros((v0['phi'].size,))
-            for i1 in range(v0['phi'].size):
-                ind1 = dind[i0]['indrz'] & (iphi == i1)
-                dsang_hor[i0][i1] = np.sum(out[0, ind1]) * v0['dV']
-
-        # update 3d
-        if keep3d is True and np.any(bool_cross):
-            indsa = out[0, :] > 0.
-
-            indr_3d = ir[indsa]
-            indz_3d = iz[indsa]
-            phi_3d = np.arctan2(yy[indsa], xx[indsa])
-            sang_3d = out[0, indsa] * dV[indsa]
-
-            if vectx is not None:
-                vx = vectx[0, indsa]
-                vy = vecty[0, indsa]
-                vz = vectz[0, indsa]
-
-        # ----- DEBUG --------
-        if debug:
-            import matplotlib.pyplot as plt
-            fig = plt.figure()
-            ax = fig.add_axes([0.1, 0.1, 0.8, 0.8])
-            # ipos = out[0, :] > 0
-            # ax.scatter(
-            #     xx[ipos], yy[ipos],
-            #     c=out[0, ipos], s=6, marker='o', vmin=0,
-            # )
-            # ax.plot(xx[~ipos], yy[~ipos], c='r', marker='x')
-            ax.scatter(np.arctan2(yy, xx), out[0, :], c=np.hypot(xx, yy), s=6, marker='.')
-        # ----- END DEBUG ----
-
-        # timing
-        if timing:
-            dt4444 += (dtm.datetime.now() - t0).total_seconds()
-            dt1111 += dt1
-            dt2222 += dt2
-            dt3333 += dt3
-            t222 = dtm.datetime.now()     # DB
-            dt222 += (t222-t111).total_seconds()
-
-        # -----------------------
-        # get pcross and simplify
-
-        if np.any(bool_cross):
-
-            # pcross
-            pc0, pc1 = _utilities._get_polygons(
-                bool_cross=bool_cross,
-                x0=x0l,
-                x1=x1l,
-                res=np.min(np.atleast_1d(res_RZ)),
-            )
 
-            ph0, ph1 = _get_phor2(
-                xx=xx,
-                yy=yy,
-                out=out[0, :],
-                res=min(res_RZ[0], res_phi),
-            )
+def _format_output(
+    coll=None,
+    key_cam=None,
+    ldpix=None,
+    keep3d=None,
+    return_vector=None,
+):
+    """ Gather the per-pixel results (ordered as the camera pixels) """
 
-        else:
-            pc0, pc1 = None, None
-            ph0, ph1 = None, None
+    dgeom = coll.dobj['camera'][key_cam]['dgeom']
+    is2d = dgeom['nd'] == '2d'
+    shape_cam = dgeom['shape']
+    npix = int(np.prod(shape_cam))
+
+    # -----------------
+    # initialize lists
+    # -----------------
+
+    (
+        # common
+        lpcross, lphor, lsang_cross, lindr_cross, lindz_cross,
+        # keep3d
+        lindr_3d, lindz_3d, lphi_3d, lsang_3d,
+        # return_vector
+        lang_tor_cross, lang_pol_cross, lvectx, lvecty, lvectz
+    ) = _initialize_lists(
+        return_vector=return_vector,
+        keep3d=keep3d,
+    )
+
+    # -------------------
+    # gather (in order)
 
-        # -----------
-        # replace
+    for dpix in ldpix:
 
-        lpcross.append((pc0, pc1))
-        lphor.append((ph0, ph1))
-        lsang_cross.append(sang_cross)
-        lindr_cross.append(indr_cross)
-        lindz_cross.append(indz_cross)
+        lpcross.append(dpix['pcross'])
+        lphor.append(dpix['phor'])
+        lsang_cross.append(dpix['sang_cross'])
+        lindr_cross.append(dpix['indr_cross'])
+        lindz_cross.append(dpix['indz_cross'])
         if lang_pol_cross is not None:
-            lang_pol_cross.append(ang_pol_cross)
-            lang_tor_cross.append(ang_tor_cross)
+            lang_pol_cross.append(dpix['ang_pol_cross'])
+            lang_tor_cross.append(dpix['ang_tor_cross'])
 
         if keep3d is True:
-            lsang_3d.append(sang_3d)
-            lindr_3d.append(indr_3d)
-            lindz_3d.append(indz_3d)
-            lphi_3d.append(phi_3d)
+            lsang_3d.append(dpix['sang_3d'])
+            lindr_3d.append(dpix['indr_3d'])
+            lindz_3d.append(dpix['indz_3d'])
+            lphi_3d.append(dpix['phi_3d'])
 
             if lvectx is not None:
-                lvectx.append(vx)
-                lvecty.append(vy)
-                lvectz.append(vz)
-
-        if timing:
-            t333 = dtm.datetime.now()     # DB
-            dt333 += (t333-t222).total_seconds()
+                lvectx.append(dpix['vx'])
+                lvecty.append(dpix['vy'])
+                lvectz.append(dpix['vz'])
 
     # ----------------------------
     # harmonize and reshape pcross
     # ----------------------------
 
-    if timing:
-        t22 = dtm.datetime.now()     # DB
-
     pcross0, pcross1 = _harmonize_reshape_pcross(
         lpcross=lpcross,
         shape=shape_cam,
@@ -561,7 +474,7 @@ def _vos(
     if keep3d is True:
         dref['npts_3d'] = {
             'key': knpts_3d,
-            'size': indr_3d.shape[1],
+            'size': indr_3d.shape[-1],
         }
 
     # ddata - polygons
@@ -687,16 +600,7 @@ def _vos(
                 },
             })
 
-    if timing:
-        t33 = dtm.datetime.now()
-        dt22 += (t33 - t22).total_seconds()
-
-    return (
-        dout, dref,
-        dt11, dt22,
-        dt111, dt222, dt333,
-        dt1111, dt2222, dt3333, dt4444,
-    )
+    return dout, dref
 
 
 # ###########################################################
@@ -751,6 +655,388 @@ def _initialize_lists(
     )
 
 
+# ###########################################################
+# ###########################################################
+#               Pixel
+# ###########################################################
+
+
+def _get_pixel(
+    ii=None,
+    dshards=None,
+    timing=None,
+    **kwdargs,
+):
+    """ Load the pixel from its shard if resuming, else compute (and save) """
+
+    if dshards is not None and dshards['resume'] is True:
+        dpix = _shards.load_pixel(
+            path=dshards['path'],
+            ii=ii,
+            dpix=_get_empty_pixel(np.zeros((7,), dtype=float)),
+        )
+        if dpix is not None:
+            return dpix
+
+    dpix = _vos_pixel(ii=ii, timing=timing, **kwdargs)
+
+    if dshards is not None:
+        _shards.save_pixel(path=dshards['path'], ii=ii, dpix=dpix)
+
+    return dpix
+
+
+def _vos_pixel(
+    ind=None,
+    dctx=None,
+    bool_cross=None,
+    timing=None,
+    # verb
+    key_cam=None,
+    ii=None,
+    npix=None,
+):
+    """ vos of a single pixel, only depends on the pixel-independent dctx
+
+    Returns a dict of per-pixel results (+ timing increments)
+
+    """
+
+    # -----------------
+    # slices
+
+    sli_poly = tuple([slice(None)] + list(ind))
+    sli_poly0 = tuple([0] + list(ind))
+
+    # timing: dt111, dt222, dt333, dt1111, dt2222, dt3333, dt4444
+    dt = np.zeros((7,), dtype=float)
+
+    # -----------------
+    # get volume limits
+
+    if timing:
+        t000 = dtm.datetime.now()     # DB
+
+    # get points
+    if dctx['pts'] is not None:
+        xx, yy, zz, dind, ir, iz, iphi, dV = dctx['pts']
+
+    elif np.isnan(dctx['pcross0'][sli_poly0]):
+        xx = None
+
+    else:
+        xx, yy, zz, dind, ir, iz, iphi, dV = _vos_points(
+            # polygons
+            pcross0=dctx['pcross0'][sli_poly],
+            pcross1=dctx['pcross1'][sli_poly],
+            phor0=dctx['phor0'][sli_poly],
+            phor1=dctx['phor1'][sli_poly],
+            margin_poly=dctx['margin_poly'],
+            dphi=dctx['dphi'][sli_poly],
+            # sampling
+            dsamp=dctx['dsamp'],
+            x0f=dctx['x0f'],
+            x1f=dctx['x1f'],
+            x0u=dctx['x0u'],
+            x1u=dctx['x1u'],
+            res=dctx['res_phi'],
+            dx0=dctx['dx0'],
+            dx1=dctx['dx1'],
+            # shape
+            sh=dctx['sh'],
+        )
+
+    if xx is None:
+        return _get_empty_pixel(dt)
+
+    # --------------
+    # re-initialize
+
+    bool_cross[...] = False
+
+    if key_cam is not None:
+        npts_tot = xx.size
+        npts_cross = np.sum([v0['iz'].size for v0 in dind.values()])
+        msg = (
+            f"\tcam '{key_cam}' pixel {ii+1} / {npix}"
+            f"\tnpts in cross_section = {npts_cross}"
+            f"\t({npts_tot} total)"
+        )
+        end = '\n 'if ii == npix - 1 else '\r'
+        print(msg, end=end, flush=True)
+
+    # --------------------------------
+    # get formatted detector geometry
+
+    # get detector / aperture
+    deti = _get_deti(
+        cxi=dctx['cx'][ind],
+        cyi=dctx['cy'][ind],
+        czi=dctx['cz'][ind],
+        dvect=dctx['dvect'],
+        par=dctx['par'],
+        out0=dctx['out0'],
+        out1=dctx['out1'],
+        ind=ind,
+    )
+
+    if timing:
+        t111 = dtm.datetime.now()     # DB
+        dt[0] += (t111-t000).total_seconds()
+
+    # --------------------------------
+    # get pixel-specific apertures if not pinhole
+
+    optics = dctx['optics']
+    if dctx['pinhole'] is False:
+        sli_path = tuple(list(ind) + [slice(None)])
+        iop = np.nonzero(dctx['paths'][sli_path])[0]
+        dap = {optics[jj]: dctx['dap0'][optics[jj]] for jj in iop}
+    else:
+        dap = dctx['dap0']
+
+    # -------------------
+    # compute solid angle
+
+    # compute
+    out = _comp_solidangles.calc_solidangle_apertures(
+        # observation points
+        pts_x=xx,
+        pts_y=yy,
+        pts_z=zz,
+        # polygons
+        apertures=dap,
+        detectors=deti,
+        # possible obstacles
+        config=dctx['config'],
+        # parameters
+        summed=False,
+        visibility=dctx['visibility'],
+        return_vector=dctx['return_vector'],
+        return_flat_pts=None,
+        return_flat_det=None,
+        timing=timing,
+    )
+
+    if timing:
+        t0 = dtm.datetime.now()     # DB
+        dt1, dt2, dt3 = out[-3:]
+        out = out[:-3] if len(out) > 4 else out[0]
+
+    if isinstance(out, tuple):
+        out, vectx, vecty, vectz = out
+    else:
+        vectx, vecty, vectz = None, None, None
+
+    # ------------
+    # get indices
+
+    # update cross-section (single pass over all points)
+    (
+        sang_cross, indr_cross, indz_cross,
+        ang_pol_cross, ang_tor_cross,
+    ) = _get_sang_cross(
+        out=out[0, :],
+        ir=ir,
+        iz=iz,
+        dV=dV,
+        # vectors
+        xx=xx,
+        yy=yy,
+        vectx=vectx,
+        vecty=vecty,
+        vectz=vectz,
+    )
+    bool_cross[indr_cross + 1, indz_cross + 1] = sang_cross > 0.
+
+    # initialize output
+    dpix = _get_empty_pixel(dt)
+    dpix.update({
+        'sang_cross': sang_cross,
+        'indr_cross': indr_cross,
+        'indz_cross': indz_cross,
+        'ang_pol_cross': ang_pol_cross,
+        'ang_tor_cross': ang_tor_cross,
+    })
+
+    # update 3d
+    if dctx['keep3d'] is True and np.any(bool_cross):
+        indsa = out[0, :] > 0.
+
+        dpix['indr_3d'] = ir[indsa]
+        dpix['indz_3d'] = iz[indsa]
+        dpix['phi_3d'] = np.arctan2(yy[indsa], xx[indsa])
+        dpix['sang_3d'] = out[0, indsa] * dV[indsa]
+
+        if vectx is not None:
+            dpix['vx'] = vectx[0, indsa]
+            dpix['vy'] = vecty[0, indsa]
+            dpix['vz'] = vectz[0, indsa]
+
+    # ----- DEBUG --------
+    if dctx['debug']:
+        import matplotlib.pyplot as plt
+        fig = plt.figure()
+        ax = fig.add_axes([0.1, 0.1, 0.8, 0.8])
+        # ipos = out[0, :] > 0
+        # ax.scatter(
+        #     xx[ipos], yy[ipos],
+        #     c=out[0, ipos], s=6, marker='o', vmin=0,
+        # )
+        # ax.plot(xx[~ipos], yy[~ipos], c='r', marker='x')
+        ax.scatter(np.arctan2(yy, xx), out[0, :], c=np.hypot(xx, yy), s=6, marker='.')
+    # ----- END DEBUG ----
+
+    # timing
+    if timing:
+        dt[6] += (dtm.datetime.now() - t0).total_seconds()
+        dt[3] += dt1
+        dt[4] += dt2
+        dt[5] += dt3
+        t222 = dtm.datetime.now()     # DB
+        dt[1] += (t222-t111).total_seconds()
+
+    # -----------------------
+    # get pcross and simplify
+
+    if np.any(bool_cross):
+
+        # pcross
+        dpix['pcross'] = _utilities._get_polygons(
+            bool_cross=bool_cross,
+            x0=dctx['x0l'],
+            x1=dctx['x1l'],
+            res=np.min(np.atleast_1d(dctx['res_RZ'])),
+        )
+
+        dpix['phor'] = _get_phor2(
+            xx=xx,
+            yy=yy,
+            out=out[0, :],
+            res=min(dctx['res_RZ'][0], dctx['res_phi']),
+        )
+
+    if timing:
+        t333 = dtm.datetime.now()     # DB
+        dt[2] += (t333-t222).total_seconds()
+
+    return dpix
+
+
+def _get_empty_pixel(dt=None):
+
+    pts = np.zeros((0,), dtype=float)
+    return {
+        'pcross': (None, None),
+        'phor': (None, None),
+        'sang_cross': pts,
+        'indr_cross': pts,
+        'indz_cross': pts,
+        'ang_pol_cross': pts,
+        'ang_tor_cross': pts,
+        'sang_3d': pts,
+        'indr_3d': pts,
+        'indz_3d': pts,
+        'phi_3d': pts,
+        'vx': pts,
+        'vy': pts,
+        'vz': pts,
+        'dt': dt,
+    }
+
+
+# ###########################################################
+# ###########################################################
+#               Pixels - parallel
+# ###########################################################
+
+
+# pixel-independent context of each worker process, set once per worker
+_DCTX = None
+
+
+def _init_worker(dctx=None):
+    global _DCTX
+    _DCTX = dctx
+
+
+def _vos_pixels_chunk(
+    lii=None,
+    lind=None,
+    shape_bool=None,
+    timing=None,
+    dshards=None,
+):
+    bool_cross = np.zeros(shape_bool, dtype=bool)
+    return [
+        _get_pixel(
+            ii=ii,
+            ind=ind,
+            dctx=_DCTX,
+            bool_cross=bool_cross,
+            timing=timing,
+            dshards=dshards,
+        )
+        for ii, ind in zip(lii, lind)
+    ]
+
+
+def _vos_pixels_parallel(
+    lind=None,
+    dctx=None,
+    shape_bool=None,
+    timing=None,
+    dshards=None,
+    n_workers=None,
+    key_cam=None,
+):
+    """ Shard the pixels in contiguous chunks over a process pool
+
+    The pixel-independent context (sample points, apertures, config...) is
+    handed to each worker once through the pool initializer (inherited
+    without copy when processes are forked) instead of being pickled for
+    each task.
+    Chunks are gathered in submission order, so the output is identical to
+    the sequential loop.
+
+    """
+
+    npix = len(lind)
+    lchunks = np.array_split(np.arange(npix), min(npix, 4*n_workers))
+
+    ldpix = []
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(dctx,),
+    ) as executor:
+
+        lfut = [
+            executor.submit(
+                _vos_pixels_chunk,
+                lii=chunk.tolist(),
+                lind=[lind[ii] for ii in chunk],
+                shape_bool=shape_bool,
+                timing=timing,
+                dshards=dshards,
+            )
+            for chunk in lchunks
+        ]
+
+        for fut, chunk in zip(lfut, lchunks):
+            ldpix += fut.result()
+
+            if key_cam is not None:
+                msg = (
+                    f"\tcam '{key_cam}' pixel {chunk[-1]+1} / {npix}"
+                    f"\t({n_workers} workers)"
+                )
+                end = '\n' if chunk[-1] == npix - 1 else '\r'
+                print(msg, end=end, flush=True)
+
+    return ldpix
+
+
 # ###########################################################
 # ###########################################################
 #               get points
@@ -905,7 +1191,6 @@ def _vos_points(
         i0: {
             'dV': dx0 * dx1 * x0u[i0] * ddphi_r[ii],
             'iz': np.unique(iz[lind[ii]]),
-            'indrz': ir[indrz] == i0,
             'phi': lphi[ii],
         }
         for ii, i0 in enumerate(iru)
@@ -914,6 +1199,68 @@ def _vos_points(
     return xx, yy, zz, dind, ir[indrz], iz[indrz], iphi, dV
 
 
+# ###########################################################
+# ###########################################################
+#               Aggregate per cell
+# ###########################################################
+
+
+def _get_sang_cross(
+    out=None,
+    ir=None,
+    iz=None,
+    dV=None,
+    # vectors
+    xx=None,
+    yy=None,
+    vectx=None,
+    vecty=None,
+    vectz=None,
+):
+    """ Sum the solid angles of all points falling in each (R, Z) cell
+
+    Each point is mapped once to a flat cell index, cells are sorted by
+    (ir, iz) and all sums are done with a single np.bincount()
+
+    """
+
+    # ------------------------
+    # flat (ir, iz) cell index
+    # ------------------------
+
+    nz = iz.max() + 1
+    icell, ipt0, inv = np.unique(
+        ir * nz + iz,
+        return_index=True,
+        return_inverse=True,
+    )
+    ncell = icell.size
+
+    # dV only depends on ir
+    sang = np.bincount(inv, weights=out, minlength=ncell) * dV[ipt0]
+
+    # ------------------------
+    # angles (optional)
+    # ------------------------
+
+    if vectx is None:
+        ang_pol, ang_tor = None, None
+
+    else:
+        tor = np.arctan2(yy, xx)
+        ctor, stor = np.cos(tor), np.sin(tor)
+        angp = np.arctan2(
+            vectz[0, :],
+            vectx[0, :] * ctor + vecty[0, :] * stor,
+        )
+        angt = np.arccos(vectx[0, :] * (-stor) + vecty[0, :] * ctor)
+
+        ang_pol = np.bincount(inv, weights=out * angp, minlength=ncell) / sang
+        ang_tor = np.bincount(inv, weights=out * angt, minlength=ncell) / sang
+
+    return sang, ir[ipt0], iz[ipt0], ang_pol, ang_tor
+
+
 # ###########################################################
 # ###########################################################
 #               PHOR
@@ -1056,90 +1403,6 @@ def _get_phor2(xx=None, yy=None, out=None, res=None, debug=False):
 #     return phx, phy
 
 
-# ###########################################################
-# ###########################################################
-#               Pixel
-# ###########################################################
-
-
-# def _vos_pixel(
-#     x0=None,
-#     x1=None,
-#     ind=None,
-#     npts=None,
-#     dphi=None,
-#     deti=None,
-#     lap=None,
-#     res=None,
-#     config=None,
-#     visibility=None,
-#     # output
-#     key_cam=None,
-#     sli=None,
-#     ii=None,
-#     bool_cross=None,
-#     sang=None,
-#     indr=None,
-#     indz=None,
-#     # timing
-#     timing=None,
-#     dt1111=None,
-#     dt2222=None,
-#     dt3333=None,
-#     dt4444=None,
-# ):
-
-
-#     out = _comp_solidangles.calc_solidangle_apertures(
-#         # observation points
-#         pts_x=xx,
-#         pts_y=yy,
-#         pts_z=zz,
-#         # polygons
-#         apertures=lap,
-#         detectors=deti,
-#         # possible obstacles
-#         config=config,
-#         # parameters
-#         summed=False,
-#         visibility=visibility,
-#         return_vector=False,
-#         return_flat_pts=None,
-#         return_flat_det=None,
-#         timing=timing,
-#     )
-
-#     # ------------
-#     # get indices
-
-#     if timing:
-#         t0 = dtm.datetime.now()     # DB
-#         out, dt1, dt2, dt3 = out
-
-#     ipt = 0
-#     for ii, i0 in enumerate(iru):
-#         ind0 = irf == i0
-#         for i1 in izru[ii]:
-#             ind = ind0 & (izf == i1)
-#             bool_cross[i0 + 1, i1 + 1] = np.any(out[0, ind] > 0.)
-#             sang[ipt] = np.sum(out[0, ind])
-#             indr[ipt] = i0
-#             indz[ipt] = i1
-#             ipt += 1
-#     assert ipt == npts
-
-#     # timing
-#     if timing:
-#         dt4444 += (dtm.datetime.now() - t0).total_seconds()
-#         dt1111 += dt1
-#         dt2222 += dt2
-#         dt3333 += dt3
-
-#         return dt1111, dt2222, dt3333, dt4444
-#     else:
-#         return
-
-
 # ###########################################################
 # ###########################################################
 #               Detector
@@ -1147,7 +1410,6 @@ def _get_phor2(xx=None, yy=None, out=None, res=None, debug=False):
 
 
 def _get_deti(
-    coll=None,
     cxi=None,
     cyi=None,
     czi=None,
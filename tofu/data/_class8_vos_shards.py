@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+
+import os
+import json
+import glob
+import hashlib
+
+
+import numpy as np
+import datastock as ds
+
+
+# ###########################################################
+# ###########################################################
+#               Defaults
+# ###########################################################
+
+
+_PREFIX = 'vos'
+_META = 'meta.json'
+_PIX = 'pix{:07d}.npz'
+_RAD = 'rad{:07d}.npz'
+
+# keys of the per-pixel dict that are stored as arrays
+_LK_ARR = [
+    'sang_cross', 'indr_cross', 'indz_cross',
+    'ang_pol_cross', 'ang_tor_cross',
+    'sang_3d', 'indr_3d', 'indz_3d', 'phi_3d',
+    'vx', 'vy', 'vz',
+]
+
+# keys of the per-radius dict (spectro)
+_LK_PTS = [
+    'ncounts', 'cos', 'phi_mean', 'phi_min', 'phi_max', 'ph_count',
+    'indr', 'indz', 'dV', 'etendlen',
+]
+
+
+# ###########################################################
+# ###########################################################
+#               check
+# ###########################################################
+
+
+def _check(
+    path_shards=None,
+    resume=None,
+):
+
+    # -----------
+    # path_shards
+
+    if path_shards is not None:
+        if not (isinstance(path_shards, str) and os.path.isdir(path_shards)):
+            msg = (
+                "Arg path_shards must be a path to an existing directory!\n"
+                f"Provided: {path_shards}"
+            )
+            raise Exception(msg)
+        path_shards = os.path.abspath(path_shards)
+
+    # -----------
+    # resume
+
+    resume = ds._generic_check._check_var(
+        resume, 'resume',
+        types=bool,
+        default=False,
+    )
+
+    if resume is True and path_shards is None:
+        msg = "Arg resume = True requires path_shards to be provided!"
+        raise Exception(msg)
+
+    return path_shards, resume
+
+
+# ###########################################################
+# ###########################################################
+#               Prepare shards directory
+# ###########################################################
+
+
+def get_dshards(
+    path_shards=None,
+    resume=None,
+    # keys
+    key_diag=None,
+    key_cam=None,
+    key_mesh=None,
+    # parameters
+    res_RZ=None,
+    res_phi=None,
+    keep3d=None,
+    return_vector=None,
+    shape_cam=None,
+    # spectro
+    nrad=None,
+    lamb=None,
+    res_lamb=None,
+    res_rock_curve=None,
+    # pixel-independent context
+    dctx=None,
+):
+    """ Return the shards directory of a camera, create it if needed
+
+    The directory name contains a hash of the pixel-independent context
+    (sample points, resolution, detector, apertures, config...), so that
+    shards of different geometries are never mixed.
+
+    For spectro cameras (nrad provided), shards are per radius of the
+    plasma points instead of per pixel.
+
+    """
+
+    # hash
+    hh = hashlib.sha256()
+    _update_hash(hh, dctx)
+    hsh = hh.hexdigest()
+
+    # path
+    path = os.path.join(
+        path_shards,
+        f"{_PREFIX}_{key_diag}_{key_cam}_{hsh[:16]}",
+    )
+
+    # meta
+    pfe = os.path.join(path, _META)
+    if not os.path.isfile(pfe):
+        os.makedirs(path, exist_ok=True)
+        dmeta = {
+            'key_diag': key_diag,
+            'key_cam': key_cam,
+            'key_mesh': key_mesh,
+            'res_RZ': list(res_RZ),
+            'res_phi': res_phi,
+            'keep3d': keep3d,
+            'return_vector': return_vector,
+            'shape_cam': [int(ss) for ss in shape_cam],
+            'hash': hsh,
+        }
+        if nrad is not None:
+            dmeta.update({
+                'spectro': True,
+                'nrad': int(nrad),
+                'lamb': np.asarray(lamb, dtype=float).tolist(),
+                'res_lamb': res_lamb,
+                'res_rock_curve': res_rock_curve,
+            })
+        with open(pfe, 'w') as fn:
+            json.dump(dmeta, fn, indent=4)
+
+    return {'path': path, 'resume': resume}
+
+
+def _update_hash(hh, val):
+
+    if isinstance(val, dict):
+        for k0 in sorted(val.keys(), key=str):
+            hh.update(str(k0).encode())
+            _update_hash(hh, val[k0])
+
+    elif isinstance(val, (list, tuple)):
+        hh.update(f"{type(val).__name__}{len(val)}".encode())
+        for v0 in val:
+            _update_hash(hh, v0)
+
+    elif isinstance(val, np.ndarray):
+        hh.update(f"{val.dtype}{val.shape}".encode())
+        hh.update(np.ascontiguousarray(val).tobytes())
+
+    elif val is None or isinstance(val, (bool, int, float, str, np.generic)):
+        hh.update(repr(val).encode())
+
+    elif hasattr(val, 'lStruct'):
+        # tofu Config
+        for ss in val.lStruct:
+            hh.update(f"{ss.Id.Cls}_{ss.Id.Name}".encode())
+            _update_hash(hh, ss.Poly)
+            _update_hash(hh, ss.Lim)
+
+    else:
+        msg = f"Cannot hash object of type {type(val)} for vos shards!"
+        raise Exception(msg)
+
+
+# ###########################################################
+# ###########################################################
+#               Save / load one pixel / radius
+# ###########################################################
+
+
+def save_pixel(path=None, ii=None, dpix=None):
+    """ Save a pixel shard, atomically (no half-written shard if killed) """
+
+    darr = {
+        k0: dpix[k0] for k0 in _LK_ARR
+        if dpix.get(k0) is not None
+    }
+    for k0 in ['pcross', 'phor']:
+        if dpix[k0][0] is not None:
+            darr[f'{k0}0'] = dpix[k0][0]
+            darr[f'{k0}1'] = dpix[k0][1]
+
+    pfe = os.path.join(path, _PIX.format(ii))
+    with open(f"{pfe}.tmp", 'wb') as fn:
+        np.savez(fn, **darr)
+    os.replace(f"{pfe}.tmp", pfe)
+
+
+def load_pixel(path=None, ii=None, dpix=None):
+    """ Update dpix (empty pixel) from its shard, return None if missing """
+
+    pfe = os.path.join(path, _PIX.format(ii))
+    if not os.path.isfile(pfe):
+        return None
+
+    with np.load(pfe, allow_pickle=False) as dnpz:
+        dpix.update({k0: dnpz[k0] for k0 in _LK_ARR if k0 in dnpz.files})
+        for k0 in ['pcross', 'phor']:
+            if f'{k0}0' in dnpz.files:
+                dpix[k0] = (dnpz[f'{k0}0'], dnpz[f'{k0}1'])
+
+    return dpix
+
+
+def save_points(path=None, ii=None, dpts=None):
+    """ Save a radius shard (spectro), atomically """
+
+    pfe = os.path.join(path, _RAD.format(ii))
+    with open(f"{pfe}.tmp", 'wb') as fn:
+        np.savez(fn, **{k0: dpts[k0] for k0 in _LK_PTS})
+    os.replace(f"{pfe}.tmp", pfe)
+
+
+def load_points(path=None, ii=None):
+    """ Return the dict of a radius shard (spectro), None if missing """
+
+    pfe = os.path.join(path, _RAD.format(ii))
+    if not os.path.isfile(pfe):
+        return None
+
+    with np.load(pfe, allow_pickle=False) as dnpz:
+        dpts = {k0: dnpz[k0] for k0 in _LK_PTS}
+    dpts['dt'] = np.zeros((3,), dtype=float)
+
+    return dpts
+
+
+# ###########################################################
+# ###########################################################
+#               Find shards of a camera
+# ###########################################################
+
+
+def get_meta(path_shards=None, key_diag=None, key_cam=None):
+    """ Return (path, dmeta) of the only complete shards dir of a camera
+
+    Return (None, None) if there is no shards dir for this camera
+
+    """
+
+    lpath = sorted(glob.glob(
+        os.path.join(path_shards, f"{_PREFIX}_{key_diag}_{key_cam}_*")
+    ))
+    dmeta = {}
+    for pp in lpath:
+        pfe = os.path.join(pp, _META)
+        if os.path.isfile(pfe):
+            with open(pfe, 'r') as fn:
+                dmeta[pp] = json.load(fn)
+    lpath = [
+        pp for pp, v0 in dmeta.items()
+        if v0['key_diag'] == key_diag and v0['key_cam'] == key_cam
+    ]
+
+    if len(lpath) == 0:
+        return None, None
+
+    elif len(lpath) > 1:
+        lstr = [f"\t- {pp}" for pp in lpath]
+        msg = (
+            f"Several vos shards dir for diag '{key_diag}', cam '{key_cam}'"
+            " (different geometry / resolution):\n"
+            + "\n".join(lstr)
+            + "\n=> remove all but one"
+        )
+        raise Exception(msg)
+
+    path = lpath[0]
+    dmeta = dmeta[path]
+
+    # check completeness
+    if dmeta.get('spectro', False) is True:
+        nn, pat, ss = dmeta['nrad'], _RAD, 'radii'
+    else:
+        nn, pat, ss = int(np.prod(dmeta['shape_cam'])), _PIX, 'pixels'
+    lmiss = [
+        ii for ii in range(nn)
+        if not os.path.isfile(os.path.join(path, pat.format(ii)))
+    ]
+    if len(lmiss) > 0:
+        msg = (
+            f"Incomplete vos shards for diag '{key_diag}', cam '{key_cam}':\n"
+            f"\t- path: {path}\n"
+            f"\t- missing {ss}: {len(lmiss)} / {nn}\n"
+            "=> run compute_diagnostic_vos(..., resume=True) again"
+        )
+        raise Exception(msg)
+
+    return path, dmeta
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
 
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
 import datetime as dtm      # DB
+
+
 import numpy as np
 import scipy.stats as scpstats
 from matplotlib.path import Path
@@ -13,6 +17,7 @@ import Polygon as plg
 from . import _class8_equivalent_apertures as _equivalent_apertures
 from . import _class8_vos_utilities as _utilities
 from . import _class8_reverse_ray_tracing as _reverse_rt
+from . import _class8_vos_shards as _shards
 
 
 # ###########################################################
@@ -27,6 +32,7 @@ def _vos(
     doptics=None,
     key_diag=None,
     key_cam=None,
+    key_mesh=None,
     dsamp=None,
     # inputs
     x0u=None,
@@ -42,6 +48,7 @@ def _vos(
     phor1=None,
     dphi_r=None,
     sh=None,
+    res_RZ=None,
     res_phi=None,
     lamb=None,
     res_lamb=None,
@@ -55,6 +62,10 @@ def _vos(
     margin_poly=None,
     visibility=None,
     verb=None,
+    n_workers=None,
+    # checkpoint
+    path_shards=None,
+    resume=None,
     # debug
     debug=None,
     # timing
@@ -173,34 +184,528 @@ def _vos(
         out=True,
     )
 
-    # -------------------------------------
-    # prepare lambda, angles, rocking_curve
+    # -------------------------------------
+    # prepare lambda, angles, rocking_curve
+
+    (
+        nlamb,
+        lamb,
+        dlamb,
+        pow_interp,
+        ang_rel,
+        dang,
+        bragg,
+    ) = _reverse_rt._prepare_lamb(
+        coll=coll,
+        key_diag=key_diag,
+        key_cam=key_cam,
+        kspectro=kspectro,
+        lamb=lamb,
+        res_lamb=res_lamb,
+        res_rock_curve=res_rock_curve,
+        verb=verb,
+    )
+
+    # --------------
+    # prepare output
+
+    shape_cam = coll.dobj['camera'][key_cam]['dgeom']['shape']
+
+    if timing:
+        t11 = dtm.datetime.now()     # DB
+        dt11 += (t11-t00).total_seconds()
+
+    # ----------
+    # verb
+
+    if verb is True:
+        msg = (
+            f"\tlamb.shape: {lamb.shape}\n"
+            f"\tang_rel.shape: {ang_rel.shape}\n"
+            f"\tiru.size: {iru.size}\n"
+            f"\tnRZ: {nRZ}\n"
+        )
+        print(msg)
+
+    # ------------------------------------
+    # point-independent context (no coll)
+    # ------------------------------------
+
+    dctx = {
+        # sample points
+        'x0u': x0u,
+        'x1u': x1u,
+        'ir': ir,
+        'iz': iz,
+        'iru': iru,
+        'dr': np.mean(np.diff(x0u)),
+        'dz': np.mean(np.diff(x1u)),
+        'dphi_r': dphi_r,
+        'res_phi': res_phi,
+        # optics
+        'lpoly_post': lpoly_post,
+        'p0x': p0x,
+        'p0y': p0y,
+        'p0z': p0z,
+        'nin': nin,
+        'e0': e0,
+        'e1': e1,
+        'ptsvect_plane': ptsvect_plane,
+        'ptsvect_spectro': ptsvect_spectro,
+        'ptsvect_cam': ptsvect_cam,
+        'coords_x01toxyz_plane': coords_x01toxyz_plane,
+        'cent_spectro': cent_spectro,
+        'dist_to_cam': dist_to_cam,
+        'pix_size': pix_size,
+        'min_threshold': min_threshold,
+        # camera
+        'shape_cam': shape_cam,
+        'cbin0': cbin0,
+        'cbin1': cbin1,
+        'n0': n0,
+        'n1': n1,
+        # lamb, rocking curve
+        'nlamb': nlamb,
+        'dang': dang,
+        'ang_rel': ang_rel,
+        'bragg': bragg,
+        'pow_interp': pow_interp,
+        # debug
+        'debug': debug,
+    }
+
+    # on-disk per-radius shards (checkpoint)
+    if path_shards is None:
+        dshards = None
+    else:
+        # the projection functions derive from the crystal geometry
+        dhash = {k0: v0 for k0, v0 in dctx.items() if not callable(v0)}
+        dhash['pow_ratio'] = pow_interp.y
+        dhash['crystal'] = coll.dobj['crystal'][kspectro]['dgeom']
+
+        dshards = _shards.get_dshards(
+            path_shards=path_shards,
+            resume=resume,
+            # keys
+            key_diag=key_diag,
+            key_cam=key_cam,
+            key_mesh=key_mesh,
+            # parameters
+            res_RZ=res_RZ,
+            res_phi=res_phi,
+            keep3d=False,
+            return_vector=False,
+            shape_cam=shape_cam,
+            # spectro
+            nrad=iru.size,
+            lamb=lamb,
+            res_lamb=res_lamb,
+            res_rock_curve=res_rock_curve,
+            # point-independent context
+            dctx=dhash,
+        )
+
+    # ---------------------
+    # loop in plasma points
+    # ---------------------
+
+    if n_workers == 1:
+        dpts = _get_points(
+            li00=np.arange(iru.size),
+            dctx=dctx,
+            dshards=dshards,
+            verb=verb,
+            timing=timing,
+        )
+
+    else:
+        dpts = _vos_points_parallel(
+            dctx=dctx,
+            timing=timing,
+            dshards=dshards,
+            n_workers=n_workers,
+            key_cam=key_cam if verb is True else None,
+        )
+
+    if timing:
+        dt111 += dpts['dt'][0]
+        dt222 += dpts['dt'][1]
+        dt333 += dpts['dt'][2]
+
+    # ------ DEBUG --------
+    if debug is True:
+        _plot_debug(
+            coll=coll,
+            key_cam=key_cam,
+            cbin0=cbin0,
+            cbin1=cbin1,
+            dx0=dpts['dx0'],
+            dx1=dpts['dx1'],
+        )
+    # ---------------------
+
+    # -------------
+    # format output
+    # -------------
+
+    if timing:
+        t22 = dtm.datetime.now()     # DB
+
+    dout, dref = _format_output(
+        coll=coll,
+        key_diag=key_diag,
+        key_cam=key_cam,
+        dpts=dpts,
+        lamb=lamb,
+    )
+
+    if timing:
+        t33 = dtm.datetime.now()
+        dt22 += (t33 - t22).total_seconds()
+
+    return (
+        dout, dref,
+        dt11, dt22,
+        dt111, dt222, dt333,
+        dt1111, dt2222, dt3333, dt4444,
+    )
+
+
+# ###########################################################
+# ###########################################################
+#               Format output
+# ###########################################################
+
+
+def _format_output(
+    coll=None,
+    key_diag=None,
+    key_cam=None,
+    dpts=None,
+    lamb=None,
+):
+    """ Clean-up the gathered plasma points and format dout, dref """
+
+    is2d = len(coll.dobj['camera'][key_cam]['dgeom']['shape']) == 2
+
+    ncounts = dpts['ncounts']
+    cos = dpts['cos']
+    phi_mean = dpts['phi_mean']
+    phi_min = dpts['phi_min']
+    phi_max = dpts['phi_max']
+    ph_count = dpts['ph_count']
+    indr = dpts['indr']
+    indz = dpts['indz']
+    dV = dpts['dV']
+    etendlen = dpts['etendlen']
+
+    # multiply by dlamb
+    # Now done during synthetic signal compute (binning vs interp)
+    # ph_count *= dlamb
+
+    # remove useless points
+    iin = np.any(np.any(ncounts > 0, axis=0), axis=0)
+    if not np.all(iin):
+        ncounts = ncounts[:, :, iin]
+        cos = cos[:, :, iin]
+        phi_mean = phi_mean[:, :, iin]
+        phi_min = phi_min[:, :, iin]
+        phi_max = phi_max[:, :, iin]
+        ph_count = ph_count[:, :, iin, :]
+        indr = indr[iin]
+        indz = indz[iin]
+        dV = dV[iin]
+        # DEBUG
+        # sang = sang[:, :, iin]
+        # ph_approx = ph_approx[:, :, iin, :]
+        # dang_rel = dang_rel[:, :, iin, :]
+        # nphi_all = nphi_all[:, :, iin, :]
+
+    # remove useless lamb
+    iin = ph_count > 0.
+    ilamb = np.any(np.any(np.any(iin, axis=0), axis=0), axis=0)
+    if not np.all(ilamb):
+        ph_count = ph_count[..., ilamb]
+        lamb = lamb[ilamb]
+        # DEBUG
+        # sang = sang[..., ilamb]
+        # ph_approx = ph_approx[..., ilamb]
+        # dang_rel = dang_rel[..., ilamb]
+        # nphi_all = nphi_all[..., ilamb]
+
+    # average cos and phi_mean
+    iout = ncounts == 0
+    cos[~iout] = cos[~iout] / ncounts[~iout]
+    phi_mean[~iout] = phi_mean[~iout] / ncounts[~iout]
+
+    # clear
+    cos[iout] = np.nan
+    phi_mean[iout] = np.nan
+    phi_min[iout] = np.nan
+    phi_max[iout] = np.nan
+    # ph_count[iout, :] = np.nan
+    # DEBUG
+    # sang[iout, :] = np.nan
+    # ph_approx[iout, :] = np.nan
+    # dang_rel[iout, :] = np.nan
+    # nphi_all[iout, :] = np.nan
+
+    lresh = [1, 1, lamb.size]
+    if is2d:
+        lresh.insert(0, 1)
+    # phtot = np.sum(ph_count, axis=(-1, -2))
+    # lamb0 = np.sum(ph_count * lamb.reshape(lresh), axis=(-1, -2)) / phtot
+    # dlamb0 = dlamb * phtot / np.max(np.sum(ph_count, axis=-2), axis=-1)
+
+    # ----------------
+    # prepare output
+
+    # ref
+    knpts = f'{key_diag}_{key_cam}_vos_npts'
+    knlamb = f'{key_diag}_{key_cam}_vos_nlamb'
+
+    # data
+    klamb = f'{key_diag}_{key_cam}_vos_lamb'
+    kir = f'{key_diag}_{key_cam}_vos_ir'
+    kiz = f'{key_diag}_{key_cam}_vos_iz'
+    kph = f'{key_diag}_{key_cam}_vos_ph'
+    kcos = f'{key_diag}_{key_cam}_vos_cos'
+    knc = f"{key_diag}_{key_cam}_vos_nc"
+    kphimin = f'{key_diag}_{key_cam}_vos_phimin'
+    kphimax = f'{key_diag}_{key_cam}_vos_phimax'
+
+    # optional data
+    kdV = f'{key_diag}_{key_cam}_vos_dV'
+    ketl = f"{key_diag}_{key_cam}_vos_etendl"
+    # klamb0 = f'{key_cam}_vos_lamb0'
+    # kdlamb = f'{key_cam}_vos_dlamb'
+    kphimean = f'{key_diag}_{key_cam}_vos_phimean'
+
+    refcam = coll.dobj['camera'][key_cam]['dgeom']['ref']
+    ref = tuple(list(refcam) + [knpts])
+    refph = tuple(list(ref) + [knlamb])
+
+    # -------------------
+    # format output
+
+    # dref
+    dref = {
+        'npts': {
+            'key': knpts,
+            'size': indr.shape[-1],
+        },
+        'nlamb': {
+            'key': knlamb,
+            'size': lamb.size,
+        },
+    }
+
+
+    # dout
+    dout = {
+        'pcross0': None,
+        'pcross1': None,
+        'phor0': None,
+        'phor1': None,
+        # lamb
+        'lamb': {
+            'key': klamb,
+            'data': lamb,
+            'ref': (knlamb,),
+            'units': 'm',
+            'dim': 'distance',
+        },
+
+        # coordinates
+        'indr_cross': {
+            'key': kir,
+            'data': indr,
+            'ref': (knpts,),
+            'units': None,
+            'dim': 'index',
+        },
+        'indz_cross': {
+            'key': kiz,
+            'data': indz,
+            'ref': (knpts,),
+            'units': None,
+            'dim': 'index',
+        },
+
+        # data
+        'cos': {
+            'key': kcos,
+            'data': cos,
+            'ref': ref,
+            'units': None,
+            'dim': 'cos',
+        },
+        'ncounts': {
+            'key': knc,
+            'data': ncounts,
+            'ref': ref,
+            'units': None,
+            'dim': 'counts',
+        },
+        'ph': {
+            'key': kph,
+            'data': ph_count,
+            'ref': refph,
+            'units': 'sr.m3',
+            'dim': 'transfert',
+        },
+        'phi_min': {
+            'key': kphimin,
+            'data': phi_min,
+            'ref': ref,
+            'units': 'rad',
+            'dim': 'angle',
+        },
+        'phi_max': {
+            'key': kphimax,
+            'data': phi_max,
+            'ref': ref,
+            'units': 'rad',
+            'dim': 'angle',
+        },
+
+        # optional
+        'phi_mean': {
+            'key': kphimean,
+            'data': phi_mean,
+            'ref': ref,
+            'units': 'rad',
+            'dim': 'angle',
+        },
+        'dV': {
+            'key': kdV,
+            'data': dV,
+            'ref': (knpts,),
+            'units': 'm3',
+            'dim': 'volume',
+        },
+
+        # debug
+        'etendlen': {
+            'key': ketl,
+            'data': etendlen,
+            'ref': refcam,
+            'units': 'sr.m3',
+            'dim': 'etend*len',
+        },
+    }
+
+    return dout, dref
+
+
+# ###########################################################
+# ###########################################################
+#               Plasma points
+# ###########################################################
+
+
+def _get_points(
+    li00=None,
+    dctx=None,
+    dshards=None,
+    verb=None,
+    timing=None,
+):
+    """ vos of the plasma points at radial indices iru[li00]
+
+    Without shards, all radii are computed at once.
+    With shards, each radius is loaded from its shard if resuming, else
+    computed (and saved), then all radii are gathered.
+
+    """
+
+    if dshards is None:
+        return _vos_points(li00=li00, dctx=dctx, verb=verb, timing=timing)
+
+    ldpts = []
+    for i00 in li00:
+        dpts = None
+        if dshards['resume'] is True:
+            dpts = _shards.load_points(path=dshards['path'], ii=i00)
+
+        if dpts is None:
+            dpts = _vos_points(
+                li00=[i00],
+                dctx=dctx,
+                verb=verb,
+                timing=timing,
+            )
+            _shards.save_points(path=dshards['path'], ii=i00, dpts=dpts)
+
+        ldpts.append(dpts)
+
+    return _gather(ldpts)
+
+
+def _gather(ldpts=None):
+    """ Concatenate the points of contiguous radii, sum etendlen """
+
+    dpts = {
+        k0: np.concatenate([dd[k0] for dd in ldpts], axis=-1)
+        for k0 in ['ncounts', 'cos', 'phi_mean', 'phi_min', 'phi_max',
+                   'indr', 'indz', 'dV']
+    }
+    dpts['ph_count'] = np.concatenate(
+        [dd['ph_count'] for dd in ldpts],
+        axis=-2,
+    )
+    dpts['etendlen'] = np.sum([dd['etendlen'] for dd in ldpts], axis=0)
+    dpts['dt'] = np.sum([dd['dt'] for dd in ldpts], axis=0)
+
+    return dpts
+
+
+def _vos_points(
+    li00=None,
+    dctx=None,
+    verb=None,
+    timing=None,
+):
+    """ vos of the plasma points at radial indices iru[li00]
+
+    Only depends on the point-independent dctx
+    Returns the arrays of these points (in the order of the sequential
+    loop) and their contribution to etendlen
+
+    """
+
+    # -------------
+    # context
+
+    x0u, x1u = dctx['x0u'], dctx['x1u']
+    ir, iz, iru = dctx['ir'], dctx['iz'], dctx['iru']
+    dr, dz = dctx['dr'], dctx['dz']
+    dphi_r, res_phi = dctx['dphi_r'], dctx['res_phi']
+    lpoly_post = dctx['lpoly_post']
+    p0x, p0y, p0z = dctx['p0x'], dctx['p0y'], dctx['p0z']
+    nin, e0, e1 = dctx['nin'], dctx['e0'], dctx['e1']
+    ptsvect_plane = dctx['ptsvect_plane']
+    ptsvect_spectro = dctx['ptsvect_spectro']
+    ptsvect_cam = dctx['ptsvect_cam']
+    coords_x01toxyz_plane = dctx['coords_x01toxyz_plane']
+    cent_spectro = dctx['cent_spectro']
+    dist_to_cam = dctx['dist_to_cam']
+    pix_size = dctx['pix_size']
+    min_threshold = dctx['min_threshold']
+    shape_cam = dctx['shape_cam']
+    cbin0, cbin1 = dctx['cbin0'], dctx['cbin1']
+    n0, n1 = dctx['n0'], dctx['n1']
+    nlamb, dang = dctx['nlamb'], dctx['dang']
+    ang_rel, bragg = dctx['ang_rel'], dctx['bragg']
+    pow_interp = dctx['pow_interp']
+    debug = dctx['debug']
 
-    (
-        nlamb,
-        lamb,
-        dlamb,
-        pow_interp,
-        ang_rel,
-        dang,
-        bragg,
-    ) = _reverse_rt._prepare_lamb(
-        coll=coll,
-        key_diag=key_diag,
-        key_cam=key_cam,
-        kspectro=kspectro,
-        lamb=lamb,
-        res_lamb=res_lamb,
-        res_rock_curve=res_rock_curve,
-        verb=verb,
-    )
+    nru = iru.size
+    nRZ = np.isin(ir, iru[li00]).sum()
 
     # --------------
     # prepare output
 
-    shape_cam = coll.dobj['camera'][key_cam]['dgeom']['shape']
-    is2d = len(shape_cam) == 2
-
     shape0 = tuple(np.r_[shape_cam, nRZ])
     ncounts = np.full(shape0, 0.)
     cos = np.full(shape0, 0.)
@@ -223,21 +728,7 @@ def _vos(
     # kp = coll.dobj[cls_spectro][kspectro]['dmat']['drock']['power_ratio']
     # POW = coll.ddata[kp]['data'].max()
 
-    if timing:
-        t11 = dtm.datetime.now()     # DB
-        dt11 += (t11-t00).total_seconds()
-
-    # ----------
-    # verb
-
-    if verb is True:
-        msg = (
-            f"\tlamb.shape: {lamb.shape}\n"
-            f"\tang_rel.shape: {ang_rel.shape}\n"
-            f"\tiru.size: {iru.size}\n"
-            f"\tnRZ: {nRZ}\n"
-        )
-        print(msg)
+    dt = np.zeros((3,), dtype=float)
 
     # ---------------------
     # loop in plasma points
@@ -247,21 +738,19 @@ def _vos(
             i0: {
                 i1: [] for i1 in np.unique(iz[ir == i0])
             }
-            for i0 in iru
+            for i0 in iru[li00]
         }
         dx1 = {
             i0: {
                 i1: [] for i1 in np.unique(iz[ir == i0])
             }
-            for i0 in iru
+            for i0 in iru[li00]
         }
 
-    dr = np.mean(np.diff(x0u))
-    dz = np.mean(np.diff(x1u))
     ipts = 0
     pti = np.r_[0., 0., 0.]
-    nru = iru.size
-    for i00, i0 in enumerate(iru):
+    for i00 in li00:
+        i0 = iru[i00]
 
         indiz = ir == i0
         nz = indiz.sum()
@@ -332,7 +821,7 @@ def _vos(
 
                 if timing:
                     t111 = dtm.datetime.now()     # DB
-                    dt111 += (t111-t000).total_seconds()
+                    dt[0] += (t111-t000).total_seconds()
 
                 # compute image
                 (
@@ -372,7 +861,7 @@ def _vos(
                 if timing:
                     # dt1111, dt2222, dt3333, dt4444 = out
                     t222 = dtm.datetime.now()     # DB
-                    dt222 += (t222-t111).total_seconds()
+                    dt[1] += (t222-t111).total_seconds()
 
                 # safety check
                 iok2 = (
@@ -511,232 +1000,108 @@ def _vos(
 
                 if timing:
                     t333 = dtm.datetime.now()     # DB
-                    dt333 += (t333-t222).total_seconds()
+                    dt[2] += (t333-t222).total_seconds()
 
             # update index
             ipts += 1
 
-    # multiply by dlamb
-    # Now done during synthetic signal compute (binning vs interp)
-    # ph_count *= dlamb
-
-    if timing:
-        t22 = dtm.datetime.now()     # DB
-
-    # remove useless points
-    iin = np.any(np.any(ncounts > 0, axis=0), axis=0)
-    if not np.all(iin):
-        ncounts = ncounts[:, :, iin]
-        cos = cos[:, :, iin]
-        phi_mean = phi_mean[:, :, iin]
-        phi_min = phi_min[:, :, iin]
-        phi_max = phi_max[:, :, iin]
-        ph_count = ph_count[:, :, iin, :]
-        indr = indr[iin]
-        indz = indz[iin]
-        dV = dV[iin]
-        # DEBUG
-        # sang = sang[:, :, iin]
-        # ph_approx = ph_approx[:, :, iin, :]
-        # dang_rel = dang_rel[:, :, iin, :]
-        # nphi_all = nphi_all[:, :, iin, :]
-
-    # remove useless lamb
-    iin = ph_count > 0.
-    ilamb = np.any(np.any(np.any(iin, axis=0), axis=0), axis=0)
-    if not np.all(ilamb):
-        ph_count = ph_count[..., ilamb]
-        lamb = lamb[ilamb]
-        # DEBUG
-        # sang = sang[..., ilamb]
-        # ph_approx = ph_approx[..., ilamb]
-        # dang_rel = dang_rel[..., ilamb]
-        # nphi_all = nphi_all[..., ilamb]
-
-    # average cos and phi_mean
-    iout = ncounts == 0
-    cos[~iout] = cos[~iout] / ncounts[~iout]
-    phi_mean[~iout] = phi_mean[~iout] / ncounts[~iout]
-
-    # clear
-    cos[iout] = np.nan
-    phi_mean[iout] = np.nan
-    phi_min[iout] = np.nan
-    phi_max[iout] = np.nan
-    # ph_count[iout, :] = np.nan
-    # DEBUG
-    # sang[iout, :] = np.nan
-    # ph_approx[iout, :] = np.nan
-    # dang_rel[iout, :] = np.nan
-    # nphi_all[iout, :] = np.nan
-
-    lresh = [1, 1, lamb.size]
-    if is2d:
-        lresh.insert(0, 1)
-    # phtot = np.sum(ph_count, axis=(-1, -2))
-    # lamb0 = np.sum(ph_count * lamb.reshape(lresh), axis=(-1, -2)) / phtot
-    # dlamb0 = dlamb * phtot / np.max(np.sum(ph_count, axis=-2), axis=-1)
+    dpts = {
+        'ncounts': ncounts,
+        'cos': cos,
+        'phi_mean': phi_mean,
+        'phi_min': phi_min,
+        'phi_max': phi_max,
+        'ph_count': ph_count,
+        'indr': indr,
+        'indz': indz,
+        'dV': dV,
+        'etendlen': etendlen,
+        'dt': dt,
+    }
 
-    # ------ DEBUG --------
     if debug is True:
-        _plot_debug(
-            coll=coll,
-            key_cam=key_cam,
-            cbin0=cbin0,
-            cbin1=cbin1,
-            dx0=dx0,
-            dx1=dx1,
-        )
-    # ---------------------
-
-    # ----------------
-    # prepare output
+        dpts['dx0'] = dx0
+        dpts['dx1'] = dx1
 
-    # ref
-    knpts = f'{key_diag}_{key_cam}_vos_npts'
-    knlamb = f'{key_diag}_{key_cam}_vos_nlamb'
+    return dpts
 
-    # data
-    klamb = f'{key_diag}_{key_cam}_vos_lamb'
-    kir = f'{key_diag}_{key_cam}_vos_ir'
-    kiz = f'{key_diag}_{key_cam}_vos_iz'
-    kph = f'{key_diag}_{key_cam}_vos_ph'
-    kcos = f'{key_diag}_{key_cam}_vos_cos'
-    knc = f"{key_diag}_{key_cam}_vos_nc"
-    kphimin = f'{key_diag}_{key_cam}_vos_phimin'
-    kphimax = f'{key_diag}_{key_cam}_vos_phimax'
 
-    # optional data
-    kdV = f'{key_diag}_{key_cam}_vos_dV'
-    ketl = f"{key_diag}_{key_cam}_vos_etendl"
-    # klamb0 = f'{key_cam}_vos_lamb0'
-    # kdlamb = f'{key_cam}_vos_dlamb'
-    kphimean = f'{key_diag}_{key_cam}_vos_phimean'
+# ###########################################################
+# ###########################################################
+#               Plasma points - parallel
+# ###########################################################
 
-    refcam = coll.dobj['camera'][key_cam]['dgeom']['ref']
-    ref = tuple(list(refcam) + [knpts])
-    refph = tuple(list(ref) + [knlamb])
 
-    # -------------------
-    # format output
+# point-independent context of each worker process, set once per worker
+_DCTX = None
 
-    # dref
-    dref = {
-        'npts': {
-            'key': knpts,
-            'size': indr.shape[-1],
-        },
-        'nlamb': {
-            'key': knlamb,
-            'size': lamb.size,
-        },
-    }
 
+def _init_worker(dctx=None):
+    global _DCTX
+    _DCTX = dctx
 
-    # dout
-    dout = {
-        'pcross0': None,
-        'pcross1': None,
-        'phor0': None,
-        'phor1': None,
-        # lamb
-        'lamb': {
-            'key': klamb,
-            'data': lamb,
-            'ref': (knlamb,),
-            'units': 'm',
-            'dim': 'distance',
-        },
 
-        # coordinates
-        'indr_cross': {
-            'key': kir,
-            'data': indr,
-            'ref': (knpts,),
-            'units': None,
-            'dim': 'index',
-        },
-        'indz_cross': {
-            'key': kiz,
-            'data': indz,
-            'ref': (knpts,),
-            'units': None,
-            'dim': 'index',
-        },
+def _vos_points_chunk(li00=None, timing=None, dshards=None):
+    return _get_points(
+        li00=li00,
+        dctx=_DCTX,
+        dshards=dshards,
+        verb=False,
+        timing=timing,
+    )
 
-        # data
-        'cos': {
-            'key': kcos,
-            'data': cos,
-            'ref': ref,
-            'units': None,
-            'dim': 'cos',
-        },
-        'ncounts': {
-            'key': knc,
-            'data': ncounts,
-            'ref': ref,
-            'units': None,
-            'dim': 'counts',
-        },
-        'ph': {
-            'key': kph,
-            'data': ph_count,
-            'ref': refph,
-            'units': 'sr.m3',
-            'dim': 'transfert',
-        },
-        'phi_min': {
-            'key': kphimin,
-            'data': phi_min,
-            'ref': ref,
-            'units': 'rad',
-            'dim': 'angle',
-        },
-        'phi_max': {
-            'key': kphimax,
-            'data': phi_max,
-            'ref': ref,
-            'units': 'rad',
-            'dim': 'angle',
-        },
 
-        # optional
-        'phi_mean': {
-            'key': kphimean,
-            'data': phi_mean,
-            'ref': ref,
-            'units': 'rad',
-            'dim': 'angle',
-        },
-        'dV': {
-            'key': kdV,
-            'data': dV,
-            'ref': (knpts,),
-            'units': 'm3',
-            'dim': 'volume',
-        },
+def _vos_points_parallel(
+    dctx=None,
+    timing=None,
+    dshards=None,
+    n_workers=None,
+    key_cam=None,
+):
+    """ Shard the plasma points, by radius, in contiguous chunks over a pool
+
+    The point-independent context holds the projection functions of the
+    optics, which are closures: it is handed to each worker once through
+    the initializer of forked processes, without being pickled.
+    Chunks are gathered in submission order: the per-point arrays are
+    identical to the sequential loop, etendlen is summed over chunks.
+    Radius shards, if any, are loaded / saved by the workers.
+
+    """
+
+    nru = dctx['iru'].size
+    lchunks = np.array_split(np.arange(nru), max(1, min(nru, 4*n_workers)))
+
+    ldpts = []
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp.get_context('fork'),
+        initializer=_init_worker,
+        initargs=(dctx,),
+    ) as executor:
+
+        lfut = [
+            executor.submit(
+                _vos_points_chunk,
+                li00=chunk,
+                timing=timing,
+                dshards=dshards,
+            )
+            for chunk in lchunks
+        ]
 
-        # debug
-        'etendlen': {
-            'key': ketl,
-            'data': etendlen,
-            'ref': refcam,
-            'units': 'sr.m3',
-            'dim': 'etend*len',
-        },
-    }
+        for fut, chunk in zip(lfut, lchunks):
+            ldpts.append(fut.result())
 
-    if timing:
-        t33 = dtm.datetime.now()
-        dt22 += (t33 - t22).total_seconds()
+            if key_cam is not None:
+                msg = (
+                    f"\tcam '{key_cam}' radius {chunk[-1]+1} / {nru}"
+                    f"\t({n_workers} workers)"
+                )
+                end = '\n' if chunk[-1] == nru - 1 else '\r'
+                print(msg, end=end, flush=True)
 
-    return (
-        dout, dref,
-        dt11, dt22,
-        dt111, dt222, dt333,
-        dt1111, dt2222, dt3333, dt4444,
-    )
+    return _gather(ldpts)
 
 
 # ################################################
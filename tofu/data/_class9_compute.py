@@ -7,6 +7,7 @@ import warnings
 
 # Common
 import numpy as np
+import scipy.sparse as scpsp
 import datastock as ds
 
 
@@ -519,7 +520,10 @@ def _concatenate(
         ldata.append(datai)
         ind += datai.shape[axis]
 
-    data = np.concatenate(ldata, axis=axis)
+    if scpsp.issparse(ldata[0]):
+        data = scpsp.vstack(ldata, format='csr')
+    else:
+        data = np.concatenate(ldata, axis=axis)
 
     return data, ref, dind
 
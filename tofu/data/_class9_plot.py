@@ -3,6 +3,7 @@
 
 # Common
 import numpy as np
+import scipy.sparse as scpsp
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 import datastock as ds
@@ -85,7 +86,7 @@ def _plot_geometry_matrix_check(
 
     # vmin, vmax
     if vmax is None:
-        lmax = [np.nanmax(coll.ddata[kk]['data']) for kk in key_data]
+        lmax = [np.nanmax(_get_dense(coll, kk)) for kk in key_data]
         vmax = max(lmax)
     if vmin is None:
         vmin = 0
@@ -267,7 +268,7 @@ def _plot_geometry_matrix_prepare(
         store=False,
     )[f'{keybs}_details']['data']
 
-    gmat0 = coll.ddata[key_data[0]]['data']
+    gmat0 = _get_dense(coll, key_data[0])
     if axis_other is not None:
         diffdim = len(bsplinebase.shape) - 1 - len(gmat0.shape)
         axo = axis_other if axis_other < axis_bs else axis_other + diffdim
@@ -276,7 +277,7 @@ def _plot_geometry_matrix_prepare(
     # bsplinetot
     coefstot = np.nansum(
         [
-            np.nansum(coll.ddata[kk]['data'], axis=axis_chan)
+            np.nansum(_get_dense(coll, kk), axis=axis_chan)
             for kk in key_data
         ],
         axis=0,
@@ -334,6 +335,8 @@ def _plot_geometry_matrix_prepare(
     coll2 = coll.__class__()
 
     gmat, ref, dind = coll.get_geometry_matrix_concatenated(key=key)
+    if scpsp.issparse(gmat):
+        gmat = gmat.toarray()
     npix = gmat.shape[ref.index(None)]
 
     for ii, rr in enumerate(ref):
@@ -358,6 +361,14 @@ def _plot_geometry_matrix_prepare(
     )
 
 
+def _get_dense(coll=None, key=None):
+    """ Return the data of a geometry matrix as a dense array """
+    data = coll.ddata[key]['data']
+    if scpsp.issparse(data):
+        data = data.toarray()
+    return data
+
+
 def plot_geometry_matrix(
     # resources
     coll=None,
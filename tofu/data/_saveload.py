@@ -2,18 +2,161 @@
 
 
 import os
+import json
+import getpass
+import datetime as dtm
+
+
+import numpy as np
+import scipy.sparse as scpsp
+import datastock as ds
 import bsplines2d as bs2
 
 
 __all__ = ['load']
 
 
+# ##################################################################
+# ##################################################################
+#                   Default values
+# ##################################################################
+
+
+_VERSION = 1
+_META = 'meta.npy'
+_INDEX = 'index.json'
+
+# sparse formats stored as (data, indices, indptr)
+_LSPARSE = ['csr', 'csc']
+
+
 # ##################################################################
 # ##################################################################
 #                   Save
 # ##################################################################
 
 
+def save(
+    coll=None,
+    path=None,
+    name=None,
+    verb=None,
+    return_pfe=None,
+):
+    """ Save a Collection as a directory of memory-mappable .npy files
+
+    The directory contains:
+        - meta.npy: everything but the data arrays (refs, obj, units...)
+        - index.json: the files of each data array
+        - one uncompressed .npy file per data array (3 for csr / csc)
+
+    It is re-loaded with tofu.data.load(), which memory-maps the arrays
+
+    """
+
+    # ------------
+    # check inputs
+
+    path = ds._generic_check._check_var(
+        path, 'path',
+        default=os.path.abspath('./'),
+        types=str,
+    )
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        msg = f"Arg path must be a valid path!\nProvided: {path}"
+        raise Exception(msg)
+
+    name = ds._generic_check._check_var(
+        name, 'name',
+        default='name',
+        types=str,
+    )
+
+    verb = ds._generic_check._check_var(
+        verb, 'verb',
+        default=True,
+        types=bool,
+    )
+
+    return_pfe = ds._generic_check._check_var(
+        return_pfe, 'return_pfe',
+        default=False,
+        types=bool,
+    )
+
+    # ---------------
+    # get dict
+
+    # bsplines classes are re-built at loading time
+    dclas = bs2._saveload.prepare_bsplines(coll)
+    try:
+        din = coll.to_dict(flatten=False, returnas='values', copy=False)
+    finally:
+        bs2._saveload.restore_bsplines(coll, dclas=dclas)
+
+    # ---------------
+    # save data arrays
+
+    # microseconds => unique name, never write into an existing directory
+    user = getpass.getuser()
+    dt = dtm.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    pfe = os.path.join(path, f'{coll.__class__.__name__}_{name}_{user}_{dt}')
+    if os.path.exists(pfe):
+        msg = f"Directory already exists, not overwritten:\n\t{pfe}"
+        raise Exception(msg)
+    os.makedirs(pfe)
+
+    # to_dict() leaves out empty _ddata
+    if '_ddata' in din.keys():
+        din['_ddata'] = {k0: dict(v0) for k0, v0 in din['_ddata'].items()}
+
+    dindex, nf = {}, 0
+    for k0, v0 in din.get('_ddata', {}).items():
+        data = v0['data']
+        if isinstance(data, np.ndarray) and data.dtype != object:
+            larr = [data]
+            dindex[k0] = {'typ': 'ndarray'}
+        elif scpsp.issparse(data) and data.format in _LSPARSE:
+            larr = [data.data, data.indices, data.indptr]
+            dindex[k0] = {
+                'typ': type(data).__name__,
+                'shape': list(data.shape),
+            }
+        else:
+            # kept in meta.npy
+            continue
+
+        lf = []
+        for arr in larr:
+            lf.append(f'd{nf:06d}.npy')
+            np.save(os.path.join(pfe, lf[-1]), arr)
+            nf += 1
+
+        dindex[k0]['files'] = lf
+        v0['data'] = None
+
+    # ---------------
+    # save meta and index
+
+    # all the rest as a single pickled object, fast to load
+    meta = np.empty((), dtype=object)
+    meta[()] = din
+    np.save(os.path.join(pfe, _META), meta)
+
+    with open(os.path.join(pfe, _INDEX), 'w') as fn:
+        json.dump({'version': _VERSION, 'ddata': dindex}, fn, indent=1)
+
+    # print
+    if verb:
+        msg = f"Saved in:\n\t{pfe}"
+        print(msg)
+
+    # return
+    if return_pfe is True:
+        return pfe
+
+
 # ###################################################################
 # ###################################################################
 #               load
@@ -23,24 +166,218 @@ __all__ = ['load']
 def load(
     pfe=None,
     cls=None,
+    keys=None,
+    mmap_mode=None,
     allow_pickle=None,
     sep=None,
     verb=None,
 ):
+    """ Load a Collection from a .npz file or a directory
+
+    Directories (saved with coll.save(mode='npy')) are opened lazily:
+    data arrays are memory-mapped and only read from disk when used
+
+    Parameters
+    ----------
+    pfe:        str
+        path to the .npz file or directory
+    keys:       None / str / list
+        If provided, only these data / obj keys are kept, together with
+        all data / obj they refer to (mesh, bsplines, cameras...)
+    mmap_mode:  str
+        memory-map mode of the data arrays of a directory, 'r' or 'c'
+        'c' (copy-on-write) allows modifying the arrays in memory
+    sep:        str
+        separator of flattened keys, only for .npz files
+
+    """
 
     # --------------------
-    # use datastock.load()
+    # check inputs
 
     if cls is None:
         from ._class10_Inversion import Inversion as Collection
         cls = Collection
 
-    coll = bs2.load(
-        pfe=pfe,
-        cls=cls,
-        allow_pickle=allow_pickle,
-        sep=sep,
-        verb=verb,
+    if keys is not None:
+        if isinstance(keys, str):
+            keys = [keys]
+        keys = ds._generic_check._check_var_iter(
+            keys, 'keys',
+            types=(list, tuple),
+            types_iter=str,
+        )
+
+    mmap_mode = ds._generic_check._check_var(
+        mmap_mode, 'mmap_mode',
+        default='r',
+        types=str,
+        allowed=['r', 'c'],
+    )
+
+    allow_pickle = ds._generic_check._check_var(
+        allow_pickle, 'allow_pickle',
+        default=True,
+        types=bool,
+    )
+
+    verb = ds._generic_check._check_var(
+        verb, 'verb',
+        default=True,
+        types=bool,
     )
 
-    return coll
\ No newline at end of file
+    # --------------------
+    # npz file: use bs2.load()
+
+    if not os.path.isdir(pfe):
+        coll = bs2.load(
+            pfe=pfe,
+            cls=cls,
+            allow_pickle=allow_pickle,
+            sep=sep,
+            verb=verb,
+        )
+
+        if keys is not None:
+            din = coll.to_dict(flatten=False, returnas='values', copy=False)
+            _select_keys(din, keys)
+            coll = cls.from_dict(din)
+
+        return coll
+
+    # --------------------
+    # directory
+
+    if sep is not None:
+        msg = "Arg sep can only be used with .npz files!"
+        raise ValueError(msg)
+
+    din = np.load(os.path.join(pfe, _META), allow_pickle=allow_pickle)
+    din = din.tolist()
+
+    with open(os.path.join(pfe, _INDEX), 'r') as fn:
+        dindex = json.load(fn)['ddata']
+
+    if keys is not None:
+        _select_keys(din, keys)
+
+    # memory-map data arrays
+    for k0, v0 in din.get('_ddata', {}).items():
+        if k0 not in dindex.keys():
+            continue
+
+        larr = [
+            np.load(os.path.join(pfe, ff), mmap_mode=mmap_mode)
+            for ff in dindex[k0]['files']
+        ]
+        if dindex[k0]['typ'] == 'ndarray':
+            v0['data'] = larr[0]
+        else:
+            v0['data'] = getattr(scpsp, dindex[k0]['typ'])(
+                tuple(larr),
+                shape=tuple(dindex[k0]['shape']),
+            )
+
+    coll = cls.from_dict(din)
+
+    # re-build bsplines classes, as bs2.load()
+    _set_bsplines_classes(coll)
+
+    if verb:
+        msg = f"Loaded from\n\t{pfe}"
+        print(msg)
+
+    return coll
+
+
+def _set_bsplines_classes(coll=None):
+
+    wm = coll._which_mesh
+    wbs = coll._which_bsplines
+    for kbs, vbs in coll.dobj.get(wbs, {}).items():
+
+        keym = vbs[wm]
+        nd = coll.dobj[wm][keym]['nd']
+        mtype = coll.dobj[wm][keym]['type']
+        if nd == '1d':
+            func = bs2._class02_compute._mesh1d_bsplines
+        elif mtype == 'rect':
+            func = bs2._class02_compute._mesh2DRect_bsplines
+        elif mtype == 'tri':
+            func = bs2._class02_compute._mesh2DTri_bsplines
+        else:
+            func = bs2._class02_compute._mesh2Dpolar_bsplines
+
+        dobj = func(coll=coll, keym=keym, keybs=kbs, deg=vbs['deg'])[2]
+        vbs['class'] = dobj[wbs][kbs]['class']
+
+
+# ###################################################################
+# ###################################################################
+#               select keys
+# ###################################################################
+
+
+def _select_keys(din=None, keys=None):
+    """ Remove from din all data / obj not needed by keys (in-place) """
+
+    # to_dict() leaves out empty _ddata / _dobj
+    ddata = din.get('_ddata', {})
+    dobj = din.get('_dobj', {})
+
+    # ------------
+    # check keys
+
+    lok = set(ddata.keys()).union(*[v0.keys() for v0 in dobj.values()])
+    lout = [k0 for k0 in keys if k0 not in lok]
+    if len(lout) > 0:
+        msg = (
+            "Arg keys must be data or obj keys!\n"
+            f"\t- Available: {sorted(lok)}\n"
+            f"\t- Provided: {lout}\n"
+        )
+        raise Exception(msg)
+
+    # --------------------------------
+    # add all keys referred to, recursively
+
+    lkeep = set()
+    lnew = set(keys)
+    while len(lnew) > 0:
+        k0 = lnew.pop()
+        lkeep.add(k0)
+
+        lv = [ddata[k0]] if k0 in ddata.keys() else []
+        lv += [v0[k0] for v0 in dobj.values() if k0 in v0.keys()]
+        lnew.update(
+            [ss for ss in _get_lstr(lv) if ss in lok and ss not in lkeep]
+        )
+
+    # ------------
+    # remove others
+
+    for k0 in set(ddata.keys()).difference(lkeep):
+        del ddata[k0]
+
+    for v0 in dobj.values():
+        for k0 in set(v0.keys()).difference(lkeep):
+            del v0[k0]
+
+    for k0 in [k0 for k0, v0 in dobj.items() if len(v0) == 0]:
+        del dobj[k0]
+
+
+def _get_lstr(val):
+    """ Return all str found in a nested dict / list / tuple / array """
+
+    if isinstance(val, str):
+        return [val]
+    elif isinstance(val, dict):
+        return _get_lstr(list(val.values()))
+    elif isinstance(val, (list, tuple)):
+        return [ss for vv in val for ss in _get_lstr(vv)]
+    elif isinstance(val, np.ndarray) and val.dtype.kind == 'U':
+        return val.ravel().tolist()
+    else:
+        return []
@@ -39,7 +39,7 @@ _ = sys.path.pop(1)
 # print(tforigin, tfversion)
 
 
-if 'imas2tofu' not in dir(tf):
+if not hasattr(tf, 'imas2tofu'):
     msg = ("imas does not seem to be available\n"
            + "  => tf.imas2tofu not available\n"
            + "  => tofuplot not available")
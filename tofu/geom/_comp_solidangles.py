@@ -26,6 +26,7 @@ _LTYPES = [int, float, np.int_, np.float64]
 __all__ = [
     'calc_solidangle_particle',
     'calc_solidangle_apertures',
+    'calc_solidangle_detectors_paired',
 ]
 
 
@@ -1567,4 +1568,155 @@ def calc_solidangle_apertures(
         if timing:
             return solid_angle, dt1, dt2, dt3
         else:
-            return solid_angle
\ No newline at end of file
+            return solid_angle
+
+
+###############################################################################
+###############################################################################
+#           Paired points / detectors - vectorized, no apertures
+###############################################################################
+
+
+def calc_solidangle_detectors_paired(
+    pts_x=None,
+    pts_y=None,
+    pts_z=None,
+    detectors=None,
+):
+    """ Return the solid angle of each detector seen from its own point
+
+    Vectorized equivalent of calling calc_solidangle_apertures() with
+    apertures=None separately for each (point, detector) pair
+
+    pts_x, pts_y, pts_z are arrays of identical shape (shape0)
+
+    detectors is a dict with the same keys as for
+    calc_solidangle_apertures(), but:
+        - 'cents_x', ..., 'e1_z' are scalars or arrays of shape0
+        - 'outline_x0', 'outline_x1' are (ncorners,) or shape0 + (ncorners,)
+            arrays, in the latter case all outlines must share the same
+            triangulation (e.g.: rescaled versions of a common outline)
+
+    Points behind their detector (w.r.t. 'nin') get a solid angle of 0
+
+    Return
+    ----------
+    solid_angle:        np.ndarray of shape0
+
+    """
+
+    # ------------
+    # check inputs
+
+    pts_x = _check_pts(pts=pts_x, pts_name='pts_x')
+    pts_y = _check_pts(pts=pts_y, pts_name='pts_y')
+    pts_z = _check_pts(pts=pts_z, pts_name='pts_z')
+
+    shape0 = pts_x.shape
+    if not (pts_x.shape == pts_y.shape == pts_z.shape):
+        msg = (
+            "Arg pts_x, pts_y and pts_z must share the same shape!\n"
+            f"\t- pts_x.shape = {pts_x.shape}\n"
+            f"\t- pts_y.shape = {pts_y.shape}\n"
+            f"\t- pts_z.shape = {pts_z.shape}\n"
+        )
+        raise Exception(msg)
+
+    lk = [
+        f'{k0}_{k1}'
+        for k0 in ['cents', 'nin', 'e0', 'e1']
+        for k1 in ['x', 'y', 'z']
+    ]
+    lout = ['outline_x0', 'outline_x1']
+    lmis = [k0 for k0 in lk + lout if k0 not in detectors.keys()]
+    if len(lmis) > 0:
+        msg = f"Arg detectors is missing keys: {lmis}"
+        raise Exception(msg)
+
+    try:
+        det = {
+            k0: np.broadcast_to(
+                np.asarray(detectors[k0], dtype=float),
+                shape0,
+            )
+            for k0 in lk
+        }
+        out0, out1 = [np.asarray(detectors[k0], dtype=float) for k0 in lout]
+        nc = out0.shape[-1]
+        out0 = np.broadcast_to(out0, shape0 + (nc,))
+        out1 = np.broadcast_to(out1, shape0 + (nc,))
+    except Exception as err:
+        msg = (
+            "Arg detectors values must be broadcastable to pts shape:\n"
+            f"\t- pts shape: {shape0}\n"
+            f"\t- error: {err}"
+        )
+        raise Exception(msg)
+
+    solid_angle = np.zeros(shape0, dtype=float)
+    if pts_x.size == 0:
+        return solid_angle
+
+    # ----------------------------------------------------
+    # un-close, counter-clockwise and triangulate (common)
+
+    p0 = out0.reshape((-1, nc))[0]
+    p1 = out1.reshape((-1, nc))[0]
+    if np.allclose([p0[0], p1[0]], [p0[-1], p1[-1]]):
+        out0, out1 = out0[..., :-1], out1[..., :-1]
+        p0, p1 = p0[:-1], p1[:-1]
+
+    if _check_polygon_2d_area_ccw(poly_x0=p0, poly_x1=p1) < 0:
+        out0, out1 = out0[..., ::-1], out1[..., ::-1]
+        p0, p1 = p0[::-1], p1[::-1]
+
+    tri = _GG.triangulate_by_earclipping_2d(np.array([p0, p1]))
+
+    # ---------------------------------------
+    # 3d corners, relative to obs. points
+
+    lcorners = [
+        (det[f'cents_{k0}'] - pts)[..., None]
+        + out0 * det[f'e0_{k0}'][..., None]
+        + out1 * det[f'e1_{k0}'][..., None]
+        for k0, pts in zip(['x', 'y', 'z'], [pts_x, pts_y, pts_z])
+    ]
+
+    # (shape0, ntri) for each triangle corner
+    ax, ay, az = [cc[..., tri[:, 0]] for cc in lcorners]
+    bx, by, bz = [cc[..., tri[:, 1]] for cc in lcorners]
+    cx, cy, cz = [cc[..., tri[:, 2]] for cc in lcorners]
+
+    # ------------------------------------------------
+    # solid angle of triangles (Van Oosterom-Strackee)
+
+    numerator = np.abs(
+        ax * (by*cz - bz*cy)
+        + ay * (bz*cx - bx*cz)
+        + az * (bx*cy - by*cx)
+    )
+
+    an = np.sqrt(ax**2 + ay**2 + az**2)
+    bn = np.sqrt(bx**2 + by**2 + bz**2)
+    cn = np.sqrt(cx**2 + cy**2 + cz**2)
+    denominator = (
+        an * bn * cn
+        + (ax*bx + ay*by + az*bz) * cn
+        + (ax*cx + ay*cy + az*cz) * bn
+        + (bx*cx + by*cy + bz*cz) * an
+    )
+
+    sa = np.sum(2. * np.arctan2(numerator, denominator), axis=-1)
+
+    # -------------------------------
+    # only points in front of detector
+
+    sca = (
+        (pts_x - det['cents_x']) * det['nin_x']
+        + (pts_y - det['cents_y']) * det['nin_y']
+        + (pts_z - det['cents_z']) * det['nin_z']
+    )
+    iok = sca > 0.
+    solid_angle[iok] = sa[iok]
+
+    return solid_angle
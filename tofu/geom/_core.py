@@ -31,12 +31,14 @@ try:
     import tofu.geom._GG as _GG
     import tofu.geom._comp as _comp
     import tofu.geom._comp_solidangles as _comp_solidangles
+    import tofu.geom._dgeom_cache as _dgeom_cache
     import tofu.geom._plot as _plot
 except Exception:
     from . import _def as _def
     from . import _GG as _GG
     from . import _comp as _comp
     from . import _comp_solidangles
+    from . import _dgeom_cache
     from . import _plot as _plot
 
 
@@ -4392,6 +4394,9 @@ class Rays(utils.ToFuObject):
 
     _method = "optimized"
 
+    # Directory of the opt-in on-disk cache of dgeom, see set_dgeom_cache()
+    _dgeom_cache = None
+
     # Does not exist beofre Python 3.6 !!!
     def __init_subclass__(cls, color="k", **kwdargs):
         # Python 2
@@ -4888,11 +4893,28 @@ class Rays(utils.ToFuObject):
     # set dictionaries
     ###########
 
-    def set_dconfig(self, config=None, strict=None, calcdgeom=True):
+    def set_dconfig(
+        self, config=None, strict=None, calcdgeom=True, cache=None,
+    ):
         config = self._checkformat_inputs_dconfig(config)
         self._dconfig["Config"] = config.copy()
         if calcdgeom:
-            self.compute_dgeom(strict=strict)
+            self.compute_dgeom(strict=strict, cache=cache)
+
+    @staticmethod
+    def set_dgeom_cache(path=None):
+        """ Set the default directory of the on-disk cache of dgeom
+
+        When set, compute_dgeom() stores kIn, kOut, vperp, indout,
+        indStruct and kRMin in path, as a .npz file named after a hash of
+        all the ray-tracing inputs (D, u, config polygons, limits, method).
+        Any later computation with identical inputs (e.g.: re-building the
+        same camera in another session) is loaded instead of ray-traced.
+
+        Applies to all Rays subclasses (CamLOS1D, CamLOS2D...)
+        Set path=None to disable (default)
+        """
+        Rays._dgeom_cache = _dgeom_cache.check_path(path)
 
     def _update_dgeom_from_TransRotFoc(self, val, key="x"):
         # To be finished for 1.4.1
@@ -5140,18 +5162,19 @@ class Rays(utils.ToFuObject):
             u = np.ascontiguousarray(u)
         assert D.shape == u.shape
 
-        # Get reference: lS
+        # Get reference: lS (lStruct is re-built at each call)
+        lStruct = self.config.lStruct
         if indStruct is None:
             indIn, indOut = self.get_indStruct_computeInOut(unique_In=True)
             indStruct = np.r_[indIn, indOut]
         else:
             indIn = [
                 ii for ii in indStruct
-                if self.config.lStruct[ii]._InOut == "in"
+                if lStruct[ii]._InOut == "in"
             ]
             if len(indIn) > 1:
                 ind = np.argmin([
-                    self.config.lStruct[ii].dgeom['Surf']
+                    lStruct[ii].dgeom['Surf']
                     for ii in indIn
                 ])
                 indStruct = [ii for ii in indStruct
@@ -5159,19 +5182,19 @@ class Rays(utils.ToFuObject):
                 indIn = [indIn[ind]]
             indOut = [
                 ii for ii in indStruct
-                if self.config.lStruct[ii]._InOut == "out"
+                if lStruct[ii]._InOut == "out"
             ]
 
         if len(indIn) == 0:
             msg = "self.config must have at least a StructIn subclass !"
             raise Exception(msg)
 
-        S = self.config.lStruct[indIn[0]]
+        S = lStruct[indIn[0]]
         VPoly = S.Poly_closed
         VVIn = S.dgeom["VIn"]
         largs = [D, u, VPoly, VVIn]
 
-        lS = [self.config.lStruct[ii] for ii in indOut]
+        lS = [lStruct[ii] for ii in indOut]
         if self._method == "ref":
 
             Lim = S.Lim
@@ -5290,7 +5313,9 @@ class Rays(utils.ToFuObject):
         indout[0, :] = indStruct[indout[0, :]]
         return kIn, kOut, vperp, indout, indStruct
 
-    def compute_dgeom(self, extra=True, strict=None, show_debug_plot=True):
+    def compute_dgeom(
+        self, extra=True, strict=None, show_debug_plot=True, cache=None,
+    ):
         """ Compute dictionnary of geometrical attributes (dgeom)
 
         Parameters
@@ -5300,10 +5325,18 @@ class Rays(utils.ToFuObject):
             they will be considered invalid. tofu will issue a warning with
             their indices and if show_debug_plot is True, try to plot a 3d
             figure to help understand why these los have no visibility
+        cache:              None / False / str
+            Path to a directory where the result of the ray-tracing is
+            stored, keyed by a hash of its inputs, and re-used if available
+            If None, uses the default set by Rays.set_dgeom_cache()
+            If False, no cache is used
         """
         # check inputs
         if strict is None:
             strict = True
+        if cache is None:
+            cache = self._dgeom_cache
+        cache = _dgeom_cache.check_path(cache)
 
         # Can only be computed if config if provided
         if self._dconfig["Config"] is None:
@@ -5315,8 +5348,28 @@ class Rays(utils.ToFuObject):
         if self._dgeom["nRays"] > 1 and strict is True:
             self._dgeom = self._complete_dX12(self._dgeom)
 
-        # Perform computation of kIn and kOut
-        kIn, kOut, vperp, indout, indStruct = self._compute_kInOut()
+        # Perform computation of kIn and kOut (or load from cache)
+        dcache = None
+        if cache is None:
+            kIn, kOut, vperp, indout, indStruct = self._compute_kInOut()
+        else:
+            indStruct, largs, dkwd = self._prepare_inputs_kInOut()
+            pfe_cache = _dgeom_cache.get_pfe(
+                path=cache,
+                method=self._method,
+                largs=largs,
+                dkwd=dkwd,
+                indStruct=indStruct,
+            )
+            dcache = _dgeom_cache.load(pfe_cache)
+            if dcache is None:
+                kIn, kOut, vperp, indout, indStruct = self._compute_kInOut(
+                    largs=largs, dkwd=dkwd, indStruct=indStruct,
+                )
+            else:
+                kIn, kOut, vperp, indout, indStruct = [
+                    dcache[k0] for k0 in _dgeom_cache._LK
+                ]
 
         # Check for LOS that have no visibility inside the plasma domain (nan)
         ind = np.isnan(kIn)
@@ -5375,9 +5428,21 @@ class Rays(utils.ToFuObject):
 
         # Run extra computations
         if extra:
-            self._compute_dgeom_kRMin()
+            if dcache is not None and 'kRMin' in dcache.keys():
+                self._dgeom["kRMin"] = dcache['kRMin']
+            else:
+                self._compute_dgeom_kRMin()
             self._compute_dgeom_extra1()
 
+        # Store in cache (kRMin only if computed, it is None for 'Lin')
+        if cache is not None:
+            dout = {k0: self._dgeom[k0] for k0 in _dgeom_cache._LK}
+            if extra:
+                dout['kRMin'] = self._dgeom['kRMin']
+            lk = [k0 for k0, v0 in dout.items() if v0 is not None]
+            if dcache is None or any([k0 not in dcache.keys() for k0 in lk]):
+                _dgeom_cache.save(pfe_cache, dout=dout)
+
     def _compute_dgeom_kRMin(self):
         # Get RMin if Type is Tor
         if self.config.Id.Type == "Tor":
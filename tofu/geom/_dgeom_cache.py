@@ -0,0 +1,125 @@
+# Built-in
+import os
+import hashlib
+
+
+# Common
+import numpy as np
+
+
+_CACHE_VERSION = 1
+_PREFIX = 'dgeom'
+
+# keys of the output of Rays._compute_kInOut(), then kRMin
+_LK = ['kIn', 'kOut', 'vperp', 'indout', 'indStruct']
+_LK_RMIN = ['kRMin']
+
+
+__all__ = ['check_path', 'get_pfe', 'load', 'save']
+
+
+###############################################################################
+###############################################################################
+#                       Check inputs
+###############################################################################
+
+
+def check_path(cache=None):
+    """ Return the absolute path of the cache directory, or None """
+
+    if cache is None or cache is False:
+        return None
+
+    if not (isinstance(cache, str) and os.path.isdir(cache)):
+        msg = (
+            "Arg cache must be None, False or a path to an existing directory!"
+            f"\nProvided: {cache}"
+        )
+        raise Exception(msg)
+    return os.path.abspath(cache)
+
+
+###############################################################################
+###############################################################################
+#                       Hash of ray-tracing inputs
+###############################################################################
+
+
+def _update_hash(hh, val):
+
+    if isinstance(val, dict):
+        for k0 in sorted(val.keys(), key=str):
+            hh.update(str(k0).encode())
+            _update_hash(hh, val[k0])
+
+    elif isinstance(val, (list, tuple)):
+        hh.update(f"{type(val).__name__}{len(val)}".encode())
+        for v0 in val:
+            _update_hash(hh, v0)
+
+    elif isinstance(val, np.ndarray):
+        hh.update(f"{val.dtype}{val.shape}".encode())
+        hh.update(np.ascontiguousarray(val).tobytes())
+
+    elif val is None or isinstance(val, (bool, int, float, str, np.generic)):
+        hh.update(repr(val).encode())
+
+    else:
+        msg = f"Cannot hash object of type {type(val)}"
+        raise Exception(msg)
+
+
+def get_pfe(path=None, method=None, largs=None, dkwd=None, indStruct=None):
+    """ Return the cache file of a ray-tracing, from a hash of its inputs
+
+    The hash covers exactly the arrays passed to the ray-tracing routine
+    (D, u, vessel and structures polygons, normals and limits, method...)
+    so a cached file is never re-used for a different geometry.
+    """
+
+    hh = hashlib.sha256()
+    _update_hash(
+        hh,
+        {
+            'cache_version': _CACHE_VERSION,
+            'method': method,
+            'largs': list(largs),
+            'dkwd': dkwd,
+            'indStruct': np.asarray(indStruct, dtype=int),
+        },
+    )
+    return os.path.join(path, f"{_PREFIX}_{hh.hexdigest()[:32]}.npz")
+
+
+###############################################################################
+###############################################################################
+#                       Load / save
+###############################################################################
+
+
+def load(pfe):
+    """ Return the cached dict of dgeom arrays, or None if not available """
+
+    if not os.path.isfile(pfe):
+        return None
+
+    try:
+        with np.load(pfe, allow_pickle=False) as npz:
+            dout = {k0: npz[k0] for k0 in _LK}
+            if 'kRMin' in npz.files:
+                dout['kRMin'] = npz['kRMin']
+    except Exception:
+        return None
+    return dout
+
+
+def save(pfe, dout=None):
+    """ Store a dict of dgeom arrays (atomic, in case of concurrent runs) """
+
+    dsave = {
+        k0: dout[k0] for k0 in _LK + _LK_RMIN
+        if dout.get(k0) is not None
+    }
+    pfe_tmp = '{}_{}.tmp.npz'.format(pfe[:-4], os.getpid())
+    np.savez(pfe_tmp, **dsave)
+    os.replace(pfe_tmp, pfe)
@@ -55,6 +55,33 @@ cdef bint inter_ray_aabb_box(const int[3] sign,
                              const double[3] ds,
                              const bint countin) nogil
 
+# ==============================================================================
+# =  Bounding volume hierarchy (BVH) of axis aligned bounding boxes
+# ==============================================================================
+cdef enum:
+    _BVH_LEAF_SIZE = 4
+    _BVH_MAX_DEPTH = 64
+
+ctypedef struct bvh_tree:
+    int nbox
+    int nnode
+    double* bounds
+    int* child
+    int* start
+    int* count
+    int* ind
+
+cdef bvh_tree* build_bvh(const int nbox,
+                         const double* lbounds) nogil
+
+cdef void free_bvh(bvh_tree* bvh) nogil
+
+cdef int bvh_candidates(const bvh_tree* bvh,
+                        const int[3] sign,
+                        const double[3] inv_direction,
+                        const double[3] ds,
+                        int* lcand) nogil
+
 # ==============================================================================
 # =  Raytracing basic tools: intersection ray and triangle (in 3d space)
 # ==============================================================================
@@ -86,6 +113,7 @@ cdef void raytracing_inout_struct_tor(const int num_los,
                                       const int* lis_limited,
                                       const long* lnvert,
                                       const long* lsz_lim,
+                                      const bvh_tree* bvh,
                                       const double* lstruct_polyx,
                                       const double* lstruct_polyy,
                                       const double* lstruct_normx,
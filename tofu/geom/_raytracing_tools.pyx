@@ -16,7 +16,7 @@ from libc.math cimport isnan as c_isnan
 from cython.parallel import prange
 from cython.parallel cimport parallel
 from cpython.array cimport array, clone
-from libc.stdlib cimport malloc, free
+from libc.stdlib cimport malloc, free, qsort
 cimport numpy as np
 import numpy as np
 from cython cimport view
@@ -27,6 +27,9 @@ from ._basic_geom_tools cimport is_point_in_path_vec
 from ._basic_geom_tools cimport compute_inv_and_sign
 from . cimport _basic_geom_tools as _bgt
 
+# relative margin of the BVH nodes bounding boxes
+cdef double _BVH_MARGIN = 1.e-12
+
 # ==============================================================================
 # =  3D Bounding box (not Toroidal)
 # ==============================================================================
@@ -148,6 +151,20 @@ cdef inline void comp_bbox_poly_tor(const int nvert,
     bounds[5] = zmax
     return
 
+cdef inline void comp_bbox_poly_union(double[6] bounds,
+                                      const double[6] bounds_other) nogil:
+    """
+    Extends the bounding box bounds so that it contains bounds_other
+    """
+    cdef int ii
+    for ii in range(3):
+        if bounds[ii] > bounds_other[ii]:
+            bounds[ii] = bounds_other[ii]
+    for ii in range(3, 6):
+        if bounds[ii] < bounds_other[ii]:
+            bounds[ii] = bounds_other[ii]
+    return
+
 cdef inline void comp_bbox_poly_tor_lim(const int nvert,
                                         const double* vertr,
                                         const double* vertz,
@@ -187,24 +204,38 @@ cdef inline void comp_bbox_poly_tor_lim(const int nvert,
     sin_min = c_sin(lmin)
     cos_max = c_cos(lmax)
     sin_max = c_sin(lmax)
-    if (lmin >= 0.) and (lmax >= 0.):
+    if lmin > lmax and ((lmin >= 0. and lmax >= 0.)
+                        or (lmin <= 0. and lmax <= 0.)):
+        # same signs but going through phi = pi (wrap-around):
+        # divide in 3 sectors of same signs
+        if lmin >= 0.:
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds[0], lmin, c_pi)
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds_min[0],
+                                   -c_pi, -0.0)
+            comp_bbox_poly_union(bounds, bounds_min)
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds_min[0],
+                                   0., lmax)
+        else:
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds[0], lmin, -0.0)
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds_min[0],
+                                   0., c_pi)
+            comp_bbox_poly_union(bounds, bounds_min)
+            comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds_min[0],
+                                   -c_pi, lmax)
+        comp_bbox_poly_union(bounds, bounds_min)
+        return
+    elif (lmin >= 0.) and (lmax >= 0.):
         if lmax > half_pi and lmin < half_pi:
+            # the structure goes through phi = pi/2, where y is maximum
             comp_bbox_poly_tor(nvert, vertr, vertz, &bounds_min[0])
             if ymax < bounds_min[4]:
                 ymax = bounds_min[4]
-        elif lmax < half_pi and lmin > half_pi:
-            comp_bbox_poly_tor(nvert, vertr, vertz, &bounds_min[0])
-            if ymin > bounds_min[1]:
-                ymin = bounds_min[1]
     elif (lmin <= 0 and lmax <= 0):
-        if lmax < -half_pi and lmin > -half_pi:
+        if lmax > -half_pi and lmin < -half_pi:
+            # the structure goes through phi = -pi/2, where y is minimum
             comp_bbox_poly_tor(nvert, vertr, vertz, &bounds_min[0])
             if ymin > bounds_min[1]:
                 ymin = bounds_min[1]
-        elif lmax > -half_pi and lmin < -half_pi:
-            comp_bbox_poly_tor(nvert, vertr, vertz, &bounds_min[0])
-            if ymax < bounds_min[4]:
-                ymax = bounds_min[4]
     elif (c_abs(c_abs(lmin) - c_pi) > _VSMALL
           and c_abs(c_abs(lmax) - c_pi) > _VSMALL):
         if lmin >= 0 :
@@ -217,12 +248,7 @@ cdef inline void comp_bbox_poly_tor_lim(const int nvert,
             comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds[0], lmin, -0.0)
             comp_bbox_poly_tor_lim(nvert, vertr, vertz, &bounds_min[0], 0, lmax)
         # we compute the extremes of the two boxes:
-        for ii in range(3):
-            if bounds[ii] > bounds_min[ii]:
-                bounds[ii] = bounds_min[ii]
-        for ii in range(3, 6):
-            if bounds[ii] < bounds_min[ii]:
-                bounds[ii] = bounds_min[ii]
+        comp_bbox_poly_union(bounds, bounds_min)
         return
     for ii in range(nvert):
         temp[0] = vertr[ii]
@@ -531,6 +557,210 @@ cdef inline bint inter_ray_aabb_box(const int[3] sign,
     return  res
 
 
+# ==============================================================================
+# =  Bounding volume hierarchy (BVH) of axis aligned bounding boxes
+# ==============================================================================
+cdef inline bvh_tree* build_bvh(const int nbox,
+                                const double* lbounds) nogil:
+    """
+    Builds a bounding volume hierarchy of a list of axis aligned bounding
+    boxes, to find the boxes intersected by a ray in O(log(nbox)) instead of
+    O(nbox).
+    Nodes are split in two at the median of the boxes centers, along the
+    direction of largest extent. A node is a leaf if it holds less than
+    _BVH_LEAF_SIZE boxes. The children of node i are child[i] and child[i]+1
+    (child[i] = -1 for leaves). Leaves hold the boxes ind[start:start+count].
+    Params
+    =====
+       nbox : int
+          Number of bounding boxes
+       lbounds : (6 * nbox) double array
+          Bounding boxes, as [xmin, ymin, zmin, xmax, ymax, zmax] for each box
+    Returns
+    =======
+       Pointer to the BVH, to be freed by free_bvh()
+    """
+    cdef int ii
+    cdef int nnode_max = max(1, 2 * nbox - 1)
+    cdef bvh_tree* bvh = <bvh_tree*>malloc(sizeof(bvh_tree))
+    cdef double* cents = <double*>malloc(3 * nbox * sizeof(double))
+
+    bvh.nbox = nbox
+    bvh.nnode = 1
+    bvh.bounds = <double*>malloc(6 * nnode_max * sizeof(double))
+    bvh.child = <int*>malloc(nnode_max * sizeof(int))
+    bvh.start = <int*>malloc(nnode_max * sizeof(int))
+    bvh.count = <int*>malloc(nnode_max * sizeof(int))
+    bvh.ind = <int*>malloc(max(1, nbox) * sizeof(int))
+
+    for ii in range(nbox):
+        bvh.ind[ii] = ii
+        cents[3*ii] = 0.5 * (lbounds[6*ii] + lbounds[6*ii + 3])
+        cents[3*ii + 1] = 0.5 * (lbounds[6*ii + 1] + lbounds[6*ii + 4])
+        cents[3*ii + 2] = 0.5 * (lbounds[6*ii + 2] + lbounds[6*ii + 5])
+
+    build_bvh_node(bvh, 0, 0, nbox, lbounds, cents)
+    free(cents)
+    return bvh
+
+
+cdef inline void build_bvh_node(bvh_tree* bvh,
+                                const int inode,
+                                const int start,
+                                const int end,
+                                const double* lbounds,
+                                const double* cents) nogil:
+    """
+    Recursively builds node inode of the BVH, holding boxes ind[start:end]
+    """
+    cdef int ii, jj, kk
+    cdef int axis = 0
+    cdef int mid
+    cdef double ext
+    cdef double[6] cbounds
+    cdef double* bounds = &bvh.bounds[6*inode]
+
+    # -- Node bounds (slightly enlarged, to be robust to rounding) ------------
+    for jj in range(3):
+        bounds[jj] = lbounds[6*bvh.ind[start] + jj]
+        bounds[jj + 3] = lbounds[6*bvh.ind[start] + jj + 3]
+        cbounds[jj] = cents[3*bvh.ind[start] + jj]
+        cbounds[jj + 3] = cbounds[jj]
+    for ii in range(start + 1, end):
+        kk = bvh.ind[ii]
+        for jj in range(3):
+            bounds[jj] = min(bounds[jj], lbounds[6*kk + jj])
+            bounds[jj + 3] = max(bounds[jj + 3], lbounds[6*kk + jj + 3])
+            cbounds[jj] = min(cbounds[jj], cents[3*kk + jj])
+            cbounds[jj + 3] = max(cbounds[jj + 3], cents[3*kk + jj])
+    for jj in range(3):
+        ext = _BVH_MARGIN * (1. + c_abs(bounds[jj]) + c_abs(bounds[jj + 3]))
+        bounds[jj] = bounds[jj] - ext
+        bounds[jj + 3] = bounds[jj + 3] + ext
+
+    bvh.start[inode] = start
+    bvh.count[inode] = end - start
+    if end - start <= _BVH_LEAF_SIZE:
+        bvh.child[inode] = -1
+        return
+
+    # -- Split at the median of the centers along the largest extent ---------
+    for jj in range(1, 3):
+        if (cbounds[jj + 3] - cbounds[jj]
+                > cbounds[axis + 3] - cbounds[axis]):
+            axis = jj
+    mid = (start + end) // 2
+    select_nth_box(bvh.ind, start, end, mid, cents, axis)
+
+    bvh.child[inode] = bvh.nnode
+    bvh.nnode += 2
+    build_bvh_node(bvh, bvh.child[inode], start, mid, lbounds, cents)
+    build_bvh_node(bvh, bvh.child[inode] + 1, mid, end, lbounds, cents)
+    return
+
+
+cdef inline void select_nth_box(int* ind,
+                                const int start,
+                                const int end,
+                                const int nth,
+                                const double* cents,
+                                const int axis) nogil:
+    """
+    Partial sort (quickselect) of ind[start:end] such that the box ind[nth]
+    has the nth smallest center along axis, lower ones being before it
+    """
+    cdef int lo = start
+    cdef int hi = end - 1
+    cdef int ii, jj, tmp
+    cdef double pivot
+    while lo < hi:
+        pivot = cents[3*ind[(lo + hi) // 2] + axis]
+        ii = lo
+        jj = hi
+        while ii <= jj:
+            while cents[3*ind[ii] + axis] < pivot:
+                ii += 1
+            while cents[3*ind[jj] + axis] > pivot:
+                jj -= 1
+            if ii <= jj:
+                tmp = ind[ii]
+                ind[ii] = ind[jj]
+                ind[jj] = tmp
+                ii += 1
+                jj -= 1
+        if nth <= jj:
+            hi = jj
+        elif nth >= ii:
+            lo = ii
+        else:
+            return
+    return
+
+
+cdef inline void free_bvh(bvh_tree* bvh) nogil:
+    """
+    Frees a BVH built by build_bvh()
+    """
+    if bvh == NULL:
+        return
+    free(bvh.bounds)
+    free(bvh.child)
+    free(bvh.start)
+    free(bvh.count)
+    free(bvh.ind)
+    free(bvh)
+    return
+
+
+cdef inline int bvh_candidates(const bvh_tree* bvh,
+                               const int[3] sign,
+                               const double[3] inv_direction,
+                               const double[3] ds,
+                               int* lcand) nogil:
+    """
+    Gets the boxes of the BVH whose enclosing nodes are all intersected by
+    the ray (same test as inter_ray_aabb_box(..., countin=True)).
+    This is a superset of the boxes intersected by the ray.
+    Params
+    =====
+       lcand : (nbox) int array <INOUT>
+          Indices of the candidate boxes, sorted in increasing order
+    Returns
+    =======
+       Number of candidate boxes
+    """
+    cdef int ii
+    cdef int inode
+    cdef int ncand = 0
+    cdef int nstack = 1
+    cdef int[_BVH_MAX_DEPTH] lstack
+
+    lstack[0] = 0
+    while nstack > 0:
+        nstack -= 1
+        inode = lstack[nstack]
+        if not inter_ray_aabb_box(sign, inv_direction, &bvh.bounds[6*inode],
+                                  ds, True):
+            continue
+        if bvh.child[inode] < 0:
+            for ii in range(bvh.start[inode],
+                            bvh.start[inode] + bvh.count[inode]):
+                lcand[ncand] = bvh.ind[ii]
+                ncand += 1
+        else:
+            lstack[nstack] = bvh.child[inode]
+            lstack[nstack + 1] = bvh.child[inode] + 1
+            nstack += 2
+
+    # same order as a loop on all boxes
+    qsort(lcand, ncand, sizeof(int), compare_int)
+    return ncand
+
+
+cdef inline int compare_int(const void* aa, const void* bb) noexcept nogil:
+    return (<int*>aa)[0] - (<int*>bb)[0]
+
+
 # ==============================================================================
 # =  Raytracing basic tools: intersection ray and triangle (in 3d space)
 # ==============================================================================
@@ -592,6 +822,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                                              const int* lis_limited,
                                              const long* lnvert,
                                              const long* lsz_lim,
+                                             const bvh_tree* bvh,
                                              const double* lstruct_polyx,
                                              const double* lstruct_polyy,
                                              const double* lstruct_normx,
@@ -671,6 +902,10 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
        List of the total number of structures before the ith structure. First
        element is always 0, else lsz_lim[i] = sum_j(lstruct_nlim[j], j=0..i-1)
        If not is_out_struct then NULL
+    bvh : bvh_tree pointer
+       Bounding volume hierarchy of the bounding boxes lbounds, used to only
+       test the structures whose bounding box may be intersected by the LOS
+       If not is_out_struct then NULL
     lstruct_polyx : (ntotnvert)
        List of "x" coordinates of the polygon's vertices of all structures on
        the poloidal plane
@@ -708,6 +943,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
     cdef double* last_pout = NULL
     cdef double* lim_ves = NULL
     cdef int* sign_ray = NULL
+    cdef int* lcand = NULL
 
     if num_threads == 1:
         # == Allocating loop  variables ========================================
@@ -725,6 +961,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
             last_pout = <double *> malloc(sizeof(double) * 3)
             lim_ves   = <double *> malloc(sizeof(double) * 2)
             sign_ray  = <int *> malloc(sizeof(int) * 3)
+            lcand     = <int *> malloc(sizeof(int) * max(1, bvh.nbox))
 
         # == Iterating over the LOS ============================================
         for ind_los_range in range(num_los):
@@ -738,6 +975,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                                               nstruct_lim,
                                               lbounds, langles,
                                               lis_limited, lnvert, lsz_lim,
+                                              bvh,
                                               lstruct_polyx, lstruct_polyy,
                                               lstruct_normx, lstruct_normy,
                                               eps_uz, eps_vz, eps_a, eps_b,
@@ -748,7 +986,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                                               loc_dir, loc_org, loc_vp,
                                               ind_loc,
                                               invr_ray, last_pout, lim_ves,
-                                              sign_ray)
+                                              sign_ray, lcand)
 
         free(loc_org)
         free(loc_dir)
@@ -761,6 +999,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
             free(lim_ves)
             free(invr_ray)
             free(sign_ray)
+            free(lcand)
 
 
     else:
@@ -780,6 +1019,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                 invr_ray  = <double *> malloc(sizeof(double) * 3)
                 lim_ves   = <double *> malloc(sizeof(double) * 2)
                 sign_ray  = <int *> malloc(sizeof(int) * 3)
+                lcand     = <int *> malloc(sizeof(int) * max(1, bvh.nbox))
 
             # == Iterating over the LOS in parallel ============================
             for ind_los_prange in prange(num_los):
@@ -793,6 +1033,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                                                   nstruct_lim,
                                                   lbounds, langles,
                                                   lis_limited, lnvert, lsz_lim,
+                                                  bvh,
                                                   lstruct_polyx, lstruct_polyy,
                                                   lstruct_normx, lstruct_normy,
                                                   eps_uz, eps_vz, eps_a, eps_b,
@@ -803,7 +1044,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                                                   loc_dir, loc_org, loc_vp,
                                                   ind_loc,
                                                   invr_ray, last_pout, lim_ves,
-                                                  sign_ray)
+                                                  sign_ray, lcand)
 
             free(loc_org)
             free(loc_dir)
@@ -816,6 +1057,7 @@ cdef inline void raytracing_inout_struct_tor(const int num_los,
                 free(lim_ves)
                 free(invr_ray)
                 free(sign_ray)
+                free(lcand)
 
     return
 
@@ -839,6 +1081,7 @@ cdef inline void raytracing_inout_struct_tor_inomp(const int num_los,
                                                    const int* lis_limited,
                                                    const long* lnvert,
                                                    const long* lsz_lim,
+                                                   const bvh_tree* bvh,
                                                    const double* lstruct_polyx,
                                                    const double* lstruct_polyy,
                                                    const double* lstruct_normx,
@@ -859,7 +1102,8 @@ cdef inline void raytracing_inout_struct_tor_inomp(const int num_los,
                                                    double* invr_ray,
                                                    double* last_pout,
                                                    double* lim_ves,
-                                                   int* sign_ray) nogil:
+                                                   int* sign_ray,
+                                                   int* lcand) nogil:
 
     cdef double upscaDp=0., upar2=0., dpar2=0., crit2=0., idpar2=0.
     cdef double dist = 0., s1x = 0., s1y = 0., s2x = 0., s2y = 0.
@@ -867,7 +1111,8 @@ cdef inline void raytracing_inout_struct_tor_inomp(const int num_los,
     cdef int totnvert=0
     cdef int nvert
     cdef int ind_struct, ind_bounds
-    cdef int ii, jj
+    cdef int ii, jj, kk
+    cdef int ind_box, ncand
     cdef bint lim_is_none
     cdef bint found_new_kout
     cdef bint inter_bbox
@@ -919,9 +1164,15 @@ cdef inline void raytracing_inout_struct_tor_inomp(const int num_los,
 
     # == Case "OUT" structure ==================================================
     if is_out_struct:
-        # We work on each structure
-        for ii in range(nstruct_lim):
+        # We only work on the structures whose bounding box may be
+        # intersected (candidates from the BVH, in increasing order)
+        ncand = bvh_candidates(bvh, sign_ray, invr_ray, loc_org, lcand)
+        ii = 0
+        for kk in range(ncand):
+            ind_box = lcand[kk]
             # -- Getting structure's data --------------------------------------
+            while ii + 1 < nstruct_lim and lsz_lim[ii + 1] <= ind_box:
+                ii += 1
             if ii == 0:
                 nvert = lnvert[0]
                 totnvert = 0
@@ -929,68 +1180,63 @@ cdef inline void raytracing_inout_struct_tor_inomp(const int num_los,
                 totnvert = lnvert[ii-1]
                 nvert = lnvert[ii] - totnvert
             ind_struct = lsz_lim[ii]
+            jj = ind_box - ind_struct
             # -- Working on the structure limited ------------------------------
-            for jj in range(lstruct_nlim[ii]):
-                lim_min = langles[(ind_struct+jj)*2]
-                lim_max = langles[(ind_struct+jj)*2 + 1]
-                lim_is_none = lis_limited[ind_struct+jj] == 1
-                # We test if it is really necessary to compute the inter
-                # ie. we check if the ray intersects the bounding box
-
-                inter_bbox = inter_ray_aabb_box(sign_ray, invr_ray,
-                                                &lbounds[(ind_struct
-                                                          + jj)*6],
-                                                loc_org, True)
-                if not inter_bbox:
-                    continue
-                # We check that the bounding box is not "behind"
-                # the last POut encountered
-                inter_bbox = inter_ray_aabb_box(sign_ray, invr_ray,
-                                                &lbounds[(ind_struct
-                                                          + jj)*6],
-                                                last_pout, False)
-                if inter_bbox:
-                    continue
-                 # Else, we compute the new values
-                found_new_kout \
-                    = comp_inter_los_vpoly(loc_org,
-                                           loc_dir,
-                                           &lstruct_polyx[totnvert],
-                                           &lstruct_polyy[totnvert],
-                                           &lstruct_normx[totnvert-ii],
-                                           &lstruct_normy[totnvert-ii],
-                                           nvert-1,
-                                           lim_is_none,
-                                           lim_min, lim_max,
-                                           forbidbis,
-                                           upscaDp, upar2,
-                                           dpar2, invuz,
-                                           s1x, s1y,
-                                           s2x, s2y,
-                                           crit2, eps_uz,
-                                           eps_vz, eps_a,
-                                           eps_b, eps_plane,
-                                           False,
-                                           kpin_loc,
-                                           kpout_loc,
-                                           ind_loc,
-                                           loc_vp)
-                if found_new_kout:
-                    coeff_inter_out[ind_los] = kpin_loc[0]
-                    vperp_out[0+3*ind_los] = loc_vp[0]
-                    vperp_out[1+3*ind_los] = loc_vp[1]
-                    vperp_out[2+3*ind_los] = loc_vp[2]
-                    ind_inter_out[2+3*ind_los] = ind_loc[0]
-                    ind_inter_out[0+3*ind_los] = 1+ii
-                    ind_inter_out[1+3*ind_los] = jj
-                    last_pout[0] = (coeff_inter_out[ind_los] *
-                                    loc_dir[0]) + loc_org[0]
-                    last_pout[1] = (coeff_inter_out[ind_los] *
-                                    loc_dir[1]) + loc_org[1]
-                    last_pout[2] = (coeff_inter_out[ind_los] *
-                                    loc_dir[2]) + loc_org[2]
-                    if lim_is_none:
-                        break
+            lim_min = langles[ind_box*2]
+            lim_max = langles[ind_box*2 + 1]
+            lim_is_none = lis_limited[ind_box] == 1
+            # We test if it is really necessary to compute the inter
+            # ie. we check if the ray intersects the bounding box
+            inter_bbox = inter_ray_aabb_box(sign_ray, invr_ray,
+                                            &lbounds[ind_box*6],
+                                            loc_org, True)
+            if not inter_bbox:
+                continue
+            # We check that the bounding box is not "behind"
+            # the last POut encountered
+            inter_bbox = inter_ray_aabb_box(sign_ray, invr_ray,
+                                            &lbounds[ind_box*6],
+                                            last_pout, False)
+            if inter_bbox:
+                continue
+             # Else, we compute the new values
+            found_new_kout \
+                = comp_inter_los_vpoly(loc_org,
+                                       loc_dir,
+                                       &lstruct_polyx[totnvert],
+                                       &lstruct_polyy[totnvert],
+                                       &lstruct_normx[totnvert-ii],
+                                       &lstruct_normy[totnvert-ii],
+                                       nvert-1,
+                                       lim_is_none,
+                                       lim_min, lim_max,
+                                       forbidbis,
+                                       upscaDp, upar2,
+                                       dpar2, invuz,
+                                       s1x, s1y,
+                                       s2x, s2y,
+                                       crit2, eps_uz,
+                                       eps_vz, eps_a,
+                                       eps_b, eps_plane,
+                                       False,
+                                       kpin_loc,
+                                       kpout_loc,
+                                       ind_loc,
+                                       loc_vp)
+            if found_new_kout:
+                coeff_inter_out[ind_los] = kpin_loc[0]
+                vperp_out[0+3*ind_los] = loc_vp[0]
+                vperp_out[1+3*ind_los] = loc_vp[1]
+                vperp_out[2+3*ind_los] = loc_vp[2]
+                ind_inter_out[2+3*ind_los] = ind_loc[0]
+                ind_inter_out[0+3*ind_los] = 1+ii
+                ind_inter_out[1+3*ind_los] = jj
+                last_pout[0] = (coeff_inter_out[ind_los] *
+                                loc_dir[0]) + loc_org[0]
+                last_pout[1] = (coeff_inter_out[ind_los] *
+                                loc_dir[1]) + loc_org[1]
+                last_pout[2] = (coeff_inter_out[ind_los] *
+                                loc_dir[2]) + loc_org[2]
     else:
         # == Case "IN" structure ===============================================
         # Nothing to do but compute intersection between vessel and LOS
@@ -1644,6 +1890,7 @@ cdef inline void compute_inout_tot(const int num_los,
     cdef int *llimits = NULL
     cdef long *lsz_lim = NULL
     cdef long* lstruct_nlim = NULL
+    cdef bvh_tree* bvh = NULL
     cdef int[1] llim_ves
     cdef double[2] lbounds_ves
     cdef double[2] lim_ves
@@ -1679,7 +1926,7 @@ cdef inline void compute_inout_tot(const int num_los,
                                     forbid0, forbidbis,
                                     rmin, rmin2, crit2_base,
                                     npts_poly,  NULL, lbounds_ves,
-                                    llim_ves, NULL, NULL,
+                                    llim_ves, NULL, NULL, NULL,
                                     &ves_poly[0][0],
                                     &ves_poly[1][0],
                                     &ves_norm[0][0],
@@ -1757,6 +2004,8 @@ cdef inline void compute_inout_tot(const int num_los,
                         langles[ind_struct*2 + 1] = lim_max
                         ind_struct = 1 + ind_struct
             # end loops over structures
+            # -- Bounding volume hierarchy of the bounding boxes ---------------
+            bvh = build_bvh(ind_struct, lbounds)
             # -- Computing intersection between structures and LOS -------------
             raytracing_inout_struct_tor(num_los, ray_vdir, ray_orig,
                                         coeff_inter_out, coeff_inter_in,
@@ -1766,7 +2015,7 @@ cdef inline void compute_inout_tot(const int num_los,
                                         rmin, rmin2, crit2_base,
                                         nstruct_lim,
                                         lbounds, langles, llimits,
-                                        &lnvert[0], lsz_lim,
+                                        &lnvert[0], lsz_lim, bvh,
                                         &lstruct_polyx[0],
                                         &lstruct_polyy[0],
                                         &lstruct_normx[0],
@@ -1776,6 +2025,7 @@ cdef inline void compute_inout_tot(const int num_los,
                                         num_threads,
                                         True) # the structure is "OUT"
 
+            free_bvh(bvh)
             free(lsz_lim)
             free(llimits)
     else:
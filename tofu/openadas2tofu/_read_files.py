@@ -3,14 +3,18 @@
 import os
 import re
 import itertools as itt
+import hashlib
+import zipfile
 import warnings
 
 # Common
 import numpy as np
+import scipy.sparse as scpsp
 from scipy.interpolate import RectBivariateSpline as scpRectSpl
+from scipy.interpolate import BSpline as scpBSpline
 
 
-__all__ = ['step03_read', 'step03_read_all']
+__all__ = ['step03_read', 'step03_read_all', 'step04_pec_interp']
 
 
 _DTYPES = {'adf11': ['acd', 'ccd', 'scd', 'plt', 'prb'],
@@ -18,6 +22,10 @@ _DTYPES = {'adf11': ['acd', 'ccd', 'scd', 'plt', 'prb'],
 _DEG = 1
 _PECASFUNC = True
 
+# cache of parsed files, in ~/.tofu/openadas2tofu/
+_CACHE = 'cache'
+_CACHE_VERSION = 1
+
 
 # #############################################################################
 # #############################################################################
@@ -33,6 +41,85 @@ def _get_PATH_LOCAL():
         return None
 
 
+def _get_raw(pfe, func=None, cache=None):
+    """ Return func(pfe), the raw content of a file as a dict of arrays
+
+    If cache is True (default), it is stored as a .npz file in
+        ~/.tofu/openadas2tofu/cache/
+    keyed by the absolute path of pfe, and re-used as long as the
+    modification time and size of pfe are unchanged
+    """
+
+    if cache is None:
+        cache = True
+
+    path_local = _get_PATH_LOCAL()
+    if cache is False or path_local is None:
+        return func(pfe)
+
+    # cache file
+    pfe = os.path.abspath(pfe)
+    stat = os.stat(pfe)
+    hsh = hashlib.sha256(pfe.encode()).hexdigest()[:16]
+    path = os.path.join(path_local, _CACHE)
+    pfe_cache = os.path.join(
+        path,
+        '{}_{}.npz'.format(os.path.basename(pfe)[:-4], hsh),
+    )
+    dkey = {
+        'cache_version': _CACHE_VERSION,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+
+    # load if up-to-date
+    if os.path.isfile(pfe_cache):
+        try:
+            with np.load(pfe_cache, allow_pickle=False) as npz:
+                if all([npz[k0] == v0 for k0, v0 in dkey.items()]):
+                    return {
+                        k0: npz[k0] for k0 in npz.files
+                        if k0 not in dkey.keys()
+                    }
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # corrupted or outdated cache file => parsed again
+            pass
+
+    # parse and store (atomic, in case of concurrent runs)
+    draw = func(pfe)
+    pfe_tmp = '{}_{}.tmp.npz'.format(pfe_cache[:-4], os.getpid())
+    try:
+        os.makedirs(path, exist_ok=True)
+        np.savez(pfe_tmp, **dkey, **draw)
+        os.replace(pfe_tmp, pfe_cache)
+    except OSError:
+        # read-only or full disk => not cached
+        if os.path.isfile(pfe_tmp):
+            os.remove(pfe_tmp)
+    return draw
+
+
+def _str2float(lines, nmax=None):
+    """ Return the (nmax first) numbers of a list of lines, as a flat array
+
+    All lines are converted at once if they only contain numbers
+    Otherwise, if nmax is provided, they are converted token by token until
+    nmax numbers are found, else a ValueError is raised
+    """
+    try:
+        return np.array(' '.join(lines).split(), dtype=float)[:nmax]
+    except ValueError:
+        if nmax is None:
+            raise
+
+    ltok = []
+    for line in lines:
+        ltok += line.split()
+        if len(ltok) >= nmax:
+            break
+    return np.array(ltok[:nmax], dtype=float)
+
+
 def _get_subdir_from_pattern(path, pattern, mult=None):
     """ Get list of files matching patterns in path
 
@@ -386,6 +473,9 @@ def step03_read(
     Povide the full adas file name
     The result is returned as a dict
 
+    The parsed content of each file is cached in ~/.tofu/openadas2tofu/cache/
+    and re-used as long as the file is unchanged (use cache=False to bypass)
+
     example
     -------
         >>> import tofu as tf
@@ -435,6 +525,8 @@ def step03_read(
                + "\t- supported: {}".format(sorted(_DTYPES.keys())))
         raise Exception(msg)
 
+    if lc[0] == 'adf15':
+        kwdargs['pec_as_func'] = pec_as_func
     func = eval('_read_{}'.format(lc[0]))
     return func(pfe, **kwdargs)
 
@@ -469,6 +561,9 @@ def step03_read_all(
 
     The result is returned as a dict
 
+    The parsed content of each file is cached in ~/.tofu/openadas2tofu/cache/
+    and re-used as long as the file is unchanged (use cache=False to bypass)
+
     examples
     --------
         >>> import tofu as tf
@@ -662,7 +757,72 @@ def step03_read_all(
 # #############################################################################
 
 
-def _read_adf11(pfe, deg=None, dout=None):
+def _parse_adf11(pfe):
+    """ Return the raw numeric content of an adf11 file, as arrays
+
+    Each numeric table (ne, te, one block per ion) is converted at once
+    """
+
+    # Get element
+    elem = pfe[:-4].split('_')[1]
+    comline = '-'*60
+    comline2 = 'C'+comline
+
+    with open(pfe) as fn:
+        lines = fn.read().splitlines()
+
+    # Get atomic number (transitions) stored in this file
+    lstr = lines[0].split('/')
+    lin = [ss for ss in lstr[0].strip().split(' ') if ss.strip() != '']
+    lc = [
+        len(lin) == 5 and all([ss.isdigit() for ss in lin]),
+        elem.upper() in lstr[1],
+        # 'ADF11' in lstr[-1],
+    ]
+    if not all(lc):
+        msg = ("File header format seems to have changed!\n"
+               + "\t- pfe: {}\n".format(pfe)
+               + "\t- lc = {}\n".format(lc)
+               + "\t- lstr = {}".format(lstr))
+        raise Exception(msg)
+    Z, nne, nte, q0, qend = map(int, lin)
+
+    # cut comments at the end, and separators
+    iend = [ii for ii, line in enumerate(lines) if comline2 in line]
+    lines = [
+        line for line in lines[1:(iend[0] if len(iend) > 0 else None)]
+        if comline not in line
+    ]
+
+    # one block per ion (Z1=), after (ne, te)
+    lind, lnion = [], []
+    for ii, line in enumerate(lines):
+        if 'Z1=' in line and ('------/' in line and 'DATE=' in line):
+            lind.append(ii)
+            lnion.append(int(
+                line[line.index('Z1=')+len('Z1='):].split('/')[0]
+            ))
+            if lnion[-1] == Z:
+                break
+    lind.append(len(lines))
+
+    # each table converted at once
+    nete = _str2float(lines[:lind[0]], nmax=nne+nte)
+    coefslog10 = np.array([
+        _str2float(lines[lind[ii]+1:lind[ii+1]], nmax=nne*nte)
+        for ii in range(len(lnion))
+    ]).reshape((len(lnion), nne*nte))
+
+    return {
+        'Z': Z,
+        'nelog10': nete[:nne],
+        'telog10': nete[nne:nne+nte],
+        'nion': np.array(lnion, dtype=int),
+        'coefslog10': coefslog10,
+    }
+
+
+def _read_adf11(pfe, deg=None, dout=None, cache=None):
     if deg is None:
         deg = _DEG
     if dout is None:
@@ -679,135 +839,45 @@ def _read_adf11(pfe, deg=None, dout=None):
 
     # Get element
     elem = pfe[:-4].split('_')[1]
-    comline = '-'*60
-    comline2 = 'C'+comline
 
-    if typ1 in ['acd', 'ccd', 'scd', 'plt', 'prb']:
+    # (name, offset to convert to m3/s or W.m3) of the coefficients
+    dtyp = {
+        'scd': ('ionis', -6, 'log10(m3/s)'),
+        'acd': ('recomb', -6, 'log10(m3/s)'),
+        'ccd': ('recomb_ce', -6, 'log10(m3/s)'),
+        'plt': ('rad_bb', 6, 'log10(W.m3)'),
+        'prb': ('rad_fffb', 6, 'log10(W.m3)'),
+    }
 
-        # read blocks
-        with open(pfe) as search:
-            for ii, line in enumerate(search):
+    # raw content, from cache if possible
+    draw = _get_raw(pfe, func=_parse_adf11, cache=cache)
+    Z = int(draw['Z'])
+    nelog10, telog10 = draw['nelog10'], draw['telog10']
+    nne, nte = nelog10.size, telog10.size
+
+    name, offset, units = dtyp[typ1]
+    for nion, coefslog10 in zip(draw['nion'], draw['coefslog10']):
+        nion = int(nion)
+        if typ1 in ['scd', 'plt']:
+            charge = nion - 1
+        else:
+            charge = nion
 
-                if comline2 in line:
-                    break
+        key = '{}{}'.format(elem, charge)
+        tkv = [('element', elem), ('Z', Z), ('charge', charge)]
+        if key in dout.keys():
+            assert all([dout[key][ss] == vv for ss, vv in tkv])
+        else:
+            dout[key] = {ss: vv for ss, vv in tkv}
 
-                # Get atomic number (transitions) stored in this file
-                if ii == 0:
-                    lstr = line.split('/')
-                    lin = [ss for ss in lstr[0].strip().split(' ')
-                           if ss.strip() != '']
-                    lc = [
-                        len(lin) == 5 and all([ss.isdigit() for ss in lin]),
-                        elem.upper() in lstr[1],
-                        # 'ADF11' in lstr[-1],
-                    ]
-                    if not all(lc):
-                        msg = ("File header format seems to have changed!\n"
-                               + "\t- pfe: {}\n".format(pfe)
-                               + "\t- lc = {}\n".format(lc)
-                               + "\t- lstr = {}".format(lstr))
-                        raise Exception(msg)
-                    Z, nne, nte, q0, qend = map(int, lin)
-                    nelog10 = np.array([])
-                    telog10 = np.array([])
-                    in_ne = True
-                    continue
-
-                if comline in line:
-                    continue
-
-                # Get nelog10
-                if in_ne:
-                    li = [ss for ss in line.strip().split(' ')
-                          if ss.strip() != '']
-                    nelog10 = np.append(nelog10, np.array(li, dtype=float))
-                    if nelog10.size == nne:
-                        in_ne = False
-                        in_te = True
-
-                # Get telog10
-                elif in_te is True:
-                    li = [ss for ss in line.strip().split(' ')
-                          if ss.strip() != '']
-                    telog10 = np.append(telog10, np.array(li, dtype=float))
-                    if telog10.size == nte:
-                        in_te = False
-                        in_ion = True
-
-                # Get ion block
-                elif (in_ion is True and 'Z1=' in line
-                      and ('------/' in line and 'DATE=' in line)):
-                    nion = int(
-                        line[line.index('Z1=')+len('Z1='):].split('/')[0])
-                    if typ1 in ['scd', 'plt']:
-                        charge = nion - 1
-                    else:
-                        charge = nion
-                    coefslog10 = np.array([])
-                elif in_ion is True and charge is not None:
-                    li = [ss for ss in line.strip().split(' ')
-                          if ss.strip() != '']
-                    coefslog10 = np.append(coefslog10,
-                                           np.array(li, dtype=float))
-                    if coefslog10.size == nne*nte:
-                        key = '{}{}'.format(elem, charge)
-                        tkv = [('element', elem), ('Z', Z), ('charge', charge)]
-                        if key in dout.keys():
-                            assert all([dout[key][ss] == vv for ss, vv in tkv])
-                        else:
-                            dout[key] = {ss: vv for ss, vv in tkv}
-                        if typ1 == 'scd':
-                            # nelog10+6 to convert /cm3 -> /m3
-                            # coefslog10-6 to convert cm3/s -> m3/s
-                            func = scpRectSpl(nelog10+6, telog10,
-                                              coefslog10.reshape((nne, nte))-6,
-                                              kx=deg, ky=deg)
-                            dout[key]['ionis'] = {'func': func,
-                                                  'type': 'log10_nete',
-                                                  'units': 'log10(m3/s)',
-                                                  'source': pfe}
-                        elif typ1 == 'acd':
-                            # nelog10+6 to convert /cm3 -> /m3
-                            # coefslog10-6 to convert cm3/s -> m3/s
-                            func = scpRectSpl(nelog10+6, telog10,
-                                              coefslog10.reshape((nne, nte))-6,
-                                              kx=deg, ky=deg)
-                            dout[key]['recomb'] = {'func': func,
-                                                   'type': 'log10_nete',
-                                                   'units': 'log10(m3/s)',
-                                                   'source': pfe}
-                        elif typ1 == 'ccd':
-                            # nelog10+6 to convert /cm3 -> /m3
-                            # coefslog10-6 to convert cm3/s -> m3/s
-                            func = scpRectSpl(nelog10+6, telog10,
-                                              coefslog10.reshape((nne, nte))-6,
-                                              kx=deg, ky=deg)
-                            dout[key]['recomb_ce'] = {'func': func,
-                                                      'type': 'log10_nete',
-                                                      'units': 'log10(m3/s)',
-                                                      'source': pfe}
-                        elif typ1 == 'plt':
-                            # nelog10+6 to convert /cm3 -> /m3
-                            # coefslog10+6 to convert W.cm3 -> W.m3
-                            func = scpRectSpl(nelog10+6, telog10,
-                                              coefslog10.reshape((nne, nte))+6,
-                                              kx=deg, ky=deg)
-                            dout[key]['rad_bb'] = {'func': func,
-                                                   'type': 'log10_nete',
-                                                   'units': 'log10(W.m3)',
-                                                   'source': pfe}
-                        elif typ1 == 'prb':
-                            # nelog10+6 to convert /cm3 -> /m3
-                            # coefslog10+6 to convert W.cm3 -> W.m3
-                            func = scpRectSpl(nelog10+6, telog10,
-                                              coefslog10.reshape((nne, nte))+6,
-                                              kx=deg, ky=deg)
-                            dout[key]['rad_fffb'] = {'func': func,
-                                                     'type': 'log10_nete',
-                                                     'units': 'log10(W.m3)',
-                                                     'source': pfe}
-                        if nion == Z:
-                            break
+        # nelog10+6 to convert /cm3 -> /m3
+        func = scpRectSpl(nelog10+6, telog10,
+                          coefslog10.reshape((nne, nte)) + offset,
+                          kx=deg, ky=deg)
+        dout[key][name] = {'func': func,
+                           'type': 'log10_nete',
+                           'units': units,
+                           'source': pfe}
 
     return dout
 
@@ -821,6 +891,90 @@ def _get_adf15_key(elem, charge, isoel, typ0, typ1):
     return '{}{}_{}_oa_{}_{}'.format(elem, charge, isoel, typ0, typ1)
 
 
+def _parse_adf15(pfe):
+    """ Return the raw numeric content of an adf15 file, as arrays
+
+    The (ne, te, pec) tables of all blocks are converted at once
+    The transitions table is kept as raw lines
+    """
+
+    # Get summary of transitions
+    flagblock = '/isel ='
+
+    with open(pfe) as fn:
+        lines = fn.read().splitlines()
+
+    # Get number of lines (transitions) stored in this file
+    nlines = int(lines[0].split('/')[0].replace(' ', ''))
+
+    # Get info about each transition (block)
+    lhead = [
+        ii for ii, line in enumerate(lines)
+        if ii > 0 and flagblock in line and 'C' not in line
+    ][:nlines]
+
+    lamb, nne, nte, ltyp = [], [], [], []
+    for ii in lhead:
+        lstr = [kk for kk in lines[ii].rstrip().split(' ') if len(kk) > 0]
+        lamb.append(float(lstr[0])*1.e-10)
+        nne.append(int(lstr[1]))
+        nte.append(int(lstr[2]))
+        typ = [ss[ss.index('type=')+len('type='):ss.index('/ispb')]
+               for ss in lstr[3:] if 'type=' in ss]
+        assert len(typ) == 1
+        ltyp.append(typ[0])
+    ntok = np.array(nne) + np.array(nte) + np.array(nne)*np.array(nte)
+
+    # (ne, te, pec) of all blocks, converted at once
+    # each block spans until the next one or the comments
+    iend = [
+        ii for ii, line in enumerate(lines)
+        if len(lhead) > 0 and ii > lhead[-1] and line.startswith('C')
+    ]
+    lend = lhead[1:] + [iend[0] if len(iend) > 0 else len(lines)]
+    try:
+        data = _str2float([
+            line for ii, ie in zip(lhead, lend) for line in lines[ii+1:ie]
+        ])
+    except ValueError:
+        data = None
+
+    # safety net for unexpected content between blocks => token by token
+    if data is None or data.size != ntok.sum():
+        ltok = []
+        for ii, nn in zip(lhead, ntok):
+            ltok0 = []
+            for line in lines[ii+1:]:
+                ltok0 += line.split()
+                if len(ltok0) >= nn:
+                    break
+            ltok += ltok0[:nn]
+        data = np.array(ltok, dtype=float)
+
+    # Get transitions from table at the end
+    ltab = []
+    itab = [
+        ii for ii, line in enumerate(lines)
+        if 'photon emissivity atomic transitions' in line
+    ]
+    if len(itab) > 0:
+        for line in lines[itab[0]+6:]:
+            ltab.append(line)
+            lstr = [kk for kk in line.rstrip().split(' ') if len(kk) > 0]
+            if int(lstr[1]) == nlines:
+                break
+
+    return {
+        'nlines': nlines,
+        'lamb': np.array(lamb, dtype=float),
+        'nne': np.array(nne, dtype=int),
+        'nte': np.array(nte, dtype=int),
+        'type': np.array(ltyp, dtype=str),
+        'data': data,
+        'table': np.array(ltab, dtype=str),
+    }
+
+
 def _read_adf15(
     pfe,
     dout=None,
@@ -828,6 +982,7 @@ def _read_adf15(
     lambmax=None,
     pec_as_func=None,
     deg=None,
+    cache=None,
 ):
     """
     Here lambmin and lambmax are provided in m
@@ -840,10 +995,6 @@ def _read_adf15(
     if dout is None:
         dout = {}
 
-    # Get summary of transitions
-    flagblock = '/isel ='
-    flag0 = 'superstage partition information'
-
     # Get file markers from name (elem, charge, typ0, typ1)
     typ0, typ1, elemq = pfe.split('][')[1:]
     ind = re.search(r'\d', elemq).start()
@@ -854,144 +1005,283 @@ def _read_adf15(
     typ0 = typ0[len(elem)+1:]
     typ1 = typ1.split('_')[1]
 
-    # Extract data from file
-    nlines, nblock = None, 0
-    in_ne, in_te, in_pec, in_tab, itab = False, False, False, False, np.inf
-    skip = False
-    with open(pfe) as search:
-        for ii, line in enumerate(search):
-
-            # Get number of lines (transitions) stored in this file
-            if ii == 0:
-                lstr = line.split('/')
-                nlines = int(lstr[0].replace(' ', ''))
-                continue
-
-            # Get info about the transition being scanned (block)
-            if flagblock in line and 'C' not in line and nblock < nlines:
-                lstr = [kk for kk in line.rstrip().split(' ') if len(kk) > 0]
-                lamb = float(lstr[0])*1.e-10
-                isoel = nblock + 1
-                nblock += 1
-                c0 = ((lambmin is not None and lamb < lambmin)
-                      or (lambmax is not None and lamb > lambmax))
-                if c0:
-                    skip = True
-                    continue
-                skip = False
-                nne, nte = int(lstr[1]), int(lstr[2])
-                typ = [ss[ss.index('type=')+len('type='):ss.index('/ispb')]
-                       for ss in lstr[3:] if 'type=' in ss]
-                assert len(typ) == 1
-                # To be updated : proper reading from line
-                in_ne = True
-                ne = np.array([])
-                te = np.array([])
-                pec = np.full((nne*nte,), np.nan)
-                ind = 0
-                # il = 0
-                continue
-
-            if 'root partition information' in line and skip is True:
-                skip = False
-
-            # Check lamb is ok
-            if skip is True:
-                continue
-
-            # Get ne for the transition being scanned (block)
-            if in_ne is True:
-                ne = np.append(ne,
-                               np.array(line.rstrip().strip().split(' '),
-                                        dtype=float))
-                if ne.size == nne:
-                    in_ne = False
-                    in_te = True
-
-            # Get te for the transition being scanned (block)
-            elif in_te is True:
-                te = np.append(te,
-                               np.array(line.rstrip().strip().split(' '),
-                                        dtype=float))
-                if te.size == nte:
-                    in_te = False
-                    in_pec = True
-
-            # Get pec for the transition being scanned (block)
-            elif in_pec is True:
-                data = np.array(line.rstrip().strip().split(' '),
-                                dtype=float)
-                pec[ind:ind+data.size] = data
-                # pec[il, :] = data
-                ind += data.size
-                # il += 1
-                if ind == pec.size:
-                    in_pec = False
-                    key = _get_adf15_key(elem, charge, isoel, typ0, typ1)
-                    # PEC reshaping and conversion to cm3/s -> m3/s
-                    pec = pec.reshape((nne, nte)) * 1e-6
-                    # log(ne)+6 to convert /cm3 -> /m3
-                    ne = ne*1e6
-
-                    if pec_as_func is True:
-                        pec_rec = scpRectSpl(
-                            np.log(ne),
-                            np.log(te),
-                            np.log(pec),
-                            kx=deg,
-                            ky=deg,
-                        )
-
-                        def pec(Te=None, ne=None, pec_rec=pec_rec):
-                            return np.exp(pec_rec(np.log(ne), np.log(Te)))
-
-                    dout[key] = {
-                        'lambda0': lamb,
-                        'ion': '{}{}+'.format(elem, charge),
-                        'charge': charge,
-                        'element': elem,
-                        'symbol': '{}{}-{}'.format(typ0, typ1, isoel),
-                        'source': pfe,
-                        'type': typ[0],
-                        'ne': ne,
-                        'ne_units': '/m3',
-                        'te': te,
-                        'te_units': 'eV',
-                        'pec': pec,
-                        'pec_type': 'f(ne, Te)',
-                        'pec_units': 'm3/s',
-                    }
+    # raw content, from cache if possible
+    draw = _get_raw(pfe, func=_parse_adf15, cache=cache)
+    nlines = int(draw['nlines'])
+
+    # Extract data from each block
+    ind = 0
+    for ii, lamb in enumerate(draw['lamb']):
+        isoel = ii + 1
+        nne, nte = int(draw['nne'][ii]), int(draw['nte'][ii])
+        i0 = ind
+        ind += nne + nte + nne*nte
+
+        # Check lamb is ok
+        c0 = ((lambmin is not None and lamb < lambmin)
+              or (lambmax is not None and lamb > lambmax))
+        if c0:
+            continue
+
+        ne = draw['data'][i0:i0+nne]
+        te = draw['data'][i0+nne:i0+nne+nte]
+        pec = draw['data'][i0+nne+nte:ind]
+
+        key = _get_adf15_key(elem, charge, isoel, typ0, typ1)
+        # PEC reshaping and conversion to cm3/s -> m3/s
+        pec = pec.reshape((nne, nte)) * 1e-6
+        # log(ne)+6 to convert /cm3 -> /m3
+        ne = ne*1e6
+
+        if pec_as_func is True:
+            pec_rec = scpRectSpl(
+                np.log(ne),
+                np.log(te),
+                np.log(pec),
+                kx=deg,
+                ky=deg,
+            )
 
-            # Get transitions from table at the end
-            if 'photon emissivity atomic transitions' in line:
-                itab = ii + 6
-            if ii == itab:
-                in_tab = True
-            if in_tab is True:
-                lstr = [kk for kk in line.rstrip().split(' ') if len(kk) > 0]
-                isoel = int(lstr[1])
-                lamb = float(lstr[2])*1.e-10
-                key = _get_adf15_key(elem, charge, isoel, typ0, typ1)
-                c0 = ((lambmin is None or lambmin < lamb)
-                      and (lambmax is None or lambmax > lamb))
-                if c0 and key not in dout.keys():
-                    msg = ("Inconsistency in file {}:\n".format(pfe)
-                           + "\t- line should be present".format(key))
-                    raise Exception(msg)
-                if key in dout.keys():
-                    if dout[key]['lambda0'] != lamb:
-                        msg = "Inconsistency in file {}".format(pfe)
-                        raise Exception(msg)
-                    c0 = (dout[key]['type'] not in lstr
-                          or lstr.index(dout[key]['type']) < 4)
-                    if c0:
-                        msg = ("Inconsistency in table, type not found:\n"
-                               + "\t- expected: {}\n".format(dout[key]['type'])
-                               + "\t- line: {}".format(line))
-                        raise Exception(msg)
-                    trans = lstr[3:lstr.index(dout[key]['type'])]
-                    dout[key]['transition'] = ''.join(trans)
-                if isoel == nlines:
-                    in_tab = False
+            def pec(Te=None, ne=None, pec_rec=pec_rec):
+                return np.exp(pec_rec(np.log(ne), np.log(Te)))
+
+        dout[key] = {
+            'lambda0': float(lamb),
+            'ion': '{}{}+'.format(elem, charge),
+            'charge': charge,
+            'element': elem,
+            'symbol': '{}{}-{}'.format(typ0, typ1, isoel),
+            'source': pfe,
+            'type': str(draw['type'][ii]),
+            'ne': ne,
+            'ne_units': '/m3',
+            'te': te,
+            'te_units': 'eV',
+            'pec': pec,
+            'pec_type': 'f(ne, Te)',
+            'pec_units': 'm3/s',
+        }
+
+    # Get transitions from table at the end
+    for line in draw['table']:
+        lstr = [kk for kk in line.rstrip().split(' ') if len(kk) > 0]
+        isoel = int(lstr[1])
+        lamb = float(lstr[2])*1.e-10
+        key = _get_adf15_key(elem, charge, isoel, typ0, typ1)
+        c0 = ((lambmin is None or lambmin < lamb)
+              and (lambmax is None or lambmax > lamb))
+        if c0 and key not in dout.keys():
+            msg = ("Inconsistency in file {}:\n".format(pfe)
+                   + "\t- line should be present".format(key))
+            raise Exception(msg)
+        if key in dout.keys():
+            if dout[key]['lambda0'] != lamb:
+                msg = "Inconsistency in file {}".format(pfe)
+                raise Exception(msg)
+            c0 = (dout[key]['type'] not in lstr
+                  or lstr.index(dout[key]['type']) < 4)
+            if c0:
+                msg = ("Inconsistency in table, type not found:\n"
+                       + "\t- expected: {}\n".format(dout[key]['type'])
+                       + "\t- line: {}".format(line))
+                raise Exception(msg)
+            trans = lstr[3:lstr.index(dout[key]['type'])]
+            dout[key]['transition'] = ''.join(trans)
+        if isoel == nlines:
+            break
     assert all(['transition' in vv.keys() for vv in dout.values()])
     return dout
+
+
+# #############################################################################
+# #############################################################################
+#                      Stacked pec interpolator
+# #############################################################################
+
+
+def step04_pec_interp(dout=None, key=None, deg=None):
+    """ Return a single interpolator of the pec of several lines
+
+    Provide the dict returned by step03_read() or step03_read_all() with
+    pec_as_func=False, and optionally the keys of the lines to be used
+    (default: all)
+
+    The returned object evaluates the pec (m3/s) of all lines at once:
+        >>> import tofu as tf
+        >>> dout = tf.openadas2tofu.step03_read_all(
+            element='Ar', typ1='adf15', pec_as_func=False,
+        )
+        >>> pec = tf.openadas2tofu.step04_pec_interp(dout)
+        >>> out = pec(Te=Te, ne=ne, grid=False)
+
+    out[ii, ...] is the pec of line pec.key[ii], with the same conventions
+    as the pec_as_func=True functions (interpolation in log-log)
+
+    Lines sharing the same (ne, Te) tables are grouped, so that the spline
+    basis is only computed once per group and not once per line
+    """
+
+    # --------------
+    # check inputs
+
+    if deg is None:
+        deg = _DEG
+    if not isinstance(dout, dict):
+        msg = "Arg dout must be a dict (output of step03_read_all())!"
+        raise Exception(msg)
+
+    lok = [k0 for k0, v0 in dout.items() if 'pec' in v0.keys()]
+    if key is None:
+        key = lok
+    if isinstance(key, str):
+        key = [key]
+    lout = [k0 for k0 in key if k0 not in lok]
+    if len(lout) > 0:
+        msg = (
+            "The following keys are not lines with a pec:\n"
+            + "\t- provided: {}\n".format(lout)
+            + "\t- available: {}".format(lok)
+        )
+        raise Exception(msg)
+
+    lout = [k0 for k0 in key if callable(dout[k0]['pec'])]
+    if len(lout) > 0:
+        msg = (
+            "The pec of the following lines are functions:\n"
+            + "\t- {}\n".format(lout)
+            + "  => load the data with pec_as_func=False"
+        )
+        raise Exception(msg)
+
+    return PECInterp(
+        key=key,
+        ne=[dout[k0]['ne'] for k0 in key],
+        te=[dout[k0]['te'] for k0 in key],
+        pec=[dout[k0]['pec'] for k0 in key],
+        deg=deg,
+    )
+
+
+class PECInterp(object):
+    """ Stacked log-log spline interpolator of the pec of several lines
+
+    Use step04_pec_interp() to build it from read pec data
+    Call it with Te (eV) and ne (/m3) to get the pec (m3/s) of all lines
+    """
+
+    def __init__(self, key=None, ne=None, te=None, pec=None, deg=None):
+
+        self.key = list(key)
+        self.deg = deg
+
+        # group lines with identical (ne, te) tables => same knots
+        dgroup = {}
+        for ii, (nei, tei) in enumerate(zip(ne, te)):
+            kg = (nei.tobytes(), tei.tobytes())
+            if kg not in dgroup.keys():
+                dgroup[kg] = {'ne': nei, 'te': tei, 'ind': []}
+            dgroup[kg]['ind'].append(ii)
+
+        # spline coefficients, stacked per group
+        self._lgroup = []
+        for vv in dgroup.values():
+            lspl = [
+                scpRectSpl(
+                    np.log(vv['ne']),
+                    np.log(vv['te']),
+                    np.log(pec[ii]),
+                    kx=deg,
+                    ky=deg,
+                )
+                for ii in vv['ind']
+            ]
+            tx, ty = lspl[0].get_knots()
+            ncx, ncy = tx.size - deg - 1, ty.size - deg - 1
+            self._lgroup.append({
+                'ind': np.array(vv['ind'], dtype=int),
+                'tx': tx,
+                'ty': ty,
+                'coefs': np.array([
+                    spl.get_coeffs().reshape((ncx, ncy)) for spl in lspl
+                ]),
+            })
+
+    def __repr__(self):
+        return "{}({} lines in {} groups, deg={})".format(
+            self.__class__.__name__,
+            len(self.key),
+            len(self._lgroup),
+            self.deg,
+        )
+
+    @staticmethod
+    def _basis(x, t, deg):
+        """ Return the (n, nc) values of all bsplines at x (clipped) """
+        nc = t.size - deg - 1
+        x = np.clip(x, t[deg], t[nc])
+        return scpBSpline(t, np.eye(nc), deg, extrapolate=False)(x), x
+
+    def __call__(self, Te=None, ne=None, grid=None):
+        """ Return the pec (m3/s) of all lines at (Te, ne)
+
+        if grid=False (default):
+            - ne and Te are broadcastable arrays of shape
+          => the result is a (nlines, shape) array
+
+        if grid=True:
+            - ne is a (n1,) 1d array
+            - Te is a (n2,) 1d array
+          => the result is a (nlines, n1, n2) array
+        """
+
+        if grid is None:
+            grid = False
+
+        if grid is True:
+            lne = np.log(np.atleast_1d(ne).ravel())
+            lte = np.log(np.atleast_1d(Te).ravel())
+            shape = (lne.size, lte.size)
+        else:
+            lne, lte = np.broadcast_arrays(np.log(ne), np.log(Te))
+            shape = lne.shape
+            lne, lte = lne.ravel(), lte.ravel()
+
+        deg = self.deg
+        out = np.full((len(self.key),) + shape, np.nan)
+        for dg in self._lgroup:
+            bx, xx = self._basis(lne, dg['tx'], deg)
+            by, yy = self._basis(lte, dg['ty'], deg)
+
+            if grid is True:
+                # (nlines, n1, n2)
+                out[dg['ind'], ...] = np.matmul(
+                    np.matmul(bx, dg['coefs']), by.T,
+                )
+            else:
+                # only deg+1 bsplines are non-zero per point and direction
+                # => sparse (npts, ncx*ncy) weights, applied to all lines
+                ncx, ncy = bx.shape[1], by.shape[1]
+                ix = np.clip(
+                    np.searchsorted(dg['tx'], xx, side='right') - 1,
+                    deg, ncx - 1,
+                )[:, None] + np.arange(-deg, 1)[None, :]
+                iy = np.clip(
+                    np.searchsorted(dg['ty'], yy, side='right') - 1,
+                    deg, ncy - 1,
+                )[:, None] + np.arange(-deg, 1)[None, :]
+                bxi = np.take_along_axis(bx, ix, axis=1)
+                byi = np.take_along_axis(by, iy, axis=1)
+                npts, nw = xx.size, (deg + 1)**2
+                weights = scpsp.csr_matrix(
+                    (
+                        (bxi[:, :, None] * byi[:, None, :]).ravel(),
+                        (ix[:, :, None] * ncy + iy[:, None, :]).ravel(),
+                        np.arange(0, npts*nw + 1, nw),
+                    ),
+                    shape=(npts, ncx*ncy),
+                )
+                out[dg['ind'], ...] = (
+                    weights.dot(dg['coefs'].reshape((-1, ncx*ncy)).T)
+                ).T.reshape((-1,) + shape)
+
+        return np.exp(out)
@@ -3,6 +3,7 @@
 import os
 import warnings
 import datetime as dtm      # DB
+from concurrent.futures import ProcessPoolExecutor
 
 # Common
 import numpy as np
@@ -96,6 +97,7 @@ def _checkformat_dinput(dinput, allow_pickle=True):
 def _checkformat_options(
     chain, method, tr_solver, tr_options,
     xtol, ftol, gtol, loss, max_nfev, verbose, strict,
+    n_workers=None,
 ):
     if chain is None:
         chain = _CHAIN
@@ -124,9 +126,23 @@ def _checkformat_options(
         verbscp = 0
     if strict is None:
         strict = False
+    if n_workers is None:
+        n_workers = 1
+    c0 = (
+        isinstance(n_workers, (int, np.integer))
+        and not isinstance(n_workers, bool)
+        and n_workers >= 1
+    )
+    if not c0:
+        msg = (
+            "Arg n_workers must be a int >= 1!\n"
+            f"\t- provided: {n_workers}"
+        )
+        raise Exception(msg)
 
     return (chain, method, tr_solver, tr_options,
-            xtol, ftol, gtol, loss, max_nfev, verbose, verbscp, strict)
+            xtol, ftol, gtol, loss, max_nfev, verbose, verbscp, strict,
+            n_workers)
 
 
 def multigausfit1d_from_dlines(
@@ -135,7 +151,7 @@ def multigausfit1d_from_dlines(
     xtol=None, ftol=None, gtol=None,
     max_nfev=None, chain=None, verbose=None,
     loss=None, jac=None,
-    strict=None,
+    strict=None, n_workers=None, batch=None,
 ):
     """ Solve multi_gaussian fit in 1d from dlines
 
@@ -156,6 +172,19 @@ def multigausfit1d_from_dlines(
         - vni: 10 km/s
         - cij: np.mean(data)
 
+    n_workers: int
+        number of processes fitting the spectra in parallel (default: 1)
+        spectra are split in n_workers contiguous chunks, with chain
+        applied within each chunk (each chunk starts from its own x0)
+
+    batch: bool
+        If True, all spectra are fitted together by a vectorized
+        Levenberg-Marquardt solver (default: False)
+        Faster for many small spectra, each spectrum has its own damping
+        and convergence criteria (xtol, ftol, gtol, max_nfev)
+        Bounds are enforced by projection, chain is not used,
+        method, tr_solver and tr_options are ignored, loss must be 'linear'
+
     """
 
     # ---------------------------
@@ -163,12 +192,30 @@ def multigausfit1d_from_dlines(
     (
         chain, method, tr_solver, tr_options,
         xtol, ftol, gtol, loss, max_nfev,
-        verbose, verbscp, strict,
+        verbose, verbscp, strict, n_workers,
     ) = _checkformat_options(
          chain, method, tr_solver, tr_options,
          xtol, ftol, gtol, loss, max_nfev, verbose, strict,
+         n_workers=n_workers,
     )
 
+    if batch is None:
+        batch = False
+    if not isinstance(batch, bool):
+        msg = (
+            "Arg batch must be a bool!\n"
+            f"\t- provided: {batch}"
+        )
+        raise Exception(msg)
+    if batch is True and (n_workers > 1 or loss != 'linear'):
+        msg = (
+            "Arg batch=True is only available with:\n"
+            "\t- n_workers = 1\n"
+            "\t- loss = 'linear'\n"
+            f"Provided:\n\t- n_workers = {n_workers}\n\t- loss = {loss}"
+        )
+        raise Exception(msg)
+
     # ---------------------------
     # Load dinput if necessary
     dinput = _checkformat_dinput(dinput)
@@ -234,7 +281,8 @@ def multigausfit1d_from_dlines(
     errmsg = ['' for ss in range(nspect)]
 
     # Prepare msg
-    if verbose in [1, 2]:
+    maxl = None
+    if verbose in [1, 2] and n_workers == 1:
         col = np.char.array([
             'spect', 'time (s)', 'cost', 'nfev', 'njev', 'msg',
         ])
@@ -246,97 +294,36 @@ def multigausfit1d_from_dlines(
     # ------------
     # Main loop
 
-    end = '\r'
-    t0 = dtm.datetime.now()     # DB
-    for ii in range(nspect):
-
-        if verbose == 3:
-            msg = "\nspect {} / {}".format(ii+1, nspect)
-            print(msg)
-
-        try:
-            dti = None
-            t0i = dtm.datetime.now()     # DB
-            if not dinput['valid']['indt'][ii]:
-                validity[ii] = -1
-                continue
-
-            # optimization
-            res = scpopt.least_squares(
-                func_cost,
-                x0[ii, indx],
-                jac=func_jac,
-                bounds=bounds[:, indx],
-                method=method,
-                ftol=ftol,
-                xtol=xtol,
-                gtol=gtol,
-                x_scale=1.0,
-                f_scale=1.0,
-                loss=loss,
-                diff_step=None,
-                tr_solver=tr_solver,
-                tr_options=tr_options,
-                jac_sparsity=None,
-                max_nfev=max_nfev,
-                verbose=verbscp,
-                args=(),
-                kwargs={
-                    'data': datacost[ii, :],
-                    'scales': scales[ii, :],
-                    'const': const[ii, :],
-                    'indok': dprepare['indok_bool'][ii, :],
-                },
-            )
-            dti = (dtm.datetime.now() - t0i).total_seconds()
-
-            if chain is True and ii < nspect-1:
-                x0[ii+1, indx] = res.x
-
-            # cost, message, time
-            success[ii] = res.success
-            cost[ii] = res.cost
-            nfev[ii] = res.nfev
-            message[ii] = res.message
-            time[ii] = round(
-                (dtm.datetime.now()-t0i).total_seconds(),
-                ndigits=3,
-            )
-            sol_x[ii, indx] = res.x
-            sol_x[ii, ~indx] = const[ii, :] / scales[ii, ~indx]
-
-        except Exception as err:
-            if strict:
-                raise err
-            else:
-                errmsg[ii] = str(err)
-                validity[ii] = -2
+    dloop = dict(
+        dim=1,
+        dfunc={
+            'lamb': lamb, 'dinput': dinput, 'dind': dind,
+            'jac': jac, 'indx': indx,
+        },
+        func_cost=func_cost,
+        func_jac=func_jac,
+        # inputs
+        x0=x0, bounds=bounds, indx=indx, scales=scales, const=const,
+        indt=dinput['valid']['indt'],
+        datacost=datacost,
+        indok=dprepare['indok_bool'],
+        # options
+        chain=chain, strict=strict,
+        verbose=verbose, verbscp=verbscp, maxl=maxl,
+        method=method, tr_solver=tr_solver, tr_options=tr_options,
+        xtol=xtol, ftol=ftol, gtol=gtol, loss=loss, max_nfev=max_nfev,
+        # outputs
+        sol_x=sol_x, success=success, time=time, cost=cost, nfev=nfev,
+        validity=validity, message=message, errmsg=errmsg,
+    )
 
-        # verbose
-        if verbose in [1, 2]:
-            if validity[ii] == 0:
-                col = np.char.array([
-                    '{} / {}'.format(ii+1, nspect),
-                    '{}'.format(dti),
-                    '{:5.3e}'.format(res.cost),
-                    str(res.nfev),
-                    str(res.njev),
-                    res.message,
-                ])
-            else:
-                col = np.char.array([
-                    '{} / {}'.format(ii+1, nspect),
-                    '{}'.format(dti),
-                    ' - ', ' - ', ' - ',
-                    errmsg[ii],
-                ])
-            msg = ' '.join([cc.ljust(maxl) for cc in col])
-            if verbose == 1:
-                if ii == nspect - 1:
-                    end = '\n'
-                print(msg, end=end, flush=True)
-            else:
-                print(msg, end='\n')
+    t0 = dtm.datetime.now()     # DB
+    if batch is True:
+        _multigausfit1d_batch(**dloop)
+    elif n_workers > 1:
+        _loop_parallel(n_workers=n_workers, dloop=dloop)
+    else:
+        _multigausfit1d_loop(ind=np.arange(nspect), **dloop)
 
     # ---------------------------
     # Reshape in case of same_spectrum
@@ -447,7 +434,7 @@ def multigausfit2d_from_dlines(
     xtol=None, ftol=None, gtol=None,
     max_nfev=None, chain=None, verbose=None,
     loss=None, jac=None,
-    strict=None,
+    strict=None, n_workers=None,
 ):
     """ Solve multi_gaussian fit in 1d from dlines
 
@@ -468,6 +455,16 @@ def multigausfit2d_from_dlines(
         - vni: 10 km/s
         - cij: np.mean(data)
 
+    jac can be:
+        - 'dense': dense (npts, nx) jacobian
+        - 'sparse': sparse jacobian (each bspline only affects its support),
+                    solved with tr_solver='lsmr' by default
+
+    n_workers: int
+        number of processes fitting the spectra in parallel (default: 1)
+        spectra are split in n_workers contiguous chunks, with chain
+        applied within each chunk (each chunk starts from its own x0)
+
     """
 
     # ---------------------------
@@ -475,10 +472,11 @@ def multigausfit2d_from_dlines(
     (
         chain, method, tr_solver, tr_options,
         xtol, ftol, gtol, loss, max_nfev,
-        verbose, verbscp, strict,
+        verbose, verbscp, strict, n_workers,
     ) = _checkformat_options(
          chain, method, tr_solver, tr_options,
          xtol, ftol, gtol, loss, max_nfev, verbose, strict,
+         n_workers=n_workers,
     )
 
     # ---------------------------
@@ -556,8 +554,13 @@ def multigausfit2d_from_dlines(
     lambrel_flat = lamb_flat - dinput['lambmin_bck']
     lambn_flat = lamb_flat[:, None] / dinput['lines'][None, ...]
 
-    # jac0
-    jac0 = np.zeros((phi_flat.size, dind['sizex']), dtype=float)
+    # jac0 (only for dense jacobian)
+    if jac is None:
+        jac = _funccostjac._JAC
+    if jac == 'sparse':
+        jac0 = None
+    else:
+        jac0 = np.zeros((phi_flat.size, dind['sizex']), dtype=float)
 
     # libs
     libs = np.array([
@@ -566,6 +569,19 @@ def multigausfit2d_from_dlines(
         for ii in range(dinput['nbs'])
     ])
 
+    # bsplines values, computed once for all iterations and time steps
+    # (only if all points are covered, otherwise cost is nan somewhere)
+    if np.all(np.any(libs, axis=0)):
+        bs_flat = _funccostjac.get_bs2d_flat(
+            phi_flat=phi_flat,
+            km=dinput['knots_mult'],
+            kpb=dinput['nknotsperbs'],
+            nbs=dinput['nbs'],
+            libs=libs,
+        )
+    else:
+        bs_flat = None
+
     # ---------------------------
     # Get function, cost function and jacobian
 
@@ -593,7 +609,8 @@ def multigausfit2d_from_dlines(
     indamp[dinput['dind']['amp']['x'].T.ravel()] = True
 
     # Prepare msg
-    if verbose in [1, 2]:
+    maxl = None
+    if verbose in [1, 2] and n_workers == 1:
         col = np.char.array(['Spect', 'time (s)', 'cost',
                              'nfev', 'njev', 'msg'])
         maxl = max(np.max(np.char.str_len(col)), 10)
@@ -606,9 +623,307 @@ def multigausfit2d_from_dlines(
     # ------------
     # Main loop
 
-    end = '\r'
+    dloop = dict(
+        dim=2,
+        dfunc={
+            'phi_flat': phi_flat, 'dinput': dinput, 'dind': dind,
+            'jac': jac,
+        },
+        func_cost=func_cost,
+        func_jac=func_jac,
+        # inputs
+        x0=x0, bounds=bounds, indx=indx, scales=scales, const=const,
+        indt=dinput['valid']['indt'],
+        data_flat=data_flat,
+        indok_flat=indok_flat,
+        phi_flat=phi_flat,
+        lambrel_flat=lambrel_flat,
+        lambn_flat=lambn_flat,
+        jac0=jac0,
+        libs=libs,
+        bs_flat=bs_flat,
+        indamp=indamp,
+        # options
+        chain=chain, strict=strict,
+        verbose=verbose, verbscp=verbscp, maxl=maxl,
+        method=method, tr_solver=tr_solver, tr_options=tr_options,
+        xtol=xtol, ftol=ftol, gtol=gtol, loss=loss, max_nfev=max_nfev,
+        # outputs
+        sol_x=sol_x, success=success, time=time, cost=cost, nfev=nfev,
+        validity=validity, saturated=saturated,
+        message=message, errmsg=errmsg,
+    )
+
     t0 = dtm.datetime.now()     # DB
-    for ii in range(nspect):
+    if n_workers > 1:
+        _loop_parallel(n_workers=n_workers, dloop=dloop)
+    else:
+        _multigausfit2d_loop(ind=np.arange(nspect), **dloop)
+
+    # ---------------
+    # Display saturated values
+    dsat = None
+    if np.any(saturated):
+        lksat = [
+            'bck_amp', 'bck_rate',
+            'amp', 'width', 'shift',
+            'dshift', 'dratio',
+        ]
+        dsat = {
+            k0: {
+                'ind': np.sum(saturated[:, dind[k0]['x']], axis=1),
+            }
+            for k0 in lksat
+            if dind.get(k0) is not None
+            and np.any(saturated[:, dind[k0]['x']])
+        }
+
+        for k0 in dsat.keys():
+            if k0 in ['amp', 'width', 'shift']:
+                dsat[k0]['str'] = {}
+                for ik, k1 in enumerate(dinput[k0]['keys']):
+                    indk1 = dsat[k0]['ind'][:, ik] > 0
+                    if np.any(indk1):
+                        dsat[k0]['str'][k1] = (
+                            indk1.sum(),
+                            np.mean(dsat[k0]['ind'][indk1, ik]),
+                        )
+            else:
+                indk1 = dsat[k0]['ind'][:, 0] > 0
+                if np.any(indk1):
+                    dsat[k0]['str'] = {
+                        '': (indk1.sum(), np.mean(dsat[k0]['ind'][indk1, 0])),
+                    }
+
+        lstr = [
+            "\n".join([
+                f"\t{k0} {k1}: {v1[0]} / {nspect} "
+                f"(mean {v1[1]} / {dinput['nbs']} bsplines)"
+                for k1, v1 in v0['str'].items()
+            ])
+            for k0, v0 in dsat.items()
+        ]
+        msg = (
+            "The following variables seem to have saturated:\n"
+            + "\n".join(lstr)
+        )
+        print(msg)
+
+    # ---------------------------
+    # Isolate dratio and dshift
+    dratio, dshift = None, None
+    if dinput['double'] is not False:
+        if dinput['double'] is True:
+            dratio = (
+                sol_x[:, dind['dratio']['x']] * scales[:, dind['dratio']['x']]
+            )
+            dshift = (
+                sol_x[:, dind['dshift']['x']] * scales[:, dind['dshift']['x']]
+            )
+        else:
+            if dinput['double'].get('dratio') is None:
+                dratio = (
+                    sol_x[:, dind['dratio']['x']]
+                    * scales[:, dind['dratio']['x']]
+                )
+            else:
+                dratio = np.full((nspect,), dinput['double']['dratio'])
+
+            if dinput['double'].get('dshift') is None:
+                dshift = (
+                    sol_x[:, dind['dshift']['x']]
+                    * scales[:, dind['dshift']['x']]
+                )
+            else:
+                dshift = np.full((nspect,), dinput['double']['dshift'])
+
+    if verbose > 0:
+        dt = (dtm.datetime.now() - t0).total_seconds()
+        msg = (
+            "Total computation time:"
+            + "\t{} s for {} spectra ({} s per spectrum)".format(
+                round(dt, ndigits=3),
+                nspect,
+                round(dt/nspect, ndigits=3)
+            )
+        )
+        print(msg)
+
+    # ---------------------------
+    # Format output as dict
+    dfit = {
+        'dinput': dinput,
+        'scales': scales, 'x0': x0, 'bounds': bounds,
+        'jac': jac, 'sol_x': sol_x,
+        'dratio': dratio, 'dshift': dshift,
+        'indx': indx,
+        'time': time, 'success': success,
+        'validity': validity,
+        'dvalidity': _DVALIDITY,
+        'errmsg': np.array(errmsg),
+        'cost': cost, 'nfev': nfev, 'msg': np.array(message),
+        'phi': phi,
+        'const': const,
+        'dsat': dsat,
+        'xtol': xtol, 'ftol': ftol, 'gtol': gtol,
+    }
+    return dfit
+
+
+###########################################################
+###########################################################
+#
+#           Loop on spectra - sequential
+#
+###########################################################
+###########################################################
+
+
+def _multigausfit1d_loop(
+    ind=None,
+    # functions
+    func_cost=None,
+    func_jac=None,
+    # inputs
+    x0=None, bounds=None, indx=None, scales=None, const=None, indt=None,
+    datacost=None,
+    indok=None,
+    # options
+    chain=None, strict=None,
+    verbose=None, verbscp=None, maxl=None,
+    method=None, tr_solver=None, tr_options=None,
+    xtol=None, ftol=None, gtol=None, loss=None, max_nfev=None,
+    # outputs (filled in place)
+    sol_x=None, success=None, time=None, cost=None, nfev=None,
+    validity=None, message=None, errmsg=None,
+    **kwdargs,
+):
+    """ Fit spectra ind sequentially, results are stored in place """
+
+    nspect = x0.shape[0]
+    end = '\r'
+    for ii in ind:
+
+        if verbose == 3:
+            msg = "\nspect {} / {}".format(ii+1, nspect)
+            print(msg)
+
+        try:
+            dti = None
+            t0i = dtm.datetime.now()     # DB
+            if not indt[ii]:
+                validity[ii] = -1
+                continue
+
+            # optimization
+            res = scpopt.least_squares(
+                func_cost,
+                x0[ii, indx],
+                jac=func_jac,
+                bounds=bounds[:, indx],
+                method=method,
+                ftol=ftol,
+                xtol=xtol,
+                gtol=gtol,
+                x_scale=1.0,
+                f_scale=1.0,
+                loss=loss,
+                diff_step=None,
+                tr_solver=tr_solver,
+                tr_options=tr_options,
+                jac_sparsity=None,
+                max_nfev=max_nfev,
+                verbose=verbscp,
+                args=(),
+                kwargs={
+                    'data': datacost[ii, :],
+                    'scales': scales[ii, :],
+                    'const': const[ii, :],
+                    'indok': indok[ii, :],
+                },
+            )
+            dti = (dtm.datetime.now() - t0i).total_seconds()
+
+            if chain is True and ii < nspect-1:
+                x0[ii+1, indx] = res.x
+
+            # cost, message, time
+            success[ii] = res.success
+            cost[ii] = res.cost
+            nfev[ii] = res.nfev
+            message[ii] = res.message
+            time[ii] = round(
+                (dtm.datetime.now()-t0i).total_seconds(),
+                ndigits=3,
+            )
+            sol_x[ii, indx] = res.x
+            sol_x[ii, ~indx] = const[ii, :] / scales[ii, ~indx]
+
+        except Exception as err:
+            if strict:
+                raise err
+            else:
+                errmsg[ii] = str(err)
+                validity[ii] = -2
+
+        # verbose
+        if verbose in [1, 2]:
+            if validity[ii] == 0:
+                col = np.char.array([
+                    '{} / {}'.format(ii+1, nspect),
+                    '{}'.format(dti),
+                    '{:5.3e}'.format(res.cost),
+                    str(res.nfev),
+                    str(res.njev),
+                    res.message,
+                ])
+            else:
+                col = np.char.array([
+                    '{} / {}'.format(ii+1, nspect),
+                    '{}'.format(dti),
+                    ' - ', ' - ', ' - ',
+                    errmsg[ii],
+                ])
+            msg = ' '.join([cc.ljust(maxl) for cc in col])
+            if verbose == 1:
+                if ii == nspect - 1:
+                    end = '\n'
+                print(msg, end=end, flush=True)
+            else:
+                print(msg, end='\n')
+
+
+def _multigausfit2d_loop(
+    ind=None,
+    # functions
+    func_cost=None,
+    func_jac=None,
+    # inputs
+    x0=None, bounds=None, indx=None, scales=None, const=None, indt=None,
+    data_flat=None,
+    indok_flat=None,
+    phi_flat=None,
+    lambrel_flat=None,
+    lambn_flat=None,
+    jac0=None,
+    libs=None,
+    bs_flat=None,
+    indamp=None,
+    # options
+    chain=None, strict=None,
+    verbose=None, verbscp=None, maxl=None,
+    method=None, tr_solver=None, tr_options=None,
+    xtol=None, ftol=None, gtol=None, loss=None, max_nfev=None,
+    # outputs (filled in place)
+    sol_x=None, success=None, time=None, cost=None, nfev=None,
+    validity=None, saturated=None, message=None, errmsg=None,
+    **kwdargs,
+):
+    """ Fit spectra ind sequentially, results are stored in place """
+
+    nspect = x0.shape[0]
+    end = '\r'
+    for ii in ind:
 
         if verbose == 3:
             msg = "\nSpect {} / {}".format(ii+1, nspect)
@@ -617,7 +932,7 @@ def multigausfit2d_from_dlines(
         try:
             dti = None
             t0i = dtm.datetime.now()     # DB
-            if not dinput['valid']['indt'][ii]:
+            if not indt[ii]:
                 validity[ii] = -1
                 continue
 
@@ -652,8 +967,14 @@ def multigausfit2d_from_dlines(
                     'phi_flat': phi_flat[indok_flat[ii]],
                     'lambrel_flat': lambrel_flat[indok_flat[ii]],
                     'lambn_flat': lambn_flat[indok_flat[ii], :],
-                    'jac0': jac0[indok_flat[ii], :],
+                    'jac0': (
+                        None if jac0 is None else jac0[indok_flat[ii], :]
+                    ),
                     'libs': [ibs[indok_flat[ii]] for ibs in libs],
+                    'bs_flat': (
+                        None if bs_flat is None
+                        else bs_flat[indok_flat[ii], :]
+                    ),
                 }
             )
             dti = (dtm.datetime.now() - t0i).total_seconds()
@@ -721,114 +1042,329 @@ def multigausfit2d_from_dlines(
             else:
                 print(msg, end='\n')
 
-    # ---------------
-    # Display saturated values
-    dsat = None
-    if np.any(saturated):
-        lksat = [
-            'bck_amp', 'bck_rate',
-            'amp', 'width', 'shift',
-            'dshift', 'dratio',
-        ]
-        dsat = {
-            k0: {
-                'ind': np.sum(saturated[:, dind[k0]['x']], axis=1),
-            }
-            for k0 in lksat
-            if dind.get(k0) is not None
-            and np.any(saturated[:, dind[k0]['x']])
-        }
 
-        for k0 in dsat.keys():
-            if k0 in ['amp', 'width', 'shift']:
-                dsat[k0]['str'] = {}
-                for ik, k1 in enumerate(dinput[k0]['keys']):
-                    indk1 = dsat[k0]['ind'][:, ik] > 0
-                    if np.any(indk1):
-                        dsat[k0]['str'][k1] = (
-                            indk1.sum(),
-                            np.mean(dsat[k0]['ind'][indk1, ik]),
-                        )
-            else:
-                indk1 = dsat[k0]['ind'][:, 0] > 0
-                if np.any(indk1):
-                    dsat[k0]['str'] = {
-                        '': (indk1.sum(), np.mean(dsat[k0]['ind'][indk1, 0])),
-                    }
+###########################################################
+###########################################################
+#
+#           Loop on spectra - parallel
+#
+###########################################################
+###########################################################
 
-        lstr = [
-            "\n".join([
-                f"\t{k0} {k1}: {v1[0]} / {nspect} "
-                f"(mean {v1[1]} / {dinput['nbs']} bsplines)"
-                for k1, v1 in v0['str'].items()
-            ])
-            for k0, v0 in dsat.items()
-        ]
-        msg = (
-            "The following variables seem to have saturated:\n"
-            + "\n".join(lstr)
+
+# outputs of each spectrum, gathered from the workers
+_LOUT = [
+    'x0', 'sol_x', 'success', 'time', 'cost', 'nfev',
+    'validity', 'saturated', 'message', 'errmsg',
+]
+
+# context of each worker process, set once per worker
+_DLOOP = None
+
+
+def _init_worker(dloop=None):
+    """ Store the context and rebuild the cost / jacobian functions """
+    global _DLOOP
+    _DLOOP = dict(dloop)
+    if _DLOOP['dim'] == 1:
+        (
+            _DLOOP['func_cost'], _DLOOP['func_jac'],
+        ) = _funccostjac.multigausfit1d_from_dlines_funccostjac(
+            **_DLOOP['dfunc'],
+        )[1:]
+    else:
+        (
+            _DLOOP['func_cost'], _DLOOP['func_jac'],
+        ) = _funccostjac.multigausfit2d_from_dlines_funccostjac(
+            **_DLOOP['dfunc'],
+        )[2:]
+
+
+def _loop_chunk(ind=None):
+    if _DLOOP['dim'] == 1:
+        _multigausfit1d_loop(ind=ind, **_DLOOP)
+    else:
+        _multigausfit2d_loop(ind=ind, **_DLOOP)
+
+    return {
+        k0: (
+            [_DLOOP[k0][ii] for ii in ind] if isinstance(_DLOOP[k0], list)
+            else _DLOOP[k0][ind, ...]
         )
-        print(msg)
+        for k0 in _LOUT if _DLOOP.get(k0) is not None
+    }
+
+
+def _loop_parallel(n_workers=None, dloop=None):
+    """ Fit independent chunks of spectra over a process pool
+
+    Spectra are split in n_workers contiguous chunks, each fitted by the
+    sequential loop in a worker process (chain is applied within a chunk)
+    The cost / jacobian functions are re-built once in each worker
+    Outputs are gathered in place in dloop, in submission order
+    """
+
+    nspect = dloop['x0'].shape[0]
+    lchunks = np.array_split(np.arange(nspect), min(nspect, n_workers))
+    verbose = dloop['verbose']
+
+    # closures cannot be pickled, workers are silent
+    dworker = {
+        k0: v0 for k0, v0 in dloop.items()
+        if k0 not in ['func_cost', 'func_jac']
+    }
+    dworker.update({'verbose': 0, 'verbscp': 0})
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(dworker,),
+    ) as executor:
+
+        lfut = [executor.submit(_loop_chunk, ind=ind) for ind in lchunks]
+
+        for fut, ind in zip(lfut, lchunks):
+            for k0, v0 in fut.result().items():
+                if isinstance(dloop[k0], list):
+                    for jj, ii in enumerate(ind):
+                        dloop[k0][ii] = v0[jj]
+                else:
+                    dloop[k0][ind, ...] = v0
+
+            if verbose in [1, 2]:
+                msg = (
+                    f"\tspect {ind[-1]+1} / {nspect}"
+                    f"\t({n_workers} workers)"
+                )
+                print(msg, end='\n', flush=True)
+
+
+###########################################################
+###########################################################
+#
+#           Loop on spectra - batched (1d only)
+#
+###########################################################
+###########################################################
+
+
+_DMSG_BATCH = {
+    0: "The maximum number of function evaluations is exceeded.",
+    1: "`gtol` termination condition is satisfied.",
+    2: "`ftol` termination condition is satisfied.",
+    3: "`xtol` termination condition is satisfied.",
+}
+
+# initial damping (relative to the diagonal of J^T J)
+_DAMP0 = 10.
+
+
+def _multigausfit1d_batch(
+    dfunc=None,
+    # inputs
+    x0=None, bounds=None, indx=None, scales=None, const=None, indt=None,
+    datacost=None,
+    indok=None,
+    # options
+    strict=None, verbose=None, maxl=None,
+    xtol=None, ftol=None, gtol=None, max_nfev=None,
+    # outputs (filled in place)
+    sol_x=None, success=None, time=None, cost=None, nfev=None,
+    validity=None, message=None, errmsg=None,
+    **kwdargs,
+):
+    """ Fit all valid spectra at once, results are stored in place
+
+    Projected Levenberg-Marquardt iterations on stacked arrays:
+        - each spectrum has its own damping factor
+        - a step is accepted only where it decreases the cost
+        - parameters on a bound with outward gradient are frozen
+        - converged spectra are removed from the active set
+    """
+
+    t0 = dtm.datetime.now()
+    nspect = x0.shape[0]
+    validity[~indt] = -1
+    ind = indt.nonzero()[0]
+    if ind.size == 0:
+        return
+
+    func_cost, func_jac = (
+        _funccostjac.multigausfit1d_from_dlines_funccostjac_batch(**dfunc)
+    )
 
     # ---------------------------
-    # Isolate dratio and dshift
-    dratio, dshift = None, None
-    if dinput['double'] is not False:
-        if dinput['double'] is True:
-            dratio = (
-                sol_x[:, dind['dratio']['x']] * scales[:, dind['dratio']['x']]
+    # Initialize (free parameters only)
+    lb, ub = bounds[0, indx], bounds[1, indx]
+    x = np.clip(x0[ind, :][:, indx], lb, ub)
+    nx = x.shape[1]
+    if max_nfev is None:
+        max_nfev = 100 * nx
+
+    dkw = {
+        'data': datacost[ind, :],
+        'scales': scales[ind, :],
+        'const': const[ind, :],
+        'indok': indok[ind, :],
+    }
+
+    def _kw(ia):
+        return {k0: v0[ia, ...] for k0, v0 in dkw.items()}
+
+    res = func_cost(x, **dkw)
+    cc = 0.5*np.sum(res**2, axis=1)
+    nf = np.ones((ind.size,), dtype=int)
+    damp = np.full((ind.size,), _DAMP0)
+    nu = np.full((ind.size,), 2.)
+    status = np.full((ind.size,), -1, dtype=int)
+
+    # spectra with non-finite initial cost cannot be fitted
+    iok = np.isfinite(cc)
+    if not np.all(iok):
+        if strict:
+            msg = (
+                "Non-finite initial cost for spectra:\n"
+                f"\t{ind[~iok]}"
             )
-            dshift = (
-                sol_x[:, dind['dshift']['x']] * scales[:, dind['dshift']['x']]
+            raise Exception(msg)
+        validity[ind[~iok]] = -2
+        for ii in ind[~iok]:
+            errmsg[ii] = 'Non-finite initial cost'
+        status[~iok] = -2
+
+    active = status == -1
+    grad = np.zeros(x.shape, dtype=float)
+    hess = np.zeros((ind.size, nx, nx), dtype=float)
+    ifix = np.zeros(x.shape, dtype=bool)
+    iup = active.copy()
+    ix = np.arange(nx)
+
+    while np.any(active):
+
+        # ---------------------------
+        # Update jacobian where x has changed
+        if np.any(iup):
+            ia = iup.nonzero()[0]
+            jac = func_jac(x[ia, :], **_kw(ia))
+            grad[ia, :] = np.einsum('ijk,ij->ik', jac, res[ia, :])
+            hess[ia, ...] = np.matmul(np.swapaxes(jac, 1, 2), jac)
+
+            # parameters on a bound, with gradient pointing outwards
+            ifix[ia, :] = (
+                ((x[ia, :] <= lb) & (grad[ia, :] > 0))
+                | ((x[ia, :] >= ub) & (grad[ia, :] < 0))
             )
-        else:
-            if dinput['double'].get('dratio') is None:
-                dratio = (
-                    sol_x[:, dind['dratio']['x']]
-                    * scales[:, dind['dratio']['x']]
-                )
-            else:
-                dratio = np.full((nspect,), dinput['double']['dratio'])
 
-            if dinput['double'].get('dshift') is None:
-                dshift = (
-                    sol_x[:, dind['dshift']['x']]
-                    * scales[:, dind['dshift']['x']]
-                )
-            else:
-                dshift = np.full((nspect,), dinput['double']['dshift'])
-
-    if verbose > 0:
-        dt = (dtm.datetime.now() - t0).total_seconds()
-        msg = (
-            "Total computation time:"
-            + "\t{} s for {} spectra ({} s per spectrum)".format(
-                round(dt, ndigits=3),
-                nspect,
-                round(dt/nspect, ndigits=3)
+            # gtol on projected gradient
+            iconv = np.all(
+                (np.abs(grad[ia, :]) < gtol) | ifix[ia, :], axis=1,
             )
+            status[ia[iconv]] = 1
+            active[ia[iconv]] = False
+
+        ia = active.nonzero()[0]
+        if ia.size == 0:
+            break
+
+        # ---------------------------
+        # Damped normal equations on free parameters, Marquardt scaling
+        diag = np.diagonal(hess[ia, ...], axis1=1, axis2=2)
+        diag = np.maximum(diag, 1e-12*np.max(diag, axis=1, keepdims=True))
+        diag = np.maximum(diag, np.finfo(float).tiny)
+        fix = ifix[ia, :]
+        gg = np.where(fix, 0., grad[ia, :])
+        mat = hess[ia, ...] * ~(fix[:, :, None] | fix[:, None, :])
+        mat[:, ix, ix] += np.where(fix, 1., damp[ia, None] * diag)
+        try:
+            dx = np.linalg.solve(mat, -gg[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            dx = np.array([
+                np.linalg.lstsq(mat[jj], -gg[jj], rcond=None)[0]
+                for jj in range(ia.size)
+            ])
+
+        # bounds enforced by projection
+        xt = np.clip(x[ia, :] + dx, lb, ub)
+        dx = xt - x[ia, :]
+        rest = func_cost(xt, **_kw(ia))
+        cct = 0.5*np.sum(rest**2, axis=1)
+        nf[ia] += 1
+
+        # ---------------------------
+        # Gain ratio: actual vs predicted (quadratic model) reduction
+        pred = -(
+            np.sum(grad[ia, :]*dx, axis=1)
+            + 0.5*np.einsum('ij,ijk,ik->i', dx, hess[ia, ...], dx)
         )
-        print(msg)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rho = (cc[ia] - cct) / pred
+        rho[~np.isfinite(rho)] = -1.
+
+        # ---------------------------
+        # Accept / reject, per spectrum
+        acc = (cct < cc[ia]) & (rho > 0)
+        iacc = ia[acc]
+        ftolok = (
+            ((cc[iacc] - cct[acc]) < ftol * cc[iacc]) & (rho[acc] > 0.25)
+        )
+        x[iacc, :] = xt[acc, :]
+        res[iacc, :] = rest[acc, :]
+        cc[iacc] = cct[acc]
+        damp[iacc] *= np.maximum(1./3., 1. - (2.*rho[acc] - 1.)**3)
+        nu[iacc] = 2.
+        irej = ia[~acc]
+        damp[irej] *= nu[irej]
+        nu[irej] *= 2.
+
+        iup[:] = False
+        iup[iacc] = True
+
+        # ---------------------------
+        # Convergence
+        xtolok = (
+            np.sqrt(np.sum(dx**2, axis=1))
+            < xtol * (xtol + np.sqrt(np.sum(x[ia, :]**2, axis=1)))
+        )
+        status[iacc[ftolok]] = 2
+        status[ia[xtolok & (status[ia] == -1)]] = 3
+        status[ia[(nf[ia] >= max_nfev) & (status[ia] == -1)]] = 0
+        active[ia] = status[ia] == -1
+        iup &= active
 
     # ---------------------------
-    # Format output as dict
-    dfit = {
-        'dinput': dinput,
-        'scales': scales, 'x0': x0, 'bounds': bounds,
-        'jac': jac, 'sol_x': sol_x,
-        'dratio': dratio, 'dshift': dshift,
-        'indx': indx,
-        'time': time, 'success': success,
-        'validity': validity,
-        'dvalidity': _DVALIDITY,
-        'errmsg': np.array(errmsg),
-        'cost': cost, 'nfev': nfev, 'msg': np.array(message),
-        'phi': phi,
-        'const': const,
-        'dsat': dsat,
-        'xtol': xtol, 'ftol': ftol, 'gtol': gtol,
-    }
-    return dfit
+    # Store
+    dt = (dtm.datetime.now() - t0).total_seconds()
+    for jj, ii in enumerate(ind):
+        if status[jj] == -2:
+            continue
+        success[ii] = status[jj] > 0
+        cost[ii] = cc[jj]
+        nfev[ii] = nf[jj]
+        message[ii] = _DMSG_BATCH[status[jj]]
+        time[ii] = round(dt / ind.size, ndigits=3)
+        sol_x[ii, indx] = x[jj, :]
+        sol_x[ii, ~indx] = const[ii, :] / scales[ii, ~indx]
+
+    # verbose
+    if verbose in [1, 2]:
+        for ii in range(nspect):
+            if validity[ii] == 0:
+                col = [
+                    '{:5.3e}'.format(cost[ii]), str(int(nfev[ii])), ' - ',
+                    message[ii],
+                ]
+            else:
+                col = [' - ', ' - ', ' - ', errmsg[ii]]
+            col = np.char.array(
+                ['{} / {}'.format(ii+1, nspect), '{}'.format(time[ii])]
+                + col
+            )
+            msg = ' '.join([cc.ljust(maxl) for cc in col])
+            if verbose == 1:
+                end = '\n' if ii == nspect - 1 else '\r'
+                print(msg, end=end, flush=True)
+            else:
+                print(msg, end='\n')
 
 
 ###########################################################
@@ -845,7 +1381,7 @@ def fit1d(
     method=None, tr_solver=None, tr_options=None,
     xtol=None, ftol=None, gtol=None,
     max_nfev=None, loss=None, chain=None,
-    jac=None, verbose=None, strict=None,
+    jac=None, verbose=None, strict=None, n_workers=None, batch=None,
     # saving
     save=None,
     name=None,
@@ -912,6 +1448,8 @@ def fit1d(
             verbose=verbose,
             jac=jac,
             strict=strict,
+            n_workers=n_workers,
+            batch=batch,
         )
 
     # ----------------------
@@ -963,7 +1501,7 @@ def fit2d(
     xtol=None, ftol=None, gtol=None,
     max_nfev=None, loss=None, chain=None,
     jac=None,
-    verbose=None, strict=None,
+    verbose=None, strict=None, n_workers=None,
     # saving
     save=None,
     name=None,
@@ -1031,6 +1569,7 @@ def fit2d(
             loss=loss,
             jac=jac,
             strict=strict,
+            n_workers=n_workers,
         )
 
     # ----------------------
@@ -338,6 +338,172 @@ def multigausfit1d_from_dlines_funccostjac(
 
     return func_detail, cost, jacob
 
+
+def multigausfit1d_from_dlines_funccostjac_batch(
+    lamb=None,
+    indx=None,
+    dinput=None,
+    dind=None,
+    **kwdargs,
+):
+    """ Return cost and jacobian functions for many spectra at once
+
+    Same model as multigausfit1d_from_dlines_funccostjac(), but for x of
+    shape (nspect, nx) (free parameters only, indx is common to all spectra)
+        - func_cost() returns residuals of shape (nspect, nlamb)
+        - func_jac() returns jacobians of shape (nspect, nlamb, nx)
+    Residuals and jacobians are set to 0 where indok is False
+
+    """
+
+    ibckax = dind['bck_amp']['x'][0, :]
+    ibckrx = dind['bck_rate']['x'][0, :]
+    iax = dind['amp']['x'][0, :]
+    iwx = dind['width']['x'][0, :]
+    ishx = dind['shift']['x'][0, :]
+    double = dinput['double']
+    idratiox, idshx = None, None
+    if double is not False:
+        if double is True or double.get('dratio') is None:
+            idratiox = dind['dratio']['x'][0, :]
+        if double is True or double.get('dshift') is None:
+            idshx = dind['dshift']['x'][0, :]
+
+    ial = dind['amp']['lines'][0, :]
+    iwl = dind['width']['lines'][0, :]
+    ishl = dind['shift']['lines'][0, :]
+
+    coefsal = dinput['amp']['coefs'][None, :]
+    coefswl = dinput['width']['coefs'][None, :]
+    coefssl = dinput['shift']['coefs'][None, :]
+    offsetal = dinput['amp']['offset'][None, :]
+    offsetwl = dinput['width']['offset'][None, :]
+    offsetsl = dinput['shift']['offset'][None, :]
+
+    lambrel = (lamb - dinput['lambmin_bck'])[None, :]
+    lambnorm = (lamb[..., None]/dinput['lines'][None, ...])[None, ...]
+
+    nlines = dinput['nlines']
+    if indx is None:
+        indx = np.ones((dind['sizex'],), dtype=bool)
+
+    # sum on lines sharing a parameter as a (nlines, nparam) product
+    def _get_sum_matrix(lind, coefs):
+        mat = np.zeros((nlines, len(lind)), dtype=float)
+        for jj, ind in enumerate(lind):
+            mat[ind, jj] = coefs[0, ind]
+        return mat
+
+    mata = _get_sum_matrix(dind['amp']['jac'], coefsal)
+    matw = _get_sum_matrix(dind['width']['jac'], coefswl)
+    mats = _get_sum_matrix(dind['shift']['jac'], coefssl)
+
+    def _get_xscale(x, scales, const):
+        xscale = np.full(scales.shape, np.nan)
+        xscale[:, indx] = x*scales[:, indx]
+        xscale[:, ~indx] = const
+        return xscale
+
+    def _get_intermediates(xscale):
+        # shape (nspect, 1, nlines)
+        amp = (xscale[:, ial] * coefsal + offsetal)[:, None, :]
+        wi2 = (xscale[:, iwl] * coefswl + offsetwl)[:, None, :]
+        shift = (xscale[:, ishl] * coefssl + offsetsl)[:, None, :]
+        # shape (nspect, nlamb)
+        expbck = np.exp(xscale[:, ibckrx[0]][:, None] * lambrel)
+
+        dratio, dshift = None, None
+        if double is not False:
+            if double is True:
+                dratio = xscale[:, idratiox[0]]
+                dshift = shift + xscale[:, idshx[0]][:, None, None]
+            else:
+                if idratiox is None:
+                    dratio = double['dratio']
+                else:
+                    dratio = xscale[:, idratiox[0]]
+                if idshx is None:
+                    dshift = shift + double['dshift']
+                else:
+                    dshift = shift + xscale[:, idshx[0]][:, None, None]
+            dratio = np.broadcast_to(dratio, (xscale.shape[0],))
+            dratio = dratio[:, None, None]
+        return amp, wi2, shift, expbck, dratio, dshift
+
+    def func_cost(x, scales=None, const=None, data=None, indok=None):
+        xscale = _get_xscale(x, scales, const)
+        amp, wi2, shift, expbck, dratio, dshift = _get_intermediates(xscale)
+
+        y = (
+            np.nansum(
+                amp * np.exp(-(lambnorm - (1 + shift))**2 / (2*wi2)),
+                axis=-1,
+            )
+            + xscale[:, ibckax[0]][:, None] * expbck
+        )
+        if double is not False:
+            y += np.nansum(
+                amp * dratio * np.exp(-(lambnorm - (1 + dshift))**2 / (2*wi2)),
+                axis=-1,
+            )
+        return np.where(indok, y - data, 0.)
+
+    def func_jac(x, scales=None, const=None, data=None, indok=None):
+        xscale = _get_xscale(x, scales, const)
+        amp, wi2, shift, expbck, dratio, dshift = _get_intermediates(xscale)
+        jac = np.zeros(indok.shape + (xscale.shape[1],), dtype=float)
+
+        beta = (lambnorm - (1 + shift)) / (2*wi2)
+        alpha = -beta**2 * (2*wi2)
+        exp = np.exp(alpha)
+
+        # Background
+        jac[..., ibckax[0]] = scales[:, ibckax[0]][:, None] * expbck
+        jac[..., ibckrx[0]] = (
+            (xscale[:, ibckax[0]] * scales[:, ibckrx[0]])[:, None]
+            * lambrel * expbck
+        )
+
+        # amp, width2, shift
+        jac[..., iax] = np.matmul(exp, mata)
+        jac[..., iwx] = np.matmul(-alpha * amp * exp / wi2, matw)
+        jac[..., ishx] = np.matmul(amp * 2. * beta * exp, mats)
+
+        if double is not False:
+            betad = (lambnorm - (1 + dshift)) / (2*wi2)
+            alphad = -betad**2 * (2*wi2)
+            expd = np.exp(alphad)
+
+            jac[..., iax] += dratio * np.matmul(expd, mata)
+            jac[..., iwx] += dratio * np.matmul(
+                -alphad * amp * expd / wi2, matw,
+            )
+            jac[..., ishx] += dratio * np.matmul(
+                amp * 2. * betad * expd, mats,
+            )
+
+            if idratiox is not None:
+                jac[..., idratiox[0]] = np.sum(amp * expd, axis=-1)
+            if idshx is not None:
+                jac[..., idshx[0]] = dratio[..., 0] * np.sum(
+                    amp * 2. * betad * expd, axis=-1,
+                )
+
+        # scales of all parameters except dratio / dshift (scaled above)
+        jac[..., iax] *= scales[:, None, iax]
+        jac[..., iwx] *= scales[:, None, iwx]
+        jac[..., ishx] *= scales[:, None, ishx]
+        if idratiox is not None:
+            jac[..., idratiox[0]] *= scales[:, idratiox[0]][:, None]
+        if idshx is not None:
+            jac[..., idshx[0]] *= scales[:, idshx[0]][:, None]
+
+        jac[~indok, :] = 0.
+        return jac[..., indx]
+
+    return func_cost, func_jac
+
+
 ###########################################################
 ###########################################################
 #
@@ -347,6 +513,50 @@ def multigausfit1d_from_dlines_funccostjac(
 ###########################################################
 
 
+def get_bs2d_flat(phi_flat=None, km=None, kpb=None, nbs=None, libs=None):
+    """ Return the (nphi, nbs) sparse csc matrix of bsplines values at phi
+
+    Only the support of each bspline (libs) is stored
+    Can be computed once per geometry and re-used for all iterations / time
+    """
+    if libs is None:
+        libs = [
+            (phi_flat >= km[ii]) & (phi_flat <= km[ii + kpb - 1])
+            for ii in range(nbs)
+        ]
+    lind = [ibs.nonzero()[0] for ibs in libs]
+    lbs = [
+        BSpline.basis_element(
+            km[ii:ii+kpb],
+            extrapolate=False,
+        )(phi_flat[lind[ii]])
+        for ii in range(nbs)
+    ]
+
+    # check bspline
+    if any([np.any(~np.isfinite(bs)) for bs in lbs]):
+        msg = "Non-finite values in bs (affecting jacobian)!"
+        raise Exception(msg)
+
+    return scpsparse.csc_matrix(
+        (
+            np.concatenate(lbs),
+            np.concatenate(lind),
+            np.r_[0, np.cumsum([ind.size for ind in lind])],
+        ),
+        shape=(phi_flat.size, nbs),
+    )
+
+
+def _eval_bs(BS, coefs, phi_flat, bs_flat):
+    """ Evaluate bsplines of coefs at phi_flat, with pre-computed values """
+    if bs_flat is None:
+        BS.c = coefs
+        return BS(phi_flat)
+    else:
+        return bs_flat.dot(coefs)
+
+
 def multigausfit2d_from_dlines_funccostjac(
     phi_flat=None,
     dinput=None,
@@ -354,6 +564,15 @@ def multigausfit2d_from_dlines_funccostjac(
     jac=None,
 ):
 
+    if jac is None:
+        jac = _JAC
+    if jac not in ['dense', 'sparse']:
+        msg = (
+            "For 2d fitting, arg jac must be in ['dense', 'sparse']\n"
+            + "\t- provided: {}".format(jac)
+        )
+        raise Exception(msg)
+
     return_costjac = phi_flat is not None
 
     ibckax = dind['bck_amp']['x']
@@ -592,6 +811,7 @@ def multigausfit2d_from_dlines_funccostjac(
             lambn_flat=None,
             jac0=None,
             libs=None,
+            bs_flat=None,
             **dkwdargs,
         ):
 
@@ -605,18 +825,22 @@ def multigausfit2d_from_dlines_funccostjac(
                 xscale[~indx] = const
 
             # Background
-            BS.c = xscale[ibckax][:, 0]
-            bcka = BS(phi_flat)
-            BS.c = xscale[ibckrx][:, 0]
-            y = bcka * np.exp(BS(phi_flat)*lambrel_flat)
+            bcka = _eval_bs(BS, xscale[ibckax][:, 0], phi_flat, bs_flat)
+            y = bcka * np.exp(
+                _eval_bs(BS, xscale[ibckrx][:, 0], phi_flat, bs_flat)
+                * lambrel_flat
+            )
 
             # make sure iwl is 2D to get all lines at once
-            BS.c = xscale[ial] * coefsal + offsetal
-            amp = BS(phi_flat)
-            BS.c = xscale[iwl] * coefswl + offsetwl
-            wi2 = BS(phi_flat)
-            BS.c = xscale[ishl] * coefssl + offsetsl
-            csh = BS(phi_flat)
+            amp = _eval_bs(
+                BS, xscale[ial] * coefsal + offsetal, phi_flat, bs_flat,
+            )
+            wi2 = _eval_bs(
+                BS, xscale[iwl] * coefswl + offsetwl, phi_flat, bs_flat,
+            )
+            csh = _eval_bs(
+                BS, xscale[ishl] * coefssl + offsetsl, phi_flat, bs_flat,
+            )
 
             y += np.nansum(
                 amp * np.exp(-(lambn_flat - (1 + csh))**2 / (2*wi2)),
@@ -651,6 +875,7 @@ def multigausfit2d_from_dlines_funccostjac(
             lambn_flat=None,
             jac0=None,
             libs=None,
+            bs_flat=None,
             **dkwdargs,
         ):
             """ Basic docstr """
@@ -660,144 +885,177 @@ def multigausfit2d_from_dlines_funccostjac(
                 xscale[indx] = x*scales[indx]
                 xscale[~indx] = const
 
-            # Intermediates
+            # bsplines values, unless pre-computed
+            if bs_flat is None:
+                bs_flat = get_bs2d_flat(
+                    phi_flat=phi_flat, km=km, kpb=kpb, nbs=nbs, libs=libs,
+                )
 
-            # Loop on bs
-            for ii in range(nbs):
+            # jacobian filled in place or assembled as sparse
+            if jac == 'sparse':
+                lrow, lcol, lval = [], [], []
 
-                # phi interval
-                ibs = libs[ii]
-
-                # bspline
-                bs = BSpline.basis_element(
-                    km[ii:ii+kpb],
-                    extrapolate=False,
-                )(phi_flat[ibs])[:, None]
-
-                # check bspline
-                if np.any(~np.isfinite(bs)):
-                    msg = "Non-finite values in bs (affecting jacobian)!"
-                    raise Exception(msg)
-
-                # Intermediates - background
-                BS.c = xscale[ibckax[:, 0]]
-                bcka = BS(phi_flat[ibs])
-                BS.c[...] = xscale[ibckrx[:, 0]]
-                bckr = BS(phi_flat[ibs])
-                expbck = np.exp(bckr*lambrel_flat[ibs])
-
-                # Intermediates - amp, wi2, shift
-                BS.c = xscale[ial] * coefsal + offsetal
-                amp = BS(phi_flat[ibs])
-                BS.c[...] = xscale[iwl] * coefswl + offsetwl
-                wi2 = BS(phi_flat[ibs])
-                BS.c[...] = xscale[ishl] * coefssl + offsetsl
-                shift = BS(phi_flat[ibs])
-
-                beta = (lambn_flat[ibs, :] - (1 + shift)) / (2*wi2)
+                # (dratio and dshift have negative indices)
+                def setjac(ibs, ix, val, add=False):
+                    lrow.append(ibs)
+                    lcol.append(np.full(ibs.shape, ix % xscale.size))
+                    lval.append(val)
+            else:
+                def setjac(ibs, ix, val, add=False):
+                    if add is True:
+                        jac0[ibs, ix] += val
+                    else:
+                        jac0[ibs, ix] = val
+
+            # Intermediates - background (all points at once)
+            bcka = bs_flat.dot(xscale[ibckax[:, 0]])
+            bckr = bs_flat.dot(xscale[ibckrx[:, 0]])
+            expbck = np.exp(bckr*lambrel_flat)
+
+            # Intermediates - amp, wi2, shift
+            amp = bs_flat.dot(xscale[ial] * coefsal + offsetal)
+            wi2 = bs_flat.dot(xscale[iwl] * coefswl + offsetwl)
+            shift = bs_flat.dot(xscale[ishl] * coefssl + offsetsl)
+
+            # points not covered by any bspline (wi2 = 0) are never used
+            with np.errstate(divide='ignore', invalid='ignore'):
+                beta = (lambn_flat - (1 + shift)) / (2*wi2)
                 alpha = -beta**2 * (2*wi2)
-                # exp = np.exp(alpha)
-                bsexp = bs * np.exp(alpha)
+                exp = np.exp(alpha)
+
+                if double is not False:
+                    if double is True:
+                        dratio = xscale[idratiox[:, 0]]
+                        # coefssl are line-specific, they do not affect dshift
+                        dshift = shift + xscale[idshx[:, 0]]
+                    else:
+                        dratio = double.get('dratio', xscale[idratiox[:, 0]])
+                        dshift = shift + double.get(
+                            'dshift', xscale[idshx[:, 0]],
+                        )
+
+                    # ampd = amp*dratio
+                    betad = (lambn_flat - (1 + dshift)) / (2*wi2)
+                    alphad = -betad**2 * (2*wi2)
+                    expd = np.exp(alphad)
+
+            # Loop on bs, only on their support
+            for ii in range(nbs):
+
+                # phi interval and bspline
+                ibs = bs_flat.indices[bs_flat.indptr[ii]:bs_flat.indptr[ii+1]]
+                bs = bs_flat.data[bs_flat.indptr[ii]:bs_flat.indptr[ii+1]]
+                bs = bs[:, None]
+                bsexp = bs * exp[ibs, :]
+                ampi, wi2i = amp[ibs, :], wi2[ibs, :]
+                alphai, betai = alpha[ibs, :], beta[ibs, :]
 
                 # Background amplitude
-                jac0[ibs, ibckax[ii, 0]] = (
-                    bs[:, 0] * scales[ibckax[ii, 0]] * expbck
+                setjac(
+                    ibs, ibckax[ii, 0],
+                    bs[:, 0] * scales[ibckax[ii, 0]] * expbck[ibs],
                 )
 
                 # Background rate
-                jac0[ibs, ibckrx[ii, 0]] = (
+                setjac(
+                    ibs, ibckrx[ii, 0],
                     bs[:, 0] * scales[ibckrx[ii, 0]]
-                    * lambrel_flat[ibs] * bcka * expbck
+                    * lambrel_flat[ibs] * bcka[ibs] * expbck[ibs],
                 )
 
                 # amp (shape: nphi/lamb, namp[jj])
                 for jj in range(len(iaj)):
                     ix = iax[ii, jj]
-                    jac0[ibs, ix] = np.sum(
+                    setjac(ibs, ix, np.sum(
                         bsexp[:, iaj[jj]] * coefsal[:, iaj[jj]],
                         axis=1,
-                    ) * scales[ix]
+                    ) * scales[ix])
 
                 # width2
                 for jj in range(len(iwj)):
                     ix = iwx[ii, jj]
-                    jac0[ibs, ix] = np.sum(
+                    setjac(ibs, ix, np.sum(
                         (
-                            -alpha[:, iwj[jj]] * amp[:, iwj[jj]]
+                            -alphai[:, iwj[jj]] * ampi[:, iwj[jj]]
                             * bsexp[:, iwj[jj]] * coefswl[:, iwj[jj]]
-                            / wi2[:, iwj[jj]]
+                            / wi2i[:, iwj[jj]]
                         ),
                         axis=1,
-                    ) * scales[ix]
+                    ) * scales[ix])
 
                 # shift
                 for jj in range(len(ishj)):
                     ix = ishx[ii, jj]
-                    jac0[ibs, ix] = np.sum(
+                    setjac(ibs, ix, np.sum(
                         (
-                            amp[:, ishj[jj]] * 2. * beta[:, ishj[jj]]
+                            ampi[:, ishj[jj]] * 2. * betai[:, ishj[jj]]
                             * bsexp[:, ishj[jj]] * coefssl[:, ishj[jj]]
                         ),
                         axis=1,
-                    ) * scales[ix]
+                    ) * scales[ix])
 
                 # double
                 if double is False:
                     continue
 
-                if double is True:
-                    dratio = xscale[idratiox[:, 0]]
-                    # coefssl are line-specific, they do not affect dshift
-                    dshift = shift + xscale[idshx[:, 0]]
-                else:
-                    dratio = double.get('dratio', xscale[idratiox[:, 0]])
-                    dshift = shift + double.get('dshift', xscale[idshx[:, 0]])
-
-                # ampd = amp*dratio
-                betad = (lambn_flat[ibs, :] - (1 + dshift)) / (2*wi2)
-                alphad = -betad**2 * (2*wi2)
-                expd = np.exp(alphad)
-                bsexpd = bs * expd
+                bsexpd = bs * expd[ibs, :]
+                alphadi, betadi = alphad[ibs, :], betad[ibs, :]
 
                 # amp
                 for jj in range(len(iaj)):
                     ix = iax[ii, jj]
-                    jac0[ibs, ix] += dratio*np.sum(
+                    setjac(ibs, ix, dratio*np.sum(
                         bsexpd[:, iaj[jj]] * coefsal[:, iaj[jj]],
                         axis=1,
-                    ) * scales[ix]
+                    ) * scales[ix], add=True)
 
                 # width2
                 for jj in range(len(iwj)):
                     ix = iwx[ii, jj]
-                    jac0[ibs, ix] += np.sum(
-                        (-alphad[:, iwj[jj]] * amp[:, iwj[jj]]
+                    setjac(ibs, ix, np.sum(
+                        (-alphadi[:, iwj[jj]] * ampi[:, iwj[jj]]
                          * bsexpd[:, iwj[jj]] * coefswl[:, iwj[jj]]
-                         / wi2[:, iwj[jj]]),
+                         / wi2i[:, iwj[jj]]),
                         axis=1,
-                    ) * scales[ix] * dratio
+                    ) * scales[ix] * dratio, add=True)
 
                 # shift
                 for jj in range(len(ishj)):
                     ix = ishx[ii, jj]
-                    jac0[ibs, ix] += np.sum(
-                        (amp[:, ishj[jj]] * 2.*betad[:, ishj[jj]]
+                    setjac(ibs, ix, np.sum(
+                        (ampi[:, ishj[jj]] * 2.*betadi[:, ishj[jj]]
                          * bsexpd[:, ishj[jj]] * coefssl[:, ishj[jj]]),
                         axis=1,
-                    ) * scales[ix] * dratio
+                    ) * scales[ix] * dratio, add=True)
+
+            # dratio and dshift, on all points covered by a bspline
+            if double is not False:
+                ibs = np.unique(bs_flat.indices)
 
                 # dratio
                 if double is True or double.get('dratio') is None:
-                    jac0[ibs, idratiox[:, 0]] = (
-                        scales[idratiox[:, 0]] * np.sum(amp * expd, axis=1)
-                    )
+                    setjac(ibs, idratiox[0, 0], (
+                        scales[idratiox[0, 0]]
+                        * np.sum(amp[ibs] * expd[ibs], axis=1)
+                    ))
 
                 # dshift
                 if double is True or double.get('dshift') is None:
-                    jac0[ibs, idshx[:, 0]] = dratio * np.sum(
-                        amp * 2.*betad*scales[idshx] * expd,
+                    setjac(ibs, idshx[0, 0], dratio * np.sum(
+                        amp[ibs] * 2.*betad[ibs]*scales[idshx[0, 0]]
+                        * expd[ibs],
                         axis=1,
-                    )
+                    ))
+
+            if jac == 'sparse':
+                jac0 = scpsparse.csc_matrix(
+                    (
+                        np.concatenate(lval),
+                        (np.concatenate(lrow), np.concatenate(lcol)),
+                    ),
+                    shape=(phi_flat.size, xscale.size),
+                )
+
             if indx is None:
                 return jac0
             else:
@@ -2,6 +2,7 @@
 
 # Built-in
 import copy
+import hashlib
 import warnings
 
 
@@ -16,6 +17,12 @@ import matplotlib.gridspec as gridspec
 from . import _rockingcurve_def as _def
 
 
+# small cache of dynamical diffraction results, see
+# CrystBragg_comp_integrated_reflect()
+_CACHE_SIZE = 16
+_DCACHE = {}
+
+
 # ##########################################################
 # ##########################################################
 #                  compute rocking curve
@@ -1215,154 +1222,132 @@ def CrystBragg_comp_integrated_reflect(
     Made to be used within the compute_rockingcurve() method.
     """
 
+    # cached results
+    # --------------
+
+    key_cache = _get_cache_key(
+        lamb=lamb, re=re, Volume=Volume, Zo=Zo, theta=theta, mu=mu,
+        F_re=F_re, psi_re=psi_re, psi0_dre=psi0_dre, psi0_im=psi0_im,
+        Fmod=Fmod, Fbmod=Fbmod, kk=kk, rek=rek,
+        miscut=miscut, alpha=alpha, bb=bb, na=na, nn=nn,
+        therm_exp=therm_exp,
+    )
+    if key_cache in _DCACHE:
+        return copy.deepcopy(_DCACHE[key_cache])
+
     # Perfect (darwin) and ideally thick mosaic models
     # ------------------------------------------------
 
-    P_per = np.full((theta.size), np.nan)
-    P_mos = P_per.copy()
-    for i in range(theta.size):
-        P_per[i] = Zo*F_re[i]*re*(lamb**2)*(1. + abs(np.cos(2.*theta[i])))/(
-            6.*np.pi*Volume[i]*np.sin(2.*theta[i])
-        )
+    P_per = Zo*F_re*re*(lamb**2)*(1. + np.abs(np.cos(2.*theta)))/(
+        6.*np.pi*Volume*np.sin(2.*theta)
+    )
 
-        P_mos[i] = (F_re[i]**2)*(re**2)*(lamb**3)*(
-            1. + (np.cos(2.*theta[i]))**2
-        )/(4.*mu*(Volume[i]**2)*np.sin(2.*theta[i]))
+    P_mos = (F_re**2)*(re**2)*(lamb**3)*(
+        1. + (np.cos(2.*theta))**2
+    )/(4.*mu*(Volume**2)*np.sin(2.*theta))
 
     # Dynamical model
     # ---------------
+    # all arrays broadcast as (polar, theta, alpha, y)
 
     # Incident wave polarization (normal & parallel components)
-    ppval = np.full((theta.size), 1)
-    npval = np.full((theta.size), np.nan)
-    for i in range(theta.size):
-        npval[i] = abs(np.cos(2.*theta[i]))
-    polar = np.concatenate((ppval, npval), axis=0).reshape(2, theta.size)
+    polar = np.array([np.ones((theta.size,)), np.abs(np.cos(2.*theta))])
+
+    polar3 = polar[:, :, None]
+    psi_re3 = psi_re[None, :, None]
+    sin2theta = np.sin(2.*theta)[None, :, None]
+    bb3 = bb[None, :, :]
+    sqbb3 = np.sqrt(np.abs(bb3))
 
     # Variables of simplification y, dy, g, L
-    g = np.full((polar.ndim, theta.size, alpha.size), np.nan)
-    for h in range(polar.ndim):
-        for i in range(theta.size):
-            for j in range(alpha.size):
-                g[h, i, j] = (((1. - bb[i, j])/2.)*psi0_im[i])/(
-                    np.sqrt(abs(bb[i, j]))*polar[h][i]*psi_re[i]
-                )
+    g = (((1. - bb3)/2.)*psi0_im[None, :, None])/(
+        sqbb3*polar3*psi_re3
+    )
     y = np.linspace(-10., 10., 201)
     dy = np.zeros(201) + 0.1
 
-    al = np.full((polar.ndim, theta.size, alpha.size, y.size), 0.)
-    power_ratio = np.full((al.shape), np.nan)
-    power_ratiob = np.full((theta.size, alpha.size, y.size), np.nan)
-    max_pr = np.full((polar.ndim, theta.size, alpha.size), np.nan)
-    ind_max_pr = max_pr.copy()
-    th_max_pr = max_pr.copy()
-    rhy = np.full((theta.size, alpha.size), np.nan)
-    th = np.full((al.shape), np.nan)
-    dth = th.copy()
-    conv_ygscale = np.full((polar.ndim, theta.size, alpha.size), np.nan)
-    rhg = np.full((polar.ndim, theta.size, alpha.size), np.nan)
-
-    for h in range(polar.ndim):
-        for i in range(theta.size):
-            for j in range(alpha.size):
-                al[h, i, j, ...] = (y**2 + g[h, i, j]**2 + np.sqrt(
-                    (y**2 - g[h, i, j]**2 + (kk[i])**2 - 1.)**2 + 4.*(
-                        g[h, i, j]*y - rek[i]
-                    )**2
-                ))/np.sqrt(((kk[i])**2 - 1.)**2 + 4.*(rek[i]**2))
-                # Reflecting power
-                power_ratio[h, i, j, ...] = (Fmod[i]/Fbmod[i])*(
-                    al[h, i, j, :] - np.sqrt(al[h, i, j, :]**2 - 1.)
-                )
-                # Power ratio maximum and its index
-                max_pr[h,i,j] = np.nanmax(power_ratio[h,i,j])
-                ind_max_pr[h, i, j] = np.where(
-                    power_ratio[h, i, j] == max_pr[h, i, j]
-                )[0][0]
-                # Integration of the power ratio over dy
-                power_ratiob[i, j, :] = power_ratio[h, i, j, ...]
-                rhy[i, j] = np.sum(dy*power_ratiob[i, j, :])
-                # Conversion formula from y-scale to glancing angle scale
-                th[h, i, j, ...] = (
-                    -y*polar[h][i]*psi_re[i]*np.sqrt(abs(bb[i, j]))
-                    + psi0_dre[i]*((1. - bb[i, j])/2.)
-                )/(bb[i, j]*np.sin(2.*theta[i]))
-                # Find the glancing angle coordinate of the power ratio maximum
-                ind = int(ind_max_pr[h, i, j])
-                th_max_pr[h, i, j] = th[h, i, j, int(ind_max_pr[h, i, j])]
-                # conversion of (theta-thetaBragg(TD=!0)) scale to
-                # theta scale by adding the value of Theta_B at
-                # alpha=TD=0 in both case
-                dth[h, i, j, ...] = th[h, i, j, :] + theta[i]
-                # Integrated reflecting power in the glancing angle scale
-                # r(i=0): normal component & r(i=1): parallel component
-                conv_ygscale[h, i, ...] = (polar[h][i]*psi_re[i])/(
-                    np.sqrt(abs(bb[i]))*np.sin(2*theta[i])
-                )
-                rhg[h, i, ...] = conv_ygscale[h, i, :]*rhy[i, j]
+    g4 = g[..., None]
+    kk4 = kk[None, :, None, None]
+    rek4 = rek[None, :, None, None]
+    al = (y**2 + g4**2 + np.sqrt(
+        (y**2 - g4**2 + kk4**2 - 1.)**2 + 4.*(
+            g4*y - rek4
+        )**2
+    ))/np.sqrt((kk4**2 - 1.)**2 + 4.*(rek4**2))
+
+    # Reflecting power
+    power_ratio = (Fmod/Fbmod)[None, :, None, None]*(
+        al - np.sqrt(al**2 - 1.)
+    )
+
+    # Power ratio maximum
+    max_pr = np.nanmax(power_ratio, axis=-1)
+
+    # Integration of the power ratio over dy
+    rhy = np.sum(dy*power_ratio, axis=-1)
+
+    # Conversion formula from y-scale to glancing angle scale
+    th = (
+        -y*polar3[..., None]*psi_re3[..., None]*sqbb3[..., None]
+        + psi0_dre[None, :, None, None]*((1. - bb3[..., None])/2.)
+    )/(bb3[..., None]*sin2theta[..., None])
+
+    # conversion of (theta-thetaBragg(TD=!0)) scale to
+    # theta scale by adding the value of Theta_B at
+    # alpha=TD=0 in both case
+    dth = th + theta[None, :, None, None]
+
+    # Integrated reflecting power in the glancing angle scale
+    # r(i=0): normal component & r(i=1): parallel component
+    conv_ygscale = (polar3*psi_re3)/(sqbb3*sin2theta)
+    rhg = conv_ygscale*rhy
 
     # Integrated reflectivity and rocking curve widths
-    def lin_interp(x, y, i, half):
-        return x[i] + (x[i+1] - x[i])*((half - y[i])/(y[i+1] - y[i]))
-
-    def half_max_x(x, y):
-        half = np.max(y)/2.
-        signs = np.sign(np.add(y, -half))
-        zero_cross = (signs[0:-2] != signs[1:-1])
-        zero_cross_ind = np.where(zero_cross)[0]
-        return [
-            lin_interp(x, y, zero_cross_ind[0], half),
-            lin_interp(x, y, zero_cross_ind[1], half),
-        ]
-
-    P_dyn = np.full((theta.size, alpha.size), np.nan)
-    (
-        rhg_perp, rhg_para, pat_cent_perp, pat_cent_para,
-        det_perp, det_para, shift_perp, shift_para,
-    ) = (
-        P_dyn.copy(), P_dyn.copy(), P_dyn.copy(), P_dyn.copy(), P_dyn.copy(),
-        P_dyn.copy(), P_dyn.copy(), P_dyn.copy(),
-    )
+    rhg_perp = rhg[0].copy()
+    rhg_para = rhg[1].copy()
 
-    for i in range(theta.size):
-        for j in range(alpha.size):
-            rhg_perp[i, j] = rhg[0, i, j]
-            rhg_para[i, j] = rhg[1, i, j]
-            # Each component accounts for half the intensity of the incident
-            # beam; if not polarized, the reflecting power is an average over
-            # the 2 polarization states
-            P_dyn[i, j] = np.sum(rhg[:, i, j])/2.
-            if P_dyn[i, j] < 1e-9:
-                msg = (
-                    "Please check the equations for integrated reflectivity, "
-                    "some values lower than 1e-9:\n"
-                    f"\t- P_dyn[{i}, {j}] = {P_dyn[i, j]}\n"
-                    f"\t- rhg[:, {i}, {j}] = {rhg[:, i, j]}\n"
-                    f"\t- conv_ygscale[:, {i}, {j}] = {conv_ygscale[:, i, j]}\n"
-                    f"\t- rhy[{i}, {j}] = {rhy[i, j]}\n"
-                    f"\t- dy = {np.mean(dy)}\n"
-                    f"\t- Fmod[{i}]/Fbmod[{i}] = {Fmod[i]/Fbmod[i]}\n"
-                    f"\t- g[:, {i}, {j}] = {g[:, i, j]}\n"
-                    f"\t- kk[{i}] = {kk[i]}\n"
-                    f"\t- rek[{i}] = {rek[i]}\n"
-                    f"\t- bb[{i}, {j}] = {bb[i, j]}\n"
-                    f"\t- psi0_im[i] = {psi0_im[i]}\n"
-                    f"\t- psi_re[i] = {psi_re[i]}\n"
-                    f"\t- polar[:][{i}] = {polar[:, i]}\n"
-                    f"\t- power_ratiob[{i}, {j}, :] = {power_ratiob[i, j, :]}\n"
-                    f"\t- al[:, {i}, {j}, :] = {al[:, i, j, :]}\n"
-                )
-                raise Exception(msg)
+    # Each component accounts for half the intensity of the incident
+    # beam; if not polarized, the reflecting power is an average over
+    # the 2 polarization states
+    P_dyn = np.sum(rhg, axis=0)/2.
+
+    ibad = (P_dyn < 1e-9).nonzero()
+    if ibad[0].size > 0:
+        i, j = ibad[0][0], ibad[1][0]
+        msg = (
+            "Please check the equations for integrated reflectivity, "
+            "some values lower than 1e-9:\n"
+            f"\t- P_dyn[{i}, {j}] = {P_dyn[i, j]}\n"
+            f"\t- rhg[:, {i}, {j}] = {rhg[:, i, j]}\n"
+            f"\t- conv_ygscale[:, {i}, {j}] = {conv_ygscale[:, i, j]}\n"
+            f"\t- rhy[:, {i}, {j}] = {rhy[:, i, j]}\n"
+            f"\t- dy = {np.mean(dy)}\n"
+            f"\t- Fmod[{i}]/Fbmod[{i}] = {Fmod[i]/Fbmod[i]}\n"
+            f"\t- g[:, {i}, {j}] = {g[:, i, j]}\n"
+            f"\t- kk[{i}] = {kk[i]}\n"
+            f"\t- rek[{i}] = {rek[i]}\n"
+            f"\t- bb[{i}, {j}] = {bb[i, j]}\n"
+            f"\t- psi0_im[i] = {psi0_im[i]}\n"
+            f"\t- psi_re[i] = {psi_re[i]}\n"
+            f"\t- polar[:][{i}] = {polar[:, i]}\n"
+            f"\t- power_ratio[:, {i}, {j}, :] = {power_ratio[:, i, j, :]}\n"
+            f"\t- al[:, {i}, {j}, :] = {al[:, i, j, :]}\n"
+        )
+        raise Exception(msg)
+
+    # Coordinates of full width at mid high sides of FWHM
+    hmx = _get_half_max_x(dth, power_ratio)
 
-            # Coordinates of full width at mid high sides of FWHM
-            hmx_perp = half_max_x(dth[0, i, j, :], power_ratio[0, i, j, :])
-            hmx_para = half_max_x(dth[1, i, j, :], power_ratio[1, i, j, :])
-            # Center of FWMH
-            pat_cent_perp[i, j] = (hmx_perp[1] + hmx_perp[0])/2.
-            pat_cent_para[i, j] = (hmx_para[1] + hmx_para[0])/2.
-            # Width of FWMH
-            det_perp[i, j] = hmx_perp[1] - hmx_perp[0]
-            det_para[i, j] = hmx_para[1] - hmx_para[0]
+    # Center of FWMH
+    pat_cent_perp = (hmx[0, ..., 1] + hmx[0, ..., 0])/2.
+    pat_cent_para = (hmx[1, ..., 1] + hmx[1, ..., 0])/2.
+
+    # Width of FWMH
+    det_perp = hmx[0, ..., 1] - hmx[0, ..., 0]
+    det_para = hmx[1, ..., 1] - hmx[1, ..., 0]
+
+    shift_perp = np.full(P_dyn.shape, np.nan)
+    shift_para = shift_perp.copy()
 
     # Normalization for DeltaT=0 & alpha=0 and
     # computation of the shift in glancing angle corresponding to
@@ -1396,7 +1381,7 @@ def CrystBragg_comp_integrated_reflect(
                     )
 
     if miscut is False and therm_exp is False:
-        return (
+        out = (
             alpha, bb,
             polar, g, y,
             power_ratio, max_pr,
@@ -1407,7 +1392,7 @@ def CrystBragg_comp_integrated_reflect(
             pat_cent_perp, pat_cent_para,
         )
     else:
-        return (
+        out = (
             alpha, bb,
             polar, g, y,
             power_ratio, max_pr,
@@ -1422,6 +1407,57 @@ def CrystBragg_comp_integrated_reflect(
             pat_cent_perp, pat_cent_para,
         )
 
+    # store in cache (oldest entries removed first)
+    if len(_DCACHE) >= _CACHE_SIZE:
+        del _DCACHE[next(iter(_DCACHE))]
+    _DCACHE[key_cache] = copy.deepcopy(out)
+
+    return out
+
+
+def _get_half_max_x(x, y):
+    """ Return the (..., 2) coordinates of both sides of the half maximum
+
+    Computed along the last dimension, by linear interpolation at the first
+    two changes of sign of (y - max(y)/2)
+    """
+
+    half = np.max(y, axis=-1, keepdims=True)/2.
+    signs = np.sign(np.add(y, -half))
+    zero_cross = (signs[..., 0:-2] != signs[..., 1:-1])
+
+    ncross = np.cumsum(zero_cross, axis=-1)
+    if np.any(ncross[..., -1] < 2):
+        ibad = np.unravel_index(np.argmin(ncross[..., -1]), ncross.shape[:-1])
+        msg = (
+            "Rocking curve half maximum could not be found (2 sides)!\n"
+            f"\t- index: {ibad}\n"
+            f"\t- max: {2*half[ibad][0]}\n"
+        )
+        raise Exception(msg)
+
+    ind = np.stack(
+        [np.argmax(ncross >= 1, axis=-1), np.argmax(ncross >= 2, axis=-1)],
+        axis=-1,
+    )
+
+    x0 = np.take_along_axis(x, ind, axis=-1)
+    x1 = np.take_along_axis(x, ind + 1, axis=-1)
+    y0 = np.take_along_axis(y, ind, axis=-1)
+    y1 = np.take_along_axis(y, ind + 1, axis=-1)
+    return x0 + (x1 - x0)*((half - y0)/(y1 - y0))
+
+
+def _get_cache_key(**kwdargs):
+    """ Return a hash of the inputs of the dynamical diffraction model """
+
+    hh = hashlib.sha256()
+    for k0 in sorted(kwdargs.keys()):
+        v0 = np.asarray(kwdargs[k0])
+        hh.update(f"{k0}{v0.dtype}{v0.shape}".encode())
+        hh.update(np.ascontiguousarray(v0).tobytes())
+    return hh.hexdigest()
+
 
 # ##########################################################
 # ##########################################################
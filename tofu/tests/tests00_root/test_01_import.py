@@ -0,0 +1,59 @@
+"""
+This module contains tests for the lazy top-level import of tofu
+"""
+
+# External modules
+import os
+import sys
+import subprocess
+
+
+_here = os.path.abspath(os.path.dirname(__file__))
+_PATH_TOFU = os.path.dirname(os.path.dirname(os.path.dirname(_here)))
+
+
+#######################################################
+#
+#     Tests
+#
+#######################################################
+
+
+def _run(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [_PATH_TOFU, env.get('PYTHONPATH', '')]
+    )
+    out = subprocess.run(
+        [sys.executable, '-c', code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return out.stdout.strip()
+
+
+class Test01_Import(object):
+
+    def test01_import_is_lazy(self):
+
+        # nothing heavy is loaded by "import tofu"
+        code = (
+            "import sys; import tofu; "
+            "lm = ['tofu.geom', 'tofu.data', 'tofu.spectro', 'tofu.tests', "
+            "'tofu.utils', 'matplotlib', 'bsplines2d', 'scipy']; "
+            "print([mm for mm in lm if mm in sys.modules])"
+        )
+        assert _run(code) == '[]'
+
+    def test02_lazy_attributes(self):
+
+        code = (
+            "import tofu as tf; "
+            "print(tf.geom.__name__, tf.spectro.__name__, "
+            "tf.load_config.__name__, tf.save.__name__, "
+            "'geom' in dir(tf), hasattr(tf, 'nonexisting'))"
+        )
+        out = _run(code)
+        assert out == 'tofu.geom tofu.spectro create_config save True False'
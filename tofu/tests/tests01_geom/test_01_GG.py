@@ -2022,4 +2022,125 @@ def test24_is_visible(debug=0):
         fig.savefig("test3")
 
         print(are_vis)
-        print(np.shape(are_vis))
\ No newline at end of file
+        print(np.shape(are_vis))
+
+
+def test25_LOS_PInOut_bvh():
+
+    # many limited OUT structures => the BVH of their bounding boxes is deep
+    rng = np.random.default_rng(0)
+    VP = np.array([[6., 8., 8., 6., 6.], [6., 6., 8., 8., 6.]])
+    VIn = np.array([[0., -1., 0., 1.], [1., 0., -1., 0.]])
+
+    nstruct = 80
+    lpoly, llim = [], []
+    for ii in range(nstruct):
+        r0, z0 = rng.uniform(6.1, 7.7, 2)
+        dd = rng.uniform(0.05, 0.2)
+        lpoly.append(np.array([
+            r0 + dd*np.r_[0., 1., 1., 0., 0.],
+            z0 + dd*np.r_[0., 0., 1., 1., 0.],
+        ]))
+        # 1 to 3 disjoint toroidal extensions
+        nlim = rng.integers(1, 4)
+        phi = np.sort(rng.uniform(-np.pi, np.pi, 2*nlim))
+        llim.append(phi.reshape((nlim, 2)))
+
+    def get_kwdargs(lind):
+        return dict(
+            nstruct_tot=int(np.sum([llim[ii].shape[0] for ii in lind])),
+            nstruct_lim=len(lind),
+            lnvert=np.cumsum([lpoly[ii].shape[1] for ii in lind]),
+            lstruct_polyx=np.concatenate([lpoly[ii][0] for ii in lind]),
+            lstruct_polyy=np.concatenate([lpoly[ii][1] for ii in lind]),
+            lstruct_nlim=np.array([llim[ii].shape[0] for ii in lind]),
+            lstruct_lims=[llim[ii] for ii in lind],
+            lstruct_normx=np.tile(VIn[0], len(lind)),
+            lstruct_normy=np.tile(VIn[1], len(lind)),
+            ves_type='Tor',
+            test=True,
+        )
+
+    # LOS from inside the vessel, in random directions
+    nlos = 2000
+    rr = rng.uniform(6.05, 7.95, nlos)
+    phi = rng.uniform(-np.pi, np.pi, nlos)
+    Ds = np.array([
+        rr*np.cos(phi), rr*np.sin(phi), rng.uniform(6.05, 7.95, nlos),
+    ])
+    us = rng.standard_normal((3, nlos))
+    us = us / np.sqrt(np.sum(us**2, axis=0))[None, :]
+
+    # all structures at once (BVH)
+    kIn, kOut, vperp, indout = GG.LOS_Calc_PInOut_VesStruct(
+        Ds, us, VP, VIn, **get_kwdargs(range(nstruct)),
+    )
+
+    # brute force: vessel alone, then each structure on its own (a single
+    # structure has at most 3 boxes, all tested without pruning)
+    kIn0, kOut0, vperp0, indout0 = GG.LOS_Calc_PInOut_VesStruct(
+        Ds, us, VP, VIn, ves_type='Tor', test=True,
+    )
+    for ii in range(nstruct):
+        kOuti, vperpi, indouti = GG.LOS_Calc_PInOut_VesStruct(
+            Ds, us, VP, VIn, **get_kwdargs([ii]),
+        )[1:]
+        ind = kOuti < kOut0
+        kOut0[ind] = kOuti[ind]
+        vperp0[:, ind] = vperpi[:, ind]
+        indout0[:, ind] = indouti[:, ind]
+        indout0[0, ind] = 1 + ii
+
+    # some LOS hit structures
+    assert np.sum(indout0[0, :] > 0) > nlos // 10
+    assert np.array_equal(kIn, kIn0, equal_nan=True)
+    assert np.array_equal(kOut, kOut0, equal_nan=True)
+    assert np.array_equal(vperp, vperp0, equal_nan=True)
+    assert np.array_equal(indout, indout0)
+
+
+def test26_LOS_PInOut_lim_bbox():
+
+    # one toroidally limited structure, R in [6.5, 7], Z in [-0.25, 0.25]
+    VP = np.array([[6., 8., 8., 6., 6.], [-1., -1., 1., 1., -1.]])
+    VIn = np.array([[0., -1., 0., 1.], [1., 0., -1., 0.]])
+    poly = np.array([
+        [6.5, 7., 7., 6.5, 6.5],
+        [-0.25, -0.25, 0.25, 0.25, -0.25],
+    ])
+
+    # vertical LOS going down at R = 6.9, toroidal angles 0, pi/2, pi, -pi/2
+    phi = np.r_[0., 0.5, 1., -0.5] * np.pi
+    Ds = np.array([6.9*np.cos(phi), 6.9*np.sin(phi), np.full((4,), 0.8)])
+    us = np.tile([[0.], [0.], [-1.]], (1, 4))
+
+    # lims (increasing, or wrapping around pi) => LOS hitting the structure
+    dlim = {
+        (-1.9, -1.3): [3],
+        (1.3, 1.9): [1],
+        (-1.0, -2.0): [0, 1, 2],
+        (2.0, 1.0): [0, 2, 3],
+        (-0.5, 0.5): [0],
+        (2.5, -2.5): [2],
+    }
+
+    for lim, lhit in dlim.items():
+        kOut = GG.LOS_Calc_PInOut_VesStruct(
+            Ds, us, VP, VIn,
+            nstruct_tot=1,
+            nstruct_lim=1,
+            lnvert=np.r_[poly.shape[1]],
+            lstruct_polyx=poly[0],
+            lstruct_polyy=poly[1],
+            lstruct_nlim=np.r_[1],
+            lstruct_lims=[np.array([lim])],
+            lstruct_normx=VIn[0],
+            lstruct_normy=VIn[1],
+            ves_type='Tor',
+            test=True,
+        )[1]
+
+        # top of the structure, else bottom of the vessel
+        kOut0 = np.full((4,), 1.8)
+        kOut0[lhit] = 0.55
+        assert np.allclose(kOut, kOut0), lim
@@ -1199,6 +1199,34 @@ class Test03_Rays(object):
                     assert np.all(k[lind[0]:] >= DL[0][1])
                     assert np.all(k[lind[0]:] <= DL[1][1])
 
+    def test17_compute_dgeom_cache(self):
+        path = os.path.join(_here, 'cache_dgeom')
+        os.makedirs(path, exist_ok=True)
+        lk = ['kIn', 'kOut', 'vperp', 'indout', 'indStruct', 'kRMin']
+        try:
+            for typ in self.dobj.keys():
+                for c in self.dobj[typ].keys():
+                    obj = self.dobj[typ][c]
+                    obj.strip(0)
+                    obj.compute_dgeom(strict=False, cache=False)
+                    dref = {k0: obj.dgeom[k0] for k0 in lk}
+
+                    # first call stores, second call loads
+                    for ii in range(2):
+                        obj.compute_dgeom(strict=False, cache=path)
+                        for k0 in lk:
+                            if dref[k0] is None:
+                                assert obj.dgeom[k0] is None
+                            else:
+                                assert np.array_equal(
+                                    obj.dgeom[k0], dref[k0], equal_nan=True,
+                                )
+            assert len(os.listdir(path)) > 0
+        finally:
+            for ff in os.listdir(path):
+                os.remove(os.path.join(path, ff))
+            os.rmdir(path)
+
 
 """
 class Test04_LOSCams(Test03_Rays):
@@ -706,3 +706,80 @@ class Test01_SolidAngles():
             raise Exception(msg)
 
         plt.close('all')
+
+    def test09_solid_angle_paired(self):
+
+        # rectangle, common detector
+        det = {
+            k0: v0 for k0, v0 in self.single_rectangle.items()
+            if k0 not in ['pts_x', 'pts_y', 'pts_z', 'sa']
+        }
+        sa = tfg.calc_solidangle_detectors_paired(
+            pts_x=self.single_rectangle['pts_x'],
+            pts_y=self.single_rectangle['pts_y'],
+            pts_z=self.single_rectangle['pts_z'],
+            detectors=det,
+        )
+
+        saref = self.single_rectangle['sa']
+        if np.any(np.abs(sa - saref) > 1.e-10 * saref):
+            msg = (
+                "Paired solid angle of rectangle is wrong!\n"
+                f"\t- Expected: {saref}\n"
+                f"\t- Obtained: {sa}\n"
+            )
+            raise Exception(msg)
+
+        # non-convex outline, one detector per point
+        npts = 6
+        ang = np.linspace(0, np.pi/3., npts)
+        ddet = {
+            'outline_x0': self.poly_2d_ccw['outline_x0'],
+            'outline_x1': self.poly_2d_ccw['outline_x1'],
+            'cents_x': np.linspace(-1, 1, npts),
+            'cents_y': np.zeros((npts,)),
+            'cents_z': np.zeros((npts,)),
+            'nin_x': np.sin(ang),
+            'nin_y': np.zeros((npts,)),
+            'nin_z': np.cos(ang),
+            'e0_x': np.cos(ang),
+            'e0_y': np.zeros((npts,)),
+            'e0_z': -np.sin(ang),
+            'e1_x': np.zeros((npts,)),
+            'e1_y': np.ones((npts,)),
+            'e1_z': np.zeros((npts,)),
+        }
+        pts_x = np.linspace(-2, 2, npts)
+        pts_y = np.linspace(-0.5, 0.5, npts)
+        pts_z = np.r_[-1, 2, 5, 10, 20, 50]
+
+        sa = tfg.calc_solidangle_detectors_paired(
+            pts_x=pts_x,
+            pts_y=pts_y,
+            pts_z=pts_z,
+            detectors=ddet,
+        )
+
+        saref = np.array([
+            tfg.calc_solidangle_apertures(
+                pts_x=pts_x[ii],
+                pts_y=pts_y[ii],
+                pts_z=pts_z[ii],
+                apertures=None,
+                detectors={
+                    k0: v0 if 'outline' in k0 else v0[ii]
+                    for k0, v0 in ddet.items()
+                },
+                visibility=False,
+                return_vector=False,
+            )[0, 0]
+            for ii in range(npts)
+        ])
+
+        if not np.allclose(sa, saref, rtol=1e-10, atol=0):
+            msg = (
+                "Paired solid angle does not match per-pair computation!\n"
+                f"\t- Expected: {saref}\n"
+                f"\t- Obtained: {sa}\n"
+            )
+            raise Exception(msg)
@@ -155,6 +155,21 @@ class Test01_openadas(object):
         )
         assert isinstance(out, dict)
 
+        # stacked pec interpolator vs per-line functions
+        dpec = tfoa.step03_read(
+            '/adf15/pec40][ar/pec40][ar_ic][ar16.dat',
+            pec_as_func=False,
+        )
+        pec = tfoa.step04_pec_interp(dpec)
+        ne = np.r_[1e18, 1e19, 1e20]
+        Te = np.r_[100., 1000., 5000.]
+        outi = pec(Te=Te, ne=ne, grid=True)
+        assert outi.shape == (len(pec.key), ne.size, Te.size)
+        for ii, k0 in enumerate(pec.key):
+            assert np.allclose(outi[ii], out[k0]['pec'](Te=Te, ne=ne))
+        outi = pec(Te=Te, ne=ne, grid=False)
+        assert outi.shape == (len(pec.key), ne.size)
+
         out = tfoa.step03_read(
             'adf11/plt41/plt41_xe.dat',
         )
@@ -187,3 +202,157 @@ class Test01_openadas(object):
 
     def test04_clear_downloads(self):
         tfoa.clear_downloads()
+
+    def test05_read_offline(self):
+
+        from tofu.openadas2tofu import _read_files as _rf
+
+        path = os.path.join(_TOFU_USER, 'openadas2tofu')
+        rng = np.random.default_rng(0)
+
+        # ------------
+        # adf11
+
+        pfe = os.path.join(path, 'adf11', 'scd99', 'scd99_li.dat')
+        ne, te = np.r_[7., 8., 9.], np.r_[0., 1., 2., 3.]
+        coefs = np.round(-12 + rng.random((3, ne.size*te.size)), 5)
+        _write_adf11(pfe, ne, te, coefs)
+
+        # the values written are what the former line-by-line reader found
+        draw = _rf._parse_adf11(pfe)
+        assert int(draw['Z']) == 3
+        assert np.array_equal(draw['nelog10'], ne)
+        assert np.array_equal(draw['telog10'], te)
+        assert np.array_equal(draw['nion'], [1, 2, 3])
+        assert np.array_equal(draw['coefslog10'], coefs)
+
+        dout = _rf._read_adf11(pfe, cache=False)
+        assert sorted(dout.keys()) == ['li0', 'li1', 'li2']
+        assert np.allclose(
+            dout['li1']['ionis']['func'](ne+6, te, grid=True),
+            coefs[1].reshape((ne.size, te.size)) - 6,
+        )
+
+        # cache re-used as long as the file is unchanged
+        pfe_cache = os.path.join(path, _rf._CACHE)
+        shutil.rmtree(pfe_cache, ignore_errors=True)
+        _rf._get_raw(pfe, func=_rf._parse_adf11)
+        lf = os.listdir(pfe_cache)
+        assert len(lf) == 1
+        pfe_cache = os.path.join(pfe_cache, lf[0])
+        mtime = os.stat(pfe_cache).st_mtime_ns
+        draw = _rf._get_raw(pfe, func=_rf._parse_adf11)
+        assert os.stat(pfe_cache).st_mtime_ns == mtime
+        assert np.array_equal(draw['coefslog10'], coefs)
+
+        # ... and invalidated when the file is modified (same size)
+        _write_adf11(pfe, ne, te, coefs - 1.)
+        tt = os.stat(pfe).st_mtime_ns + 10**9
+        os.utime(pfe, ns=(tt, tt))
+        draw = _rf._get_raw(pfe, func=_rf._parse_adf11)
+        assert np.array_equal(draw['coefslog10'], coefs - 1.)
+
+        # a failed cache write (here: cache dir is a file) is ignored
+        pfe_cache = os.path.join(path, _rf._CACHE)
+        shutil.rmtree(pfe_cache)
+        with open(pfe_cache, 'w') as fn:
+            fn.write('')
+        try:
+            draw = _rf._get_raw(pfe, func=_rf._parse_adf11)
+            assert np.array_equal(draw['coefslog10'], coefs - 1.)
+        finally:
+            os.remove(pfe_cache)
+
+        # ------------
+        # adf15
+
+        pfe = os.path.join(path, 'adf15', 'pec99][li', 'pec99][li_ic][li2.dat')
+        lamb = np.r_[3942., 3945.7]
+        lne = [np.r_[1e10, 1e12, 1e14], np.r_[1e10, 1e13]]
+        lte = [np.r_[10., 100., 1000., 5000.], np.r_[10., 1000., 2000.]]
+        lpec = [
+            np.array([f'{vv:.2e}' for vv in 1e-12*(1 + rng.random(nn))], float)
+            for nn in [12, 6]
+        ]
+
+        # unexpected content between blocks => token by token fallback
+        for junk in [False, True]:
+            _write_adf15(pfe, lamb, lne, lte, lpec, junk=junk)
+            dout = _rf._read_adf15(pfe, pec_as_func=False, cache=False)
+            assert len(dout) == 2
+            for ii in range(2):
+                dd = dout[_rf._get_adf15_key('Li', 2, ii+1, 'pec99', 'ic')]
+                assert dd['lambda0'] == lamb[ii]*1e-10
+                assert np.array_equal(dd['ne'], lne[ii]*1e6)
+                assert np.array_equal(dd['te'], lte[ii])
+                assert np.array_equal(
+                    dd['pec'],
+                    lpec[ii].reshape((lne[ii].size, lte[ii].size))*1e-6,
+                )
+                assert dd['transition'] == '1(2)0(0.0)-2(1)1(1.0)'
+
+
+#######################################################
+#
+#     Writing adf11 / adf15 fixtures
+#
+#######################################################
+
+
+def _write_lines(arr, fmt, nper=8):
+    return [
+        ''.join([fmt.format(vv) for vv in arr[ii:ii+nper]])
+        for ii in range(0, arr.size, nper)
+    ]
+
+
+def _write_adf11(pfe, ne, te, coefs):
+    lines = [
+        '    3{:5d}{:5d}    1    3     /LITHIUM           /GCR PROJECT'.format(
+            ne.size, te.size,
+        ),
+        '-'*70,
+    ]
+    lines += _write_lines(ne, '{:10.5f}') + _write_lines(te, '{:10.5f}')
+    for ii, cc in enumerate(coefs):
+        lines.append(
+            '-------------------/ IPRT= 1  / IGRD= 1  /--------/'
+            f' Z1= {ii+1}   / DATE= 27/03/12'
+        )
+        lines += _write_lines(cc, '{:10.5f}')
+    lines += ['C' + '-'*70, 'C', 'C  comments', 'C' + '-'*70]
+
+    os.makedirs(os.path.dirname(pfe), exist_ok=True)
+    with open(pfe, 'w') as fn:
+        fn.write('\n'.join(lines) + '\n')
+
+
+def _write_adf15(pfe, lamb, lne, lte, lpec, junk=None):
+    lines = [f'{len(lamb):5d}    /photon emissivity coefficients/']
+    for ii, (ll, ne, te, pec) in enumerate(zip(lamb, lne, lte, lpec)):
+        lines.append(
+            f'{ll:10.1f}{ne.size:5d}{te.size:5d}'
+            f' /ic/type=excit/ispb=1/ispp=1/isel = {ii+1:5d}'
+        )
+        lines += _write_lines(ne, ' {:.2e}') + _write_lines(te, ' {:.2e}')
+        lines += _write_lines(pec, ' {:.2e}', nper=te.size)
+        if junk is True:
+            lines.append('  unexpected content')
+    lines += [
+        'C' + '-'*70,
+        'C',
+        'C  photon emissivity atomic transitions',
+        'C  ------------------------------------',
+        'C',
+        'C',
+        'C  isel  wavelength          transition               type',
+        'C  ----  ----------  ----------------  -----',
+    ]
+    lines += [
+        f'C {ii+1:5d}{ll:11.1f}     1(2)0( 0.0)-  2(1)1( 1.0)  excit'
+        for ii, ll in enumerate(lamb)
+    ]
+
+    os.makedirs(os.path.dirname(pfe), exist_ok=True)
+    with open(pfe, 'w') as fn:
+        fn.write('\n'.join(lines) + '\n')
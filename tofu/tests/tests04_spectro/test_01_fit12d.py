@@ -430,7 +430,62 @@ class Test01_ProofOfPrinciple(object):
             assert np.sum(dfit1d['validity'] < 0) == 0
             self.ldfit1d.append(dfit1d)
 
-    def test04_fit1d_dextract(self):
+    def test04_fit1d_parallel(self):
+        """ Fitting spectra in parallel gives the same result (no chain)
+        """
+        inn = [
+            ii for ii, dd in enumerate(self.ldinput1d)
+            if self.ldinput1d_run[ii] and dd['dprepare']['data'].shape[0] > 1
+        ][0]
+
+        ldfit = [
+            tfs.fit1d(
+                dinput=self.ldinput1d[inn],
+                chain=False,
+                jac='dense',
+                verbose=False,
+                strict=True,
+                n_workers=nw,
+            )
+            for nw in [1, 2]
+        ]
+        for k0 in ['sol_x', 'cost', 'nfev', 'validity']:
+            assert np.allclose(ldfit[0][k0], ldfit[1][k0], equal_nan=True)
+
+    def test05_fit1d_batch(self):
+        """ Fitting all spectra at once (batched LM) vs one by one (trf)
+
+        Double lines are avoided (several local minima)
+        """
+        inn = [
+            ii for ii, dd in enumerate(self.ldinput1d)
+            if self.ldinput1d_run[ii]
+            and dd['dprepare']['data'].shape[0] > 1
+            and dd['double'] is False
+        ][0]
+
+        ldfit = [
+            tfs.fit1d(
+                dinput=self.ldinput1d[inn],
+                chain=False,
+                jac='dense',
+                verbose=False,
+                strict=True,
+                batch=batch,
+            )
+            for batch in [False, True]
+        ]
+        assert np.all(ldfit[0]['validity'] == ldfit[1]['validity'])
+        iok = ldfit[1]['validity'] == 0
+        assert np.all(ldfit[1]['success'][iok])
+        assert np.all(np.isfinite(ldfit[1]['sol_x'][iok, :]))
+
+        assert np.allclose(
+            ldfit[0]['cost'][iok], ldfit[1]['cost'][iok], rtol=1e-2,
+        )
+        tfs.fit1d_extract(dfit1d=ldfit[1], sol_total=True)
+
+    def test06_fit1d_dextract(self):
         """ Extract dict of output from fitted 1d spectra
         """
         for ii, dd in enumerate(self.ldfit1d):
@@ -442,7 +497,7 @@ class Test01_ProofOfPrinciple(object):
             )
             self.ldex1d.append(dex)
 
-    def test05_fit1d_plot(self, warn=True):
+    def test07_fit1d_plot(self, warn=True):
         lwar = []
         for ii, dd in enumerate(self.ldex1d):
             try:
@@ -478,7 +533,7 @@ class Test01_ProofOfPrinciple(object):
             )
             warnings.warn(msg)
 
-    def test06_fit2d_dinput(self):
+    def test08_fit2d_dinput(self):
         """ Build the input dict for fitting a 2d spectrum
         """
         combin = [
@@ -532,12 +587,12 @@ class Test01_ProofOfPrinciple(object):
             if c0:
                 self.ldinput2d_run.append(ii)
 
-    def test07_plot_dinput2d(self):
+    def test09_plot_dinput2d(self):
         for ii, dd in enumerate(self.ldinput2d):
             dax = tfs._plot.plot_dinput2d(dinput=dd)
         plt.close('all')
 
-    def test08_funccostjac_2d(self):
+    def test10_funccostjac_2d(self):
         """ check that tofu properly returns 3 functions for fitting 1d spectra
 
         func_detail: should return all components of a spectrum
@@ -610,7 +665,28 @@ class Test01_ProofOfPrinciple(object):
             assert np.allclose(dy0, dy1, equal_nan=True)
             assert np.allclose(dy0, dy2, equal_nan=True)
 
-    def test09_fit2d(self, strict=None, verb=False):
+            # check consistency between dense and sparse jacobians
+            func_jac_sparse = func(
+                phi_flat=phi_flat,
+                dinput=dd,
+                dind=dd['dind'],
+                jac='sparse',
+            )[3]
+            kwdargs = dict(
+                scales=scales[0, :],
+                phi_flat=phi_flat,
+                lambrel_flat=lambrel_flat,
+                lambn_flat=lambn_flat,
+            )
+            jac0 = func_jac(
+                x0[0, :],
+                jac0=np.zeros((phi_flat.size, dd['dind']['sizex'])),
+                **kwdargs,
+            )
+            jac1 = func_jac_sparse(x0[0, :], **kwdargs)
+            assert np.allclose(jac0, jac1.toarray(), equal_nan=True)
+
+    def test11_fit2d(self, strict=None, verb=False):
         """ Actually run the 2d spectrum fitting routine,
 
         """
@@ -631,7 +707,7 @@ class Test01_ProofOfPrinciple(object):
             assert np.sum(dfit2d['validity'] < 0) == 0
             self.ldfit2d.append(dfit2d)
 
-    def test09_fit2d_dextract(self):
+    def test11_fit2d_dextract(self):
         """ Extract dict of output from fitted 2d spectra
         """
         for ii, dd in enumerate(self.ldfit2d):
@@ -643,7 +719,7 @@ class Test01_ProofOfPrinciple(object):
             )
             self.ldex2d.append(dex)
 
-    def test10_fit2d_plot(self, warn=True):
+    def test12_fit2d_plot(self, warn=True):
         lwar = []
         for ii, dd in enumerate(self.ldex2d):
             try:
@@ -126,3 +126,34 @@ class Test01_RockingCurve(object):
                 # return
                 returnas=dict,
             )
+
+    def test02_rockingcurve_scans_cache(self):
+
+        for k0 in self.lc:
+            lout = [
+                tfs.compute_rockingcurve(
+                    crystal=k0,
+                    lamb=np.r_[3.969067],
+                    miscut=True,
+                    nn=5,
+                    therm_exp=True,
+                    # Plot
+                    plot_therm_exp=False,
+                    plot_asf=False,
+                    plot_power_ratio=False,
+                    plot_asymmetry=False,
+                    plot_cmaps=False,
+                    # return
+                    returnas=dict,
+                )
+                for ii in range(2)
+            ]
+
+            # (polar, temperature, alpha, y)
+            pr = lout[0]['Power ratio']
+            assert pr.shape == (2, 11, 11, 201)
+            assert np.all(np.isfinite(lout[0]['RC width (perp. compo)']))
+
+            # 2nd call from cache, as an independent copy
+            assert np.allclose(pr, lout[1]['Power ratio'])
+            assert pr is not lout[1]['Power ratio']
@@ -10,7 +10,10 @@ import warnings
 
 
 # Standard
+import pytest
 import numpy as np
+import scipy.sparse as scpsp
+import scipy.integrate as scpinteg
 import matplotlib.pyplot as plt
 
 
@@ -279,3 +282,354 @@ class Test01_Inversions():
                 dref_vector={'units': 's'},
             )
             plt.close('all')
+
+    def test02_sparse_save_load(self):
+
+        # (nchan, nbs) geometry matrices are stored sparse
+        for kmat, v0 in self.coll.dobj['geom matrix'].items():
+            for kk in v0['data']:
+                data = self.coll.ddata[kk]['data']
+                if data.ndim == 2:
+                    assert scpsp.issparse(data), kmat
+
+        # saving / loading preserves sparsity
+        pfe = self.coll.save(path=_here, return_pfe=True, verb=False)
+        try:
+            coll2 = tf.data.load(pfe, verb=False)
+            for kmat, v0 in self.coll.dobj['geom matrix'].items():
+                for kk in v0['data']:
+                    d0 = self.coll.ddata[kk]['data']
+                    d1 = coll2.ddata[kk]['data']
+                    assert scpsp.issparse(d0) == scpsp.issparse(d1)
+                    if scpsp.issparse(d0):
+                        d0, d1 = d0.toarray(), d1.toarray()
+                    assert np.allclose(d0, d1)
+        finally:
+            os.remove(pfe)
+
+    def test03_batch(self):
+
+        # time-constant emissivity => identical time steps
+        nt = 4
+        kap = self.coll.dobj['bsplines']['m2_bs1']['apex'][0]
+        rad = self.coll.ddata[kap]['data']
+        emiss = np.repeat(np.exp(-rad**2/0.2**2)[None, :], nt, axis=0)
+
+        self.coll.add_ref(key='nt1', size=nt)
+        self.coll.add_data(
+            key='t1', data=np.arange(nt), dim='time', ref='nt1', units='s',
+        )
+        self.coll.add_data(
+            key='emiss1',
+            data=emiss,
+            ref=('nt1', 'm2_bs1'),
+            units='W/(m3.sr)',
+        )
+        self.coll.compute_diagnostic_signal(
+            key='s2',
+            key_diag='d0',
+            key_integrand='emiss1',
+            res=0.01,
+        )
+
+        # batched vs time loop, with (s2) and without (s0) batched steps
+        lcomb = itt.product(['s2', 's0'], ['algo2', 'algo3'], [False, True])
+        for kdat, algo, chain in lcomb:
+            dout = {}
+            for batch in [False, True]:
+                dout[batch] = self.coll.add_inversion(
+                    algo=algo,
+                    key_matrix='gmat01',
+                    key_data=kdat,
+                    sigma=0.10,
+                    operator='D1N2',
+                    store=False,
+                    conv_crit=1.e-4,
+                    chain=chain,
+                    batch=batch,
+                    dref_vector={'units': 's'},
+                    verb=0,
+                )
+
+            sol0, mu0, niter0 = [dout[False][ii] for ii in [0, 1, 4]]
+            sol1, mu1, niter1 = [dout[True][ii] for ii in [0, 1, 4]]
+            assert np.allclose(sol0, sol1, rtol=1.e-3, atol=0.)
+            assert np.allclose(mu0, mu1, rtol=1.e-3, atol=0.)
+
+            # same first step, then mu is carried whatever chain
+            assert mu0[0] == mu1[0]
+            if kdat == 's2':
+                assert np.all(niter0[1:] < niter0[0])
+                assert np.all(niter1[1:] == 1)
+
+    def test04_signal_sparse(self):
+
+        # sparse los operator vs pixel-by-pixel integration
+        for kdiag in ['d0', 'd1']:
+            dout = {}
+            for sparse in [False, True]:
+                dout[sparse] = self.coll.compute_diagnostic_signal(
+                    key_diag=kdiag,
+                    key_integrand='emiss',
+                    res=0.01,
+                    sparse=sparse,
+                    store=False,
+                    returnas=dict,
+                    verb=False,
+                )
+
+            for kcam, v0 in dout[False].items():
+                v1 = dout[True][kcam]
+                assert v0['ref'] == v1['ref']
+                assert v0['units'] == v1['units']
+
+                # los seeing only zero emissivity may be nan vs 0
+                iok = np.isfinite(v0['data'])
+                assert np.allclose(
+                    v0['data'][iok], v1['data'][iok], rtol=1e-10, atol=0,
+                )
+                assert np.all(
+                    np.isnan(v1['data'][~iok]) | (v1['data'][~iok] == 0.)
+                )
+
+    def test05_save_load_npy(self):
+
+        # save as a directory of memory-mappable arrays
+        pfe = self.coll.save(
+            path=_here, mode='npy', return_pfe=True, verb=False,
+        )
+        try:
+            coll2 = tf.data.load(pfe, verb=False)
+            assert coll2.dobj.keys() == self.coll.dobj.keys()
+            for k0, v0 in self.coll.ddata.items():
+                d0, d1 = v0['data'], coll2.ddata[k0]['data']
+                assert type(d0) == type(d1) or isinstance(d1, np.memmap), k0
+                if scpsp.issparse(d0):
+                    assert (d0 != d1).nnz == 0, k0
+                elif isinstance(d0, np.ndarray) and d0.dtype != object:
+                    assert np.array_equal(d0, d1, equal_nan=True), k0
+            assert isinstance(coll2.ddata['emiss']['data'], np.memmap)
+
+            # memory-mapped collection is usable
+            dout = coll2.compute_diagnostic_signal(
+                key_diag='d0',
+                key_integrand='emiss',
+                res=0.01,
+                store=False,
+                returnas=dict,
+                verb=False,
+            )
+            for kcam, v0 in dout.items():
+                kdata = self.coll.dobj['synth sig']['s0']['data']
+                kdata = [kk for kk in kdata if kcam in kk][0]
+                assert np.allclose(
+                    v0['data'],
+                    self.coll.ddata[kdata]['data'],
+                    equal_nan=True,
+                )
+
+            # only the requested keys and their dependencies
+            coll3 = tf.data.load(pfe, keys='emiss', verb=False)
+            assert 'diagnostic' not in coll3.dobj.keys()
+            assert 'synth sig' not in coll3.dobj.keys()
+            assert 'm2_bs1' in coll3.dobj['bsplines'].keys()
+            assert 'emiss' in coll3.ddata.keys()
+
+            # sep is only for npz files
+            with pytest.raises(ValueError):
+                self.coll.save(path=_here, mode='npy', sep='.', verb=False)
+            with pytest.raises(ValueError):
+                tf.data.load(pfe, sep='.', verb=False)
+
+            # a second save never re-uses the same directory
+            pfe2 = self.coll.save(
+                path=_here, mode='npy', return_pfe=True, verb=False,
+            )
+            shutil.rmtree(pfe2)
+            assert pfe2 != pfe
+
+        finally:
+            shutil.rmtree(pfe)
+
+    def test06_n_workers(self):
+
+        # independent time steps solved in parallel vs sequentially
+        for kmat, kdat in [('gmat01', 's0'), ('gmat04', 's0')]:
+            dout = {}
+            for n_workers in [1, 2]:
+                dout[n_workers] = self.coll.add_inversion(
+                    algo='algo2',
+                    key_matrix=kmat,
+                    key_data=kdat,
+                    sigma=0.10,
+                    operator='D1N2',
+                    store=False,
+                    conv_crit=1.e-4,
+                    chain=False,
+                    n_workers=n_workers,
+                    dref_vector={'units': 's'},
+                    verb=0,
+                )
+
+            # same time order, first chunk identical
+            assert np.array_equal(dout[1][6], dout[2][6])
+            for ii in [0, 1, 2, 4]:
+                assert np.array_equal(dout[1][ii][0], dout[2][ii][0]), ii
+
+            # mu only warm-started within chunks => within conv_crit
+            for ii in [0, 1, 2]:
+                assert np.allclose(
+                    dout[1][ii], dout[2][ii], rtol=1e-3, atol=0,
+                ), ii
+
+    def test07_geometry_matrix_los(self):
+
+        # batched sparse matrix vs pixel-by-pixel integration
+        nout = 0
+        for kmat in ['gmat01', 'gmat04']:
+            v0 = self.coll.dobj['geom matrix'][kmat]
+            kbs = v0['bsplines']
+            doptics = self.coll.dobj['diagnostic'][v0['diagnostic']]['doptics']
+            kcam, kdata = v0['camera'][0], v0['data'][0]
+            mat = self.coll.ddata[kdata]['data']
+            ketend = doptics[kcam]['etendue']
+            etend = self.coll.ddata[ketend]['data'].ravel()
+
+            for ii in [0, 3, 4, 7]:
+                R, Z, length = self.coll.sample_rays(
+                    key=doptics[kcam]['los'],
+                    res=v0['res'],
+                    mode='abs',
+                    segment=None,
+                    ind_ch=ii,
+                    concatenate=False,
+                    return_coords=['R', 'z', 'ltot'],
+                )
+
+                dout = self.coll.interpolate(
+                    keys=None,
+                    ref_key=kbs,
+                    x0=R[:, 0],
+                    x1=Z[:, 0],
+                    submesh=True,
+                    grid=False,
+                    details=True,
+                    crop=None,
+                    nan0=True,
+                    val_out=np.nan,
+                    return_params=False,
+                    store=False,
+                )[f'{kbs}_details']
+                data = dout['data']
+                assert dout['ref'].index(None) == 0
+
+                # count los with points both inside and outside the mesh
+                iin = np.any(np.isfinite(data), axis=1)
+                nout += int(np.any(iin) and not np.all(iin))
+
+                data[~np.isfinite(data)] = 0.
+                ref = scpinteg.simpson(data, x=length[:, 0], axis=0)
+                ref *= etend[ii]
+                assert np.allclose(
+                    mat[ii].toarray().ravel(), ref, rtol=1e-10, atol=0,
+                ), (kmat, ii)
+
+        assert nout > 0
+
+    def test08_augTikho_eigh(self):
+
+        # small synthetic problem
+        nchan, nbs = 30, 20
+        rng = np.random.default_rng(0)
+        xx = np.linspace(0, 1, nbs)
+        Tn = np.exp(-(rng.uniform(0, 1, (nchan, 1)) - xx[None, :])**2 / 0.01)
+        yn = Tn.dot(np.exp(-(xx - 0.5)**2 / 0.04))
+        yn += 0.05 * rng.normal(size=nchan)
+        TTn, Tyn = Tn.T.dot(Tn), Tn.T.dot(yn)
+
+        # semi-definite (TTn, TTn + R) and definite (TTn, R) pencils
+        LL = np.diff(np.eye(nbs), axis=0)
+        lR = [LL.T.dot(LL), LL.T.dot(LL) + 1e-2*np.eye(nbs)]
+
+        algos = tf.data._class10_algos
+        lfunc = [
+            algos.inv_linear_augTikho_dense,
+            algos.inv_linear_augTikho_chol_dense,
+        ]
+
+        def _solve(func, R, dfact):
+            return func(
+                Tn=Tn, TTn=TTn, Tyn=Tyn, R=R, yn=yn,
+                sol0=np.zeros((nbs,)),
+                nchan=nchan,
+                nbs=nbs,
+                mu0=1.,
+                conv_crit=1e-6,
+                a0bis=nbs/2.,
+                b0=1.,
+                a1bis=nchan/2.,
+                b1=1.,
+                d=0.4,
+                verb=0,
+                maxiter_outer=100,
+                dfact=dfact,
+            )
+
+        for R, func in itt.product(lR, lfunc):
+
+            # direct solve (cached deig = None)
+            sol0, mu0 = _solve(func, R, {'deig': None})[:2]
+
+            # no re-use (no cache or first call) => direct solve, no eigh
+            dfact = {}
+            for dfacti in [None, dfact]:
+                sol1, mu1 = _solve(func, R, dfacti)[:2]
+                assert np.array_equal(sol0, sol1)
+                assert mu0 == mu1
+            assert 'deig' not in dfact
+
+            # re-used => (TTn, R) diagonalization
+            sol1, mu1 = _solve(func, R, dfact)[:2]
+            deig = dfact['deig']
+
+            # the diagonalized form is accurate enough at convergence
+            Tyv = deig['vect'].T.dot(Tyn)
+            assert algos._augTikho_eigh_solve(
+                deig=deig, Tyv=Tyv, mu=mu1,
+            ) is not None
+
+            assert np.allclose(sol0, sol1, rtol=1e-8, atol=0)
+            assert np.isclose(mu0, mu1, rtol=1e-8, atol=0)
+
+    def test09_save_load_npy_noobj(self):
+
+        # collection without any obj (no '_dobj' in to_dict())
+        coll = tf.data.Collection()
+        coll.add_ref(key='nn', size=5)
+        coll.add_data(key='big', data=np.arange(5.), ref='nn')
+        coll.add_data(key='small', data=np.ones((5,)), ref='nn')
+
+        for mode in ['npy', 'npz']:
+            pfe = coll.save(
+                path=_here, mode=mode, return_pfe=True, verb=False,
+            )
+            try:
+                coll2 = tf.data.load(pfe, keys='big', verb=False)
+                assert list(coll2.ddata.keys()) == ['big']
+                assert list(coll2.dref.keys()) == ['nn']
+                assert np.array_equal(coll2.ddata['big']['data'], np.arange(5))
+            finally:
+                if mode == 'npy':
+                    shutil.rmtree(pfe)
+                else:
+                    os.remove(pfe)
+
+        # empty collection
+        pfe = tf.data.Collection().save(
+            path=_here, mode='npy', return_pfe=True, verb=False,
+        )
+        try:
+            coll2 = tf.data.load(pfe, verb=False)
+            assert len(coll2.ddata) == 0
+        finally:
+            shutil.rmtree(pfe)
@@ -8,11 +8,14 @@ This module contains tests for tofu.geom in its structured version
 import sys
 import os
 import copy
+import shutil
+import tempfile
 
 
 # Standard
 import numpy as np
 import matplotlib.pyplot as plt
+import Polygon as plg
 
 
 # tofu-specific
@@ -765,20 +768,38 @@ class Test01_Diagnostic():
             if len(doptics[lcam[0]]['optics']) == 0:
                 continue
 
-            self.coll.compute_diagnostic_vos(
-                # keys
-                key_diag=k0,
-                key_mesh=key_mesh,
-                # resolution
-                res_RZ=0.03,
-                res_phi=0.04,
-                # spectro
-                n0=5,
-                n1=5,
-                res_lamb=1e-10,
-                visibility=False,
-                store=True,
-            )
+            dout = {}
+            for n_workers in [1, 2]:
+                dout[n_workers] = self.coll.compute_diagnostic_vos(
+                    # keys
+                    key_diag=k0,
+                    key_mesh=key_mesh,
+                    # resolution
+                    res_RZ=0.03,
+                    res_phi=0.04,
+                    # spectro
+                    n0=5,
+                    n1=5,
+                    res_lamb=1e-10,
+                    visibility=False,
+                    # parallel
+                    n_workers=n_workers,
+                    store=n_workers == 2,
+                )[0]
+
+            # sharded vs sequential
+            for kcam, vcam in dout[1].items():
+                for kk, vv in vcam.items():
+                    if not (isinstance(vv, dict) and 'data' in vv):
+                        continue
+                    data = dout[2][kcam][kk]['data']
+                    if kk == 'etendlen':
+                        # summed over chunks of plasma points
+                        assert np.allclose(vv['data'], data, rtol=1e-12)
+                    else:
+                        assert np.array_equal(
+                            vv['data'], data, equal_nan=True,
+                        ), (k0, kcam, kk)
 
     def test06_plot_coverage(self):
 
@@ -839,7 +860,7 @@ class Test01_Diagnostic():
                 rocking_curve=None,
             )[1]
 
-            _ = self.coll.get_raytracing_from_pts(
+            dout = self.coll.get_raytracing_from_pts(
                 key=k0,
                 key_cam=None,
                 key_mesh=None,
@@ -866,6 +887,28 @@ class Test01_Diagnostic():
                 colorbar=None,
             )
 
+            # batched version, small memory budget, sparse
+            dout2 = self.coll.get_raytracing_from_pts(
+                key=k0,
+                ptsx=ptsx[-1, ...],
+                ptsy=ptsy[-1, ...],
+                ptsz=ptsz[-1, ...],
+                n0=3,
+                n1=3,
+                lamb0=lamb,
+                max_mem=1e4,
+                sparse=True,
+                append=False,
+                plot=False,
+            )
+            for k1 in ['ncounts', 'sang_lamb']:
+                assert np.allclose(dout[k1]['data'], dout2[k1]['data'])
+            for k1 in ['sang0', 'sang']:
+                assert np.allclose(
+                    dout[k1]['data'].reshape(dout2[k1]['data'].shape),
+                    dout2[k1]['data'].toarray(),
+                )
+
     def test08_save_to_json(self):
 
         for ii, (k0, v0) in enumerate(self.coll.dobj['diagnostic'].items()):
@@ -883,4 +926,472 @@ class Test01_Diagnostic():
             _ = tf.data.load_diagnostic_from_file(pfe)
 
             # remove file
-            os.remove(pfe)
\ No newline at end of file
+            os.remove(pfe)
+
+    def test09_vos_shards(self):
+
+        # add mesh
+        key_mesh = 'm0'
+
+        if key_mesh not in self.coll.dobj.get('mesh', {}).keys():
+            self.coll.add_mesh_2d_rect(
+                key=key_mesh,
+                res=0.1,
+                crop_poly=self.conf,
+            )
+
+        # shards directory
+        path = tempfile.mkdtemp()
+
+        try:
+            for k0, v0 in self.coll.dobj['diagnostic'].items():
+
+                lcam = self.coll.dobj['diagnostic'][k0]['camera']
+                doptics = self.coll.dobj['diagnostic'][k0]['doptics']
+                if len(doptics[lcam[0]]['optics']) == 0 or v0['spectro']:
+                    continue
+
+                dkw = {
+                    'key_diag': k0,
+                    'key_mesh': key_mesh,
+                    'res_RZ': 0.03,
+                    'res_phi': 0.04,
+                    'visibility': False,
+                    'path_shards': path,
+                }
+
+                # compute and save all pixels
+                dvos, dref = self.coll.compute_diagnostic_vos(**dkw)
+
+                # remove some pixels, tag the others with an old mtime
+                mtime = 10**18
+                lrem, lkeep = [], []
+                for kcam in dvos.keys():
+                    lf = sorted([
+                        os.path.join(root, ff)
+                        for root, _, lfiles in os.walk(path)
+                        for ff in lfiles
+                        if ff.startswith('pix')
+                        and f"_{k0}_{kcam}_" in os.path.basename(root)
+                    ])
+                    shape = self.coll.dobj['camera'][kcam]['dgeom']['shape']
+                    assert len(lf) == np.prod(shape), kcam
+                    lrem += lf[::3]
+                    lkeep += [ff for ff in lf if ff not in lf[::3]]
+
+                for ff in lrem:
+                    os.remove(ff)
+                for ff in lkeep:
+                    os.utime(ff, ns=(mtime, mtime))
+
+                # resume: only removed pixels are computed again
+                dvos2, dref2 = self.coll.compute_diagnostic_vos(
+                    resume=True,
+                    **dkw,
+                )
+
+                for ff in lrem:
+                    assert os.stat(ff).st_mtime_ns != mtime, ff
+                for ff in lkeep:
+                    assert os.stat(ff).st_mtime_ns == mtime, ff
+
+                # unchanged output
+                for kcam, vcam in dvos.items():
+                    for kk, vv in vcam.items():
+                        if not (isinstance(vv, dict) and 'data' in vv):
+                            continue
+                        assert np.array_equal(
+                            vv['data'],
+                            dvos2[kcam][kk]['data'],
+                            equal_nan=True,
+                        ), (k0, kcam, kk)
+
+                # assemble and store from shards
+                self.coll.store_diagnostic_vos(
+                    key_diag=k0,
+                    path_shards=path,
+                    overwrite=True,
+                )
+
+        finally:
+            shutil.rmtree(path)
+
+    def test10_etendue_qmc(self):
+
+        for k0, v0 in self.coll.dobj['diagnostic'].items():
+
+            lcam = v0['camera']
+            doptics = v0['doptics']
+            if len(doptics[lcam[0]]['optics']) == 0 or v0['spectro']:
+                continue
+
+            dcompute, _ = tf.data._class8_etendue_los.compute_etendue_los(
+                coll=self.coll,
+                key=k0,
+                analytical=True,
+                numerical=True,
+                numerical_method='qmc',
+                rtol=1e-2,
+                npts_max=2**14,
+                seed=0,
+                verb=False,
+                plot=False,
+                store=False,
+            )
+
+            for kcam, vcam in dcompute.items():
+                etend = vcam['numerical'][-1, ...]
+                err = vcam['numerical_err']
+                etend0 = vcam['analytical'][-1, ...]
+                iok = np.isfinite(etend0) & (etend0 > 0.)
+                assert np.any(iok), k0
+                # converged or max nb of points reached
+                conv = err <= 1e-2 * etend
+                nmax = vcam['numerical_npts'] == 2**14
+                assert np.all(conv[iok] | nmax[iok]), k0
+                assert np.allclose(
+                    etend[iok & conv],
+                    etend0[iok & conv],
+                    rtol=0.1,
+                ), k0
+
+    def test11_sample_rays_ragged(self):
+
+        lc = ['x', 'R', 'z', 'itot', 'ltot']
+        for k0 in self.coll.dobj['rays'].keys():
+            for mode, res in [('abs', 0.02), ('rel', 0.1)]:
+
+                lpad = self.coll.sample_rays(
+                    key=k0,
+                    res=res,
+                    mode=mode,
+                    return_coords=lc,
+                )
+                lflat = self.coll.sample_rays(
+                    key=k0,
+                    res=res,
+                    mode=mode,
+                    ragged=True,
+                    return_coords=lc,
+                )
+
+                if lpad[0] is None:
+                    assert all([aa is None for aa in lflat]), k0
+                    continue
+
+                # flat pts are the finite padded pts, ray by ray
+                offsets = lflat[-1]
+                npts = lpad[0].shape[0]
+                iok = np.isfinite(lpad[0].reshape((npts, -1))).T
+                assert offsets[-1] == iok.sum(), k0
+                assert np.all(np.diff(offsets) == iok.sum(axis=1)), k0
+
+                for cc, aa, bb in zip(lc, lpad, lflat[:-1]):
+                    if cc == 'itot' and aa.ndim == 1:
+                        aa = np.broadcast_to(aa[:, None], iok.T.shape)
+                    aa = aa.reshape((npts, -1)).T[iok]
+                    assert np.array_equal(aa, bb), (k0, mode, cc)
+
+    def test12_sinogram_quartic_roots(self):
+
+        # random quartics, with real roots and complex pairs
+        rng = np.random.default_rng(0)
+        coefs = rng.standard_normal((5, 2000))
+        coefs[:, :500] = np.array([
+            np.polynomial.polynomial.polyfromroots(rr)
+            for rr in rng.uniform(-3, 3, (500, 4))
+        ]).T
+        coefs[4, -10:] = 0.
+
+        roots = tf.data._class2_sinogram._get_quartic_roots(coefs)
+
+        # reference: one by one
+        for ii in range(coefs.shape[1]):
+            rr = np.polynomial.polynomial.Polynomial(coefs[:, ii]).roots()
+            rr = np.sort(np.real(rr[np.isreal(rr)]))
+            r2 = np.sort(roots[ii, np.isfinite(roots[ii, :])])
+            assert rr.size == r2.size, ii
+            assert np.allclose(rr, r2, rtol=1e-6, atol=1e-6), ii
+
+    def test13_equivalent_apertures_batch(self):
+
+        eqap = tf.data._class8_equivalent_apertures
+
+        # reference plane x = 0, seen from pixels at x = -1
+        plane = {
+            'cent': np.r_[0., 0., 0.],
+            'nin': np.r_[1., 0., 0.],
+            'e0': np.r_[0., 1., 0.],
+            'e1': np.r_[0., 0., 1.],
+        }
+
+        def ptsvect(
+            pts_x=None, pts_y=None, pts_z=None,
+            vect_x=None, vect_y=None, vect_z=None,
+            **kwdargs,
+        ):
+            kk = -pts_x / vect_x
+            return pts_y + kk * vect_y, pts_z + kk * vect_z
+
+        yy, zz = np.meshgrid(np.linspace(-2.5, 2.5, 11), np.r_[-0.5, 0, 1.])
+        pts_y, pts_z = yy.ravel(), zz.ravel()
+        pts_x = np.full(pts_y.shape, -1.)
+
+        # optics at x = -0.5
+        square = np.array([[-1., 1., 1., -1.], [-1., -1., 1., 1.]])
+        tri = np.array([[-1., 1.5, -0.5], [-1., -0.5, 1.5]])
+        lshape = np.array([
+            [-1., 1., 1., 0., 0., -1.],
+            [-1., -1., 0., 0., 1., 1.],
+        ])
+
+        def get_poly(pp, scale):
+            return np.array([
+                np.full((pp.shape[1],), -0.5),
+                scale * pp[0],
+                scale * pp[1],
+            ])
+
+        # (p_a, optics, fall back)
+        lcase = [
+            (square, [get_poly(square, 0.4), get_poly(tri, 0.5)], False),
+            (square, [get_poly(lshape, 0.6)], False),
+            (lshape, [get_poly(-lshape, 0.6)], True),
+        ]
+
+        for ii, (p_a, lpoly_pre, fb) in enumerate(lcase):
+
+            # batch, counting the calls to the per-pixel fall back
+            lfb = []
+            func = eqap._get_equivalent_aperture
+
+            def func_fb(**kwdargs):
+                lfb.append(kwdargs['pt'])
+                return func(**kwdargs)
+
+            eqap._get_equivalent_aperture = func_fb
+            try:
+                x0, x1 = eqap._get_equivalent_aperture_batch(
+                    p_a=plg.Polygon(p_a.T),
+                    pts_x=pts_x,
+                    pts_y=pts_y,
+                    pts_z=pts_z,
+                    lpoly_pre=lpoly_pre,
+                    ptsvect=ptsvect,
+                    plane=plane,
+                )
+            finally:
+                eqap._get_equivalent_aperture = func
+
+            assert (len(lfb) > 0) == fb, ii
+
+            # reference: one pixel at a time, with Polygon
+            nok = 0
+            for jj in range(pts_x.size):
+                p0, p1 = eqap._get_equivalent_aperture(
+                    p_a=plg.Polygon(p_a.T),
+                    pt=np.r_[pts_x[jj], pts_y[jj], pts_z[jj]],
+                    lpoly_pre=lpoly_pre,
+                    ptsvect=ptsvect,
+                )
+
+                if p0 is None:
+                    assert x0[jj] is None or x0[jj].size < 3, (ii, jj)
+                    continue
+
+                nok += 1
+                pref = plg.Polygon(np.array([p0, p1]).T)
+                pbatch = plg.Polygon(np.array([x0[jj], x1[jj]]).T)
+                area = 0.5 * np.abs(np.sum(
+                    x0[jj] * np.roll(x1[jj], -1)
+                    - np.roll(x0[jj], -1) * x1[jj]
+                ))
+                assert np.isclose(area, pref.area(), rtol=1e-9), (ii, jj)
+                assert (pref ^ pbatch).area() < 1e-9 * area, (ii, jj)
+
+            # some pixels see the optics, some do not
+            assert 0 < nok < pts_x.size, ii
+
+    def test14_vos_sang_cross(self):
+
+        vosb = tf.data._class8_vos_broadband
+        get_sang_cross = vosb._get_sang_cross
+
+        # previous per-cell aggregation, with one mask per (ir, iz) cell
+        def _ref(out=None, ir=None, iz=None, dV=None, xx=None, yy=None,
+                 vectx=None, vecty=None, vectz=None):
+            lsang, lir, liz, lpol, ltor = [], [], [], [], []
+            for i0 in np.unique(ir):
+                indr = ir == i0
+                for i1 in np.unique(iz[indr]):
+                    ind1 = indr & (iz == i1)
+                    tot = np.sum(out[ind1]) * dV[ind1][0]
+                    tor = np.arctan2(yy[ind1], xx[ind1])
+                    vx, vy, vz = vectx[0, ind1], vecty[0, ind1], vectz[0, ind1]
+                    ang_pol = np.arctan2(
+                        vz,
+                        vx*np.cos(tor) + vy*np.sin(tor),
+                    )
+                    ang_tor = np.arccos(vx*(-np.sin(tor)) + vy*np.cos(tor))
+                    lsang.append(tot)
+                    lir.append(i0)
+                    liz.append(i1)
+                    lpol.append(np.sum(out[ind1] * ang_pol) / tot)
+                    ltor.append(np.sum(out[ind1] * ang_tor) / tot)
+            return lsang, lir, liz, lpol, ltor
+
+        lsang = []
+
+        def _check(**kwdargs):
+            out = get_sang_cross(**kwdargs)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ref = _ref(**kwdargs)
+            assert np.allclose(out[0], ref[0], rtol=1e-12, atol=0)
+            assert np.array_equal(out[1], ref[1])
+            assert np.array_equal(out[2], ref[2])
+            for ii in [3, 4]:
+                assert np.allclose(
+                    out[ii], ref[ii], rtol=1e-10, atol=0, equal_nan=True,
+                )
+            lsang.append(out[0])
+            return out
+
+        # add mesh
+        key_mesh = 'm0'
+
+        if key_mesh not in self.coll.dobj.get('mesh', {}).keys():
+            self.coll.add_mesh_2d_rect(
+                key=key_mesh,
+                res=0.1,
+                crop_poly=self.conf,
+            )
+
+        # compute vos of the first broadband diagnostic
+        k0 = [
+            k0 for k0, v0 in self.coll.dobj['diagnostic'].items()
+            if len(v0['doptics'][v0['camera'][0]]['optics']) > 0
+            and not v0['spectro']
+        ][0]
+
+        vosb._get_sang_cross = _check
+        try:
+            self.coll.compute_diagnostic_vos(
+                key_diag=k0,
+                key_mesh=key_mesh,
+                res_RZ=0.03,
+                res_phi=0.04,
+                visibility=False,
+                return_vector=True,
+                store=False,
+            )
+        finally:
+            vosb._get_sang_cross = get_sang_cross
+
+        assert np.any([np.any(ss > 0.) for ss in lsang])
+
+    def test15_vos_shards_spectro(self):
+
+        # add mesh
+        key_mesh = 'm0'
+
+        if key_mesh not in self.coll.dobj.get('mesh', {}).keys():
+            self.coll.add_mesh_2d_rect(
+                key=key_mesh,
+                res=0.1,
+                crop_poly=self.conf,
+            )
+
+        # shards directory
+        path = tempfile.mkdtemp()
+
+        try:
+            for k0, v0 in self.coll.dobj['diagnostic'].items():
+
+                lcam = self.coll.dobj['diagnostic'][k0]['camera']
+                doptics = self.coll.dobj['diagnostic'][k0]['doptics']
+                if len(doptics[lcam[0]]['optics']) == 0 or not v0['spectro']:
+                    continue
+
+                dkw = {
+                    'key_diag': k0,
+                    'key_mesh': key_mesh,
+                    'res_RZ': 0.03,
+                    'res_phi': 0.04,
+                    'n0': 5,
+                    'n1': 5,
+                    'res_lamb': 1e-10,
+                    'visibility': False,
+                }
+
+                # reference, without shards
+                dvos0 = self.coll.compute_diagnostic_vos(**dkw)[0]
+
+                # compute and save all radii
+                dvos = self.coll.compute_diagnostic_vos(
+                    path_shards=path,
+                    **dkw,
+                )[0]
+
+                # remove some radii, tag the others with an old mtime
+                mtime = 10**18
+                lf = sorted([
+                    os.path.join(root, ff)
+                    for root, _, lfiles in os.walk(path)
+                    for ff in lfiles
+                    if ff.startswith('rad')
+                    and f"_{k0}_" in os.path.basename(root)
+                ])
+                assert len(lf) > 3, k0
+                lrem = lf[::3]
+                lkeep = [ff for ff in lf if ff not in lrem]
+
+                for ff in lrem:
+                    os.remove(ff)
+                for ff in lkeep:
+                    os.utime(ff, ns=(mtime, mtime))
+
+                # resume in parallel: only removed radii are computed again
+                dvos2 = self.coll.compute_diagnostic_vos(
+                    path_shards=path,
+                    resume=True,
+                    n_workers=2,
+                    **dkw,
+                )[0]
+
+                for ff in lrem:
+                    assert os.stat(ff).st_mtime_ns != mtime, ff
+                for ff in lkeep:
+                    assert os.stat(ff).st_mtime_ns == mtime, ff
+
+                # unchanged output
+                for kcam, vcam in dvos0.items():
+                    for kk, vv in vcam.items():
+                        if not (isinstance(vv, dict) and 'data' in vv):
+                            continue
+                        for dd in [dvos, dvos2]:
+                            data = dd[kcam][kk]['data']
+                            if kk == 'etendlen':
+                                # summed over radii
+                                assert np.allclose(
+                                    vv['data'], data, rtol=1e-12,
+                                )
+                            else:
+                                assert np.array_equal(
+                                    vv['data'], data, equal_nan=True,
+                                ), (k0, kcam, kk)
+
+                # assemble and store from shards
+                self.coll.store_diagnostic_vos(
+                    key_diag=k0,
+                    path_shards=path,
+                    overwrite=True,
+                )
+                dvos3 = self.coll.check_diagnostic_dvos(key=k0)[1]
+                for kcam in lcam:
+                    assert np.array_equal(
+                        dvos3[kcam]['ph']['data'],
+                        dvos0[kcam]['ph']['data'],
+                    ), (k0, kcam)
+
+        finally:
+            shutil.rmtree(path)